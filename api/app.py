@@ -13,7 +13,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import service mới
 from services.ai_forecast_service import EnhancedAIForecastService
+from services.rollup_service import BorrowRollupService
 from config.database import db
+from config.settings import AppConfig
+from api.response_cache import ResponseCache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,6 +30,14 @@ CORS(app)
 # Khởi tạo service
 ai_service = EnhancedAIForecastService()
 
+# Cache response: xóa khi phiên bản rollup đổi (mượn / trả / phạt từ ứng dụng desktop)
+response_cache = ResponseCache(version_source=BorrowRollupService().data_version)
+
+# TTL (giây) theo endpoint
+CACHE_TTL = AppConfig.API_CACHE_TTL
+CACHE_TTL_BOOK_AGE = CACHE_TTL * 4   # Chỉ đổi khi thêm sách / năm XB
+CACHE_TTL_FORECAST = CACHE_TTL * 2   # Dữ liệu theo tháng
+
 
 # ========== EXISTING ENDPOINTS (giữ nguyên) ==========
 
@@ -59,7 +70,8 @@ def health_check():
         return jsonify({
             'status': 'healthy',
             'database': 'connected' if db_status else 'disconnected',
-            'ai_model': 'Multi-Factor Linear Model v2.0'
+            'ai_model': 'Multi-Factor Linear Model v2.0',
+            'cache': response_cache.stats()
         }), 200
     except Exception as e:
         return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
@@ -68,6 +80,7 @@ def health_check():
 # ========== NEW AI INSIGHTS ENDPOINTS ==========
 
 @app.route('/api/ai/insights/categories', methods=['GET'])
+@response_cache.cached(ttl=CACHE_TTL)
 def get_category_insights():
     """
     📊 Phân tích xu hướng theo thể loại sách
@@ -93,6 +106,7 @@ def get_category_insights():
 
 
 @app.route('/api/ai/insights/authors', methods=['GET'])
+@response_cache.cached(ttl=CACHE_TTL, vary_on={'limit': 10})
 def get_author_insights():
     """
     ✍️ Phân tích tác giả phổ biến
@@ -121,6 +135,7 @@ def get_author_insights():
 
 
 @app.route('/api/ai/insights/publishers', methods=['GET'])
+@response_cache.cached(ttl=CACHE_TTL)
 def get_publisher_insights():
     """
     🏢 Phân tích hiệu suất nhà xuất bản
@@ -146,6 +161,7 @@ def get_publisher_insights():
 
 
 @app.route('/api/ai/insights/book-age', methods=['GET'])
+@response_cache.cached(ttl=CACHE_TTL_BOOK_AGE)
 def get_book_age_insights():
     """
     📅 Phân tích ảnh hưởng năm xuất bản
@@ -170,6 +186,7 @@ def get_book_age_insights():
 
 
 @app.route('/api/ai/insights/comprehensive', methods=['GET'])
+@response_cache.cached(ttl=CACHE_TTL)
 def get_comprehensive_insights():
     """
     🎯 Lấy TẤT CẢ insights trong 1 request
@@ -197,6 +214,7 @@ def get_comprehensive_insights():
 
 
 @app.route('/api/ai/forecast-smart', methods=['GET'])
+@response_cache.cached(ttl=CACHE_TTL_FORECAST, vary_on={'months': 6})
 def get_smart_forecast():
     """
     🔮 Dự đoán thông minh dựa trên nhiều yếu tố
@@ -301,6 +319,13 @@ if __name__ == '__main__':
    # Dự đoán thông minh
    curl http://localhost:5000/api/ai/forecast-smart?months=6
 
+   # Cache: header X-Cache (HIT/MISS), gửi lại ETag để nhận 304
+   curl -i http://localhost:5000/api/ai/insights/comprehensive
+   curl -i -H 'If-None-Match: "<etag>"' http://localhost:5000/api/ai/insights/comprehensive
+
+   # Tỉ lệ hit của cache
+   curl http://localhost:5000/api/health
+
 4. Kết quả sẽ là JSON với insights chi tiết về:
    - Thể loại hot/trending/cold
    - Tác giả được yêu thích
@@ -0,0 +1,212 @@
+"""
+Response Cache - Cache phản hồi JSON cho các endpoint AI nặng
+
+- TTL riêng cho từng endpoint, key = endpoint + các query param được chỉ định
+  (đã chuẩn hóa: ?limit=010 và ?limit=10 dùng chung 1 entry)
+- ETag / If-None-Match: trình duyệt tải lại dashboard nhận 304, không tải lại body
+- Single-flight: nhiều request giống nhau cùng lúc chỉ tính 1 lần, các request
+  còn lại chờ và dùng chung kết quả
+- Tự xóa cache khi phiên bản dữ liệu đổi (mượn / trả / phạt ở tiến trình khác)
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Union
+import logging
+
+from flask import make_response, request
+
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Cache response của Flask view
+
+    Args:
+        version_source: Hàm trả về phiên bản dữ liệu hiện tại (None = không rõ)
+        check_interval: Số giây tối thiểu giữa 2 lần hỏi version_source
+        max_size: Số response tối đa giữ trong cache
+    """
+
+    def __init__(self, version_source: Optional[Callable[[], Optional[int]]] = None,
+                 check_interval: float = 2.0, max_size: int = 256):
+        self.version_source = version_source
+        self.check_interval = check_interval
+        self._store = TTLCache(max_size=max_size)
+        self._version: Optional[int] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._inflight: Dict[tuple, threading.Lock] = {}
+        self._endpoint_stats: Dict[str, Dict[str, int]] = {}
+        self.invalidations = 0
+
+    # ========== DECORATOR ==========
+
+    def cached(self, ttl: float, vary_on: Union[Iterable[str], Mapping[str, Any]] = ()):
+        """
+        Decorator cache response của view
+
+        Args:
+            ttl: Thời gian sống (giây) của response
+            vary_on: Các query param tham gia vào cache key (vd: 'months', 'limit'), hoặc
+                     {param: giá_trị_mặc_định} - thiếu param thì dùng mặc định, số được
+                     chuẩn hóa theo kiểu của mặc định (?limit=010 = ?limit=10 = không có limit)
+        """
+        if not isinstance(vary_on, Mapping):
+            vary_on = dict.fromkeys(vary_on)
+        vary_on = dict(vary_on)
+
+        def decorator(view):
+            endpoint = view.__name__
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                self._check_version()
+                key = (endpoint,) + tuple(
+                    self._normalise(request.args.get(name), default) for name, default in vary_on.items()
+                )
+
+                entry = self._store.get(key)
+                if entry is None:
+                    # Chỉ 1 request tính toán cho mỗi key, các request khác chờ
+                    lock = self._inflight_lock(key)
+                    try:
+                        with lock:
+                            entry = self._store.get(key)
+                            if entry is None:
+                                self._count(endpoint, 'misses')
+                                response = make_response(view(*args, **kwargs))
+                                if response.status_code != 200:
+                                    response.headers['X-Cache'] = 'BYPASS'
+                                    return response
+                                entry = self._store_response(key, response, ttl)
+                                return self._respond(entry, ttl, 'MISS')
+                    finally:
+                        # Luôn bỏ lock khi xong (kể cả lỗi / BYPASS): _inflight chỉ chứa
+                        # các key đang được tính, không phình theo số tham số khác nhau
+                        self._release_inflight(key, lock)
+
+                self._count(endpoint, 'hits')
+                return self._respond(entry, ttl, 'HIT')
+
+            return wrapper
+
+        return decorator
+
+    # ========== INVALIDATION ==========
+
+    def invalidate(self):
+        """Xóa toàn bộ response đã cache"""
+        self._store.invalidate()
+        self.invalidations += 1
+
+    def _check_version(self):
+        """Hỏi phiên bản dữ liệu (tối đa 1 lần / check_interval giây), đổi thì xóa cache"""
+        if self.version_source is None:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+
+        try:
+            version = self.version_source()
+        except Exception as e:
+            logger.warning(f"⚠️ Không đọc được phiên bản dữ liệu: {e}")
+            return
+
+        if version is None:
+            return
+
+        with self._lock:
+            changed = self._version is not None and version != self._version
+            self._version = version
+
+        if changed:
+            logger.info(f"♻️ Dữ liệu thay đổi (version {version}), xóa cache API")
+            self.invalidate()
+
+    # ========== STATS ==========
+
+    def stats(self) -> dict:
+        """Thống kê hit/miss tổng và theo endpoint (hiển thị ở /api/health)"""
+        with self._lock:
+            endpoints = {}
+            for name, counts in self._endpoint_stats.items():
+                lookups = counts['hits'] + counts['misses']
+                endpoints[name] = dict(
+                    counts,
+                    hit_ratio=round(counts['hits'] / lookups, 4) if lookups else 0.0
+                )
+
+            hits = sum(c['hits'] for c in self._endpoint_stats.values())
+            misses = sum(c['misses'] for c in self._endpoint_stats.values())
+
+        return {
+            'entries': len(self._store),
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'invalidations': self.invalidations,
+            'data_version': self._version,
+            'endpoints': endpoints
+        }
+
+    # ========== INTERNAL ==========
+
+    def _inflight_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            lock = self._inflight.get(key)
+            if lock is None:
+                lock = self._inflight[key] = threading.Lock()
+            return lock
+
+    def _release_inflight(self, key: tuple, lock: threading.Lock):
+        with self._lock:
+            if self._inflight.get(key) is lock:
+                del self._inflight[key]
+
+    @staticmethod
+    def _normalise(value: Optional[str], default: Any = None) -> Any:
+        """Giá trị query param -> phần của cache key"""
+        if value is None or not value.strip():
+            return default
+        value = value.strip()
+        if isinstance(default, int) or default is None:
+            try:
+                return int(value)
+            except ValueError:
+                pass
+        return value
+
+    def _count(self, endpoint: str, field: str):
+        with self._lock:
+            counts = self._endpoint_stats.setdefault(endpoint, {'hits': 0, 'misses': 0})
+            counts[field] += 1
+
+    def _store_response(self, key: tuple, response, ttl: float) -> dict:
+        body = response.get_data()
+        entry = {
+            'body': body,
+            'mimetype': response.mimetype,
+            'etag': hashlib.sha1(body).hexdigest()
+        }
+        self._store.set(key, entry, ttl=ttl)
+        return entry
+
+    @staticmethod
+    def _respond(entry: dict, ttl: float, status: str):
+        response = make_response(entry['body'], 200)
+        response.mimetype = entry['mimetype']
+        response.set_etag(entry['etag'])
+        # Trình duyệt luôn hỏi lại bằng If-None-Match, nhận 304 nếu không đổi
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Cache'] = status
+        response.headers['X-Cache-TTL'] = str(int(ttl))
+        return response.make_conditional(request)
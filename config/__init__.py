@@ -1,5 +1,5 @@
 """Configuration package"""
-from .database import Database, db
+from .database import Database, Transaction, db
 from .settings import DatabaseConfig, AppConfig
 from .session import Session
-__all__ = ['Database', 'db', 'DatabaseConfig', 'AppConfig', 'Session']
\ No newline at end of file
+__all__ = ['Database', 'Transaction', 'db', 'DatabaseConfig', 'AppConfig', 'Session']
\ No newline at end of file
@@ -1,6 +1,11 @@
 import mysql.connector
 from mysql.connector import pooling, Error
-from typing import Optional, Any
+from mysql.connector import errorcode
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Any, Iterator, Sequence
+import threading
+import weakref
 import logging
 
 from config.settings import DatabaseConfig
@@ -10,12 +15,122 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class PreparedStatementCache:
+    """
+    LRU cache các prepared statement (server-side) của 1 connection
+
+    Key là nguyên văn câu SQL, value là (sql, cursor) với cursor đã PREPARE trên server.
+    Connector chỉ dùng lại statement khi nhận ĐÚNG object chuỗi đã PREPARE
+    (so sánh `is`), nên cache giữ lại object sql ban đầu để execute.
+    Cursor bị loại khỏi cache sẽ được close (DEALLOCATE trên server).
+    Một connection chỉ được 1 thread dùng tại 1 thời điểm nên không cần lock.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._cursors: OrderedDict = OrderedDict()
+
+    def get(self, sql: str) -> Optional[tuple]:
+        """Trả về (sql_gốc, cursor) hoặc None"""
+        entry = self._cursors.get(sql)
+        if entry is not None:
+            self._cursors.move_to_end(sql)
+        return entry
+
+    def put(self, sql: str, cursor) -> bool:
+        """Thêm cursor vào cache, trả về True nếu phải loại bỏ 1 statement cũ"""
+        self._cursors[sql] = (sql, cursor)
+        self._cursors.move_to_end(sql)
+        if len(self._cursors) > self.capacity:
+            _, (_, old_cursor) = self._cursors.popitem(last=False)
+            self._close(old_cursor)
+            return True
+        return False
+
+    def clear(self):
+        while self._cursors:
+            _, (_, cursor) = self._cursors.popitem()
+            self._close(cursor)
+
+    @staticmethod
+    def _close(cursor):
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._cursors)
+
+
+class Transaction:
+    """
+    Unit-of-work: mọi câu lệnh chạy trên CÙNG 1 connection,
+    chỉ commit 1 lần khi kết thúc khối `with db.transaction() as tx`.
+    Không tự bắt lỗi: exception sẽ làm rollback toàn bộ.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor(dictionary=True)
+
+    def fetchone(self, query: str, params: tuple = None) -> Optional[dict]:
+        """Lấy 1 dòng (SELECT ONE)"""
+        self.cursor.execute(query, params or ())
+        rows = self.cursor.fetchall()
+        return rows[0] if rows else None
+
+    def fetchall(self, query: str, params: tuple = None) -> list[dict]:
+        """Lấy nhiều dòng (SELECT ALL)"""
+        self.cursor.execute(query, params or ())
+        return self.cursor.fetchall()
+
+    def execute(self, query: str, params: tuple = None) -> int:
+        """INSERT / UPDATE / DELETE, trả về số dòng bị ảnh hưởng"""
+        self.cursor.execute(query, params or ())
+        return self.cursor.rowcount
+
+    def execute_insert(self, query: str, params: tuple = None) -> Optional[int]:
+        """INSERT và trả về lastrowid"""
+        self.cursor.execute(query, params or ())
+        return self.cursor.lastrowid
+
+    def executemany(self, query: str, seq_params: Sequence[tuple]) -> int:
+        """Chạy 1 câu lệnh với nhiều bộ tham số (INSERT nhiều dòng gộp 1 lần gửi)"""
+        if not seq_params:
+            return 0
+        self.cursor.executemany(query, seq_params)
+        return self.cursor.rowcount
+
+    def close(self):
+        self.cursor.close()
+
+
 class Database:
-    """Singleton class quản lý MySQL database connection pool"""
+    """
+    Singleton class quản lý MySQL database connection pool
+
+    Connection của pool chạy autocommit: fetchone / fetchall / execute là 1 câu lệnh tự
+    commit, không cần thêm COMMIT / ROLLBACK. Nhiều câu lệnh phải atomic thì dùng
+    transaction() (hoặc connection.start_transaction() khi tự giữ connection).
+
+    Biến session: pool không reset session khi bật cache prepared statement
+    (POOL_RESET_SESSION), nên ai đổi biến session trên connection của pool phải tự đặt
+    lại trước khi trả connection (hoặc trả với discard=True), vd.:
+        - FOREIGN_KEY_CHECKS / UNIQUE_CHECKS (phục hồi dữ liệu)
+        - @skip_change_log (trigger sao lưu tăng dần, xem services/backup_chain.py)
+        - lock_wait_timeout, autocommit, transaction_isolation / READ ONLY của session
+    Transaction chưa kết thúc thì được rollback khi lấy / trả connection.
+    """
 
     _instance: Optional['Database'] = None
     _connection_pool: Optional[pooling.MySQLConnectionPool] = None
 
+    # Lỗi server cho biết statement không dùng được ở chế độ prepared
+    _UNPREPARABLE_ERRORS = (errorcode.ER_UNSUPPORTED_PS,)
+    # Lỗi server cho biết statement handle đã mất (reconnect, reset session...)
+    _STALE_STMT_ERRORS = (errorcode.ER_UNKNOWN_STMT_HANDLER,)
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Database, cls).__new__(cls)
@@ -23,6 +138,14 @@ class Database:
 
     def __init__(self):
         """Khởi tạo connection pool"""
+        if not hasattr(self, 'stmt_cache_size'):
+            self.stmt_cache_size = DatabaseConfig.STMT_CACHE_SIZE
+            # Cache theo connection vật lý (không phải PooledMySQLConnection bọc ngoài)
+            self._stmt_caches = weakref.WeakKeyDictionary()
+            self._unpreparable: set = set()
+            self._stats_lock = threading.Lock()
+            self._stmt_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'fallbacks': 0}
+
         if self._connection_pool is None:
             self._create_connection_pool()
 
@@ -51,13 +174,18 @@ class Database:
     def get_connection(self) -> Optional[mysql.connector.MySQLConnection]:
         """
         Lấy connection từ pool
-        QUAN TRỌNG: Phải close() connection sau khi sử dụng
+        QUAN TRỌNG: Phải trả connection bằng release_connection() (hoặc close()) sau khi sử dụng
         """
         try:
             if self._connection_pool is None:
                 self._create_connection_pool()
 
             connection = self._connection_pool.get_connection()
+            if connection.in_transaction:
+                # Người dùng trước mở transaction rồi close() không commit/rollback: pool
+                # không reset session nên phải tự kết thúc (in_transaction đọc từ cờ trạng
+                # thái server đã nhận, không tốn round trip khi không có transaction)
+                connection.rollback()
             return connection
 
         except Error as e:
@@ -69,7 +197,8 @@ class Database:
             query: str,
             params: tuple = None,
             fetch: bool = False,
-            commit: bool = False
+            commit: bool = False,
+            raise_errors: bool = False
     ) -> Any:
         """
         Helper method để execute query
@@ -79,51 +208,176 @@ class Database:
             params: Parameters cho prepared statement
             fetch: True nếu cần fetch kết quả (SELECT)
             commit: True nếu cần commit (INSERT/UPDATE/DELETE)
+            raise_errors: True để ném lỗi CSDL cho caller thay vì trả về None
 
         Returns:
             - Nếu fetch=True: trả về list of tuples
             - Nếu commit=True: trả về lastrowid hoặc rowcount
-            - Nếu lỗi: trả về None
+            - Nếu lỗi: trả về None (hoặc ném Error nếu raise_errors=True)
         """
         connection = None
         cursor = None
+        cached = False
 
         try:
             connection = self.get_connection()
             if not connection:
+                if raise_errors:
+                    raise Error(msg="Không lấy được connection từ pool")
                 return None
 
-            cursor = connection.cursor(dictionary=True)  # Trả về dict
-
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
+            cursor, cached = self._execute_cursor(connection, query, params)
 
             if fetch:
-                result = cursor.fetchall()
-                return result
+                return cursor.fetchall()
 
+            # autocommit: câu lệnh đã được commit, không cần gửi COMMIT
             if commit:
-                connection.commit()
                 return cursor.lastrowid if cursor.lastrowid else cursor.rowcount
 
             return True
 
         except Error as e:
-            if connection:
+            if connection and connection.in_transaction:
                 connection.rollback()
             logger.error(f"❌ Lỗi execute query: {e}")
             logger.error(f"Query: {query}")
             logger.error(f"Params: {params}")
+            if raise_errors:
+                raise
             return None
 
         finally:
-            if cursor:
+            if cursor and not cached:
                 cursor.close()
             if connection:
                 connection.close()
 
+    def release_connection(self, connection, discard: bool = False):
+        """
+        Trả connection về pool ở trạng thái sạch
+
+        Pool không reset session (để giữ prepared statement) nên transaction còn mở
+        (snapshot sao lưu, START TRANSACTION chưa kết thúc) được rollback trước khi trả.
+        Biến session người gọi đã đổi phải tự đặt lại trước (xem docstring Database).
+
+        Args:
+            discard: True khi còn kết quả chưa đọc hết / lỗi giữa chừng: đóng hẳn socket
+                     (không đọc bỏ phần còn lại, server tự hủy query), pool mở lại khi cần
+        """
+        if not discard and connection.in_transaction:
+            try:
+                connection.rollback()
+            except Error as e:
+                logger.warning(f"⚠️ Rollback khi trả connection thất bại: {e}")
+                discard = True
+
+        if discard:
+            self._drop_statement_cache(connection)
+            try:
+                getattr(connection, '_cnx', connection).shutdown()
+            except Exception:
+                pass
+
+        try:
+            connection.close()
+        except Error:
+            # Connection đã shutdown: pool vẫn nhận lại và reconnect ở lần lấy sau
+            pass
+
+    # =========================
+    # PREPARED STATEMENT CACHE
+    # =========================
+
+    def _execute_cursor(self, connection, query: str, params: tuple = None):
+        """
+        Chạy query trên cursor phù hợp
+
+        Returns:
+            (cursor, cached): cursor đã execute; cached=True nếu cursor thuộc
+            cache prepared statement (không được close sau khi dùng)
+        """
+        cache = self._get_statement_cache(connection)
+
+        if cache is None or query in self._unpreparable:
+            cursor = connection.cursor(dictionary=True)  # Trả về dict
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            return cursor, False
+
+        entry = cache.get(query)
+        if entry is not None:
+            prepared_sql, cursor = entry
+            try:
+                cursor.execute(prepared_sql, params or ())
+                self._count_stmt('hits')
+                return cursor, True
+            except Error as e:
+                if e.errno not in self._STALE_STMT_ERRORS:
+                    raise
+                # Statement trên server đã mất (reconnect...): bỏ cache và PREPARE lại
+                self._drop_statement_cache(connection)
+                cache = self._get_statement_cache(connection)
+
+        self._count_stmt('misses')
+        cursor = connection.cursor(prepared=True, dictionary=True)
+        try:
+            cursor.execute(query, params or ())
+        except Error as e:
+            cursor.close()
+            if e.errno not in self._UNPREPARABLE_ERRORS:
+                raise
+            # Câu lệnh không hỗ trợ prepared protocol: ghi nhớ và dùng text protocol
+            self._unpreparable.add(query)
+            self._count_stmt('fallbacks')
+            return self._execute_cursor(connection, query, params)
+
+        if cache.put(query, cursor):
+            self._count_stmt('evictions')
+        return cursor, True
+
+    def _get_statement_cache(self, connection) -> Optional[PreparedStatementCache]:
+        """Lấy (hoặc tạo) cache prepared statement của connection vật lý"""
+        if self.stmt_cache_size <= 0:
+            return None
+
+        raw_connection = getattr(connection, '_cnx', connection)
+        cache = self._stmt_caches.get(raw_connection)
+        if cache is None or cache.capacity != self.stmt_cache_size:
+            if cache is not None:
+                cache.clear()
+            cache = PreparedStatementCache(self.stmt_cache_size)
+            self._stmt_caches[raw_connection] = cache
+        return cache
+
+    def _drop_statement_cache(self, connection):
+        raw_connection = getattr(connection, '_cnx', connection)
+        cache = self._stmt_caches.pop(raw_connection, None)
+        if cache is not None:
+            cache.clear()
+
+    def _count_stmt(self, key: str):
+        with self._stats_lock:
+            self._stmt_stats[key] += 1
+
+    def get_statement_cache_stats(self) -> dict:
+        """Thống kê cache prepared statement: hits, misses, evictions, hit_ratio..."""
+        with self._stats_lock:
+            stats = dict(self._stmt_stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['cached_statements'] = sum(len(c) for c in list(self._stmt_caches.values()))
+        stats['capacity_per_connection'] = self.stmt_cache_size
+        return stats
+
+    def reset_statement_cache_stats(self):
+        """Đặt lại bộ đếm (dùng cho benchmark)"""
+        with self._stats_lock:
+            for key in self._stmt_stats:
+                self._stmt_stats[key] = 0
+
     def test_connection(self) -> bool:
         """Test kết nối database"""
         try:
@@ -139,6 +393,10 @@ class Database:
 
     def close_pool(self):
         """Đóng toàn bộ connection pool"""
+        for cache in list(self._stmt_caches.values()):
+            cache.clear()
+        self._stmt_caches.clear()
+
         if self._connection_pool:
             # MySQL connector không có close pool method
             # Chỉ cần set None, Python garbage collector sẽ xử lý
@@ -159,12 +417,18 @@ class Database:
         )
         return results[0] if results else None
 
-    def fetchall(self, query: str, params: tuple = None) -> list[dict]:
-        """Lấy nhiều dòng (SELECT ALL)"""
+    def fetchall(self, query: str, params: tuple = None, raise_errors: bool = False) -> list[dict]:
+        """
+        Lấy nhiều dòng (SELECT ALL)
+
+        raise_errors=True: lỗi CSDL được ném ra thay vì trả về [] - dùng khi danh sách
+        rỗng và "không đọc được" phải phân biệt (phân trang, xuất dữ liệu)
+        """
         return self.execute_query(
             query=query,
             params=params,
-            fetch=True
+            fetch=True,
+            raise_errors=raise_errors
         ) or []
 
     def execute(self, query: str, params: tuple = None) -> bool:
@@ -184,6 +448,75 @@ class Database:
             commit=True
         )
 
+    @contextmanager
+    def transaction(self) -> Iterator[Transaction]:
+        """
+        Mở unit-of-work trên 1 connection của pool
+
+        Ví dụ:
+            with db.transaction() as tx:
+                slip_id = tx.execute_insert("INSERT ...", (...))
+                tx.execute("UPDATE ...", (...))
+            # commit 1 lần tại đây, rollback nếu có exception
+        """
+        connection = self.get_connection()
+        if not connection:
+            raise Error(msg="Không lấy được connection từ pool")
+
+        tx = None
+        try:
+            # Connection chạy autocommit: mở transaction tường minh cho cả khối
+            connection.start_transaction()
+            tx = Transaction(connection)
+            yield tx
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            if tx is not None:
+                tx.close()
+            connection.close()
+
+    def stream(self, query: str, params: tuple = None, batch_size: int = 1000) -> Iterator[dict]:
+        """
+        Đọc kết quả SELECT theo từng lô (fetchmany) thay vì fetchall
+
+        Giữ 1 connection trong suốt quá trình duyệt, chỉ có tối đa
+        batch_size dòng nằm trong bộ nhớ tại một thời điểm.
+        QUAN TRỌNG: Phải duyệt hết (hoặc close generator) để trả connection về pool.
+        Dừng giữa chừng thì connection bị đóng hẳn thay vì đọc bỏ phần còn lại.
+
+        Raises:
+            Error: lỗi CSDL được ném ra cho caller, không nuốt (tránh kết quả bị cắt cụt)
+        """
+        connection = self.get_connection()
+        if not connection:
+            raise Error(msg="Không lấy được connection từ pool")
+
+        cursor = None
+        exhausted = False
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, params or ())
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+            exhausted = True
+
+        except Error as e:
+            logger.error(f"❌ Lỗi stream query: {e}")
+            logger.error(f"Query: {query}")
+            raise
+
+        finally:
+            if exhausted:
+                cursor.close()
+            self.release_connection(connection, discard=not exhausted)
+
 
 # Singleton instance
 db = Database()
\ No newline at end of file
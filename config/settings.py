@@ -20,7 +20,14 @@ class DatabaseConfig:
     # Connection pool settings
     POOL_NAME = 'library_pool'
     POOL_SIZE = 10
-    POOL_RESET_SESSION = True
+
+    # Số prepared statement (server-side) giữ lại trên mỗi connection, 0 = tắt cache
+    STMT_CACHE_SIZE = int(os.getenv('DB_STMT_CACHE_SIZE', 32))
+
+    # Reset session khi trả connection về pool sẽ hủy mọi prepared statement
+    # trên server, nên chỉ bật khi không dùng cache. Khi tắt, biến session đi theo
+    # connection về pool: xem "Biến session" trong config/database.py
+    POOL_RESET_SESSION = STMT_CACHE_SIZE == 0
 
     @classmethod
     def get_config(cls) -> Dict[str, any]:
@@ -33,7 +40,9 @@ class DatabaseConfig:
             'database': cls.DATABASE,
             'charset': 'utf8mb4',
             'collation': 'utf8mb4_unicode_ci',
-            'autocommit': False,
+            # Mỗi câu lệnh lẻ tự commit (không tốn round trip COMMIT / ROLLBACK khi đọc);
+            # nhiều câu lệnh cần atomic thì dùng db.transaction() (START TRANSACTION)
+            'autocommit': True,
             'raise_on_warnings': False,
             'use_pure': True
         }
@@ -72,6 +81,31 @@ class AppConfig:
     ITEMS_PER_PAGE = 50
     DEFAULT_CARD_VALIDITY_DAYS = 365
 
+    # Thời gian (giây) giữ snapshot thống kê trước khi tính lại
+    STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', 30))
+
+    # Thời gian (giây) API AI giữ response trong cache (tự xóa khi dữ liệu mượn trả đổi)
+    API_CACHE_TTL = int(os.getenv('API_CACHE_TTL', 300))
+
+    # Thời gian (giây) tối đa giữa 2 lần xây chỉ mục tìm kiếm trong bộ nhớ
+    # (quá hạn thì xây lại nền để thấy sách / bạn đọc do máy khác thêm vào)
+    SEARCH_INDEX_MAX_AGE = int(os.getenv('SEARCH_INDEX_MAX_AGE', 600))
+
+    # Số mã (barcode / ISBN / tên) giữ trong LRU tra cứu ở quầy mượn trả
+    LOOKUP_CACHE_SIZE = int(os.getenv('LOOKUP_CACHE_SIZE', 10000))
+    # Thời gian (giây) 1 mã / tên tra được còn dùng mà không hỏi lại CSDL
+    LOOKUP_CACHE_TTL = int(os.getenv('LOOKUP_CACHE_TTL', 300))
+
+    # Số bảng sao lưu / phục hồi đồng thời (mỗi bảng 1 connection của pool,
+    # bị giới hạn ở POOL_SIZE // 3 - xem services/table_scheduler.py)
+    BACKUP_WORKERS = int(os.getenv('BACKUP_WORKERS', 3))
+
+    # Số job xuất dữ liệu (JSON / CSV / Excel / PDF) chạy nền đồng thời
+    EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 2))
+
+    # Font TTF Unicode cho file PDF xuất ra (để trống = tự tìm Arial / DejaVu Sans)
+    PDF_FONT_PATH = os.getenv('PDF_FONT_PATH', '')
+
     # Colors
     COLOR_PRIMARY = '#2196F3'
     COLOR_SUCCESS = '#4CAF50'
@@ -5,6 +5,7 @@ from models.book import Book, Author, Category, Publisher
 from services.book_service import BookService
 from utils.messagebox_helper import MessageBoxHelper
 from utils.export_helper import ExportHelper
+from utils.export_jobs import ExportJob, RecordExport
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,16 @@ class BookController:
         self.service = BookService()
         self.msg_helper = MessageBoxHelper()
         self.export_helper = ExportHelper()
+        self.exports = RecordExport(
+            'sách', 'books',
+            {
+                'JSON': self.export_helper.export_books_to_json,
+                'CSV': self.export_helper.export_books_to_csv,
+                'Excel': self.export_helper.export_books_to_excel,
+                'PDF': self.export_helper.export_books_to_pdf,
+            },
+            stream=self.service.stream_books, count=self.service.count_books, msg_helper=self.msg_helper
+        )
 
     # ========== CRUD OPERATIONS - BOOKS ==========
 
@@ -74,6 +85,16 @@ class BookController:
         """Lấy danh sách tất cả sách"""
         return self.service.get_all_books()
 
+    def get_books_page(self, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[Book]:
+        """Lấy 1 trang sách (keyset theo book_id)"""
+        if limit is None:
+            return self.service.get_books_page(after_id)
+        return self.service.get_books_page(after_id, limit)
+
+    def count_books(self) -> int:
+        """Đếm tổng số đầu sách"""
+        return self.service.count_books()
+
     def get_book_by_id(self, book_id: int) -> Optional[Book]:
         """Lấy thông tin sách theo ID"""
         return self.service.get_book_by_id(book_id)
@@ -159,75 +180,33 @@ class BookController:
             return None
 
     # ========== EXPORT OPERATIONS ==========
+    # books = None: xuất toàn bộ, đọc thẳng từ DB theo lô (không cần nạp hết vào bộ nhớ)
 
-    def export_json(self, books: List[Book], parent=None) -> bool:
-        """Xuất ra JSON"""
-        if not books:
-            self.msg_helper.show_warning("Không có dữ liệu", "Không có sách để xuất", parent=parent)
-            return False
-
-        success, message = self.export_helper.export_books_to_json(books)
-
-        if success:
-            self.msg_helper.show_success(
-                f"Đã xuất {len(books)} sách ra JSON\n{message}",
-                parent=parent
-            )
-            return True
-        else:
-            self.msg_helper.show_error("Lỗi xuất JSON", message, parent=parent)
-            return False
-
-    def export_csv(self, books: List[Book], parent=None) -> bool:
-        """Xuất ra CSV"""
-        if not books:
-            self.msg_helper.show_warning("Không có dữ liệu", "Không có sách để xuất", parent=parent)
-            return False
-
-        success, message = self.export_helper.export_books_to_csv(books)
-
-        if success:
-            self.msg_helper.show_success(
-                f"Đã xuất {len(books)} sách ra CSV\n{message}",
-                parent=parent
-            )
-            return True
-        else:
-            self.msg_helper.show_error("Lỗi xuất CSV", message, parent=parent)
-            return False
+    def export_json(self, books: Optional[List[Book]] = None, parent=None) -> bool:
+        """Xuất ra JSON (ghi theo luồng)"""
+        return self.exports.export('JSON', books, parent)
 
-    def export_excel(self, books: List[Book], parent=None) -> bool:
-        """Xuất ra Excel"""
-        if not books:
-            self.msg_helper.show_warning("Không có dữ liệu", "Không có sách để xuất", parent=parent)
-            return False
+    def export_csv(self, books: Optional[List[Book]] = None, parent=None) -> bool:
+        """Xuất ra CSV (ghi theo luồng)"""
+        return self.exports.export('CSV', books, parent)
 
-        success, message = self.export_helper.export_books_to_excel(books)
+    def export_excel(self, books: Optional[List[Book]] = None, parent=None) -> bool:
+        """Xuất ra Excel (write-only, ghi theo luồng)"""
+        return self.exports.export('Excel', books, parent)
 
-        if success:
-            self.msg_helper.show_success(
-                f"Đã xuất {len(books)} sách ra Excel\n{message}",
-                parent=parent
-            )
-            return True
-        else:
-            self.msg_helper.show_error("Lỗi xuất Excel", message, parent=parent)
-            return False
+    def export_pdf(self, books: Optional[List[Book]] = None, parent=None) -> bool:
+        """Xuất ra PDF (chia trang, ghi theo luồng)"""
+        return self.exports.export('PDF', books, parent)
 
-    def export_pdf(self, books: List[Book], parent=None) -> bool:
-        """Xuất ra PDF"""
-        if not books:
-            self.msg_helper.show_warning("Không có dữ liệu", "Không có sách để xuất", parent=parent)
-            return False
+    def export_async(self, label: str, books: Optional[List[Book]] = None,
+                     parent=None) -> Optional[ExportJob]:
+        """
+        Đưa vào hàng đợi xuất chạy nền (tiến độ / hủy / thông báo ở bảng job của cửa sổ chính)
 
-        success, message = self.export_helper.export_books_to_pdf(books)
+        Args:
+            label: 'JSON' | 'CSV' | 'Excel' | 'PDF'
 
-        if success:
-            self.msg_helper.show_success(
-                f"Đã xuất {len(books)} sách ra PDF\n{message}",
-                parent=parent
-            )
-            return True
-        else:
-            self.msg_helper.show_error("Lỗi xuất PDF", message, parent=parent)
-            return False
\ No newline at end of file
+        Returns:
+            ExportJob hoặc None nếu không có dữ liệu
+        """
+        return self.exports.submit(label, books, parent)
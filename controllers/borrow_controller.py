@@ -7,11 +7,38 @@ class BorrowController:
     def create_borrow_by_name(self, reader_name, book_name):
         return self.service.create_borrow(reader_name, book_name)
 
+    def suggest_readers(self, text):
+        return self.service.lookup.suggest_readers(text)
+
+    def suggest_books(self, text):
+        return self.service.lookup.suggest_books(text)
+
+    def create_borrow_batch(self, reader_ref, book_codes):
+        return self.service.create_borrow_batch(reader_ref, book_codes)
+
     def update_borrow(self, slip_id, borrow_date, return_date, status):
         return self.service.update_borrow(slip_id, borrow_date, return_date, status)
 
     def return_books(self, slip_id):
         return self.service.return_books(slip_id)
 
-    def get_all_borrows(self):
-        return self.service.get_all_borrows()
+    def return_books_bulk(self, slip_ids=(), barcodes=()):
+        return self.service.return_books_bulk(slip_ids, barcodes)
+
+    def get_all_borrows(self, **filters):
+        return self.service.get_all_borrows(**filters)
+
+    def count_borrows(self, **filters):
+        return self.service.count_borrows(**filters)
+
+    def get_borrow(self, slip_id):
+        return self.service.get_borrow(slip_id)
+
+    def matches_filters(self, row, **filters):
+        return self.service.matches_filters(row, **filters)
+
+    def page_cursor(self, row, sort_by):
+        return self.service.page_cursor(row, sort_by)
+
+    def resolve_reader(self, reader_ref):
+        return self.service.lookup.resolve_reader(reader_ref)
@@ -4,7 +4,8 @@ import logging
 from models.reader import Reader
 from services.reader_service import ReaderService
 from utils.messagebox_helper import MessageBoxHelper
-from utils. export_helper import ExportHelper
+from utils.export_helper import ExportHelper
+from utils.export_jobs import ExportJob, RecordExport
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,16 @@ class ReaderController:
         self.service = ReaderService()
         self.msg_helper = MessageBoxHelper()
         self.export_helper = ExportHelper()
+        self.exports = RecordExport(
+            'bạn đọc', 'readers',
+            {
+                'JSON': self.export_helper.export_to_json,
+                'CSV': self.export_helper.export_to_csv,
+                'Excel': self.export_helper.export_to_excel,
+                'PDF': self.export_helper.export_to_pdf,
+            },
+            stream=self.service.stream_readers, count=self.service.count_readers, msg_helper=self.msg_helper
+        )
 
     # ========== CRUD OPERATIONS ==========
 
@@ -147,75 +158,33 @@ class ReaderController:
             return False
 
     # ========== EXPORT OPERATIONS ==========
+    # readers = None: xuất toàn bộ, đọc thẳng từ DB theo lô (không cần nạp hết vào bộ nhớ)
 
-    def export_json(self, readers: List[Reader], parent=None) -> bool:
-        """Xuất ra JSON"""
-        if not readers:
-            self.msg_helper.show_warning("Không có dữ liệu", "Không có bạn đọc để xuất", parent=parent)
-            return False
-
-        success, message = self.export_helper.export_to_json(readers)
-
-        if success:
-            self. msg_helper.show_success(
-                f"Đã xuất {len(readers)} bạn đọc ra JSON\n{message}",
-                parent=parent
-            )
-            return True
-        else:
-            self. msg_helper.show_error("Lỗi xuất JSON", message, parent=parent)
-            return False
-
-    def export_csv(self, readers: List[Reader], parent=None) -> bool:
-        """Xuất ra CSV"""
-        if not readers:
-            self.msg_helper. show_warning("Không có dữ liệu", "Không có bạn đọc để xuất", parent=parent)
-            return False
-
-        success, message = self.export_helper. export_to_csv(readers)
-
-        if success:
-            self.msg_helper.show_success(
-                f"Đã xuất {len(readers)} bạn đọc ra CSV\n{message}",
-                parent=parent
-            )
-            return True
-        else:
-            self.msg_helper.show_error("Lỗi xuất CSV", message, parent=parent)
-            return False
+    def export_json(self, readers: Optional[List[Reader]] = None, parent=None) -> bool:
+        """Xuất ra JSON (ghi theo luồng)"""
+        return self.exports.export('JSON', readers, parent)
 
-    def export_excel(self, readers: List[Reader], parent=None) -> bool:
-        """Xuất ra Excel"""
-        if not readers:
-            self.msg_helper.show_warning("Không có dữ liệu", "Không có bạn đọc để xuất", parent=parent)
-            return False
+    def export_csv(self, readers: Optional[List[Reader]] = None, parent=None) -> bool:
+        """Xuất ra CSV (ghi theo luồng)"""
+        return self.exports.export('CSV', readers, parent)
 
-        success, message = self.export_helper.export_to_excel(readers)
+    def export_excel(self, readers: Optional[List[Reader]] = None, parent=None) -> bool:
+        """Xuất ra Excel (write-only, ghi theo luồng)"""
+        return self.exports.export('Excel', readers, parent)
 
-        if success:
-            self. msg_helper.show_success(
-                f"Đã xuất {len(readers)} bạn đọc ra Excel\n{message}",
-                parent=parent
-            )
-            return True
-        else:
-            self. msg_helper.show_error("Lỗi xuất Excel", message, parent=parent)
-            return False
+    def export_pdf(self, readers: Optional[List[Reader]] = None, parent=None) -> bool:
+        """Xuất ra PDF (chia trang, ghi theo luồng)"""
+        return self.exports.export('PDF', readers, parent)
 
-    def export_pdf(self, readers: List[Reader], parent=None) -> bool:
-        """Xuất ra PDF"""
-        if not readers:
-            self.msg_helper. show_warning("Không có dữ liệu", "Không có bạn đọc để xuất", parent=parent)
-            return False
+    def export_async(self, label: str, readers: Optional[List[Reader]] = None,
+                     parent=None) -> Optional[ExportJob]:
+        """
+        Đưa vào hàng đợi xuất chạy nền (tiến độ / hủy / thông báo ở bảng job của cửa sổ chính)
 
-        success, message = self.export_helper. export_to_pdf(readers)
+        Args:
+            label: 'JSON' | 'CSV' | 'Excel' | 'PDF'
 
-        if success:
-            self.msg_helper.show_success(
-                f"Đã xuất {len(readers)} bạn đọc ra PDF\n{message}",
-                parent=parent
-            )
-            return True
-        else:
-            self.msg_helper.show_error("Lỗi xuất PDF", message, parent=parent)
-            return False
\ No newline at end of file
+        Returns:
+            ExportJob hoặc None nếu không có dữ liệu
+        """
+        return self.exports.submit(label, readers, parent)
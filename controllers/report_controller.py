@@ -1,7 +1,7 @@
-import pandas as pd
 from tkinter import filedialog
 from datetime import datetime
 from services.report_service import ReportService
+from utils.export_jobs import ExportJob, export_jobs
 
 
 class ReportController:
@@ -23,81 +23,87 @@ class ReportController:
 
     def export_to_excel(self):
         """
-        Xuất toàn bộ báo cáo ra file Excel (.xlsx)
+        Xuất toàn bộ báo cáo ra file Excel (.xlsx) - chạy đồng bộ
+        """
+        save_path = self.ask_excel_path()
+        if not save_path:
+            return False, "Đã hủy lưu file."
+        return self.write_excel(save_path)
+
+    def ask_excel_path(self):
+        """Mở hộp thoại chọn nơi lưu file (gọi trên main thread)"""
+        filename = f"Bao_cao_Thu_vien_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+        return filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            initialfile=filename,
+            title="Lưu file báo cáo Excel",
+            filetypes=[("Excel files", "*.xlsx")]
+        )
+
+    def export_excel_async(self, save_path) -> ExportJob:
+        """Đưa việc xuất báo cáo vào hàng đợi xuất chạy nền"""
+        return export_jobs.submit("Xuất báo cáo Excel", self._run_excel_job, save_path)
+
+    def _run_excel_job(self, job: ExportJob, save_path):
+        job.output_path = save_path
+        return self.write_excel(save_path, job=job)
+
+    def write_excel(self, save_path, job: ExportJob = None):
+        """
+        Ghi báo cáo ra file Excel (gọi được từ thread nền)
+
+        Args:
+            job: Job xuất (báo tiến độ theo sheet, dừng khi bị hủy)
         """
         try:
+            from utils.excel_export import ExcelExportEngine
+
             # 1. Lấy dữ liệu mới nhất (Mặc định lấy theo tháng cho báo cáo tổng quan)
             data = self.get_dashboard_data(mode='month')
-
-            # 2. Chuẩn bị các DataFrame (Bảng dữ liệu) cho từng Sheet
-
-            # --- Sheet 1: Thống kê mượn ---
-            df_borrow = pd.DataFrame(data['borrow_stats'])
-            if not df_borrow.empty:
-                df_borrow.columns = ['Thời gian', 'Số lượt mượn']
-
-            # --- Sheet 2: Top bạn đọc ---
-            df_readers = pd.DataFrame(data['top_readers'])
-            if not df_readers.empty:
-                # Chọn cột và đổi tên tiếng Việt
-                if 'reader_id' in df_readers.columns:
-                    df_readers = df_readers[['reader_id', 'full_name', 'borrow_count']]
-                    df_readers.columns = ['Mã bạn đọc', 'Họ tên', 'Số lần mượn']
-
-            # --- Sheet 3: Sách Hư hỏng / Mất ---
-            df_risk = pd.DataFrame(data['damaged_lost'])
-            if not df_risk.empty:
-                # Map tên loại phạt sang tiếng Việt
-                type_map = {'LOST': 'Mất sách', 'DAMAGED': 'Hư hỏng', 'LATE': 'Trễ hạn'}
-                df_risk['penalty_type'] = df_risk['penalty_type'].map(type_map).fillna(df_risk['penalty_type'])
-
-                df_risk.columns = ['Loại vi phạm', 'Số lượng', 'Tổng tiền phạt']
-
-            # --- Sheet 4: Tổng quan Kho ---
             inv = data['inventory']
-            # Tạo bảng tổng quan
-            df_inventory_general = pd.DataFrame([
-                {'Chỉ số': 'Tổng đầu sách', 'Giá trị': inv['total']},
-                {'Chỉ số': 'Đang cho mượn', 'Giá trị': inv['borrowed']},
-                {'Chỉ số': 'Còn trong kho', 'Giá trị': inv['available']}
-            ])
-            # Tạo bảng chi tiết thể loại
-            df_categories = pd.DataFrame(inv['categories'])
-            if not df_categories.empty:
-                df_categories.columns = ['Thể loại', 'Số lượng']
-
-            # 3. Mở hộp thoại chọn nơi lưu file
-            filename = f"Bao_cao_Thu_vien_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-            save_path = filedialog.asksaveasfilename(
-                defaultextension=".xlsx",
-                initialfile=filename,
-                title="Lưu file báo cáo Excel",
-                filetypes=[("Excel files", "*.xlsx")]
-            )
-
-            if save_path:
-                # 4. Ghi dữ liệu vào file Excel (Sử dụng engine openpyxl)
-                with pd.ExcelWriter(save_path, engine='openpyxl') as writer:
-                    if not df_inventory_general.empty:
-                        df_inventory_general.to_excel(writer, sheet_name='Tổng Quan', index=False)
-
-                    if not df_categories.empty:
-                        df_categories.to_excel(writer, sheet_name='Chi tiết Thể loại', index=False)
-
-                    if not df_borrow.empty:
-                        df_borrow.to_excel(writer, sheet_name='Xu hướng Mượn', index=False)
-
-                    if not df_readers.empty:
-                        df_readers.to_excel(writer, sheet_name='Top Bạn Đọc', index=False)
-
-                    if not df_risk.empty:
-                        df_risk.to_excel(writer, sheet_name='Rủi ro & Phạt', index=False)
-
-                return True, f"Đã xuất file thành công tại:\n{save_path}"
-
-            return False, "Đã hủy lưu file."
 
+            # 2. Chuẩn bị từng Sheet: (tên sheet, tiêu đề cột, các dòng, định dạng số)
+            type_map = {'LOST': 'Mất sách', 'DAMAGED': 'Hư hỏng', 'LATE': 'Trễ hạn'}
+            sheets = [
+                # --- Tổng quan Kho ---
+                ('Tổng Quan', ['Chỉ số', 'Giá trị'], [
+                    ['Tổng đầu sách', inv['total']],
+                    ['Đang cho mượn', inv['borrowed']],
+                    ['Còn trong kho', inv['available']]
+                ], None),
+                # --- Chi tiết thể loại ---
+                ('Chi tiết Thể loại', ['Thể loại', 'Số lượng'],
+                 [[row['category_name'], row['quantity']] for row in inv['categories']], None),
+                # --- Thống kê mượn ---
+                ('Xu hướng Mượn', ['Thời gian', 'Số lượt mượn'],
+                 [[row['time_point'], row['total_borrows']] for row in data['borrow_stats']], None),
+                # --- Top bạn đọc ---
+                ('Top Bạn Đọc', ['Mã bạn đọc', 'Họ tên', 'Số lần mượn'],
+                 [[row['reader_id'], row['full_name'], row['borrow_count']]
+                  for row in data['top_readers']], None),
+                # --- Sách Hư hỏng / Mất (map tên loại phạt sang tiếng Việt) ---
+                ('Rủi ro & Phạt', ['Loại vi phạm', 'Số lượng', 'Tổng tiền phạt'],
+                 [[type_map.get(row['penalty_type'], row['penalty_type']),
+                   row['quantity'], row['total_fine']]
+                  for row in data['damaged_lost']], {2: '#,##0'}),
+            ]
+
+            # 3. Ghi dữ liệu vào file Excel (write-only, bỏ qua sheet rỗng)
+            if job:
+                job.set_total(len(sheets))
+            engine = ExcelExportEngine()
+            for index, (title, headers, rows, number_formats) in enumerate(sheets, start=1):
+                if rows:
+                    engine.add_sheet(title, headers, rows, number_formats=number_formats)
+                if job:
+                    job.advance(index)
+            engine.save(save_path)
+
+            return True, f"Đã xuất file thành công tại:\n{save_path}"
+
+        except ImportError:
+            return False, "Chưa cài đặt thư viện openpyxl. Chạy: pip install openpyxl"
         except Exception as e:
             # In lỗi ra console để debug nếu cần
             print(f"Lỗi xuất Excel: {e}")
-            return False, f"Có lỗi xảy ra khi xuất file:\n{str(e)}"
\ No newline at end of file
+            return False, f"Có lỗi xảy ra khi xuất file:\n{str(e)}"
@@ -1,4 +1,5 @@
 from services.system_service import SystemService
+from services.table_scheduler import MAX_WORKERS
 from tkinter import filedialog
 
 
@@ -6,6 +7,11 @@ class SystemController:
     def __init__(self):
         self.service = SystemService()
 
+    @property
+    def max_workers(self):
+        """Số luồng sao lưu / phục hồi tối đa (giới hạn bởi connection pool)"""
+        return MAX_WORKERS
+
     def get_current_settings(self):
         return self.service.get_settings()
 
@@ -26,22 +32,34 @@ class SystemController:
         else:
             return False, "Cập nhật thất bại!"
 
-    def perform_backup(self):
-        success, message = self.service.backup_data()
+    def perform_backup(self, incremental=False, workers=1, progress=None):
+        """Sao lưu (có thể gọi ở thread nền, progress nhận (bảng, số_dòng, dòng/giây))"""
+        success, message = self.service.backup_data(incremental=incremental, workers=workers,
+                                                    progress=progress)
         if success:
             return True, f"Sao lưu thành công!\nFile lưu tại: {message}"
         else:
             return False, f"Lỗi sao lưu: {message}"
 
-    def perform_restore(self):
-        """Mở hộp thoại chọn file và thực hiện restore"""
-        filepath = filedialog.askopenfilename(
-            title="Chọn file sao lưu (.json)",
-            filetypes=[("JSON Files", "*.json")]
+    def choose_restore_file(self):
+        """Mở hộp thoại chọn file sao lưu, trả về đường dẫn hoặc '' nếu hủy"""
+        return filedialog.askopenfilename(
+            title="Chọn file sao lưu",
+            filetypes=[("Bản sao lưu", "*.jsonl.gz *.manifest.json *.json"),
+                       ("Bản sao lưu nén", "*.jsonl.gz"),
+                       ("JSON (định dạng cũ)", "*.json")]
         )
 
+    def restore_from(self, filepath, progress=None, workers=1):
+        """Phục hồi từ file (có thể gọi ở thread nền, progress nhận (bảng, số_dòng, dòng/giây))"""
+        return self.service.restore_data(filepath, progress=progress, workers=workers)
+
+    def perform_restore(self, progress=None, workers=1):
+        """Mở hộp thoại chọn file và thực hiện restore"""
+        filepath = self.choose_restore_file()
+
         if not filepath:
             return False, "Đã hủy chọn file."
 
-        success, msg = self.service.restore_data(filepath)
-        return success, msg
\ No newline at end of file
+        success, msg = self.restore_from(filepath, progress=progress, workers=workers)
+        return success, msg
@@ -34,6 +34,7 @@ class SystemService:
             if conn is None: return False
 
             cursor = conn.cursor()
+            conn.start_transaction()
             for key, value in settings_dict.items():
                 cursor.execute(
                     "UPDATE system_settings SET setting_value = %s WHERE setting_key = %s",
@@ -92,26 +93,36 @@ class SystemService:
             if conn is None: return False, "Lỗi kết nối CSDL"
 
             cursor = conn.cursor()
-            cursor.execute("SET FOREIGN_KEY_CHECKS = 0;")
-
-            tables = ['categories', 'authors', 'publishers', 'books', 'book_inventory',
-                      'readers', 'borrow_slips', 'borrow_details', 'penalties', 'system_settings']
-
-            for table in tables:
-                if table in data:
-                    rows = data[table]
-                    if not rows: continue
-                    cursor.execute(f"TRUNCATE TABLE {table}")
-                    for row in rows:
-                        cols = ', '.join(f"`{k}`" for k in row.keys())
-                        placeholders = ', '.join(['%s'] * len(row))
-                        sql = f"INSERT INTO `{table}` ({cols}) VALUES ({placeholders})"
-                        cursor.execute(sql, list(row.values()))
-
-            cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
-            conn.commit()
-            cursor.close()
-            conn.close()
+            try:
+                cursor.execute("SET FOREIGN_KEY_CHECKS = 0;")
+
+                tables = ['categories', 'authors', 'publishers', 'books', 'book_inventory',
+                          'readers', 'borrow_slips', 'borrow_details', 'penalties', 'system_settings']
+
+                for table in tables:
+                    if table in data:
+                        rows = data[table]
+                        if not rows: continue
+                        cursor.execute(f"TRUNCATE TABLE {table}")
+                        # TRUNCATE tự commit: gom các INSERT của bảng vào 1 transaction
+                        conn.start_transaction()
+                        for row in rows:
+                            cols = ', '.join(f"`{k}`" for k in row.keys())
+                            placeholders = ', '.join(['%s'] * len(row))
+                            sql = f"INSERT INTO `{table}` ({cols}) VALUES ({placeholders})"
+                            cursor.execute(sql, list(row.values()))
+
+                conn.commit()
+            finally:
+                # Biến session đi theo connection về pool (pool không reset session):
+                # phải bật lại kiểm tra khóa ngoại kể cả khi phục hồi lỗi giữa chừng
+                discard = False
+                try:
+                    cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
+                    cursor.close()
+                except Exception:
+                    discard = True
+                db.release_connection(conn, discard=discard)
             return True, "Phục hồi dữ liệu thành công!"
 
         except Exception as e:
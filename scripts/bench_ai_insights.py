@@ -0,0 +1,183 @@
+"""
+Benchmark: xử lý kết quả insights AI - vòng lặp iterrows() cũ so với bản vector hóa
+Chạy: python scripts/bench_ai_insights.py [số_dòng ...]
+
+Sinh DataFrame giả lập (mặc định 10k và 100k dòng) đúng cấu trúc kết quả SQL
+của analyze_category_trends / analyze_author_popularity / analyze_publisher_performance,
+chạy cả 2 cách xử lý, kiểm tra kết quả giống nhau rồi in thời gian.
+Không truy vấn database (chỉ cần kết nối được như khi chạy ứng dụng, do import service).
+"""
+import sys
+import os
+import time
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ai_forecast_service import EnhancedAIForecastService
+
+
+# ========== DỮ LIỆU GIẢ LẬP ==========
+
+def make_frames(rows: int, seed: int = 42) -> dict:
+    """Sinh dữ liệu giống kết quả db.fetchall (list dict -> DataFrame, cột Decimal)"""
+    rng = np.random.default_rng(seed)
+    total = rng.integers(0, 5000, rows)
+    recent = (total * rng.uniform(0, 0.6, rows)).astype(int)
+    books = rng.integers(1, 80, rows)
+    prices = [Decimal(f"{p:.2f}") if p > 10000 else None for p in rng.uniform(0, 300000, rows)]
+    days = [Decimal(f"{d:.4f}") if d > 2 else None for d in rng.uniform(0, 30, rows)]
+
+    return {
+        'categories': pd.DataFrame({
+            'category_name': [f"Thể loại {i}" for i in range(rows)],
+            'total_borrows': total,
+            'unique_slips': total,
+            'avg_borrow_days': days,
+            'recent_borrows_3m': recent,
+        }),
+        'authors': pd.DataFrame({
+            'author_name': [f"Tác giả {i}" for i in range(rows)],
+            'total_borrows': total + 1,
+            'total_books': books,
+            'avg_book_price': prices,
+            'recent_borrows_6m': recent,
+        }),
+        'publishers': pd.DataFrame({
+            'publisher_name': [f"NXB {i}" for i in range(rows)],
+            'total_books': books,
+            'total_borrows': total + 1,
+            'avg_price': prices,
+            'recent_books': rng.integers(0, 10, rows),
+        }),
+    }
+
+
+# ========== CÁCH CŨ (iterrows) ==========
+
+def legacy_categories(df: pd.DataFrame) -> list:
+    df = df.copy()
+    df['growth_indicator'] = df['recent_borrows_3m'] / (df['total_borrows'] + 1)
+    df['trend'] = df['growth_indicator'].apply(
+        lambda x: 'hot' if x > 0.4 else ('trending' if x > 0.25 else 'cold')
+    )
+
+    result = []
+    for _, row in df.iterrows():
+        result.append({
+            'category': row['category_name'],
+            'total_borrows': int(row['total_borrows']),
+            'avg_days': float(row['avg_borrow_days']) if row['avg_borrow_days'] else 14.0,
+            'recent_activity': int(row['recent_borrows_3m']),
+            'trend': row['trend'],
+            'popularity_score': round((row['total_borrows'] / df['total_borrows'].max()) * 100, 1)
+        })
+    return result
+
+
+def legacy_authors(df: pd.DataFrame) -> list:
+    df = df.copy()
+    df['borrow_per_book'] = df['total_borrows'] / df['total_books']
+    df['popularity_index'] = (
+        df['total_borrows'] * 0.5 +
+        df['recent_borrows_6m'] * 0.3 +
+        df['borrow_per_book'] * 0.2
+    )
+    df = df.sort_values('popularity_index', ascending=False, kind='stable')
+
+    result = []
+    for _, row in df.head(10).iterrows():
+        result.append({
+            'author': row['author_name'],
+            'total_borrows': int(row['total_borrows']),
+            'total_books': int(row['total_books']),
+            'avg_price': float(row['avg_book_price']) if row['avg_book_price'] else 0,
+            'recent_activity': int(row['recent_borrows_6m']),
+            'popularity_score': round(row['popularity_index'], 2)
+        })
+    return result
+
+
+def legacy_publishers(df: pd.DataFrame) -> list:
+    df = df.copy()
+    df['performance_score'] = (
+        (df['total_borrows'] / df['total_books']) * 0.6 +
+        (df['recent_books'] / df['total_books']) * 0.4
+    ) * 100
+
+    result = []
+    for _, row in df.head(10).iterrows():
+        result.append({
+            'publisher': row['publisher_name'],
+            'total_books': int(row['total_books']),
+            'total_borrows': int(row['total_borrows']),
+            'avg_price': float(row['avg_price']) if row['avg_price'] else 0,
+            'recent_books': int(row['recent_books']),
+            'performance_score': round(row['performance_score'], 1)
+        })
+    return result
+
+
+CASES = [
+    ('Thể loại', 'categories', legacy_categories, EnhancedAIForecastService._build_category_records),
+    ('Tác giả', 'authors', legacy_authors, EnhancedAIForecastService._build_author_records),
+    ('NXB', 'publishers', legacy_publishers, EnhancedAIForecastService._build_publisher_records),
+]
+
+
+# ========== ĐO ==========
+
+def best_of(func, df: pd.DataFrame, repeat: int):
+    """Thời gian nhỏ nhất (giây) sau repeat lần chạy, kèm kết quả lần cuối"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def same_records(expected: list, actual: list) -> bool:
+    if len(expected) != len(actual):
+        return False
+    for a, b in zip(expected, actual):
+        if a.keys() != b.keys():
+            return False
+        for key in a:
+            if isinstance(a[key], float) or isinstance(b[key], float):
+                if not np.isclose(a[key], b[key], equal_nan=True):
+                    return False
+            elif a[key] != b[key]:
+                return False
+    return True
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+
+    print("=" * 60)
+    print("⏱️  Benchmark xử lý insights AI: iterrows() vs vector hóa")
+    print("=" * 60)
+
+    for rows in sizes:
+        frames = make_frames(rows)
+        # Vòng lặp cũ chậm: chỉ chạy 1 lần với dữ liệu lớn
+        repeat = 3 if rows <= 10_000 else 1
+
+        print(f"\n📊 {rows:,} dòng")
+        for label, key, legacy, vectorized in CASES:
+            df = frames[key]
+            legacy_time, expected = best_of(legacy, df, repeat)
+            fast_time, actual = best_of(vectorized, df, 3)
+
+            status = "✅" if same_records(expected, actual) else "❌ KẾT QUẢ KHÁC"
+            print(f"  {label:<9} iterrows: {legacy_time * 1000:9.1f} ms | "
+                  f"vector: {fast_time * 1000:7.1f} ms | x{legacy_time / fast_time:7.1f} {status}")
+
+
+if __name__ == '__main__':
+    main()
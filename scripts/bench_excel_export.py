@@ -0,0 +1,170 @@
+"""
+Benchmark: xuất Excel danh sách sách - Workbook thường + quét lại cột so với ExcelExportEngine (write-only)
+Chạy: python scripts/bench_excel_export.py [số_dòng ...] [--legacy-all]
+
+Sinh dữ liệu sách giả lập (mặc định 10k, 100k và 500k dòng), ghi file .xlsx vào
+thư mục tạm bằng cả 2 cách rồi in thời gian, bộ nhớ tăng thêm và kích thước file.
+Mỗi lần đo chạy trong 1 process con riêng để bộ nhớ đỉnh (RSS) không lẫn nhau;
+trên Windows không có module resource nên không in bộ nhớ.
+Cách cũ giữ toàn bộ ô trong bộ nhớ nên mặc định chỉ chạy tới 100k dòng
+(thêm --legacy-all để chạy cả các kích thước lớn hơn).
+Không truy vấn database (chỉ cần kết nối được như khi chạy ứng dụng, do import utils).
+"""
+import sys
+import os
+import tempfile
+import time
+from multiprocessing import Pool
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.book import Book
+from utils.export_helper import ExportHelper
+
+LEGACY_LIMIT = 100_000
+
+
+# ========== DỮ LIỆU GIẢ LẬP ==========
+
+def make_books(rows: int):
+    """Generator sách giống kết quả BookService.stream_books()"""
+    for i in range(rows, 0, -1):
+        book = Book(title=f"Tựa sách mẫu số {i} - tập {i % 7 + 1}")
+        book.book_id = i
+        book.author_name = f"Tác giả {i % 997}"
+        book.category_name = f"Thể loại {i % 23}"
+        book.publisher_name = f"Nhà xuất bản {i % 41}"
+        book.publish_year = 1990 + i % 35
+        book.isbn = f"978{i:010d}"
+        book.barcode = f"BC{i:08d}"
+        book.price = float(50000 + (i * 137) % 450000)
+        book.total_quantity = 1 + i % 20
+        book.available_quantity = i % 21 % (book.total_quantity + 1)
+        book.description = "Mô tả ngắn" if i % 3 else ""
+        yield book
+
+
+# ========== CÁCH CŨ (Workbook thường, quét lại cột) ==========
+
+def legacy_export(books, filename):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Danh sách Sách"
+
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+
+    headers = [
+        'ID', 'Tựa sách', 'Tác giả', 'Thể loại', 'NXB',
+        'Năm XB', 'ISBN', 'Barcode', 'Giá (VNĐ)',
+        'Tổng SL', 'Còn', 'Trạng thái', 'Mô tả'
+    ]
+    for col, header in enumerate(headers, start=1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+
+    for row, book in enumerate(books, start=2):
+        ws.cell(row=row, column=1, value=book.book_id or '')
+        ws.cell(row=row, column=2, value=book.title or '')
+        ws.cell(row=row, column=3, value=book.author_name or '')
+        ws.cell(row=row, column=4, value=book.category_name or '')
+        ws.cell(row=row, column=5, value=book.publisher_name or '')
+        ws.cell(row=row, column=6, value=book.publish_year or '')
+        ws.cell(row=row, column=7, value=book.isbn or '')
+        ws.cell(row=row, column=8, value=book.barcode or '')
+        ws.cell(row=row, column=9, value=book.price or 0)
+        ws.cell(row=row, column=10, value=book.total_quantity or 0)
+        ws.cell(row=row, column=11, value=book.available_quantity or 0)
+        ws.cell(row=row, column=12, value=book.get_stock_status())
+        ws.cell(row=row, column=13, value=book.description or '')
+
+    for column in ws.columns:
+        max_length = 0
+        column_letter = column[0].column_letter
+        for cell in column:
+            try:
+                if len(str(cell.value)) > max_length:
+                    max_length = len(cell.value)
+            except:
+                pass
+        ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
+
+    wb.save(filename)
+    return True, str(filename)
+
+
+def engine_export(books, filename):
+    return ExportHelper.export_books_to_excel(books, filename)
+
+
+# ========== ĐO ==========
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả KB, macOS trả byte
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_case(label: str, rows: int, filename: str):
+    func = legacy_export if label == 'cũ' else engine_export
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    success, message = func(make_books(rows), filename)
+    elapsed = time.perf_counter() - start
+    if not success:
+        raise RuntimeError(message)
+    peak = _peak_rss_mb()
+    return elapsed, None if peak is None else peak - baseline
+
+
+def measure(label: str, rows: int, filename: str):
+    """(giây, bộ nhớ tăng thêm MB hoặc None, kích thước file MB)"""
+    with Pool(1) as pool:
+        seconds, peak = pool.apply(_run_case, (label, rows, filename))
+    return seconds, peak, os.path.getsize(filename) / 1024 / 1024
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    legacy_all = '--legacy-all' in sys.argv
+    sizes = [int(arg) for arg in args] or [10_000, 100_000, 500_000]
+
+    print("=" * 60)
+    print("⏱️  Benchmark xuất Excel: Workbook thường vs write-only")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            print(f"\n📊 {rows:,} dòng")
+            cases = ['write-only']
+            if rows <= LEGACY_LIMIT or legacy_all:
+                cases.insert(0, 'cũ')
+            else:
+                print(f"  {'cũ':<11} (bỏ qua, > {LEGACY_LIMIT:,} dòng - dùng --legacy-all)")
+
+            results = {}
+            for label in cases:
+                filename = os.path.join(tmp, f"{label}_{rows}.xlsx")
+                seconds, peak, size = measure(label, rows, filename)
+                results[label] = seconds
+                memory = f"+{peak:7.1f} MB" if peak is not None else "      -   "
+                print(f"  {label:<11} {seconds:8.2f} s | bộ nhớ {memory} | file {size:6.1f} MB")
+                os.remove(filename)
+
+            if 'cũ' in results:
+                print(f"  ➜ nhanh hơn x{results['cũ'] / results['write-only']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
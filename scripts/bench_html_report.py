@@ -0,0 +1,115 @@
+"""
+Benchmark: kích thước + thời gian dựng báo cáo thống kê HTML (biểu đồ SVG vẽ sẵn)
+Chạy: python scripts/bench_html_report.py [số_bạn_đọc ...]
+
+Dựng báo cáo bạn đọc (kèm bảng danh sách giả lập, mặc định 0, 1k và 10k dòng) và
+báo cáo sách vào thư mục tạm, in thời gian lần dựng đầu / lần dùng lại cache, kích
+thước file HTML, CSS dùng chung và kiểm tra báo cáo không tham chiếu tài nguyên
+mạng nào (mở được trên mạng nội bộ không ra Internet).
+Không truy vấn database (chỉ cần kết nối được như khi chạy ứng dụng, do import utils).
+"""
+import sys
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.reader import Reader
+from utils.html_report_helper import HTMLReportHelper
+
+# src= / href= / url() trỏ ra ngoài (xmlns của SVG không phải tải về)
+EXTERNAL_REF = re.compile(r'(?:src|href)\s*=\s*["\']?(?:https?:)?//|url\(\s*["\']?(?:https?:)?//', re.I)
+
+
+# ========== DỮ LIỆU GIẢ LẬP ==========
+
+def make_readers(rows: int):
+    statuses = [Reader.STATUS_ACTIVE] * 8 + [Reader.STATUS_EXPIRED, Reader.STATUS_LOCKED]
+    readers = []
+    for i in range(1, rows + 1):
+        reader = Reader(
+            full_name=f"Bạn đọc mẫu số {i}",
+            phone=f"09{i:08d}",
+            email=f"reader{i}@example.com",
+            card_end=f"2026-{i % 12 + 1:02d}-15",
+            status=statuses[i % len(statuses)],
+            reputation_score=40 + i % 61,
+            reader_id=i
+        )
+        readers.append(reader)
+    return readers
+
+
+def reader_stats(rows: int):
+    total = max(rows, 1000)
+    return {
+        'total': total,
+        'active': int(total * 0.8),
+        'expired': int(total * 0.1),
+        'locked': total - int(total * 0.8) - int(total * 0.1),
+        'avg_reputation': 82.4,
+        'high_reputation': int(total * 0.35),
+        'low_reputation': int(total * 0.05),
+        'expiring_soon': int(total * 0.03),
+    }
+
+
+BOOK_STATS = {
+    'total_books': 5200, 'total_quantity': 48000, 'available_quantity': 41250,
+    'borrowed_quantity': 6750, 'out_of_stock': 120, 'low_stock': 480,
+    'total_authors': 1900, 'total_categories': 35, 'total_publishers': 60,
+}
+
+
+# ========== ĐO ==========
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def report(label: str, path: Path, first: float, cached: float):
+    content = path.read_text(encoding='utf-8')
+    external = len(EXTERNAL_REF.findall(content))
+    svg_bytes = sum(len(m.encode('utf-8')) for m in re.findall(r'<svg.*?</svg>', content, re.S))
+    print(f"\n📊 {label}")
+    print(f"  file       {path.stat().st_size / 1024:8.1f} KB (biểu đồ SVG {svg_bytes / 1024:.1f} KB)")
+    print(f"  dựng       {first * 1000:8.1f} ms | dùng lại cache {cached * 1000:.1f} ms")
+    print(f"  tài nguyên mạng: {'không có ✅' if external == 0 else f'{external} ❌'}")
+
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [0, 1_000, 10_000]
+
+    print("=" * 60)
+    print("⏱️  Benchmark báo cáo HTML (biểu đồ SVG, không cần mạng)")
+    print("=" * 60)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            for rows in sizes:
+                readers = make_readers(rows)
+                stats = reader_stats(rows)
+                path, first = timed(HTMLReportHelper.create_reader_statistics_report, stats, readers)
+                _, cached = timed(HTMLReportHelper.create_reader_statistics_report, stats, readers)
+                report(f"Bạn đọc ({rows:,} dòng bảng)", Path(path), first, cached)
+
+            path, first = timed(HTMLReportHelper.create_book_statistics_report, BOOK_STATS)
+            _, cached = timed(HTMLReportHelper.create_book_statistics_report, BOOK_STATS)
+            report("Sách (không bảng)", Path(path), first, cached)
+
+            css = Path(tmp) / 'reports' / 'assets' / 'report.css'
+            print(f"\n📦 CSS dùng chung (ghi 1 lần): {css.stat().st_size / 1024:.1f} KB")
+        finally:
+            os.chdir(cwd)
+
+if __name__ == '__main__':
+    main()
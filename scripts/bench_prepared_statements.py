@@ -0,0 +1,84 @@
+"""
+Benchmark: cache prepared statement (server-side) so với text protocol
+Chạy: python scripts/bench_prepared_statements.py [số_vòng]
+
+Chạy lặp các câu truy vấn nóng của ứng dụng (tra bạn đọc, tra tồn kho,
+thống kê...) qua db.fetchone / db.fetchall, lần lượt với cache tắt và bật.
+Chỉ đọc dữ liệu, không ghi gì vào database.
+"""
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import db
+from config.settings import DatabaseConfig
+
+
+HOT_QUERIES = [
+    ("SELECT * FROM readers WHERE reader_id=%s", 'reader'),
+    ("SELECT available_quantity FROM book_inventory WHERE book_id=%s", 'book'),
+    ("SELECT * FROM borrow_slips WHERE slip_id=%s", 'slip'),
+    ("SELECT * FROM borrow_details WHERE slip_id=%s", 'slip'),
+    ("SELECT COUNT(*) as count FROM borrow_slips WHERE reader_id = %s AND status = 'BORROWING'", 'reader'),
+]
+
+
+def load_sample_ids():
+    """Lấy vài ID có thật để truy vấn"""
+    def ids(query):
+        return [row['id'] for row in db.fetchall(query)] or [1]
+
+    return {
+        'reader': ids("SELECT reader_id AS id FROM readers LIMIT 50"),
+        'book': ids("SELECT book_id AS id FROM books LIMIT 50"),
+        'slip': ids("SELECT slip_id AS id FROM borrow_slips LIMIT 50"),
+    }
+
+
+def run(iterations: int, sample_ids: dict) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        for query, kind in HOT_QUERIES:
+            values = sample_ids[kind]
+            db.fetchall(query, (values[i % len(values)],))
+    return time.perf_counter() - start
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    total_queries = iterations * len(HOT_QUERIES)
+
+    print("=" * 60)
+    print(f"⏱️  Benchmark prepared statement cache ({total_queries} truy vấn)")
+    print(f"   Pool reset session: {DatabaseConfig.POOL_RESET_SESSION}")
+    print("=" * 60)
+
+    sample_ids = load_sample_ids()
+    original_size = db.stmt_cache_size
+
+    # 1. Text protocol (cache tắt)
+    db.stmt_cache_size = 0
+    run(50, sample_ids)  # warm-up
+    text_time = run(iterations, sample_ids)
+
+    # 2. Prepared statement cache
+    db.stmt_cache_size = original_size or 32
+    run(50, sample_ids)  # warm-up (PREPARE lần đầu)
+    db.reset_statement_cache_stats()
+    prepared_time = run(iterations, sample_ids)
+    stats = db.get_statement_cache_stats()
+
+    db.stmt_cache_size = original_size
+
+    print(f"\n📄 Text protocol : {text_time:.3f}s  ({total_queries / text_time:,.0f} truy vấn/s)")
+    print(f"⚡ Prepared cache: {prepared_time:.3f}s  ({total_queries / prepared_time:,.0f} truy vấn/s)")
+    print(f"📈 Tăng tốc      : x{text_time / prepared_time:.2f}")
+    print(f"\n🎯 Cache hits={stats['hits']} misses={stats['misses']} "
+          f"evictions={stats['evictions']} hit_ratio={stats['hit_ratio']:.2%}")
+
+
+if __name__ == '__main__':
+    main()
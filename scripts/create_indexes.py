@@ -0,0 +1,46 @@
+"""
+Script migration: tạo các index mà ứng dụng cần (idempotent, bỏ qua index đã có)
+Chạy 1 lần khi cài đặt / nâng cấp, ngoài giờ mượn trả: CREATE INDEX trên bảng lớn
+khóa ghi khá lâu và cần quyền ALTER (tài khoản của ứng dụng không cần quyền này)
+Chạy: python scripts/create_indexes.py
+"""
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import db
+from services.borrow_service import BorrowService
+from services.circulation_lookup_service import CirculationLookupService
+from services.schema_indexes import create_indexes, missing_indexes
+
+# Mọi index ứng dụng cần, theo service dùng nó
+INDEXES = {
+    **BorrowService.BORROW_INDEXES,
+    **CirculationLookupService.LOOKUP_INDEXES,
+}
+
+
+def main():
+    if not db.test_connection():
+        print("❌ Không thể kết nối database!")
+        return
+
+    missing = missing_indexes(INDEXES)
+    if not missing:
+        print(f"✅ Đã có đủ {len(INDEXES)} index")
+        return
+
+    for name in missing:
+        table, columns = INDEXES[name]
+        print(f"⏳ Tạo {name} trên {table}({columns})...")
+        start = time.perf_counter()
+        create_indexes({name: INDEXES[name]})
+        print(f"   ✅ {time.perf_counter() - start:.1f}s")
+    print(f"✅ Đã tạo {len(missing)} index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Script xây lại bảng rollup lượt mượn theo tháng (borrow_rollup_*)
+Dùng sau khi nhập / sửa dữ liệu mượn trả trực tiếp bằng SQL
+Chạy: python scripts/rebuild_borrow_rollup.py
+"""
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import db
+from services.rollup_service import BorrowRollupService
+
+
+def main():
+    if not db.test_connection():
+        print("❌ Không thể kết nối database!")
+        return
+
+    start = time.perf_counter()
+    if not BorrowRollupService().rebuild_all():
+        print("❌ Xây lại rollup thất bại (xem log)")
+        return
+
+    months = db.fetchone("SELECT COUNT(*) AS count FROM borrow_rollup_months")
+    rows = db.fetchone("SELECT COUNT(*) AS count FROM borrow_rollup_monthly")
+    print(f"✅ Đã xây lại rollup trong {time.perf_counter() - start:.2f}s")
+    print(f"   📅 {months['count']} tháng, 📊 {rows['count']} dòng tổng hợp")
+
+
+if __name__ == "__main__":
+    main()
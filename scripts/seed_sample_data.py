@@ -11,6 +11,7 @@ import random
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.database import db
+from services.rollup_service import BorrowRollupService
 
 
 def clear_old_data():
@@ -212,6 +213,10 @@ def main():
         seed_penalties()
         seed_readers()
 
+        # Dữ liệu được INSERT trực tiếp nên phải xây lại bảng rollup
+        print("\n📈 Đang xây lại bảng tổng hợp lượt mượn...")
+        BorrowRollupService().rebuild_all()
+
         # Kiểm tra
         verify_data()
 
@@ -0,0 +1,258 @@
+"""
+Stress test: nhiều quầy cùng cho mượn - kiểm tra không oversell tồn kho
+Chạy: python scripts/stress_borrow_inventory.py [--threads N] [--borrows M] [--books B]
+                                                [--stock S] [--latency MS] [--mysql]
+
+N thread (quầy) x M lượt mượn ngẫu nhiên trên B đầu sách, mỗi đầu sách có S bản.
+Chạy 2 cách rồi in số lượt thành công, tồn kho cuối, số bản bị bán quá và lượt/giây:
+
+- cũ:  đọc available_quantity, kiểm tra rồi trừ kho vô điều kiện ở câu lệnh riêng
+- mới: InventoryService.reserve (UPDATE ... WHERE available_quantity >= n) trong
+       InventoryService.run_transaction (tự thử lại khi deadlock)
+
+Mặc định chạy trên SQLite (file tạm; vẫn cần kết nối được MySQL như khi chạy ứng dụng,
+do import services). --mysql chạy trên MySQL của ứng dụng với bảng tạm
+stress_book_inventory (tạo rồi xóa, không đụng dữ liệu thật).
+--latency giả lập thời gian 1 vòng gửi lệnh tới database (mặc định 1ms).
+"""
+import sys
+import os
+import argparse
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import db, Transaction
+from services.inventory_service import InventoryService
+
+TABLE = 'stress_book_inventory'
+
+
+# ========== SQLITE (THAY THẾ MYSQL) ==========
+
+class SQLiteTransaction:
+    """Cùng API với config.database.Transaction (placeholder %s)"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def fetchone(self, query: str, params: tuple = None):
+        cursor = self.connection.execute(query.replace('%s', '?'), params or ())
+        row = cursor.fetchone()
+        return dict(zip([c[0] for c in cursor.description], row)) if row else None
+
+    def execute(self, query: str, params: tuple = None) -> int:
+        return self.connection.execute(query.replace('%s', '?'), params or ()).rowcount
+
+
+class SQLiteBackend:
+    name = 'SQLite'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=60, isolation_level=None,
+                                         check_same_thread=False)
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        connection = self._connection()
+        # Khóa ghi ngay từ đầu (giống khóa dòng của InnoDB khi UPDATE)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield SQLiteTransaction(connection)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def autocommit(self):
+        """Mỗi câu lệnh tự commit (như db.fetchone / db.execute của code cũ)"""
+        yield SQLiteTransaction(self._connection())
+
+    def setup(self, stocks: dict):
+        connection = sqlite3.connect(self.path)
+        connection.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        connection.execute(f"CREATE TABLE {TABLE} (book_id INTEGER PRIMARY KEY, "
+                           f"available_quantity INTEGER NOT NULL)")
+        connection.executemany(f"INSERT INTO {TABLE} VALUES (?, ?)", stocks.items())
+        connection.commit()
+        connection.close()
+
+    def stocks(self) -> dict:
+        connection = sqlite3.connect(self.path)
+        rows = connection.execute(f"SELECT book_id, available_quantity FROM {TABLE}").fetchall()
+        connection.close()
+        return dict(rows)
+
+    def cleanup(self):
+        pass
+
+
+# ========== MYSQL ==========
+
+class MySQLBackend:
+    name = 'MySQL'
+
+    def __init__(self):
+        self.db = db
+
+    def transaction(self):
+        return self.db.transaction()
+
+    @contextmanager
+    def autocommit(self):
+        """Connection của pool chạy autocommit: dùng thẳng, không mở transaction"""
+        connection = self.db.get_connection()
+        tx = Transaction(connection)
+        try:
+            yield tx
+        finally:
+            tx.close()
+            self.db.release_connection(connection)
+
+    def setup(self, stocks: dict):
+        with self.db.transaction() as tx:
+            tx.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            tx.execute(f"CREATE TABLE {TABLE} (book_id INT PRIMARY KEY, "
+                       f"available_quantity INT NOT NULL) ENGINE=InnoDB")
+            tx.executemany(f"INSERT INTO {TABLE} VALUES (%s, %s)", list(stocks.items()))
+
+    def stocks(self) -> dict:
+        rows = self.db.fetchall(f"SELECT book_id, available_quantity FROM {TABLE}")
+        return {row['book_id']: row['available_quantity'] for row in rows}
+
+    def cleanup(self):
+        with self.db.transaction() as tx:
+            tx.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+# ========== 2 CÁCH MƯỢN ==========
+
+def legacy_borrow(backend, book_id: int, latency: float) -> bool:
+    """Code cũ: đọc - kiểm tra - trừ vô điều kiện, 2 câu lệnh tự commit"""
+    with backend.autocommit() as tx:
+        row = tx.fetchone(f"SELECT available_quantity FROM {TABLE} WHERE book_id=%s", (book_id,))
+        time.sleep(latency)
+        if not row or row['available_quantity'] < 1:
+            return False
+        tx.execute(f"UPDATE {TABLE} SET available_quantity = available_quantity - %s "
+                   f"WHERE book_id=%s", (1, book_id))
+        time.sleep(latency)
+        return True
+
+
+def reserve_borrow(inventory: InventoryService, book_id: int, latency: float) -> bool:
+    def work(tx):
+        reserved = inventory.reserve(tx, book_id, 1)
+        # Thời gian ghi phiếu + chi tiết mượn trong cùng transaction
+        time.sleep(latency)
+        return reserved
+    return inventory.run_transaction(work)
+
+
+# ========== ĐO ==========
+
+def run(label: str, backend, args) -> dict:
+    initial = {book_id: args.stock for book_id in range(1, args.books + 1)}
+    backend.setup(initial)
+    inventory = InventoryService(table=TABLE, transaction_factory=backend.transaction)
+    latency = args.latency / 1000
+
+    successes = [0] * args.threads
+    errors = [0] * args.threads
+    barrier = threading.Barrier(args.threads)
+
+    def desk(index: int):
+        rng = random.Random(index)
+        barrier.wait()
+        for _ in range(args.borrows):
+            book_id = rng.randint(1, args.books)
+            try:
+                if label == 'cũ':
+                    ok = legacy_borrow(backend, book_id, latency)
+                else:
+                    ok = reserve_borrow(inventory, book_id, latency)
+            except Exception as e:
+                errors[index] += 1
+                print(f"    ⚠️  {e}")
+                continue
+            successes[index] += ok
+
+    threads = [threading.Thread(target=desk, args=(i,)) for i in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    final = backend.stocks()
+    lent = sum(successes)
+    capacity = sum(initial.values())
+    return {
+        'lent': lent,
+        'errors': sum(errors),
+        'final': sum(final.values()),
+        'negative': sum(1 for q in final.values() if q < 0),
+        'oversold': max(0, lent - capacity),
+        'consistent': sum(final.values()) == capacity - lent,
+        'per_second': args.threads * args.borrows / elapsed,
+        'elapsed': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test tồn kho khi mượn đồng thời")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--borrows', type=int, default=50)
+    parser.add_argument('--books', type=int, default=5)
+    parser.add_argument('--stock', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=1.0)
+    parser.add_argument('--mysql', action='store_true')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🏁 Stress test mượn sách đồng thời")
+    print("=" * 60)
+    print(f"{args.threads} quầy x {args.borrows} lượt, {args.books} đầu sách x {args.stock} bản "
+          f"(sức chứa {args.books * args.stock}), trễ {args.latency}ms/lệnh")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = MySQLBackend() if args.mysql else SQLiteBackend(os.path.join(tmp, 'stress.db'))
+        print(f"Database: {backend.name}")
+        failed = False
+        try:
+            for label in ('cũ', 'mới'):
+                result = run(label, backend, args)
+                status = '✅' if result['oversold'] == 0 and result['negative'] == 0 else '❌'
+                print(f"\n📊 {label}")
+                print(f"  cho mượn thành công {result['lent']:6,} | tồn kho cuối {result['final']:5,} "
+                      f"| bán quá {result['oversold']:4,} {status}")
+                print(f"  đầu sách bị âm kho {result['negative']:4} | lỗi {result['errors']} "
+                      f"| khớp sổ sách: {'có' if result['consistent'] else 'KHÔNG'}")
+                print(f"  {result['per_second']:8.1f} lượt/giây ({result['elapsed']:.2f} s)")
+                if label == 'mới' and status == '❌':
+                    failed = True
+        finally:
+            backend.cleanup()
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
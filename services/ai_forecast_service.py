@@ -1,23 +1,49 @@
 """
 Enhanced AI Forecast Service - Phân tích và dự đoán thông minh
 Phân tích dựa trên: Thể loại, Tác giả, NXB, Năm xuất bản, Xu hướng người đọc
+
+Số liệu lượt mượn được đọc từ bảng rollup theo tháng (xem rollup_service)
+thay vì join lại toàn bộ lịch sử mượn trả ở mỗi lần phân tích.
 """
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 import logging
+import threading
+import time
 from collections import defaultdict
 
 from config.database import db
+from services.rollup_service import BorrowRollupService
 
 logger = logging.getLogger(__name__)
 
 
+def _to_records(frame: pd.DataFrame) -> List[Dict]:
+    """
+    DataFrame -> list dict (kiểu Python thuần, dùng được cho jsonify)
+
+    Tương đương frame.to_dict('records') nhưng nhanh hơn nhiều với bảng lớn
+    vì chuyển từng cột bằng tolist() rồi ghép bằng zip.
+    """
+    columns = list(frame.columns)
+    return [dict(zip(columns, row)) for row in zip(*(frame[c].tolist() for c in columns))]
+
+
 class EnhancedAIForecastService:
     """Service dự đoán AI nâng cao với phân tích đa chiều"""
 
+    # Số thread tối đa cho get_comprehensive_insights, dùng chung giữa mọi request
+    # (mỗi thread giữ 1 connection nên phải nhỏ hơn POOL_SIZE)
+    MAX_WORKERS = 4
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
     def __init__(self):
+        self.rollup = BorrowRollupService()
         self.seasonality_factors = {
             1: -0.05,  # Tháng 1: Tết, giảm
             2: 0.03,   # Tháng 2: Sau Tết, tăng nhẹ
@@ -41,47 +67,29 @@ class EnhancedAIForecastService:
         Returns: Dict với insights về từng thể loại
         """
         try:
+            self.rollup.ensure_ready()
+
             query = """
             SELECT 
                 c.category_name,
-                COUNT(bd.detail_id) as total_borrows,
-                COUNT(DISTINCT bd.slip_id) as unique_slips,
-                AVG(DATEDIFF(bs.return_date, bs.borrow_date)) as avg_borrow_days,
-                COUNT(CASE WHEN bs.borrow_date >= DATE_SUB(CURDATE(), INTERVAL 3 MONTH) 
-                      THEN 1 END) as recent_borrows_3m
+                CAST(COALESCE(SUM(r.borrows), 0) AS SIGNED) as total_borrows,
+                CAST(COALESCE(SUM(r.slips), 0) AS SIGNED) as unique_slips,
+                SUM(r.loan_days_sum) / NULLIF(SUM(r.returned_count), 0) as avg_borrow_days,
+                CAST(COALESCE(SUM(CASE WHEN r.month >= %s THEN r.borrows END), 0) AS SIGNED)
+                    as recent_borrows_3m
             FROM categories c
-            LEFT JOIN books b ON c.category_id = b.category_id
-            LEFT JOIN borrow_details bd ON b.book_id = bd.book_id
-            LEFT JOIN borrow_slips bs ON bd.slip_id = bs.slip_id
+            LEFT JOIN borrow_rollup_monthly r
+                ON r.dim_type = 'category' AND r.dim_id = c.category_id
             GROUP BY c.category_id, c.category_name
             ORDER BY total_borrows DESC
             """
 
-            results = db.fetchall(query)
+            results = db.fetchall(query, (self.rollup.months_ago(3),))
 
             if not results:
                 return {'success': False, 'message': 'Không có dữ liệu thể loại'}
 
-            df = pd.DataFrame(results)
-
-            # Tính growth rate (tăng trưởng 3 tháng gần nhất)
-            df['growth_indicator'] = df['recent_borrows_3m'] / (df['total_borrows'] + 1)
-
-            # Phân loại hot/trending/cold
-            df['trend'] = df['growth_indicator'].apply(
-                lambda x: 'hot' if x > 0.4 else ('trending' if x > 0.25 else 'cold')
-            )
-
-            categories_analysis = []
-            for _, row in df.iterrows():
-                categories_analysis.append({
-                    'category': row['category_name'],
-                    'total_borrows': int(row['total_borrows']),
-                    'avg_days': float(row['avg_borrow_days']) if row['avg_borrow_days'] else 14.0,
-                    'recent_activity': int(row['recent_borrows_3m']),
-                    'trend': row['trend'],
-                    'popularity_score': round((row['total_borrows'] / df['total_borrows'].max()) * 100, 1)
-                })
+            categories_analysis = self._build_category_records(pd.DataFrame(results))
 
             logger.info(f"✅ Analyzed {len(categories_analysis)} categories")
 
@@ -95,6 +103,31 @@ class EnhancedAIForecastService:
             logger.error(f"❌ Error analyzing categories: {e}")
             return {'success': False, 'error': str(e)}
 
+    @staticmethod
+    def _build_category_records(df: pd.DataFrame) -> List[Dict]:
+        """Tính trend / popularity cho từng thể loại (vector hóa, không lặp từng dòng)"""
+        total = df['total_borrows'].astype('int64')
+        recent = df['recent_borrows_3m'].astype('int64')
+
+        # Tính growth rate (tăng trưởng 3 tháng gần nhất)
+        growth = recent / (total + 1)
+
+        # Phân loại hot/trending/cold
+        trend = np.select([growth > 0.4, growth > 0.25], ['hot', 'trending'], default='cold')
+
+        # NULL / 0 ngày mượn -> mặc định 14 ngày (cột Decimal: tolist() nhanh hơn astype)
+        avg_days = pd.Series(np.array(df['avg_borrow_days'].tolist(), dtype=float), index=df.index)
+        avg_days = avg_days.where(avg_days.notna() & (avg_days != 0), 14.0)
+
+        return _to_records(pd.DataFrame({
+            'category': df['category_name'],
+            'total_borrows': total,
+            'avg_days': avg_days,
+            'recent_activity': recent,
+            'trend': trend,
+            'popularity_score': (total / total.max() * 100).round(1)
+        }))
+
     def _generate_category_insights(self, categories: List[Dict]) -> Dict:
         """Tạo insights từ phân tích thể loại"""
         hot_categories = [c for c in categories if c['trend'] == 'hot']
@@ -114,51 +147,42 @@ class EnhancedAIForecastService:
         Phân tích tác giả được yêu thích nhất
         """
         try:
+            self.rollup.ensure_ready()
+
             query = """
             SELECT 
                 a.author_name,
-                COUNT(bd.detail_id) as total_borrows,
-                COUNT(DISTINCT b.book_id) as total_books,
-                AVG(b.price) as avg_book_price,
-                COUNT(CASE WHEN bs.borrow_date >= DATE_SUB(CURDATE(), INTERVAL 6 MONTH) 
-                      THEN 1 END) as recent_borrows_6m
-            FROM authors a
-            JOIN books b ON a.author_id = b.author_id
-            LEFT JOIN borrow_details bd ON b.book_id = bd.book_id
-            LEFT JOIN borrow_slips bs ON bd.slip_id = bs.slip_id
-            GROUP BY a.author_id, a.author_name
-            HAVING total_borrows > 0
-            ORDER BY total_borrows DESC
+                r.total_borrows,
+                bk.total_books,
+                bk.avg_book_price,
+                r.recent_borrows_6m
+            FROM (
+                SELECT
+                    dim_id,
+                    CAST(SUM(borrows) AS SIGNED) as total_borrows,
+                    CAST(COALESCE(SUM(CASE WHEN month >= %s THEN borrows END), 0) AS SIGNED)
+                        as recent_borrows_6m
+                FROM borrow_rollup_monthly
+                WHERE dim_type = 'author'
+                GROUP BY dim_id
+                HAVING total_borrows > 0
+            ) r
+            JOIN authors a ON a.author_id = r.dim_id
+            JOIN (
+                SELECT author_id, COUNT(*) as total_books, AVG(price) as avg_book_price
+                FROM books
+                GROUP BY author_id
+            ) bk ON bk.author_id = r.dim_id
+            ORDER BY r.total_borrows DESC
             LIMIT 20
             """
 
-            results = db.fetchall(query)
+            results = db.fetchall(query, (self.rollup.months_ago(6),))
 
             if not results:
                 return {'success': False, 'message': 'Không có dữ liệu tác giả'}
 
-            df = pd.DataFrame(results)
-
-            # Tính popularity index
-            df['borrow_per_book'] = df['total_borrows'] / df['total_books']
-            df['popularity_index'] = (
-                df['total_borrows'] * 0.5 +
-                df['recent_borrows_6m'] * 0.3 +
-                df['borrow_per_book'] * 0.2
-            )
-
-            df = df.sort_values('popularity_index', ascending=False)
-
-            authors_data = []
-            for _, row in df.head(10).iterrows():
-                authors_data.append({
-                    'author': row['author_name'],
-                    'total_borrows': int(row['total_borrows']),
-                    'total_books': int(row['total_books']),
-                    'avg_price': float(row['avg_book_price']) if row['avg_book_price'] else 0,
-                    'recent_activity': int(row['recent_borrows_6m']),
-                    'popularity_score': round(row['popularity_index'], 2)
-                })
+            authors_data = self._build_author_records(pd.DataFrame(results))
 
             return {
                 'success': True,
@@ -174,6 +198,26 @@ class EnhancedAIForecastService:
             logger.error(f"❌ Error analyzing authors: {e}")
             return {'success': False, 'error': str(e)}
 
+    @staticmethod
+    def _build_author_records(df: pd.DataFrame, top: int = 10) -> List[Dict]:
+        """Tính popularity index và lấy top tác giả (vector hóa)"""
+        total = df['total_borrows'].astype('int64')
+        books = df['total_books'].astype('int64')
+        recent = df['recent_borrows_6m'].astype('int64')
+
+        # Tính popularity index, chỉ chuyển đổi các dòng lọt top
+        popularity = total * 0.5 + recent * 0.3 + (total / books) * 0.2
+        index = popularity.nlargest(top).index
+
+        return _to_records(pd.DataFrame({
+            'author': df['author_name'][index],
+            'total_borrows': total[index],
+            'total_books': books[index],
+            'avg_price': df['avg_book_price'][index].astype(float).fillna(0.0),
+            'recent_activity': recent[index],
+            'popularity_score': popularity[index].round(2)
+        }))
+
     # ========== 3. PHÂN TÍCH NHÀ XUẤT BẢN ==========
 
     def analyze_publisher_performance(self) -> Dict:
@@ -181,20 +225,34 @@ class EnhancedAIForecastService:
         Phân tích hiệu suất các nhà xuất bản
         """
         try:
+            self.rollup.ensure_ready()
+
             query = """
             SELECT 
                 p.publisher_name,
-                COUNT(DISTINCT b.book_id) as total_books,
-                COUNT(bd.detail_id) as total_borrows,
-                AVG(b.price) as avg_price,
-                COUNT(CASE WHEN b.publish_year >= YEAR(CURDATE()) - 3 
-                      THEN 1 END) as recent_books
-            FROM publishers p
-            JOIN books b ON p.publisher_id = b.publisher_id
-            LEFT JOIN borrow_details bd ON b.book_id = bd.book_id
-            GROUP BY p.publisher_id, p.publisher_name
-            HAVING total_borrows > 0
-            ORDER BY total_borrows DESC
+                bk.total_books,
+                r.total_borrows,
+                bk.avg_price,
+                bk.recent_books
+            FROM (
+                SELECT dim_id, CAST(SUM(borrows) AS SIGNED) as total_borrows
+                FROM borrow_rollup_monthly
+                WHERE dim_type = 'publisher'
+                GROUP BY dim_id
+                HAVING total_borrows > 0
+            ) r
+            JOIN publishers p ON p.publisher_id = r.dim_id
+            JOIN (
+                SELECT
+                    publisher_id,
+                    COUNT(*) as total_books,
+                    AVG(price) as avg_price,
+                    CAST(COALESCE(SUM(publish_year >= YEAR(CURDATE()) - 3), 0) AS SIGNED)
+                        as recent_books
+                FROM books
+                GROUP BY publisher_id
+            ) bk ON bk.publisher_id = r.dim_id
+            ORDER BY r.total_borrows DESC
             LIMIT 15
             """
 
@@ -203,24 +261,7 @@ class EnhancedAIForecastService:
             if not results:
                 return {'success': False, 'message': 'Không có dữ liệu NXB'}
 
-            df = pd.DataFrame(results)
-
-            # Performance score
-            df['performance_score'] = (
-                (df['total_borrows'] / df['total_books']) * 0.6 +
-                (df['recent_books'] / df['total_books']) * 0.4
-            ) * 100
-
-            publishers_data = []
-            for _, row in df.head(10).iterrows():
-                publishers_data.append({
-                    'publisher': row['publisher_name'],
-                    'total_books': int(row['total_books']),
-                    'total_borrows': int(row['total_borrows']),
-                    'avg_price': float(row['avg_price']) if row['avg_price'] else 0,
-                    'recent_books': int(row['recent_books']),
-                    'performance_score': round(row['performance_score'], 1)
-                })
+            publishers_data = self._build_publisher_records(pd.DataFrame(results))
 
             return {
                 'success': True,
@@ -236,6 +277,26 @@ class EnhancedAIForecastService:
             logger.error(f"❌ Error analyzing publishers: {e}")
             return {'success': False, 'error': str(e)}
 
+    @staticmethod
+    def _build_publisher_records(df: pd.DataFrame, top: int = 10) -> List[Dict]:
+        """Tính performance score cho top NXB (vector hóa)"""
+        df = df.head(top)
+        books = df['total_books'].astype('int64')
+        total = df['total_borrows'].astype('int64')
+        recent = df['recent_books'].astype('int64')
+
+        # Performance score
+        performance = ((total / books) * 0.6 + (recent / books) * 0.4) * 100
+
+        return _to_records(pd.DataFrame({
+            'publisher': df['publisher_name'],
+            'total_books': books,
+            'total_borrows': total,
+            'avg_price': df['avg_price'].astype(float).fillna(0.0),
+            'recent_books': recent,
+            'performance_score': performance.round(1)
+        }))
+
     # ========== 4. PHÂN TÍCH THEO NĂM XUẤT BẢN ==========
 
     def analyze_book_age_impact(self) -> Dict:
@@ -244,15 +305,21 @@ class EnhancedAIForecastService:
         """
         try:
             current_year = datetime.now().year
+            self.rollup.ensure_ready()
 
             query = """
             SELECT 
                 b.publish_year,
-                COUNT(DISTINCT b.book_id) as total_books,
-                COUNT(bd.detail_id) as total_borrows,
+                COUNT(*) as total_books,
+                COALESCE(MAX(r.total_borrows), 0) as total_borrows,
                 AVG(b.price) as avg_price
             FROM books b
-            LEFT JOIN borrow_details bd ON b.book_id = bd.book_id
+            LEFT JOIN (
+                SELECT dim_id, CAST(SUM(borrows) AS SIGNED) as total_borrows
+                FROM borrow_rollup_monthly
+                WHERE dim_type = 'publish_year'
+                GROUP BY dim_id
+            ) r ON r.dim_id = b.publish_year
             WHERE b.publish_year IS NOT NULL 
                 AND b.publish_year >= 2000 
                 AND b.publish_year <= %s
@@ -301,17 +368,24 @@ class EnhancedAIForecastService:
 
     # ========== 5. DỰ ĐOÁN NÂNG CAO ==========
 
-    def generate_smart_forecast(self, months: int = 6) -> Dict:
+    def generate_smart_forecast(self, months: int = 6,
+                                category_analysis: Optional[Dict] = None,
+                                historical: Optional[pd.DataFrame] = None) -> Dict:
         """
         Dự đoán thông minh dựa trên nhiều yếu tố:
         - Xu hướng lịch sử
         - Mùa vụ
         - Thể loại hot
         - Tác giả phổ biến
+
+        Args:
+            category_analysis: Kết quả analyze_category_trends() đã có (tránh tính lại)
+            historical: Dữ liệu lịch sử đã có (tránh truy vấn lại)
         """
         try:
             # 1. Lấy dữ liệu lịch sử
-            historical = self._get_historical_with_features()
+            if historical is None:
+                historical = self._get_historical_with_features()
 
             if len(historical) < 3:
                 return {
@@ -320,7 +394,8 @@ class EnhancedAIForecastService:
                 }
 
             # 2. Phân tích thể loại hot
-            category_analysis = self.analyze_category_trends()
+            if category_analysis is None:
+                category_analysis = self.analyze_category_trends()
             hot_categories_boost = 1.0
             if category_analysis['success']:
                 hot_count = len([c for c in category_analysis['categories'] if c['trend'] == 'hot'])
@@ -386,25 +461,22 @@ class EnhancedAIForecastService:
             return {'success': False, 'error': str(e)}
 
     def _get_historical_with_features(self) -> pd.DataFrame:
-        """Lấy dữ liệu lịch sử với features"""
+        """Lấy dữ liệu lịch sử với features (12 tháng gần nhất, từ rollup)"""
+        self.rollup.ensure_ready()
+
         query = """
         SELECT 
-            DATE_FORMAT(bs.borrow_date, '%Y-%m') as month,
-            COUNT(bs.slip_id) as borrowing_count,
-            COUNT(DISTINCT bs.reader_id) as unique_readers,
-            SUM(COALESCE(p.amount, 0)) as revenue,
-            COUNT(DISTINCT CASE WHEN r.card_start >= DATE_SUB(bs.borrow_date, INTERVAL 3 MONTH)
-                  THEN bs.reader_id END) as new_users
-        FROM borrow_slips bs
-        LEFT JOIN readers r ON bs.reader_id = r.reader_id
-        LEFT JOIN borrow_details bd ON bs.slip_id = bd.slip_id
-        LEFT JOIN penalties p ON bd.slip_id = p.slip_id AND bd.book_id = p.book_id
-        WHERE bs.borrow_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-        GROUP BY month
+            month,
+            borrowing_count,
+            unique_readers,
+            revenue,
+            new_users
+        FROM borrow_rollup_months
+        WHERE month >= %s
         ORDER BY month
         """
 
-        results = db.fetchall(query)
+        results = db.fetchall(query, (self.rollup.months_ago(12),))
         return pd.DataFrame(results) if results else pd.DataFrame()
 
     def _calculate_trend(self, values: np.ndarray) -> float:
@@ -437,21 +509,76 @@ class EnhancedAIForecastService:
     def get_comprehensive_insights(self) -> Dict:
         """
         Lấy tất cả insights trong một call
+
+        Các phân tích độc lập chạy song song trên thread pool (mỗi thread dùng
+        1 connection riêng của pool). Phân tích thể loại và dữ liệu lịch sử chỉ
+        tính 1 lần rồi dùng lại cho dự đoán. Thời gian từng bước trả về trong 'timings_ms'.
         """
         try:
+            started = time.perf_counter()
+
+            # Backfill rollup (nếu cần) trước khi tỏa ra nhiều thread
+            self.rollup.ensure_ready()
+
+            stages = {
+                'categories': self.analyze_category_trends,
+                'authors': self.analyze_author_popularity,
+                'publishers': self.analyze_publisher_performance,
+                'book_age': self.analyze_book_age_impact,
+                'historical': self._get_historical_with_features
+            }
+
+            executor = self._get_executor()
+            futures = {name: executor.submit(self._timed, func) for name, func in stages.items()}
+
+            results, timings = {}, {}
+            for name, future in futures.items():
+                try:
+                    results[name], timings[name] = future.result()
+                except Exception as e:
+                    # Dự đoán sẽ tự truy vấn lại phần bị lỗi
+                    logger.error(f"❌ Error in insights stage '{name}': {e}")
+                    results[name] = None
+
+            forecast, timings['forecast'] = self._timed(
+                self.generate_smart_forecast, 6,
+                category_analysis=results['categories'],
+                historical=results['historical']
+            )
+            timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+
             return {
                 'success': True,
-                'categories': self.analyze_category_trends(),
-                'authors': self.analyze_author_popularity(),
-                'publishers': self.analyze_publisher_performance(),
-                'book_age': self.analyze_book_age_impact(),
-                'forecast': self.generate_smart_forecast(6),
+                'categories': results['categories'],
+                'authors': results['authors'],
+                'publishers': results['publishers'],
+                'book_age': results['book_age'],
+                'forecast': forecast,
+                'timings_ms': timings,
                 'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
         except Exception as e:
             logger.error(f"❌ Error getting comprehensive insights: {e}")
             return {'success': False, 'error': str(e)}
 
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """Thread pool dùng chung (tạo lần đầu khi cần)"""
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=cls.MAX_WORKERS,
+                    thread_name_prefix='ai-insights'
+                )
+            return cls._executor
+
+    @staticmethod
+    def _timed(func: Callable, *args, **kwargs) -> Tuple[object, float]:
+        """Chạy hàm, trả về (kết quả, thời gian ms)"""
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, round((time.perf_counter() - start) * 1000, 1)
+
 # ========== CÁCH SỬ DỤNG ==========
 """
 # 1. Thay file services/ai_forecast_service.py bằng code này
@@ -0,0 +1,284 @@
+"""
+Backup Chain - Sao lưu tăng dần (incremental) và phục hồi theo chuỗi
+
+- ChangeTracker: trigger trên các bảng sao lưu ghi khóa chính của dòng bị
+  thêm / sửa / xóa vào backup_change_log. change_id tăng dần là mốc (high-water mark)
+  của mỗi bản sao lưu: bản delta chỉ chứa các dòng có thay đổi sau mốc của bản trước.
+  change_id được cấp lúc INSERT chứ không phải lúc commit, nên mỗi bản còn ghi
+  change_floor (lúc bắt đầu giao dịch ghi cũ nhất chưa commit): delta kế tiếp quét lại
+  cả các dòng log có changed_at >= change_floor. Phát lại delta là upsert / xóa theo
+  khóa nên dòng bị quét trùng không sao.
+- BackupCatalog: duyệt manifest trong thư mục sao lưu, dựng chuỗi
+  full -> delta -> delta ... để phục hồi đến 1 thời điểm.
+
+Chỉ dùng updated_at là không đủ: chỉ bảng readers có cột này, dòng bị xóa không để
+lại dấu vết, và mốc theo đồng hồ bỏ sót giao dịch commit muộn hơn thời điểm ghi.
+"""
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import logging
+
+from config.database import db
+from services.backup_format import MANIFEST_SUFFIX, BackupReader, Snapshot, iter_cursor, table_cursor
+
+logger = logging.getLogger(__name__)
+
+# Biến session: đặt = 1 khi phục hồi để trigger không ghi log cho dữ liệu nạp lại
+SKIP_LOG_VARIABLE = '@skip_change_log'
+
+TRIGGER_OPS = {'ins': 'INSERT', 'upd': 'UPDATE', 'del': 'DELETE'}
+
+# Giây trừ hao cho change_floor (trx_started / changed_at làm tròn theo giây)
+LATE_COMMIT_SLACK = 5
+# Không đọc được innodb_trx (thiếu quyền PROCESS): coi mọi giao dịch ngắn hơn chừng này
+LATE_COMMIT_MARGIN = 600
+
+
+class ChangeTracker:
+    """Ghi nhận khóa chính của các dòng thay đổi bằng trigger"""
+
+    def __init__(self, tables: Sequence[str]):
+        self.tables = list(tables)
+        self._primary_keys: Dict[str, List[str]] = {}
+
+    # ========== SCHEMA ==========
+
+    def ensure_tracking(self) -> bool:
+        """
+        Tạo bảng log và trigger còn thiếu (idempotent)
+
+        Returns:
+            bool: False nếu không tạo được (vd. tài khoản MySQL thiếu quyền TRIGGER)
+        """
+        try:
+            with db.transaction() as tx:
+                tx.execute("""
+                    CREATE TABLE IF NOT EXISTS backup_change_log (
+                        change_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                        table_name VARCHAR(64) NOT NULL,
+                        pk VARCHAR(255) NOT NULL,
+                        op CHAR(1) NOT NULL,
+                        changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        KEY idx_change_log_table (table_name, change_id)
+                    )
+                """)
+                tx.execute("""
+                    CREATE TABLE IF NOT EXISTS backup_change_meta (
+                        id TINYINT NOT NULL PRIMARY KEY,
+                        epoch VARCHAR(32) NOT NULL,
+                        updated_at DATETIME NOT NULL
+                    )
+                """)
+                tx.execute("""
+                    INSERT IGNORE INTO backup_change_meta (id, epoch, updated_at)
+                    VALUES (1, %s, NOW())
+                """, (uuid.uuid4().hex,))
+
+                existing = {
+                    row['TRIGGER_NAME'] for row in tx.fetchall("""
+                        SELECT TRIGGER_NAME FROM information_schema.TRIGGERS
+                        WHERE TRIGGER_SCHEMA = DATABASE()
+                    """)
+                }
+
+            for table in self.tables:
+                for suffix, event in TRIGGER_OPS.items():
+                    name = f"trg_bk_{table}_{suffix}"
+                    if name not in existing:
+                        self._create_trigger(name, table, event)
+            return True
+
+        except Exception as e:
+            logger.warning(f"⚠️ Không bật được theo dõi thay đổi cho sao lưu tăng dần: {e}")
+            return False
+
+    def _create_trigger(self, name: str, table: str, event: str):
+        pk = self.primary_key(table)
+        new_key = 'JSON_ARRAY(' + ', '.join(f"NEW.`{c}`" for c in pk) + ')'
+        old_key = 'JSON_ARRAY(' + ', '.join(f"OLD.`{c}`" for c in pk) + ')'
+        log = "INSERT INTO backup_change_log (table_name, pk, op) VALUES ('{t}', {key}, '{op}');"
+
+        if event == 'INSERT':
+            body = log.format(t=table, key=new_key, op='I')
+        elif event == 'DELETE':
+            body = log.format(t=table, key=old_key, op='D')
+        else:
+            # Đổi khóa chính = xóa khóa cũ + thêm khóa mới
+            same_key = ' AND '.join(f"OLD.`{c}` <=> NEW.`{c}`" for c in pk)
+            body = (log.format(t=table, key=new_key, op='U') +
+                    f" IF NOT ({same_key}) THEN " +
+                    log.format(t=table, key=old_key, op='D') + " END IF;")
+
+        with db.transaction() as tx:
+            tx.execute(f"""
+                CREATE TRIGGER `{name}` AFTER {event} ON `{table}`
+                FOR EACH ROW BEGIN
+                    IF {SKIP_LOG_VARIABLE} IS NULL THEN {body} END IF;
+                END
+            """)
+        logger.info(f"✅ Đã tạo trigger {name}")
+
+    def primary_key(self, table: str) -> List[str]:
+        """Các cột khóa chính của bảng (đọc từ information_schema, có cache)"""
+        if table not in self._primary_keys:
+            rows = db.fetchall("""
+                SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                  AND CONSTRAINT_NAME = 'PRIMARY'
+                ORDER BY ORDINAL_POSITION
+            """, (table,))
+            if not rows:
+                raise ValueError(f"Bảng '{table}' không có khóa chính, không thể sao lưu tăng dần")
+            self._primary_keys[table] = [row['COLUMN_NAME'] for row in rows]
+        return self._primary_keys[table]
+
+    # ========== MỐC THAY ĐỔI ==========
+
+    def state(self, snapshot: Snapshot) -> Tuple[str, int, str]:
+        """
+        (epoch, change_id lớn nhất, change_floor) đọc trong snapshot của bản sao lưu
+
+        Mốc phải lấy trong cùng snapshot với dữ liệu: đọc ngoài snapshot thì dòng
+        commit giữa 2 lần đọc nằm dưới mốc mà không có trong bản sao lưu.
+        """
+        meta = snapshot.fetchone("SELECT epoch FROM backup_change_meta WHERE id = 1")
+        row = snapshot.fetchone("SELECT COALESCE(MAX(change_id), 0) AS hwm FROM backup_change_log")
+        if meta is None or row is None:
+            raise RuntimeError("Không đọc được trạng thái theo dõi thay đổi")
+        return meta['epoch'], int(row['hwm']), self._change_floor(snapshot)
+
+    @staticmethod
+    def _change_floor(snapshot: Snapshot) -> str:
+        """
+        Thời điểm bắt đầu giao dịch ghi cũ nhất chưa commit (giờ server, trừ LATE_COMMIT_SLACK)
+
+        Giao dịch đó có thể đã giữ change_id <= hwm mà snapshot không thấy; dòng log của
+        nó có changed_at >= mốc này.
+        """
+        try:
+            row = snapshot.fetchone("""
+                SELECT COALESCE(MIN(trx_started), NOW()) - INTERVAL %s SECOND AS floor
+                FROM information_schema.innodb_trx
+                WHERE trx_mysql_thread_id <> CONNECTION_ID() AND trx_rows_modified > 0
+            """, (LATE_COMMIT_SLACK,))
+        except Exception as e:
+            logger.warning(f"⚠️ Không đọc được giao dịch đang chạy ({e}), "
+                           f"lùi mốc thay đổi {LATE_COMMIT_MARGIN}s")
+            row = snapshot.fetchone("SELECT NOW() - INTERVAL %s SECOND AS floor",
+                                    (LATE_COMMIT_MARGIN,))
+        return str(row['floor'])
+
+    def changed_keys(self, snapshot: Snapshot, table: str, after: int, upto: int,
+                     floor: Optional[str] = None) -> Set[tuple]:
+        """
+        Khóa chính các dòng của bảng thay đổi trong (after, upto], cộng các dòng log
+        <= after nhưng có changed_at >= floor (commit muộn sau bản trước)
+        """
+        query = "SELECT DISTINCT pk FROM backup_change_log WHERE table_name = %s AND change_id <= %s"
+        params = (table, upto)
+        if floor:
+            query += " AND (change_id > %s OR changed_at >= %s)"
+            params += (after, floor)
+        else:
+            query += " AND change_id > %s"
+            params += (after,)
+
+        keys = set()
+        with table_cursor(query, params, snapshot=snapshot) as cursor:
+            for (pk,) in iter_cursor(cursor):
+                keys.add(tuple(json.loads(pk)))
+        return keys
+
+    def prune(self, upto: int, floor: Optional[str] = None):
+        """
+        Xóa log đã nằm trong 1 bản full (không còn delta nào cần tới)
+
+        Giữ dòng có changed_at >= floor: có thể thuộc giao dịch commit sau snapshot
+        của bản full, delta kế tiếp còn cần.
+        """
+        if floor:
+            db.execute("DELETE FROM backup_change_log WHERE change_id <= %s AND changed_at < %s",
+                       (upto, floor))
+        else:
+            db.execute("DELETE FROM backup_change_log WHERE change_id <= %s", (upto,))
+
+    def reset(self):
+        """
+        Sau khi phục hồi: log cũ không còn khớp dữ liệu, đổi epoch để
+        bản sao lưu kế tiếp bắt buộc là full
+        """
+        with db.transaction() as tx:
+            tx.execute("DELETE FROM backup_change_log")
+            tx.execute("""
+                UPDATE backup_change_meta SET epoch = %s, updated_at = NOW() WHERE id = 1
+            """, (uuid.uuid4().hex,))
+
+
+def key_condition(columns: Sequence[str], count: int) -> str:
+    """WHERE cho count khóa: `a` IN (%s, ...) hoặc (`a`, `b`) IN ((%s, %s), ...)"""
+    if len(columns) == 1:
+        return f"`{columns[0]}` IN (" + ', '.join(['%s'] * count) + ')'
+    tuple_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    return ('(' + ', '.join(f"`{c}`" for c in columns) + ') IN (' +
+            ', '.join([tuple_sql] * count) + ')')
+
+
+def chunked(items, size: int) -> Iterator[list]:
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class BackupCatalog:
+    """Danh mục các bản sao lưu (đọc manifest) trong 1 thư mục"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def manifests(self) -> List[dict]:
+        """Manifest định dạng mới, sắp theo thời gian tạo; thêm khóa 'path'"""
+        result = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(MANIFEST_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            manifest['path'] = path
+            result.append(manifest)
+        return sorted(result, key=lambda m: (m.get('created_at', ''), m.get('change_id_to', 0)))
+
+    def latest(self) -> Optional[dict]:
+        manifests = self.manifests()
+        return manifests[-1] if manifests else None
+
+    def find(self, backup_id: str) -> Optional[dict]:
+        return next((m for m in self.manifests() if m.get('backup_id') == backup_id), None)
+
+    def chain(self, path: str) -> List[BackupReader]:
+        """
+        Chuỗi cần phục hồi để đạt tới bản sao lưu đã chọn: [full, delta1, ..., đã_chọn]
+
+        Raises:
+            ValueError: Thiếu 1 mắt xích trong chuỗi
+        """
+        readers = [BackupReader(path)]
+        while readers[0].manifest.get('kind') == 'delta':
+            parent_id = readers[0].manifest.get('parent')
+            parent = self.find(parent_id)
+            if parent is None:
+                raise ValueError(f"Thiếu bản sao lưu '{parent_id}' trong chuỗi phục hồi")
+            readers.insert(0, BackupReader(parent['path']))
+        return readers
+
+    def point_in_time(self, until: datetime) -> Optional[dict]:
+        """Bản sao lưu mới nhất được tạo không muộn hơn thời điểm until"""
+        candidates = [m for m in self.manifests()
+                      if m.get('created_at') and datetime.fromisoformat(m['created_at']) <= until]
+        return candidates[-1] if candidates else None
@@ -0,0 +1,454 @@
+"""
+Backup Format - Định dạng sao lưu theo luồng, nén gzip, có manifest và checksum
+
+File dữ liệu  backup_<ts>.jsonl.gz:
+    Mỗi bảng là 1 gzip member riêng (nối tiếp nhau, gunzip vẫn đọc được cả file).
+    Nội dung member, mỗi dòng 1 JSON:
+        {"table": "books", "columns": ["book_id", "title", ...]}
+        [1, "Dế Mèn phiêu lưu ký", ...]
+        ...
+
+File manifest backup_<ts>.manifest.json:
+    Với từng bảng: số dòng, vị trí (offset/length) của member trong file dữ liệu
+    và sha256 của nội dung đã giải nén - dùng để kiểm tra trước khi phục hồi
+    và để đọc riêng 1 bảng mà không phải giải nén cả file.
+
+Ghi và đọc đều theo lô (fetchmany / từng dòng), bộ nhớ không phụ thuộc kích thước CSDL.
+Mọi bảng của 1 bản sao lưu được đọc trong cùng 1 consistent snapshot (consistent_snapshots),
+nên khóa ngoại giữa các bảng và mốc change_id khớp nhau.
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+import logging
+
+from config.database import db
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = 'library-backup'
+FORMAT_VERSION = 1
+
+DATA_SUFFIX = '.jsonl.gz'
+MANIFEST_SUFFIX = '.manifest.json'
+
+# Mức nén gzip: 6 cân bằng giữa tốc độ và kích thước (9 chậm hơn nhiều, nhỏ hơn ít)
+COMPRESS_LEVEL = 6
+FETCH_BATCH_SIZE = 2000
+PROGRESS_EVERY = 10000
+# Số giây chờ tối đa FLUSH TABLES WITH READ LOCK (chờ câu lệnh dài đang chạy)
+GLOBAL_LOCK_TIMEOUT = 10
+
+
+# ========== ĐƯỜNG DẪN ==========
+
+def manifest_path_for(path: str) -> str:
+    """backup_x.jsonl.gz -> backup_x.manifest.json (nhận cả đường dẫn manifest)"""
+    if path.endswith(MANIFEST_SUFFIX):
+        return path
+    if path.endswith(DATA_SUFFIX):
+        path = path[:-len(DATA_SUFFIX)]
+    return path + MANIFEST_SUFFIX
+
+
+def is_streaming_backup(path: str) -> bool:
+    return path.endswith(DATA_SUFFIX) or path.endswith(MANIFEST_SUFFIX)
+
+
+# ========== ĐỌC TỪ CSDL ==========
+
+class Snapshot:
+    """
+    1 connection đang mở START TRANSACTION WITH CONSISTENT SNAPSHOT
+
+    Mọi truy vấn trên snapshot thấy CSDL ở cùng 1 thời điểm. Mỗi lúc chỉ 1 cursor
+    (1 luồng) dùng snapshot; đọc dở 1 cursor thì snapshot hỏng (broken).
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.broken = False
+
+    def start(self):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+        finally:
+            cursor.close()
+
+    def fetchone(self, query: str, params: tuple = None) -> Optional[dict]:
+        """1 dòng (dict) đọc trong snapshot"""
+        if self.broken:
+            raise RuntimeError("Snapshot sao lưu đã hỏng")
+        cursor = self.connection.cursor(dictionary=True, buffered=True)
+        try:
+            cursor.execute(query, params or ())
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+
+def _open_snapshot() -> Snapshot:
+    connection = db.get_connection()
+    if connection is None:
+        raise RuntimeError("Lỗi kết nối CSDL")
+    snapshot = Snapshot(connection)
+    try:
+        snapshot.start()
+    except Exception:
+        db.release_connection(connection, discard=True)
+        raise
+    return snapshot
+
+
+def _open_under_global_lock(snapshots: List[Snapshot], count: int):
+    """
+    Mở count snapshot trong lúc giữ FLUSH TABLES WITH READ LOCK: không giao dịch nào
+    commit xen giữa nên các snapshot thấy cùng 1 trạng thái. Khóa chỉ giữ trong lúc mở.
+    """
+    coordinator = db.get_connection()
+    if coordinator is None:
+        raise RuntimeError("Lỗi kết nối CSDL")
+
+    cursor = coordinator.cursor()
+    locked = False
+    try:
+        cursor.execute(f"SET SESSION lock_wait_timeout = {GLOBAL_LOCK_TIMEOUT}")
+        cursor.execute("FLUSH TABLES WITH READ LOCK")
+        locked = True
+        for _ in range(count):
+            snapshots.append(_open_snapshot())
+    finally:
+        clean = True
+        try:
+            if locked:
+                cursor.execute("UNLOCK TABLES")
+            cursor.execute("SET SESSION lock_wait_timeout = DEFAULT")
+            cursor.close()
+        except Exception as e:
+            # Đóng hẳn connection: session đóng thì khóa toàn cục cũng được nhả
+            logger.warning(f"⚠️ Lỗi nhả khóa toàn cục: {e}")
+            clean = False
+        db.release_connection(coordinator, discard=not clean)
+
+
+@contextmanager
+def consistent_snapshots(count: int = 1) -> Iterator[List[Snapshot]]:
+    """
+    count connection cùng thấy 1 trạng thái CSDL (cho sao lưu nhiều bảng / nhiều luồng)
+
+    count > 1 cần quyền RELOAD (FLUSH TABLES WITH READ LOCK); không được thì lùi về
+    1 snapshot (sao lưu tuần tự) thay vì để mỗi bảng ở 1 thời điểm khác nhau.
+
+    Yields:
+        List[Snapshot]: 1 hoặc count snapshot
+    """
+    snapshots: List[Snapshot] = []
+    try:
+        if count > 1:
+            try:
+                _open_under_global_lock(snapshots, count)
+            except Exception as e:
+                logger.warning(f"⚠️ Không mở được {count} snapshot đồng thời ({e}), "
+                               f"sao lưu tuần tự trên 1 snapshot")
+                for snapshot in snapshots:
+                    db.release_connection(snapshot.connection)
+                snapshots.clear()
+        if not snapshots:
+            snapshots.append(_open_snapshot())
+        yield snapshots
+    finally:
+        # rollback kết thúc transaction chỉ đọc; snapshot đọc dở thì đóng hẳn connection
+        for snapshot in snapshots:
+            db.release_connection(snapshot.connection, discard=snapshot.broken)
+
+
+@contextmanager
+def table_cursor(query: str, params: tuple = None, snapshot: Optional[Snapshot] = None):
+    """
+    Cursor không buffer (dữ liệu được kéo dần từ server khi fetchmany)
+
+    Args:
+        snapshot: Đọc trên connection của snapshot (None = 1 connection riêng của pool)
+
+    Yields:
+        cursor: Có column_names; duyệt bằng iter_cursor()
+    """
+    if snapshot is not None:
+        if snapshot.broken:
+            raise RuntimeError("Snapshot sao lưu đã hỏng")
+        connection = snapshot.connection
+    else:
+        connection = db.get_connection()
+        if connection is None:
+            raise RuntimeError("Lỗi kết nối CSDL")
+
+    cursor = connection.cursor()
+    completed = False
+    try:
+        cursor.execute(query, params or ())
+        yield cursor
+        completed = True
+    finally:
+        # Dừng giữa chừng (lỗi / hủy): đóng hẳn connection thay vì đọc bỏ phần còn lại
+        exhausted = completed and not connection.unread_result
+        if exhausted:
+            cursor.close()
+        if snapshot is not None:
+            snapshot.broken = snapshot.broken or not exhausted
+        else:
+            db.release_connection(connection, discard=not exhausted)
+
+
+def iter_cursor(cursor, batch_size: int = FETCH_BATCH_SIZE) -> Iterator[tuple]:
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+# ========== GHI ==========
+
+def _json_default(value):
+    """Kiểu MySQL -> JSON (ngày giờ dạng ISO, DECIMAL dạng chuỗi để không mất chính xác)"""
+    if isinstance(value, (datetime, date, time)):
+        return str(value)
+    if isinstance(value, (Decimal, timedelta)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', errors='replace')
+    if isinstance(value, set):
+        return ','.join(sorted(value))
+    raise TypeError(f"Không chuyển được kiểu {type(value).__name__} sang JSON")
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_json_default)
+
+
+def write_member(file, table: str, columns: Sequence[str], rows: Iterable[Sequence],
+                 progress: Optional[Callable[[str, int], None]] = None, **entry_fields) -> dict:
+    """
+    Ghi 1 bảng thành 1 gzip member tại vị trí hiện tại của file
+
+    Args:
+        progress: Callback(tên_bảng, số_dòng) gọi sau mỗi PROGRESS_EVERY dòng
+
+    Returns:
+        dict: Mục manifest của bảng (rows, offset, length, sha256, ...)
+    """
+    offset = file.tell()
+    digest = hashlib.sha256()
+    count = 0
+
+    with gzip.GzipFile(fileobj=file, mode='wb', compresslevel=COMPRESS_LEVEL,
+                       filename='', mtime=0) as gz:
+        out = io.BufferedWriter(gz, buffer_size=1 << 16)
+        header = _encoder.encode({'table': table, 'columns': list(columns)}) + '\n'
+        data = header.encode('utf-8')
+        digest.update(data)
+        out.write(data)
+
+        for row in rows:
+            data = (_encoder.encode(list(row)) + '\n').encode('utf-8')
+            digest.update(data)
+            out.write(data)
+            count += 1
+            if progress and count % PROGRESS_EVERY == 0:
+                progress(table, count)
+        out.flush()
+
+    if progress:
+        progress(table, count)
+
+    return {
+        'name': table,
+        'columns': list(columns),
+        'rows': count,
+        'offset': offset,
+        'length': file.tell() - offset,
+        'sha256': digest.hexdigest(),
+        **entry_fields
+    }
+
+
+class BackupWriter:
+    """
+    Ghi file sao lưu theo từng bảng
+
+    Ví dụ:
+        with BackupWriter(path) as writer:
+            writer.write_table('books', columns, rows)
+    """
+
+    def __init__(self, path: str, **manifest_fields):
+        self.path = path
+        self.manifest_path = manifest_path_for(path)
+        self.manifest = {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'compression': 'gzip',
+            'data_file': os.path.basename(path),
+            **manifest_fields,
+            'tables': []
+        }
+        self._file = open(path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def write_table(self, table: str, columns: Sequence[str], rows: Iterable[Sequence],
+                    progress: Optional[Callable[[str, int], None]] = None, **entry_fields) -> dict:
+        """
+        Ghi 1 bảng thành 1 gzip member
+
+        Returns:
+            dict: Mục manifest của bảng (rows, offset, length, sha256, ...)
+        """
+        entry = write_member(self._file, table, columns, rows, progress=progress, **entry_fields)
+        self.manifest['tables'].append(entry)
+        return entry
+
+    def append_part(self, part_path: str, entry: dict) -> dict:
+        """
+        Nối 1 file tạm (1 gzip member do write_member ghi ở thread khác) vào cuối file
+
+        Returns:
+            dict: entry với offset đã đổi sang vị trí trong file dữ liệu
+        """
+        offset = self._file.tell()
+        with open(part_path, 'rb') as part:
+            shutil.copyfileobj(part, self._file, 1 << 20)
+        entry = dict(entry, offset=offset)
+        self.manifest['tables'].append(entry)
+        return entry
+
+    def close(self):
+        """Đóng file dữ liệu rồi mới ghi manifest (manifest có = bản sao lưu hoàn chỉnh)"""
+        self._file.close()
+        self.manifest['size'] = os.path.getsize(self.path)
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def abort(self):
+        """Lỗi giữa chừng: xóa file dở dang"""
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+# ========== ĐỌC ==========
+
+class _SectionReader(io.RawIOBase):
+    """Đọc đúng length byte bắt đầu từ offset của file (1 gzip member)"""
+
+    def __init__(self, file, offset: int, length: int):
+        self.file = file
+        self.file.seek(offset)
+        self.remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            return 0
+        size = min(len(buffer), self.remaining)
+        data = self.file.read(size)
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+class BackupReader:
+    """Đọc file sao lưu theo manifest"""
+
+    def __init__(self, path: str):
+        self.manifest_path = manifest_path_for(path)
+        if not os.path.exists(self.manifest_path):
+            raise ValueError(f"Không tìm thấy manifest: {os.path.basename(self.manifest_path)}")
+
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get('format') != FORMAT_NAME:
+            raise ValueError("File không phải bản sao lưu của hệ thống")
+        if self.manifest.get('version', 0) > FORMAT_VERSION:
+            raise ValueError(f"Phiên bản định dạng sao lưu không hỗ trợ: {self.manifest.get('version')}")
+
+        self.path = os.path.join(os.path.dirname(self.manifest_path), self.manifest['data_file'])
+        if not os.path.exists(self.path):
+            raise ValueError(f"Không tìm thấy file dữ liệu: {self.manifest['data_file']}")
+
+    @property
+    def tables(self) -> List[dict]:
+        return self.manifest['tables']
+
+    def table(self, name: str) -> Optional[dict]:
+        return next((t for t in self.tables if t['name'] == name), None)
+
+    def _lines(self, entry: dict) -> Iterator[bytes]:
+        with open(self.path, 'rb') as f:
+            section = io.BufferedReader(_SectionReader(f, entry['offset'], entry['length']), 1 << 16)
+            with gzip.GzipFile(fileobj=section, mode='rb') as gz:
+                yield from io.BufferedReader(gz, 1 << 16)
+
+    def verify(self):
+        """
+        Kiểm tra kích thước file, số dòng và sha256 của từng bảng
+
+        Raises:
+            ValueError: Bản sao lưu bị hỏng / không khớp manifest
+        """
+        size = self.manifest.get('size')
+        if size is not None and os.path.getsize(self.path) != size:
+            raise ValueError("Kích thước file dữ liệu không khớp manifest (file bị cắt hoặc bị sửa)")
+
+        for entry in self.tables:
+            digest = hashlib.sha256()
+            count = -1  # dòng đầu là header
+            try:
+                for line in self._lines(entry):
+                    digest.update(line)
+                    count += 1
+            except (OSError, EOFError, zlib.error) as e:
+                raise ValueError(f"Dữ liệu nén của bảng '{entry['name']}' bị hỏng: {e}")
+
+            if digest.hexdigest() != entry['sha256'] or count != entry['rows']:
+                raise ValueError(f"Checksum bảng '{entry['name']}' không khớp, bản sao lưu bị hỏng")
+
+    def iter_rows(self, entry: dict) -> Iterator[list]:
+        """Các dòng (list giá trị theo thứ tự cột) của 1 bảng"""
+        lines = self._lines(entry)
+        header = json.loads(next(lines))
+        if header.get('table') != entry['name']:
+            raise ValueError(f"Vị trí bảng '{entry['name']}' trong manifest không đúng")
+        for line in lines:
+            yield json.loads(line)
+
+    def iter_tables(self, names: Optional[Iterable[str]] = None):
+        """(bảng, cột, dòng) theo thứ tự trong manifest, cho BulkRestoreEngine"""
+        wanted = set(names) if names is not None else None
+        for entry in self.tables:
+            if wanted is None or entry['name'] in wanted:
+                yield entry['name'], entry['columns'], self.iter_rows(entry)
@@ -1,15 +1,40 @@
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 import logging
 
 from config.database import db
+from config.settings import AppConfig
 from models.book import Book, Author, Category, Publisher
+from services.circulation_lookup_service import CirculationLookupService
+from services.search_index import SearchIndex
+from services.statistics_service import StatisticsService
 
 logger = logging.getLogger(__name__)
 
+# Chỉ mục tìm kiếm dùng chung cho mọi BookService (trường: (kiểu, trọng số))
+book_search_index = SearchIndex({
+    'title': ('prefix', 3.0),
+    'author': ('prefix', 2.0),
+    'category': ('prefix', 1.0),
+    'isbn': ('substring', 2.0),
+    'barcode': ('substring', 2.0),
+}, name='books', max_age=AppConfig.SEARCH_INDEX_MAX_AGE)
+
 
 class BookService:
     """Service layer xử lý business logic cho Book"""
 
+    # Câu SELECT chung (JOIN tác giả, thể loại, NXB, tồn kho)
+    BOOK_SELECT = """
+        SELECT b.*, a.author_name, c.category_name, p.publisher_name,
+               COALESCE(bi.total_quantity, 0) as total_quantity,
+               COALESCE(bi.available_quantity, 0) as available_quantity
+        FROM books b
+        LEFT JOIN authors a ON b.author_id = a.author_id
+        LEFT JOIN categories c ON b.category_id = c.category_id
+        LEFT JOIN publishers p ON b.publisher_id = p.publisher_id
+        LEFT JOIN book_inventory bi ON b.book_id = bi.book_id
+    """
+
     def __init__(self):
         pass
 
@@ -46,22 +71,26 @@ class BookService:
                 if existing:
                     return False, f"Mã vạch '{book.barcode}' đã tồn tại", None
 
-            # Insert book
+            # Insert book + tồn kho trong 1 transaction (1 commit)
             query = """
                 INSERT INTO books (title, author_id, category_id, publisher_id,
                                    publish_year, isbn, barcode, price, description)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
-            book_id = db.execute_query(query, book.to_tuple(), commit=True)
+            inventory_query = """
+                INSERT INTO book_inventory (book_id, total_quantity, available_quantity)
+                VALUES (%s, 0, 0)
+            """
+            with db.transaction() as tx:
+                book_id = tx.execute_insert(query, book.to_tuple())
+                if book_id:
+                    # Tạo bản ghi tồn kho
+                    tx.execute(inventory_query, (book_id,))
 
             if book_id:
-                # Tạo bản ghi tồn kho
-                inventory_query = """
-                    INSERT INTO book_inventory (book_id, total_quantity, available_quantity)
-                    VALUES (%s, 0, 0)
-                """
-                db.execute_query(inventory_query, (book_id,), commit=True)
-
+                self._index_book(book_id)
+                CirculationLookupService.invalidate_books()
+                StatisticsService.invalidate_books()
                 logger.info(f"✅ Đã thêm sách: {book.title} (ID: {book_id})")
                 return True, None, book_id
             else:
@@ -116,6 +145,8 @@ class BookService:
             result = db.execute_query(query, params, commit=True)
 
             if result and result > 0:
+                self._index_book(book.book_id)
+                CirculationLookupService.invalidate_books()
                 logger.info(f"✅ Đã cập nhật sách ID: {book.book_id}")
                 return True, None
             else:
@@ -140,13 +171,15 @@ class BookService:
             if result and result[0]['count'] > 0:
                 return False, "Không thể xóa sách đang được mượn"
 
-            # Xóa inventory trước
-            db.execute_query("DELETE FROM book_inventory WHERE book_id = %s", (book_id,), commit=True)
-
-            # Xóa sách
-            result = db.execute_query("DELETE FROM books WHERE book_id = %s", (book_id,), commit=True)
+            # Xóa inventory trước rồi xóa sách, cùng 1 transaction
+            with db.transaction() as tx:
+                tx.execute("DELETE FROM book_inventory WHERE book_id = %s", (book_id,))
+                result = tx.execute("DELETE FROM books WHERE book_id = %s", (book_id,))
 
             if result and result > 0:
+                book_search_index.remove(book_id)
+                CirculationLookupService.invalidate_books()
+                StatisticsService.invalidate_books()
                 logger.info(f"✅ Đã xóa sách ID: {book_id}")
                 return True, None
             else:
@@ -157,31 +190,71 @@ class BookService:
             return False, f"Lỗi database: {str(e)}"
 
     def get_all_books(self) -> List[Book]:
-        """Lấy danh sách tất cả sách với thông tin JOIN"""
-        try:
-            query = """
-                SELECT b.*, a.author_name, c.category_name, p.publisher_name,
-                       COALESCE(bi.total_quantity, 0) as total_quantity,
-                       COALESCE(bi.available_quantity, 0) as available_quantity
-                FROM books b
-                LEFT JOIN authors a ON b.author_id = a.author_id
-                LEFT JOIN categories c ON b.category_id = c.category_id
-                LEFT JOIN publishers p ON b.publisher_id = p.publisher_id
-                LEFT JOIN book_inventory bi ON b.book_id = bi.book_id
-                ORDER BY b.book_id DESC
-            """
-            rows = db.execute_query(query, fetch=True)
+        """
+        Lấy danh sách tất cả sách với thông tin JOIN
 
-            if rows is None:
-                return []
+        Raises:
+            Error: lỗi CSDL (không trả về danh sách thiếu)
+        """
+        books = list(self.stream_books())
+        logger.info(f"✅ Đã tải {len(books)} sách")
+        return books
 
-            books = [Book.from_dict(row) for row in rows]
-            logger.info(f"✅ Đã tải {len(books)} sách")
-            return books
+    def get_books_page(self, after_id: Optional[int] = None,
+                       limit: int = AppConfig.ITEMS_PER_PAGE) -> List[Book]:
+        """
+        Lấy 1 trang sách theo keyset (book_id giảm dần)
 
-        except Exception as e:
-            logger.error(f"❌ Lỗi lấy danh sách sách: {e}")
-            return []
+        Args:
+            after_id: book_id cuối cùng của trang trước (None = trang đầu)
+            limit: Số sách mỗi trang
+
+        Returns:
+            List[Book]: Tối đa `limit` sách có book_id < after_id
+
+        Raises:
+            Error: lỗi CSDL được ném ra (trang rỗng = hết dữ liệu, không phải lỗi);
+                   giao diện bắt lỗi và báo cho người dùng
+        """
+        if after_id is None:
+            query = self.BOOK_SELECT + " ORDER BY b.book_id DESC LIMIT %s"
+            params = (limit,)
+        else:
+            query = self.BOOK_SELECT + " WHERE b.book_id < %s ORDER BY b.book_id DESC LIMIT %s"
+            params = (after_id, limit)
+
+        rows = db.fetchall(query, params, raise_errors=True)
+        return [Book.from_dict(row) for row in rows]
+
+    def iter_books(self, batch_size: int = AppConfig.ITEMS_PER_PAGE) -> Iterator[Book]:
+        """
+        Duyệt toàn bộ sách theo từng trang keyset, không giữ cả danh sách trong bộ nhớ
+
+        Lỗi đọc 1 trang được ném ra, không kết thúc sớm như thể đã hết sách.
+        """
+        after_id = None
+        while True:
+            page = self.get_books_page(after_id, batch_size)
+            yield from page
+            if len(page) < batch_size:
+                break
+            after_id = page[-1].book_id
+
+    def stream_books(self, batch_size: int = 1000) -> Iterator[Book]:
+        """
+        Duyệt toàn bộ sách bằng 1 truy vấn, đọc theo lô (fetchmany)
+
+        Khác iter_books (mỗi trang 1 truy vấn, không giữ connection): dùng cho
+        xuất dữ liệu lớn, ít round trip hơn. Phải duyệt hết để trả connection về pool.
+        """
+        query = self.BOOK_SELECT + " ORDER BY b.book_id DESC"
+        for row in db.stream(query, batch_size=batch_size):
+            yield Book.from_dict(row)
+
+    def count_books(self) -> int:
+        """Đếm tổng số đầu sách"""
+        result = db.fetchone("SELECT COUNT(*) as count FROM books")
+        return result['count'] if result else 0
 
     def get_book_by_id(self, book_id: int) -> Optional[Book]:
         """Lấy thông tin sách theo ID"""
@@ -211,20 +284,29 @@ class BookService:
         """
         Tìm kiếm sách
         search_by: 'all', 'title', 'author', 'isbn', 'barcode', 'category'
+
+        Dùng chỉ mục trong bộ nhớ; trong lúc chỉ mục đang được xây lần đầu
+        thì tạm dùng truy vấn LIKE.
         """
+        if not book_search_index.ready(self._iter_index_documents):
+            return self._search_books_like(keyword, search_by)
+
         try:
-            keyword_pattern = f"%{keyword}%"
+            fields = None if search_by == "all" else [search_by]
+            book_ids = book_search_index.search(keyword, fields, limit=AppConfig.MAX_SEARCH_RESULTS)
+            books = self._get_books_by_ids(book_ids)
+            logger.info(f"🔍 Tìm thấy {len(books)} sách cho '{keyword}'")
+            return books
 
-            base_query = """
-                SELECT b.*, a.author_name, c.category_name, p.publisher_name,
-                       COALESCE(bi.total_quantity, 0) as total_quantity,
-                       COALESCE(bi.available_quantity, 0) as available_quantity
-                FROM books b
-                LEFT JOIN authors a ON b.author_id = a.author_id
-                LEFT JOIN categories c ON b.category_id = c.category_id
-                LEFT JOIN publishers p ON b.publisher_id = p.publisher_id
-                LEFT JOIN book_inventory bi ON b.book_id = bi.book_id
-            """
+        except Exception as e:
+            logger.error(f"❌ Lỗi tìm kiếm sách: {e}")
+            return []
+
+    def _search_books_like(self, keyword: str, search_by: str = "all") -> List[Book]:
+        """Tìm kiếm sách bằng LIKE (quét bảng) - dùng khi chưa có chỉ mục"""
+        try:
+            keyword_pattern = f"%{keyword}%"
+            base_query = self.BOOK_SELECT
 
             if search_by == "title":
                 query = base_query + " WHERE b.title LIKE %s ORDER BY b.book_id DESC"
@@ -264,6 +346,48 @@ class BookService:
             logger.error(f"❌ Lỗi tìm kiếm sách: {e}")
             return []
 
+    # ========== SEARCH INDEX ==========
+
+    def _get_books_by_ids(self, book_ids: List[int]) -> List[Book]:
+        """Lấy sách theo danh sách ID, giữ nguyên thứ tự xếp hạng"""
+        if not book_ids:
+            return []
+
+        placeholders = ', '.join(['%s'] * len(book_ids))
+        query = self.BOOK_SELECT + f" WHERE b.book_id IN ({placeholders})"
+        rows = db.execute_query(query, tuple(book_ids), fetch=True) or []
+
+        by_id = {row['book_id']: Book.from_dict(row) for row in rows}
+        return [by_id[book_id] for book_id in book_ids if book_id in by_id]
+
+    @staticmethod
+    def _index_document(book: Book) -> dict:
+        """Các trường của sách được đưa vào chỉ mục"""
+        return {
+            'title': book.title,
+            'author': book.author_name,
+            'category': book.category_name,
+            'isbn': book.isbn,
+            'barcode': book.barcode,
+        }
+
+    def _iter_index_documents(self):
+        """Nguồn dữ liệu để xây chỉ mục tìm kiếm"""
+        for book in self.iter_books(batch_size=5000):
+            yield book.book_id, self._index_document(book)
+
+    def _index_book(self, book_id: int):
+        """Cập nhật chỉ mục cho 1 sách sau khi thêm / sửa (kể cả khi chỉ mục đang xây)"""
+        if not book_search_index.needs_updates:
+            return
+        book = self.get_book_by_id(book_id)
+        if book:
+            book_search_index.add(book_id, self._index_document(book))
+
+    def rebuild_search_index(self) -> int:
+        """Xây lại chỉ mục tìm kiếm sách (vd. sau khi đổi tên tác giả / thể loại)"""
+        return book_search_index.build(self._iter_index_documents())
+
     # ========== INVENTORY MANAGEMENT ==========
 
     def update_inventory(self, book_id: int, total_qty: int, available_qty: int) -> Tuple[bool, Optional[str]]:
@@ -283,6 +407,7 @@ class BookService:
             result = db.execute_query(query, (total_qty, available_qty, book_id), commit=True)
 
             if result:
+                StatisticsService.invalidate_books()
                 logger.info(f"✅ Đã cập nhật tồn kho sách ID {book_id}: {available_qty}/{total_qty}")
                 return True, None
             else:
@@ -314,6 +439,7 @@ class BookService:
                 (name.strip(),),
                 commit=True
             )
+            StatisticsService.invalidate_books()
             return True, None, author_id
         except Exception as e:
             return False, f"Lỗi: {str(e)}", None
@@ -340,6 +466,7 @@ class BookService:
                 (name.strip(),),
                 commit=True
             )
+            StatisticsService.invalidate_books()
             return True, None, category_id
         except Exception as e:
             return False, f"Lỗi: {str(e)}", None
@@ -367,6 +494,7 @@ class BookService:
                 (publisher.publisher_name, publisher.address, publisher.phone),
                 commit=True
             )
+            StatisticsService.invalidate_books()
             return True, None, publisher_id
         except Exception as e:
             return False, f"Lỗi: {str(e)}", None
@@ -374,68 +502,5 @@ class BookService:
     # ========== STATISTICS ==========
 
     def get_statistics(self) -> dict:
-        """Lấy thống kê sách"""
-        try:
-            stats = {
-                'total_books': 0,
-                'total_quantity': 0,
-                'available_quantity': 0,
-                'borrowed_quantity': 0,
-                'out_of_stock': 0,
-                'low_stock': 0,
-                'total_authors': 0,
-                'total_categories': 0,
-                'total_publishers': 0
-            }
-
-            # Tổng số đầu sách
-            result = db.execute_query("SELECT COUNT(*) as count FROM books", fetch=True)
-            if result:
-                stats['total_books'] = result[0]['count']
-
-            # Tổng số lượng sách
-            result = db.execute_query(
-                "SELECT SUM(total_quantity) as total, SUM(available_quantity) as available FROM book_inventory",
-                fetch=True
-            )
-            if result and result[0]['total']:
-                stats['total_quantity'] = int(result[0]['total'])
-                stats['available_quantity'] = int(result[0]['available'])
-                stats['borrowed_quantity'] = stats['total_quantity'] - stats['available_quantity']
-
-            # Số sách hết hàng
-            result = db.execute_query(
-                "SELECT COUNT(*) as count FROM book_inventory WHERE available_quantity = 0",
-                fetch=True
-            )
-            if result:
-                stats['out_of_stock'] = result[0]['count']
-
-            # Số sách sắp hết (< 5)
-            result = db.execute_query(
-                "SELECT COUNT(*) as count FROM book_inventory WHERE available_quantity > 0 AND available_quantity < 5",
-                fetch=True
-            )
-            if result:
-                stats['low_stock'] = result[0]['count']
-
-            # Số tác giả
-            result = db.execute_query("SELECT COUNT(*) as count FROM authors", fetch=True)
-            if result:
-                stats['total_authors'] = result[0]['count']
-
-            # Số thể loại
-            result = db.execute_query("SELECT COUNT(*) as count FROM categories", fetch=True)
-            if result:
-                stats['total_categories'] = result[0]['count']
-
-            # Số NXB
-            result = db.execute_query("SELECT COUNT(*) as count FROM publishers", fetch=True)
-            if result:
-                stats['total_publishers'] = result[0]['count']
-
-            return stats
-
-        except Exception as e:
-            logger.error(f"❌ Lỗi thống kê: {e}")
-            return {}
\ No newline at end of file
+        """Lấy thống kê sách (1 truy vấn gộp, có cache snapshot)"""
+        return StatisticsService().get_book_statistics()
@@ -1,49 +1,148 @@
-from datetime import datetime, timedelta
-from config.database import db
+from collections import Counter, defaultdict, deque
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import logging
+import time
+
+from config.database import db, Transaction
+from config.settings import AppConfig
 
 from models.BorrowSlip import BorrowSlip
 from models.BorrowDetail import BorrowDetail
 from models.reader import Reader
 from models.book import Book
+from services.backup_chain import chunked
+from services.circulation_lookup_service import CirculationLookupService, StaleLookupError
+from services.inventory_service import InsufficientStockError, InventoryService
+from services.statistics_service import StatisticsService
+from services.rollup_service import BorrowRollupService
+from services.schema_indexes import warn_missing_indexes
+
+logger = logging.getLogger(__name__)
 
 
 class BorrowService:
     """Service xử lý mượn / trả sách"""
 
     BORROW_DAYS = 14
+    # Số phiếu mỗi câu lệnh khi trả hàng loạt (giới hạn độ dài danh sách IN)
+    RETURN_CHUNK = 1000
+
+    # Cột được phép sắp xếp danh sách phiếu (giá trị cố định, an toàn khi ghép vào SQL)
+    SORT_COLUMNS = ('borrow_date', 'return_due', 'slip_id')
+    # Cột sắp xếp có thể NULL: MySQL xếp NULL đầu tiên khi tăng dần, cuối cùng khi giảm dần
+    NULLABLE_SORT_COLUMNS = ('return_due',)
+    # Index cho lọc + sắp xếp danh sách phiếu: mỗi bộ lọc đi kèm cột sắp xếp mặc định
+    # (tạo bằng scripts/create_indexes.py, lúc chạy chỉ kiểm tra)
+    BORROW_INDEXES = {
+        'idx_slips_borrow_date': ('borrow_slips', 'borrow_date, slip_id'),
+        'idx_slips_return_due': ('borrow_slips', 'return_due, slip_id'),
+        'idx_slips_status_date': ('borrow_slips', 'status, borrow_date, slip_id'),
+        'idx_slips_reader_date': ('borrow_slips', 'reader_id, borrow_date, slip_id'),
+    }
+    _indexes_checked = False
+
+    # 1 dòng / phiếu cho danh sách; {source}: bảng phiếu hoặc trang phiếu đã lọc
+    BORROW_ROWS = """
+        SELECT
+            b.slip_id,
+            b.reader_id,
+            r.full_name,
+            GROUP_CONCAT(bk.title ORDER BY bd.book_id SEPARATOR ', ') AS book_name,
+            b.borrow_date,
+            b.return_due,
+            b.return_date,
+            b.status
+        FROM {source} b
+        JOIN readers r ON b.reader_id = r.reader_id
+        LEFT JOIN borrow_details bd ON b.slip_id = bd.slip_id
+        LEFT JOIN books bk ON bd.book_id = bk.book_id
+        {where}
+        GROUP BY b.slip_id, b.reader_id, r.full_name, b.borrow_date, b.return_due,
+                 b.return_date, b.status
+    """
+
+    def __init__(self):
+        self.inventory = InventoryService()
+        self.lookup = CirculationLookupService()
+        self.rollup = BorrowRollupService()
 
     # ==================================================
-    # Tạo phiếu mượn (theo tên bạn đọc & tên sách)
+    # Tạo phiếu mượn (mã thẻ / tên bạn đọc & barcode / ISBN / tên sách)
     # ==================================================
-    def create_borrow(self, reader_name: str, book_name: str):
-        # ---------- Lấy bạn đọc ----------
-        sql_reader = "SELECT * FROM readers WHERE full_name=%s"
-        reader_data = db.fetchone(sql_reader, (reader_name,))
-        if not reader_data:
-            return False, "Bạn đọc không tồn tại"
+    def create_borrow(self, reader_ref: Union[int, str], book_ref: Union[int, str]):
+        """
+        Tạo phiếu mượn 1 cuốn
 
-        reader = Reader.from_dict(reader_data)
-        can_borrow, reason = reader.can_borrow()
-        if not can_borrow:
+        Bạn đọc / sách được tra trước transaction qua CirculationLookupService (khóa có
+        index + LRU); transaction chỉ đọc theo khóa chính và so lại mã / tên với dòng
+        vừa đọc. Cache cũ (sửa ở máy khác) thì tra lại 1 lần.
+
+        Args:
+            reader_ref: Mã thẻ (reader_id) hoặc họ tên
+            book_ref: book_id (int), barcode / ISBN / mã sách, hoặc tên sách
+
+        Returns:
+            (success, message, slip_id)
+        """
+        for attempt in (1, 2):
+            try:
+                return self._create_borrow(reader_ref, book_ref)
+            except StaleLookupError as e:
+                if attempt == 2:
+                    return False, str(e), None
+                logger.warning(f"⚠️ {e} - tra lại mã")
+
+    def _create_borrow(self, reader_ref: Union[int, str], book_ref: Union[int, str]):
+        try:
+            reader_id, error = self.lookup.resolve_reader(reader_ref)
+            if error:
+                return False, error, None
+            book_id, error = self.lookup.resolve_book(book_ref)
+            if error:
+                return False, error, None
+
+            # Toàn bộ phiếu mượn (kể cả rollup) chạy trong 1 transaction (1 connection,
+            # 1 commit), chạy lại cả khối nếu MySQL báo deadlock / chờ khóa quá lâu
+            self.rollup.prepare()
+            success, result = self.inventory.run_transaction(
+                self._create_borrow_tx, reader_id, book_id, reader_ref, book_ref
+            )
+            if not success:
+                return False, result, None
+
+            slip_id = result
+            StatisticsService.invalidate_books()
+            return True, f"Tạo phiếu mượn #{slip_id} thành công", slip_id
+
+        except StaleLookupError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Lỗi tạo phiếu mượn: {e}")
+            return False, f"Lỗi database: {str(e)}", None
+
+    def _create_borrow_tx(self, tx: Transaction, reader_id: int, book_id: int,
+                          reader_ref: Union[int, str] = None, book_ref: Union[int, str] = None):
+        """Phần chạy trong transaction: (True, slip_id) hoặc (False, lý do)"""
+        # ---------- Lấy bạn đọc ----------
+        reader, reason = self._get_borrowing_reader(tx, reader_id, reader_ref)
+        if not reader:
             return False, reason
 
         # ---------- Lấy sách ----------
-        sql_book = "SELECT * FROM books WHERE title=%s"
-        book_data = db.fetchone(sql_book, (book_name,))
+        book_data = tx.fetchone(
+            "SELECT book_id, title, barcode, isbn FROM books WHERE book_id=%s", (book_id,)
+        )
         if not book_data:
-            return False, f"Sách '{book_name}' không tồn tại"
+            return False, "Sách không tồn tại"
+        if book_ref is not None:
+            self.lookup.check_book(book_ref, book_data)
 
         book = Book.from_dict(book_data)
 
-        # ---------- Kiểm tra tồn kho ----------
-        sql_inventory = """
-        SELECT available_quantity
-        FROM book_inventory
-        WHERE book_id=%s
-        """
-        inv_data = db.fetchone(sql_inventory, (book.book_id,))
-        if not inv_data or inv_data["available_quantity"] < 1:
-            return False, f"Sách '{book_name}' không đủ số lượng"
+        # ---------- Trừ tồn kho (kiểm tra + trừ trong 1 câu, trước mọi lệnh ghi khác) ----------
+        if not self.inventory.reserve(tx, book.book_id, 1):
+            return False, f"Sách '{book.title}' không đủ số lượng"
 
         # ---------- Tạo phiếu mượn ----------
         borrow_date = datetime.now().date()
@@ -55,7 +154,7 @@ class BorrowService:
             borrow_date=borrow_date,
             return_due=return_due
         )
-        slip_id = self._insert_borrow_slip(slip)
+        slip_id = self._insert_borrow_slip(tx, slip)
 
         # ---------- Tạo chi tiết mượn ----------
         detail = BorrowDetail(
@@ -63,21 +162,158 @@ class BorrowService:
             book_id=book.book_id,
             quantity=1
         )
-        self._insert_borrow_detail(detail)
+        self._insert_borrow_detail(tx, detail)
+        self.rollup.apply_changes(tx, None, [slip_id])
+        return True, slip_id
+
+    # ==================================================
+    # Tạo 1 phiếu mượn nhiều sách (quét mã vạch / nhập mã sách)
+    # ==================================================
+    def create_borrow_batch(self, reader_ref: Union[int, str], book_codes: Sequence[Union[int, str]]):
+        """
+        Tạo 1 phiếu mượn cho nhiều sách
+
+        Mã được tra trước transaction (LRU + 1 truy vấn theo index cho các mã chưa gặp).
+        Trong transaction số round trip cố định, không phụ thuộc số sách: 1 truy vấn bạn
+        đọc, 1 truy vấn sách + tồn kho, 1 UPDATE trừ kho, 1 INSERT phiếu, 1 executemany chi tiết.
+
+        Args:
+            reader_ref: Mã thẻ (reader_id) hoặc họ tên
+            book_codes: Barcode, ISBN hoặc mã sách (book_id); quét 1 mã 2 lần = mượn 2 bản
+
+        Returns:
+            (success, message, slip_id)
+        """
+        codes = [str(code).strip() for code in book_codes if str(code).strip()]
+        if not codes:
+            return False, "Chưa có sách nào để mượn", None
+
+        for attempt in (1, 2):
+            try:
+                return self._create_borrow_batch(reader_ref, codes)
+            except StaleLookupError as e:
+                if attempt == 2:
+                    return False, str(e), None
+                logger.warning(f"⚠️ {e} - tra lại mã")
+
+    def _create_borrow_batch(self, reader_ref: Union[int, str], codes: List[str]):
+        try:
+            reader_id, error = self.lookup.resolve_reader(reader_ref)
+            if error:
+                return False, error, None
+
+            book_ids = self.lookup.resolve_books(codes)
+            missing = sorted({code for code in codes if code not in book_ids})
+            if missing:
+                return False, f"Không tìm thấy sách có mã: {', '.join(missing)}", None
+
+            quantities: Dict[int, int] = Counter(book_ids[code] for code in codes)
+            self.rollup.prepare()
+            success, result = self.inventory.run_transaction(
+                self._create_borrow_batch_tx, reader_id, dict(sorted(quantities.items())),
+                reader_ref, {code: book_ids[code] for code in codes}
+            )
+            if not success:
+                return False, result, None
+
+            slip_id = result
+            StatisticsService.invalidate_books()
+            message = f"Tạo phiếu mượn #{slip_id} thành công: {len(codes)} cuốn ({len(quantities)} đầu sách)"
+            return True, message, slip_id
+
+        except InsufficientStockError as e:
+            return False, str(e), None
+        except StaleLookupError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Lỗi tạo phiếu mượn nhiều sách: {e}")
+            return False, f"Lỗi database: {str(e)}", None
+
+    def _create_borrow_batch_tx(self, tx: Transaction, reader_id: int, quantities: Dict[int, int],
+                                reader_ref: Union[int, str] = None, book_ids: Dict[str, int] = None):
+        # ---------- Lấy bạn đọc ----------
+        reader, reason = self._get_borrowing_reader(tx, reader_id, reader_ref)
+        if not reader:
+            return False, reason
+
+        # ---------- Lấy sách + tồn kho (1 truy vấn theo khóa chính cho mọi sách) ----------
+        placeholders = ', '.join(['%s'] * len(quantities))
+        rows = tx.fetchall(f"""
+        SELECT b.book_id, b.title, b.barcode, b.isbn,
+               COALESCE(bi.available_quantity, 0) AS available_quantity
+        FROM books b
+        LEFT JOIN book_inventory bi ON b.book_id = bi.book_id
+        WHERE b.book_id IN ({placeholders})
+        """, tuple(quantities))
+        by_id = {row['book_id']: row for row in rows}
+        if len(by_id) != len(quantities):
+            return False, "Có sách vừa bị xóa, vui lòng quét lại"
+        # Mã quét lấy từ cache phải còn khớp sách (barcode / ISBN có thể vừa đổi)
+        for code, book_id in (book_ids or {}).items():
+            self.lookup.check_book(code, by_id[book_id])
+
+        short = [
+            f"'{by_id[book_id]['title']}' (còn {by_id[book_id]['available_quantity']}, cần {qty})"
+            for book_id, qty in quantities.items()
+            if by_id[book_id]['available_quantity'] < qty
+        ]
+        if short:
+            return False, "Không đủ số lượng:\n" + "\n".join(short)
+
+        # ---------- Trừ tồn kho (1 câu UPDATE có điều kiện cho mọi sách) ----------
+        self.inventory.reserve_many(tx, quantities)
+
+        # ---------- Tạo phiếu + chi tiết ----------
+        borrow_date = datetime.now().date()
+        slip = BorrowSlip(
+            reader_id=reader.reader_id,
+            staff_id=1,  # demo
+            borrow_date=borrow_date,
+            return_due=borrow_date + timedelta(days=self.BORROW_DAYS)
+        )
+        slip_id = self._insert_borrow_slip(tx, slip)
+
+        details = [BorrowDetail(slip_id=slip_id, book_id=book_id, quantity=qty)
+                   for book_id, qty in quantities.items()]
+        self._insert_borrow_details(tx, details)
+        self.rollup.apply_changes(tx, None, [slip_id])
 
-        # ---------- Trừ tồn kho ----------
-        self._decrease_stock(book.book_id, 1)
+        return True, slip_id
+
+    def _get_borrowing_reader(self, tx: Transaction, reader_id: int, reader_ref: Union[int, str] = None):
+        """(Reader, None) nếu bạn đọc được mượn, ngược lại (None, lý do)"""
+        reader_data = tx.fetchone("SELECT * FROM readers WHERE reader_id=%s", (reader_id,))
+        if not reader_data:
+            return None, "Bạn đọc không tồn tại"
+        if reader_ref is not None:
+            self.lookup.check_reader(reader_ref, reader_data)
 
-        return True, "Tạo phiếu mượn thành công"
+        reader = Reader.from_dict(reader_data)
+        can_borrow, reason = reader.can_borrow()
+        if not can_borrow:
+            return None, reason
+        return reader, None
 
     # ==================================================
     # Cập nhật phiếu mượn
     # ==================================================
     def update_borrow(self, slip_id, borrow_date, return_date, status):
-        sql_check = "SELECT * FROM borrow_slips WHERE slip_id=%s"
-        if not db.fetchone(sql_check, (slip_id,)):
+        try:
+            self.rollup.prepare()
+            return self.inventory.run_transaction(
+                self._update_borrow_tx, slip_id, borrow_date, return_date, status
+            )
+        except Exception as e:
+            logger.error(f"❌ Lỗi cập nhật phiếu mượn: {e}")
+            return False, f"Lỗi database: {str(e)}"
+
+    def _update_borrow_tx(self, tx: Transaction, slip_id, borrow_date, return_date, status):
+        sql_check = "SELECT slip_id FROM borrow_slips WHERE slip_id=%s FOR UPDATE"
+        if not tx.fetchone(sql_check, (slip_id,)):
             return False, "Phiếu mượn không tồn tại"
 
+        # Ngày mượn có thể đổi sang tháng khác: rollup trừ ở tháng cũ, cộng ở tháng mới
+        before = self.rollup.capture(tx, [slip_id])
         sql_update = """
         UPDATE borrow_slips
         SET borrow_date=%s,
@@ -85,21 +321,29 @@ class BorrowService:
             status=%s
         WHERE slip_id=%s
         """
-        db.execute_query(
-            sql_update,
-            (borrow_date, return_date, status, slip_id),
-            commit=True
-        )
-
+        tx.execute(sql_update, (borrow_date, return_date, status, slip_id))
+        self.rollup.apply_changes(tx, before)
         return True, "Cập nhật phiếu mượn thành công"
 
     # ==================================================
     # Trả sách
     # ==================================================
     def return_books(self, slip_id):
+        try:
+            self.rollup.prepare()
+            success, message = self.inventory.run_transaction(self._return_books_tx, slip_id)
+            if success:
+                StatisticsService.invalidate_books()
+            return success, message
+
+        except Exception as e:
+            logger.error(f"❌ Lỗi trả sách: {e}")
+            return False, f"Lỗi database: {str(e)}"
+
+    def _return_books_tx(self, tx: Transaction, slip_id):
         # ---------- Lấy phiếu ----------
-        sql_slip = "SELECT * FROM borrow_slips WHERE slip_id=%s"
-        slip = db.fetchone(sql_slip, (slip_id,))
+        sql_slip = "SELECT * FROM borrow_slips WHERE slip_id=%s FOR UPDATE"
+        slip = tx.fetchone(sql_slip, (slip_id,))
         if not slip:
             return False, "Phiếu mượn không tồn tại"
 
@@ -108,79 +352,400 @@ class BorrowService:
 
         # ---------- Lấy chi tiết mượn ----------
         sql_details = "SELECT * FROM borrow_details WHERE slip_id=%s"
-        details = db.fetchall(sql_details, (slip_id,))
+        details = tx.fetchall(sql_details, (slip_id,))
         if not details:
             return False, "Không tìm thấy chi tiết mượn"
 
+        before = self.rollup.capture(tx, [slip_id])
+
         # ---------- Hoàn kho ----------
-        for d in details:
-            sql_inc = """
-            UPDATE book_inventory
-            SET available_quantity = available_quantity + %s
-            WHERE book_id = %s
-            """
-            db.execute_query(
-                sql_inc,
-                (d["quantity"], d["book_id"]),
-                commit=True
-            )
+        sql_inc = """
+        UPDATE book_inventory
+        SET available_quantity = available_quantity + %s
+        WHERE book_id = %s
+        """
+        tx.executemany(sql_inc, [(d["quantity"], d["book_id"]) for d in details])
 
-        # ---------- Cập nhật trạng thái ----------
+        # ---------- Phạt trễ hạn (cùng cách tính với trả hàng loạt) ----------
         today = datetime.now().date()
+        fee = self._late_fee_per_day(tx)
+        late = self._charge_late_fees(tx, [slip], today, fee)
+
+        # ---------- Cập nhật trạng thái ----------
         sql_update = """
         UPDATE borrow_slips
         SET status='RETURNED',
             return_date=%s
         WHERE slip_id=%s
         """
-        db.execute_query(sql_update, (today, slip_id), commit=True)
-
+        tx.execute(sql_update, (today, slip_id))
+        self.rollup.apply_changes(tx, before)
+        if late and fee > 0:
+            return True, "Trả sách thành công (trễ hạn, đã ghi phạt)"
         return True, "Trả sách thành công"
 
     # ==================================================
-    # Lấy danh sách tất cả phiếu mượn / trả
+    # Trả sách hàng loạt (thùng trả sách cuối kỳ)
     # ==================================================
-    def get_all_borrows(self):
-        sql = """
-        SELECT
-            b.slip_id,
-            r.full_name,
-            bk.title AS book_name,
-            b.borrow_date,
-            b.return_due,
-            b.return_date,
-            b.status
-        FROM borrow_slips b
-        JOIN readers r ON b.reader_id = r.reader_id
-        JOIN borrow_details bd ON b.slip_id = bd.slip_id
-        JOIN books bk ON bd.book_id = bk.book_id
-        ORDER BY b.borrow_date DESC
+    def return_books_bulk(self, slip_ids: Sequence = (), barcodes: Sequence[str] = ()) -> Tuple[bool, str, dict]:
+        """
+        Trả nhiều phiếu mượn trong 1 transaction bằng các câu lệnh theo tập
+
+        Mỗi lô RETURN_CHUNK phiếu chỉ tốn 4 câu lệnh: khóa phiếu, hoàn kho (1 UPDATE ... JOIN
+        gộp theo sách), ghi phạt trễ hạn (1 INSERT ... SELECT), đánh dấu RETURNED.
+
+        Args:
+            slip_ids: Mã phiếu mượn (mã không phải số được báo trong not_found)
+            barcodes: Barcode sách quét từ thùng trả; mỗi lần quét trả phiếu đang mượn
+                      cũ nhất có sách đó (cả phiếu)
+
+        Returns:
+            (success, message, summary) - summary: returned, late, skipped, not_found,
+            late_fee_per_day, seconds, per_second
+        """
+        start = time.perf_counter()
+        refs = [str(s).strip() for s in slip_ids if str(s).strip()]
+        ids = [int(ref) for ref in refs if ref.isdigit()]
+        invalid = [ref for ref in refs if not ref.isdigit()]
+        codes = [str(c).strip() for c in barcodes if str(c).strip()]
+        if not refs and not codes:
+            return False, "Chưa có phiếu / sách nào để trả", {}
+
+        try:
+            self.rollup.prepare()
+            summary = self.inventory.run_transaction(self._return_bulk_tx, ids, codes)
+        except Exception as e:
+            logger.error(f"❌ Lỗi trả sách hàng loạt: {e}")
+            return False, f"Lỗi database: {str(e)}", {}
+
+        summary['not_found'] = invalid + summary['not_found']
+        if summary['returned']:
+            StatisticsService.invalidate_books()
+
+        summary['seconds'] = time.perf_counter() - start
+        summary['per_second'] = summary['returned'] / summary['seconds'] if summary['seconds'] else 0
+        logger.info(f"✅ Trả hàng loạt {summary['returned']} phiếu trong {summary['seconds']:.2f}s "
+                    f"({summary['per_second']:.0f} phiếu/giây)")
+
+        message = (f"Đã trả {summary['returned']:,} phiếu ({summary['late']:,} trễ hạn) "
+                   f"trong {summary['seconds']:.2f}s - {summary['per_second']:,.0f} phiếu/giây")
+        if summary['skipped']:
+            message += f"\nBỏ qua {summary['skipped']:,} phiếu đã trả trước đó"
+        if summary['not_found']:
+            shown = ', '.join(map(str, summary['not_found'][:20]))
+            more = '...' if len(summary['not_found']) > 20 else ''
+            message += f"\nKhông tìm thấy ({len(summary['not_found']):,}): {shown}{more}"
+        return summary['returned'] > 0, message, summary
+
+    def _return_bulk_tx(self, tx: Transaction, ids: List[int], codes: List[str]) -> dict:
+        not_found = []
+        if codes:
+            slip_by_code, not_found = self._open_slips_for_barcodes(tx, codes)
+            ids = ids + slip_by_code
+
+        # ---------- Khóa phiếu ----------
+        requested = list(dict.fromkeys(ids))
+        slips = []
+        for chunk in chunked(requested, self.RETURN_CHUNK):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            slips += tx.fetchall(
+                f"SELECT slip_id, borrow_date, return_due, status FROM borrow_slips "
+                f"WHERE slip_id IN ({placeholders}) FOR UPDATE",
+                tuple(chunk)
+            )
+
+        found = {slip['slip_id'] for slip in slips}
+        not_found += [slip_id for slip_id in requested if slip_id not in found]
+        open_slips = [slip for slip in slips if slip['status'] != BorrowSlip.STATUS_RETURNED]
+
+        today = datetime.now().date()
+        fee = self._late_fee_per_day(tx)
+        late = 0
+
+        for chunk in chunked(open_slips, self.RETURN_CHUNK):
+            chunk_ids = tuple(slip['slip_id'] for slip in chunk)
+            placeholders = ', '.join(['%s'] * len(chunk_ids))
+            before = self.rollup.capture(tx, chunk_ids)
+
+            # ---------- Hoàn kho: 1 UPDATE gộp theo sách ----------
+            tx.execute(f"""
+            UPDATE book_inventory bi
+            JOIN (
+                SELECT book_id, SUM(quantity) AS qty
+                FROM borrow_details
+                WHERE slip_id IN ({placeholders})
+                GROUP BY book_id
+            ) r ON bi.book_id = r.book_id
+            SET bi.available_quantity = bi.available_quantity + r.qty
+            """, chunk_ids)
+
+            # ---------- Phạt trễ hạn ----------
+            late += self._charge_late_fees(tx, chunk, today, fee)
+
+            # ---------- Đánh dấu đã trả ----------
+            tx.execute(
+                f"UPDATE borrow_slips SET status=%s, return_date=%s WHERE slip_id IN ({placeholders})",
+                (BorrowSlip.STATUS_RETURNED, today) + chunk_ids
+            )
+            self.rollup.apply_changes(tx, before)
+
+        return {
+            'returned': len(open_slips),
+            'late': late,
+            'skipped': len(slips) - len(open_slips),
+            'not_found': not_found,
+            'late_fee_per_day': fee,
+        }
+
+    def _open_slips_for_barcodes(self, tx: Transaction, codes: List[str]):
+        """
+        Gán mỗi lần quét cho phiếu đang mượn cũ nhất còn bản sách đó chưa được quét
+
+        Trả cả phiếu nên quét tiếp các cuốn khác của 1 phiếu đã chọn không mở thêm phiếu mới.
+
+        Returns:
+            (danh sách slip_id theo thứ tự chọn, các mã không khớp phiếu nào)
+        """
+        candidates = defaultdict(deque)     # barcode -> deque[slip_id] theo ngày mượn
+        remaining = Counter()               # (slip_id, barcode) -> số bản chưa quét
+        for chunk in chunked(list(dict.fromkeys(codes)), self.RETURN_CHUNK):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            rows = tx.fetchall(f"""
+            SELECT bk.barcode, bs.slip_id, bd.quantity
+            FROM borrow_slips bs
+            JOIN borrow_details bd ON bd.slip_id = bs.slip_id
+            JOIN books bk ON bk.book_id = bd.book_id
+            WHERE bk.barcode IN ({placeholders}) AND bs.status <> %s
+            ORDER BY bs.borrow_date, bs.slip_id
+            """, tuple(chunk) + (BorrowSlip.STATUS_RETURNED,))
+            for row in rows:
+                key = (row['slip_id'], row['barcode'])
+                if key not in remaining:
+                    candidates[row['barcode']].append(row['slip_id'])
+                remaining[key] += row['quantity']
+
+        chosen = {}                         # slip_id -> None (giữ thứ tự chọn)
+        not_found = []
+        for code in codes:
+            queue = candidates.get(code)
+            if not queue:
+                not_found.append(code)
+                continue
+            slip_id = queue[0]
+            chosen[slip_id] = None
+            remaining[(slip_id, code)] -= 1
+            if remaining[(slip_id, code)] <= 0:
+                queue.popleft()
+        return list(chosen), not_found
+
+    @staticmethod
+    def _charge_late_fees(tx: Transaction, slips: Sequence[dict], today, fee: float) -> int:
+        """
+        Ghi phạt trễ hạn cho các phiếu đang trả: số ngày trễ x số bản x phí/ngày,
+        mỗi sách của phiếu trễ 1 dòng (1 INSERT ... SELECT cho cả lô)
+
+        Args:
+            slips: Phiếu đã khóa, cần slip_id và return_due
+
+        Returns:
+            int: Số phiếu trễ hạn (kể cả khi phí = 0 nên không ghi phạt)
+        """
+        late_ids = tuple(slip['slip_id'] for slip in slips
+                         if slip['return_due'] and slip['return_due'] < today)
+        if late_ids and fee > 0:
+            placeholders = ', '.join(['%s'] * len(late_ids))
+            tx.execute(f"""
+            INSERT INTO penalties (reader_id, slip_id, book_id, penalty_type, amount, created_at)
+            SELECT bs.reader_id, bs.slip_id, bd.book_id, 'LATE',
+                   DATEDIFF(%s, bs.return_due) * bd.quantity * %s, NOW()
+            FROM borrow_slips bs
+            JOIN borrow_details bd ON bd.slip_id = bs.slip_id
+            WHERE bs.slip_id IN ({placeholders})
+            """, (today, fee) + late_ids)
+        return len(late_ids)
+
+    @staticmethod
+    def _late_fee_per_day(tx: Transaction) -> float:
+        row = tx.fetchone("SELECT setting_value FROM system_settings WHERE setting_key=%s",
+                          ('LATE_FEE_PER_DAY',))
+        try:
+            return float(row['setting_value']) if row else 0.0
+        except (TypeError, ValueError):
+            return 0.0
+
+    # ==================================================
+    # Danh sách phiếu mượn / trả (lọc + sắp xếp trong SQL, phân trang keyset)
+    # ==================================================
+    def get_all_borrows(self, status: Union[str, Sequence[str], None] = None,
+                        date_from: Optional[date] = None, date_to: Optional[date] = None,
+                        reader_id: Optional[int] = None, sort_by: str = 'borrow_date',
+                        descending: bool = True, after: Optional[Tuple] = None,
+                        limit: int = AppConfig.ITEMS_PER_PAGE) -> List[dict]:
+        """
+        Lấy 1 trang phiếu mượn, mỗi phiếu 1 dòng (book_name = các tên sách nối bằng ", ")
+
+        Phân trang theo keyset trên (cột sắp xếp, slip_id): trang sau không phải bỏ qua
+        các dòng trước như OFFSET. Chỉ `limit` phiếu được join với bạn đọc / sách.
+
+        Args:
+            status: 1 trạng thái hoặc danh sách trạng thái (None = tất cả)
+            date_from / date_to: Khoảng ngày mượn (bao gồm 2 đầu)
+            reader_id: Chỉ phiếu của bạn đọc này
+            sort_by: 'borrow_date', 'return_due' hoặc 'slip_id'
+            descending: Giảm dần (mặc định, mới nhất trước)
+            after: Con trỏ của dòng cuối trang trước - page_cursor(row, sort_by)
+            limit: Số phiếu mỗi trang
+
+        Returns:
+            List[dict]: slip_id, reader_id, full_name, book_name, borrow_date, return_due,
+            return_date, status
+
+        Raises:
+            Exception: lỗi database (không trả [] để khỏi bị hiểu là trang cuối)
+        """
+        if sort_by not in self.SORT_COLUMNS:
+            raise ValueError(f"Không sắp xếp được theo '{sort_by}'")
+        self.check_indexes()
+
+        where, params = self._borrow_filters(status, date_from, date_to, reader_id)
+        direction = 'DESC' if descending else 'ASC'
+        keys = [sort_by, 'slip_id'] if sort_by != 'slip_id' else ['slip_id']
+
+        if after is not None:
+            condition, values = self._keyset_condition(sort_by, descending, after)
+            where.append(condition)
+            params += values
+
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        # Lọc + sắp xếp + LIMIT trên riêng borrow_slips (dùng index), rồi mới join
+        page = f"""(
+            SELECT slip_id, reader_id, borrow_date, return_due, return_date, status
+            FROM borrow_slips
+            {where_sql}
+            ORDER BY {', '.join(f'{k} {direction}' for k in keys)}
+            LIMIT %s
+        )"""
+        sql = self.BORROW_ROWS.format(source=page, where="") + \
+            f" ORDER BY {', '.join(f'b.{k} {direction}' for k in keys)}"
+        # Lỗi được ném ra: danh sách rỗng sẽ bị hiểu là đã hết trang
+        return db.fetchall(sql, tuple(params) + (limit,), raise_errors=True)
+
+    def count_borrows(self, status: Union[str, Sequence[str], None] = None,
+                      date_from: Optional[date] = None, date_to: Optional[date] = None,
+                      reader_id: Optional[int] = None) -> int:
+        """Đếm số phiếu khớp bộ lọc (cùng điều kiện với get_all_borrows)"""
+        where, params = self._borrow_filters(status, date_from, date_to, reader_id)
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+        row = db.fetchone(f"SELECT COUNT(*) AS count FROM borrow_slips{where_sql}", tuple(params))
+        return row['count'] if row else 0
+
+    def get_borrow(self, slip_id: int) -> Optional[dict]:
+        """1 phiếu (cùng cột với get_all_borrows) - để làm mới đúng dòng vừa đổi"""
+        sql = self.BORROW_ROWS.format(source="borrow_slips", where="WHERE b.slip_id = %s")
+        return db.fetchone(sql, (slip_id,))
+
+    @staticmethod
+    def matches_filters(row: dict, status: Union[str, Sequence[str], None] = None,
+                        date_from: Optional[date] = None, date_to: Optional[date] = None,
+                        reader_id: Optional[int] = None) -> bool:
+        """1 phiếu (dòng của get_borrow) có khớp bộ lọc không (cùng điều kiện với _borrow_filters)"""
+        if status:
+            statuses = [status] if isinstance(status, str) else list(status)
+            if row['status'] not in statuses:
+                return False
+        if reader_id is not None and row['reader_id'] != reader_id:
+            return False
+        if date_from and row['borrow_date'] < date_from:
+            return False
+        if date_to and row['borrow_date'] > date_to:
+            return False
+        return True
+
+    @classmethod
+    def _keyset_condition(cls, sort_by: str, descending: bool, after: Tuple) -> Tuple[str, list]:
+        """
+        Điều kiện "sau con trỏ" theo đúng thứ tự ORDER BY (cột, slip_id) của MySQL
+
+        So sánh trực tiếp trên cột (không COALESCE) để index (cột, slip_id) vẫn dùng được
+        cho sắp xếp; dòng NULL được xử lý riêng theo vị trí MySQL xếp chúng.
         """
-        return db.execute_query(sql, fetch=True)
+        op = '<' if descending else '>'
+        if sort_by == 'slip_id':
+            return f"slip_id {op} %s", [after[-1]]
+
+        value, slip_id = after
+        if sort_by not in cls.NULLABLE_SORT_COLUMNS:
+            return f"({sort_by} {op} %s OR ({sort_by} = %s AND slip_id {op} %s))", [value, value, slip_id]
+
+        if value is None:
+            if descending:
+                # NULL nằm cuối: chỉ còn các dòng NULL phía sau
+                return f"({sort_by} IS NULL AND slip_id < %s)", [slip_id]
+            # NULL nằm đầu: các dòng NULL phía sau rồi mọi dòng có giá trị
+            return f"(({sort_by} IS NULL AND slip_id > %s) OR {sort_by} IS NOT NULL)", [slip_id]
+
+        condition = f"{sort_by} {op} %s OR ({sort_by} = %s AND slip_id {op} %s)"
+        if descending:
+            condition += f" OR {sort_by} IS NULL"
+        return f"({condition})", [value, value, slip_id]
+
+    @staticmethod
+    def page_cursor(row: dict, sort_by: str = 'borrow_date') -> Tuple:
+        """Con trỏ keyset của 1 dòng (truyền vào after= để lấy trang kế tiếp)"""
+        return (row['slip_id'],) if sort_by == 'slip_id' else (row[sort_by], row['slip_id'])
+
+    @staticmethod
+    def _borrow_filters(status, date_from, date_to, reader_id) -> Tuple[List[str], list]:
+        where, params = [], []
+        if status:
+            statuses = [status] if isinstance(status, str) else list(status)
+            where.append(f"status IN ({', '.join(['%s'] * len(statuses))})")
+            params += statuses
+        if reader_id is not None:
+            where.append("reader_id = %s")
+            params.append(reader_id)
+        if date_from:
+            where.append("borrow_date >= %s")
+            params.append(date_from)
+        if date_to:
+            where.append("borrow_date <= %s")
+            params.append(date_to)
+        return where, params
+
+    def check_indexes(self):
+        """
+        Cảnh báo (1 lần) nếu thiếu index của danh sách phiếu
+
+        Không tạo index ở đây: CREATE INDEX trên bảng phiếu lớn khóa bảng rất lâu trên
+        thread giao diện và cần quyền ALTER - chạy scripts/create_indexes.py.
+        """
+        if not BorrowService._indexes_checked:
+            BorrowService._indexes_checked = warn_missing_indexes(self.BORROW_INDEXES,
+                                                                  "danh sách phiếu mượn")
 
     # ==================================================
     # INTERNAL METHODS
     # ==================================================
-    def _insert_borrow_slip(self, slip: BorrowSlip):
+    def _insert_borrow_slip(self, tx: Transaction, slip: BorrowSlip):
         sql = """
         INSERT INTO borrow_slips
         (reader_id, staff_id, borrow_date, return_due, status)
         VALUES (%s, %s, %s, %s, %s)
         """
-        return db.execute_query(sql, slip.to_tuple(), commit=True)
+        return tx.execute_insert(sql, slip.to_tuple())
 
-    def _insert_borrow_detail(self, detail: BorrowDetail):
+    def _insert_borrow_detail(self, tx: Transaction, detail: BorrowDetail):
         sql = """
         INSERT INTO borrow_details
         (slip_id, book_id, quantity, fine_amount)
         VALUES (%s, %s, %s, %s)
         """
-        db.execute_query(sql, detail.to_tuple(), commit=True)
+        tx.execute(sql, detail.to_tuple())
 
-    def _decrease_stock(self, book_id, quantity):
+    def _insert_borrow_details(self, tx: Transaction, details: List[BorrowDetail]):
         sql = """
-        UPDATE book_inventory
-        SET available_quantity = available_quantity - %s
-        WHERE book_id=%s
+        INSERT INTO borrow_details
+        (slip_id, book_id, quantity, fine_amount)
+        VALUES (%s, %s, %s, %s)
         """
-        db.execute_query(sql, (quantity, book_id), commit=True)
+        tx.executemany(sql, [d.to_tuple() for d in details])
@@ -0,0 +1,332 @@
+"""
+Circulation Lookup Service - Tra bạn đọc / sách ở quầy mượn trả theo khóa có chỉ mục
+
+Trước đây phiếu mượn tìm bạn đọc bằng full_name=%s và sách bằng title=%s (SELECT *):
+cột không có index, không duy nhất - trùng tên thì lấy đại 1 dòng.
+
+Giờ:
+- Mã thẻ bạn đọc = reader_id (khóa chính), không cần tra thêm.
+- Barcode / ISBN / mã sách -> book_id: 1 truy vấn theo cột có index (books.barcode,
+  books.isbn, khóa chính) cho cả lô mã, kết quả giữ trong LRU trong bộ nhớ nên quét lại
+  1 mã quen không tốn truy vấn nào. Mã không tìm thấy không được cache.
+- Tên bạn đọc / tên sách: ứng viên từ chỉ mục tiền tố trong bộ nhớ (SearchIndex của
+  ReaderService / BookService) cộng với tra đúng tên trên cột có index, rồi so khớp
+  nguyên tên; trùng tên thì báo để chọn theo mã.
+- Index của các cột tra cứu (LOOKUP_INDEXES) tạo bằng scripts/create_indexes.py; lúc chạy
+  chỉ kiểm tra và cảnh báo nếu thiếu.
+- Gợi ý khi gõ (type-ahead): chỉ mục tiền tố + 1 truy vấn khóa chính lấy tên hiển thị.
+
+Cache có TTL (LOOKUP_CACHE_TTL). BookService / ReaderService gọi invalidate_books() /
+invalidate_readers() khi sửa hoặc xóa; thay đổi từ máy khác được chặn ở transaction
+mượn: check_book() / check_reader() so lại mã / tên với dòng vừa đọc, lệch thì bỏ
+khỏi cache và ném StaleLookupError để tra lại.
+
+Ví dụ:
+    lookup = CirculationLookupService()
+    book_ids = lookup.resolve_books(['8935235226272', 'BC-0012'])
+    reader_id, error = lookup.resolve_reader('Nguyễn Văn A')
+"""
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import logging
+
+from config.database import db
+from config.settings import AppConfig
+from services.search_index import fold_text
+from services.schema_indexes import warn_missing_indexes
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Mã đã quét (barcode / ISBN / mã sách) -> book_id
+_book_codes = TTLCache(ttl=AppConfig.LOOKUP_CACHE_TTL, max_size=AppConfig.LOOKUP_CACHE_SIZE)
+# Tên (đã chuẩn hóa) -> id, cho bạn đọc và sách nhập bằng tên
+_reader_names = TTLCache(ttl=AppConfig.LOOKUP_CACHE_TTL, max_size=AppConfig.LOOKUP_CACHE_SIZE)
+_book_titles = TTLCache(ttl=AppConfig.LOOKUP_CACHE_TTL, max_size=AppConfig.LOOKUP_CACHE_SIZE)
+
+_SPACES = re.compile(r'\s+')
+
+
+def _name_key(name: str) -> str:
+    """Khóa so khớp tên: bỏ dấu, chữ thường, gộp khoảng trắng"""
+    return _SPACES.sub(' ', fold_text(name)).strip()
+
+
+def _reader_index():
+    # Import trong hàm: reader_service / book_service import module này để xóa cache
+    from services.reader_service import ReaderService, reader_search_index
+    return reader_search_index, ReaderService()._iter_index_documents
+
+
+def _book_index():
+    from services.book_service import BookService, book_search_index
+    return book_search_index, BookService()._iter_index_documents
+
+
+class StaleLookupError(Exception):
+    """Mã / tên lấy từ cache không còn khớp với dòng trong CSDL (đã sửa ở máy khác)"""
+    pass
+
+
+class CirculationLookupService:
+    """Tra mã thẻ / barcode / ISBN / tên ở quầy mượn trả"""
+
+    # Số ứng viên lấy từ chỉ mục tên để so khớp nguyên tên
+    NAME_CANDIDATES = 50
+    # Index cần cho tra mã sách / đúng tên: tên index -> (bảng, cột)
+    # (tạo bằng scripts/create_indexes.py, lúc chạy chỉ kiểm tra)
+    LOOKUP_INDEXES = {
+        'idx_books_barcode': ('books', 'barcode'),
+        'idx_books_isbn': ('books', 'isbn'),
+        'idx_books_title': ('books', 'title'),
+        'idx_readers_full_name': ('readers', 'full_name'),
+    }
+
+    _indexes_checked = False
+    _lock = threading.Lock()
+
+    # ========== SCHEMA ==========
+
+    def check_indexes(self):
+        """
+        Cảnh báo (1 lần) nếu cột tra cứu chưa đứng đầu 1 index (LOOKUP_INDEXES)
+
+        Không tạo index ở đây: CREATE INDEX sẽ chặn lượt quét đầu tiên ở quầy và cần
+        quyền ALTER - chạy scripts/create_indexes.py.
+        """
+        if CirculationLookupService._indexes_checked:
+            return
+
+        with CirculationLookupService._lock:
+            if not CirculationLookupService._indexes_checked:
+                CirculationLookupService._indexes_checked = warn_missing_indexes(
+                    self.LOOKUP_INDEXES, "tra cứu ở quầy mượn trả"
+                )
+
+    # ========== BẠN ĐỌC ==========
+
+    def resolve_reader(self, ref: Union[int, str]) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Mã thẻ (reader_id) hoặc họ tên -> reader_id
+
+        Returns:
+            (reader_id, None) hoặc (None, lý do)
+        """
+        if isinstance(ref, int):
+            return ref, None
+        ref = str(ref).strip()
+        if not ref:
+            return None, "Vui lòng nhập mã thẻ hoặc tên bạn đọc"
+        if ref.isdigit():
+            return int(ref), None
+
+        reader_id, matches = self._resolve_name(ref, _reader_names, _reader_index, 'name',
+                                                'readers', 'reader_id', 'full_name')
+        if not matches:
+            return None, f"Bạn đọc '{ref}' không tồn tại"
+        if matches > 1:
+            return None, f"Có {matches} bạn đọc tên '{ref}', vui lòng nhập mã thẻ"
+        return reader_id, None
+
+    def suggest_readers(self, text: str, limit: int = 10) -> List[dict]:
+        """Gợi ý bạn đọc khi gõ tên: [{'reader_id', 'full_name'}]"""
+        return self._suggest(text, limit, _reader_index, 'name',
+                             'readers', 'reader_id', ('full_name',))
+
+    # ========== SÁCH ==========
+
+    def resolve_books(self, codes: Iterable[str]) -> Dict[str, int]:
+        """
+        {mã: book_id} cho các mã tìm thấy - ưu tiên barcode, rồi ISBN, rồi mã sách
+
+        Mã đã có trong LRU không tốn truy vấn; các mã còn lại tra bằng 1 truy vấn.
+        """
+        result = {}
+        misses = []
+        for code in dict.fromkeys(str(c).strip() for c in codes):
+            if not code:
+                continue
+            book_id = _book_codes.get(code)
+            if book_id is None:
+                misses.append(code)
+            else:
+                result[code] = book_id
+
+        if misses:
+            self.check_indexes()
+            ids = [int(code) for code in misses if code.isdigit()]
+            placeholders = ', '.join(['%s'] * len(misses))
+            where = f"barcode IN ({placeholders}) OR isbn IN ({placeholders})"
+            params = misses + misses
+            if ids:
+                where += f" OR book_id IN ({', '.join(['%s'] * len(ids))})"
+                params += ids
+
+            rows = db.fetchall(f"SELECT book_id, barcode, isbn FROM books WHERE {where}",
+                               tuple(params)) or []
+            by_barcode = {row['barcode']: row['book_id'] for row in rows if row['barcode']}
+            by_isbn = {row['isbn']: row['book_id'] for row in rows if row['isbn']}
+            by_id = {str(row['book_id']): row['book_id'] for row in rows}
+
+            for code in misses:
+                book_id = by_barcode.get(code) or by_isbn.get(code) or by_id.get(code)
+                if book_id is not None:
+                    _book_codes.set(code, book_id)
+                    result[code] = book_id
+
+        return result
+
+    def resolve_book(self, ref: Union[int, str]) -> Tuple[Optional[int], Optional[str]]:
+        """
+        book_id (int), barcode / ISBN / mã sách, hoặc tên sách -> book_id
+
+        Returns:
+            (book_id, None) hoặc (None, lý do)
+        """
+        if isinstance(ref, int):
+            return ref, None
+        ref = str(ref).strip()
+        if not ref:
+            return None, "Vui lòng nhập mã hoặc tên sách"
+
+        # Barcode / ISBN không có khoảng trắng: tên sách nhiều từ đi thẳng tới chỉ mục tên
+        if not _SPACES.search(ref):
+            book_id = self.resolve_books([ref]).get(ref)
+            if book_id is not None:
+                return book_id, None
+
+        book_id, matches = self._resolve_name(ref, _book_titles, _book_index, 'title',
+                                              'books', 'book_id', 'title')
+        if not matches:
+            return None, f"Sách '{ref}' không tồn tại"
+        if matches > 1:
+            return None, f"Có {matches} đầu sách tên '{ref}', vui lòng quét barcode / nhập mã sách"
+        return book_id, None
+
+    def suggest_books(self, text: str, limit: int = 10) -> List[dict]:
+        """Gợi ý sách khi gõ tên: [{'book_id', 'title', 'barcode'}]"""
+        return self._suggest(text, limit, _book_index, 'title',
+                             'books', 'book_id', ('title', 'barcode'))
+
+    # ========== KIỂM TRA TRONG TRANSACTION ==========
+
+    @staticmethod
+    def check_reader(ref: Union[int, str], row: dict):
+        """
+        Bạn đọc tra theo tên: tên trong dòng vừa đọc (trong transaction) phải còn khớp
+
+        Raises:
+            StaleLookupError: bạn đọc đã đổi tên (cache cũ), đã bỏ khỏi cache
+        """
+        if isinstance(ref, int) or str(ref).strip().isdigit():
+            return
+        key = _name_key(ref)
+        if _name_key(row.get('full_name')) != key:
+            _reader_names.invalidate(key)
+            raise StaleLookupError(f"Bạn đọc '{ref}' vừa được sửa, vui lòng nhập lại")
+
+    @staticmethod
+    def check_book(ref: Union[int, str], row: dict):
+        """
+        Mã / tên sách dùng để tra phải còn khớp dòng sách vừa đọc (cần book_id, title,
+        barcode, isbn)
+
+        Raises:
+            StaleLookupError: barcode / ISBN / tên đã đổi (cache cũ), đã bỏ khỏi cache
+        """
+        if isinstance(ref, int):
+            return
+        ref = str(ref).strip()
+        if ref in (row.get('barcode'), row.get('isbn'), str(row['book_id'])):
+            return
+        key = _name_key(ref)
+        if _name_key(row.get('title')) == key:
+            return
+        _book_codes.invalidate(ref)
+        _book_titles.invalidate(key)
+        raise StaleLookupError(f"Mã sách '{ref}' vừa thay đổi, vui lòng quét lại")
+
+    # ========== CACHE ==========
+
+    @staticmethod
+    def invalidate_books():
+        """Xóa cache mã / tên sách (gọi khi sửa hoặc xóa sách)"""
+        _book_codes.invalidate()
+        _book_titles.invalidate()
+
+    @staticmethod
+    def invalidate_readers():
+        """Xóa cache tên bạn đọc (gọi khi sửa hoặc xóa bạn đọc)"""
+        _reader_names.invalidate()
+
+    @staticmethod
+    def cache_stats() -> dict:
+        """Thống kê hit/miss của các LRU"""
+        return {
+            'book_codes': _book_codes.stats(),
+            'book_titles': _book_titles.stats(),
+            'reader_names': _reader_names.stats(),
+        }
+
+    # ========== INTERNAL ==========
+
+    def _resolve_name(self, name: str, cache: TTLCache, index_source, field: str,
+                      table: str, id_column: str, name_column: str) -> Tuple[Optional[int], int]:
+        """
+        Tên -> id: ứng viên từ chỉ mục tiền tố + tra đúng tên, rồi so khớp nguyên tên
+
+        Chỉ mục chỉ trả NAME_CANDIDATES ứng viên xếp hạng cao nhất - tên phổ biến
+        ("Nguyễn Văn A") có thể bị đẩy ra ngoài - nên luôn tra thêm `cột tên = %s`
+        (có index, xem LOOKUP_INDEXES). Chỉ mục bù các cách gõ khác (không dấu...).
+
+        Returns:
+            (id, 1) nếu khớp đúng 1 dòng, ngược lại (None, số dòng khớp)
+        """
+        key = _name_key(name)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, 1
+
+        self.check_indexes()
+        select = f"SELECT {id_column} AS id, {name_column} AS name FROM {table}"
+        queries, params = [f"{select} WHERE {name_column} = %s"], [name]
+        index, loader = index_source()
+        if index.ready(loader):
+            candidate_ids = index.search(name, [field], limit=self.NAME_CANDIDATES)
+            if candidate_ids:
+                placeholders = ', '.join(['%s'] * len(candidate_ids))
+                queries.append(f"{select} WHERE {id_column} IN ({placeholders})")
+                params += candidate_ids
+        # Chỉ mục đang được xây lần đầu: chỉ tra đúng tên
+        rows = db.fetchall(" UNION ".join(queries), tuple(params)) or []
+
+        matches = list(dict.fromkeys(row['id'] for row in rows if _name_key(row['name']) == key))
+        if len(matches) != 1:
+            return None, len(matches)
+
+        cache.set(key, matches[0])
+        return matches[0], 1
+
+    def _suggest(self, text: str, limit: int, index_source, field: str,
+                 table: str, id_column: str, columns: Tuple[str, ...]) -> List[dict]:
+        """Các dòng khớp tiền tố, theo thứ tự xếp hạng của chỉ mục"""
+        text = (text or '').strip()
+        if len(text) < 2:
+            return []
+
+        index, loader = index_source()
+        if not index.ready(loader):
+            # Gợi ý là tiện ích: chưa có chỉ mục thì chờ lần gõ sau
+            return []
+
+        ids = index.search(text, [field], limit=limit)
+        if not ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(ids))
+        rows = db.fetchall(
+            f"SELECT {id_column}, {', '.join(columns)} FROM {table} WHERE {id_column} IN ({placeholders})",
+            tuple(ids)
+        ) or []
+        by_id = {row[id_column]: row for row in rows}
+        return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
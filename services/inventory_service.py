@@ -0,0 +1,145 @@
+"""
+Inventory Service - Giữ chỗ tồn kho khi mượn sách, không oversell khi nhiều quầy cùng mượn
+
+Trước đây phiếu mượn đọc available_quantity, kiểm tra < 1 rồi trừ kho vô điều kiện:
+2 quầy cùng cho mượn cuốn cuối đều qua được bước kiểm tra và tồn kho bị âm.
+
+Giờ việc kiểm tra và trừ kho là 1 câu UPDATE có điều kiện:
+
+    UPDATE book_inventory
+    SET available_quantity = available_quantity - n
+    WHERE book_id = ? AND available_quantity >= n
+
+InnoDB khóa dòng khi UPDATE nên 2 giao dịch không thể cùng trừ 1 bản cuối; số dòng bị
+ảnh hưởng = 0 nghĩa là không đủ hàng (không cần SELECT ... FOR UPDATE trước). Toàn bộ
+phiếu mượn chạy trong 1 transaction; nếu MySQL hủy giao dịch vì deadlock / chờ khóa quá
+lâu thì run_transaction chạy lại cả khối (optimistic retry).
+
+Ví dụ:
+    inventory = InventoryService()
+    def work(tx):
+        if not inventory.reserve(tx, book_id):
+            return False, "Hết sách"
+        ...
+        return True, "OK"
+    success, message = inventory.run_transaction(work)
+"""
+import random
+import time
+from typing import Callable, Dict, Optional, TypeVar
+import logging
+
+from mysql.connector import Error, errorcode
+
+from config.database import db, Transaction
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class InsufficientStockError(Exception):
+    """
+    Không trừ được đủ kho cho mọi đầu sách trong 1 lần giữ chỗ nhiều sách
+
+    Raise (thay vì trả False) để transaction rollback các dòng đã trừ.
+    """
+
+
+class InventoryService:
+    """
+    Trừ / hoàn tồn kho có điều kiện trong transaction của người gọi
+
+    Args:
+        table: Bảng tồn kho (đổi được để chạy script stress trên bảng tạm)
+        transaction_factory: Hàm mở transaction (mặc định db.transaction); script stress
+            truyền transaction SQLite cùng API (execute trả số dòng bị ảnh hưởng)
+    """
+
+    # Lỗi MySQL mà chạy lại cả transaction là an toàn
+    RETRYABLE_ERRORS = (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT)
+    MAX_ATTEMPTS = 5
+    # Thời gian chờ (giây) trước lần thử thứ n = BACKOFF * n (+ ngẫu nhiên để tách các quầy)
+    BACKOFF = 0.02
+
+    def __init__(self, table: str = 'book_inventory',
+                 transaction_factory: Optional[Callable] = None):
+        # Tên bảng cố định do code truyền vào, an toàn khi ghép vào SQL
+        self.table = table
+        self.transaction_factory = transaction_factory or db.transaction
+
+    # ========== TRANSACTION ==========
+
+    def run_transaction(self, work: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Chạy work(tx, *args, **kwargs) trong 1 transaction, thử lại khi deadlock / lock timeout
+
+        work có thể chạy nhiều lần nên không được có tác dụng phụ ngoài transaction.
+        """
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                with self.transaction_factory() as tx:
+                    return work(tx, *args, **kwargs)
+            except Error as e:
+                if e.errno not in self.RETRYABLE_ERRORS or attempt == self.MAX_ATTEMPTS:
+                    raise
+                delay = self.BACKOFF * attempt * (1 + random.random())
+                logger.warning(f"⚠️ Xung đột khóa tồn kho ({e.errno}), thử lại lần {attempt + 1} "
+                               f"sau {delay * 1000:.0f}ms")
+                time.sleep(delay)
+
+    # ========== GIỮ CHỖ / HOÀN KHO ==========
+
+    def reserve(self, tx: Transaction, book_id: int, quantity: int = 1) -> bool:
+        """
+        Trừ kho nếu còn đủ (kiểm tra + trừ trong 1 câu lệnh)
+
+        Returns:
+            bool: False nếu không đủ hàng (không có dòng nào bị trừ)
+        """
+        if quantity < 1:
+            raise ValueError("Số lượng mượn phải >= 1")
+
+        sql = f"""
+        UPDATE {self.table}
+        SET available_quantity = available_quantity - %s
+        WHERE book_id = %s AND available_quantity >= %s
+        """
+        return tx.execute(sql, (quantity, book_id, quantity)) == 1
+
+    def reserve_many(self, tx: Transaction, quantities: Dict[int, int]):
+        """
+        Trừ kho nhiều đầu sách bằng 1 câu UPDATE ... JOIN (tất cả hoặc không)
+
+        Args:
+            quantities: {book_id: số lượng}
+
+        Raises:
+            InsufficientStockError: Có đầu sách không đủ hàng (cả transaction phải rollback)
+        """
+        if not quantities:
+            return
+        if any(q < 1 for q in quantities.values()):
+            raise ValueError("Số lượng mượn phải >= 1")
+
+        requested = " UNION ALL ".join(["SELECT %s AS book_id, %s AS qty"] * len(quantities))
+        sql = f"""
+        UPDATE {self.table} bi
+        JOIN ({requested}) req ON bi.book_id = req.book_id
+        SET bi.available_quantity = bi.available_quantity - req.qty
+        WHERE bi.available_quantity >= req.qty
+        """
+        params = tuple(v for item in quantities.items() for v in item)
+        if tx.execute(sql, params) != len(quantities):
+            # Có quầy khác vừa mượn mất (kiểm tra tồn kho trước đó đã qua)
+            raise InsufficientStockError("Tồn kho vừa thay đổi, không đủ sách để mượn")
+
+    def release(self, tx: Transaction, book_id: int, quantity: int = 1) -> int:
+        """Hoàn kho (trả sách / hủy phiếu), trả về số dòng được cập nhật"""
+        sql = f"""
+        UPDATE {self.table}
+        SET available_quantity = available_quantity + %s
+        WHERE book_id = %s
+        """
+        return tx.execute(sql, (quantity, book_id))
+
@@ -1,4 +1,10 @@
+import logging
+
 from config.database import db
+from services.rollup_service import BorrowRollupService
+
+logger = logging.getLogger(__name__)
+
 
 class PenaltyService:
     def get_all_penalties(self):
@@ -17,22 +23,64 @@ class PenaltyService:
         return db.fetchall(query)
 
     def create_penalty(self, reader_id, slip_id, book_id, penalty_type, amount):
-        query = """
-            INSERT INTO penalties (reader_id, slip_id, book_id, penalty_type, amount, created_at)
-            VALUES (%s, %s, %s, %s, %s, NOW())
         """
+        Tạo phiếu phạt; slip_id = None / rỗng cho phạt không gắn phiếu mượn (không vào rollup)
+
+        Returns:
+            bool: False nếu phiếu mượn không tồn tại hoặc lỗi CSDL (có ghi log lý do)
+        """
+        if isinstance(slip_id, str):
+            # Ô "Phiếu mượn" để trống trên form
+            slip_id = slip_id.strip() or None
         try:
-            db.execute(query, (reader_id, slip_id, book_id, penalty_type, amount))
+            rollup = BorrowRollupService()
+            if slip_id is not None:
+                rollup.prepare()
+            with db.transaction() as tx:
+                before = None
+                if slip_id is not None:
+                    # Khóa phiếu mượn: rollup đọc trước / sau trên cùng trạng thái của phiếu
+                    if not tx.fetchone("SELECT slip_id FROM borrow_slips WHERE slip_id = %s FOR UPDATE",
+                                       (slip_id,)):
+                        logger.warning(f"⚠️ Không tạo phiếu phạt: phiếu mượn #{slip_id} không tồn tại")
+                        return False
+                    before = rollup.capture(tx, [slip_id])
+                tx.execute("""
+                    INSERT INTO penalties (reader_id, slip_id, book_id, penalty_type, amount, created_at)
+                    VALUES (%s, %s, %s, %s, %s, NOW())
+                """, (reader_id, slip_id, book_id, penalty_type, amount))
+                if slip_id is not None:
+                    # Tiền phạt được cộng vào doanh thu của tháng mượn
+                    rollup.apply_changes(tx, before)
+            if slip_id is not None:
+                logger.info(f"✅ Đã tạo phiếu phạt cho phiếu mượn #{slip_id}")
+            else:
+                logger.info(f"✅ Đã tạo phiếu phạt cho bạn đọc #{reader_id}")
             return True
         except Exception as e:
-            print(f"Error creating penalty: {e}")
+            logger.error(f"❌ Lỗi tạo phiếu phạt: {e}")
             return False
 
     def delete_penalty(self, penalty_id):
-        query = "DELETE FROM penalties WHERE id = %s"
         try:
-            db.execute(query, (penalty_id,))
+            rollup = BorrowRollupService()
+            rollup.prepare()
+            with db.transaction() as tx:
+                penalty = tx.fetchone("SELECT slip_id FROM penalties WHERE penalty_id = %s", (penalty_id,))
+                if not penalty:
+                    logger.warning(f"⚠️ Không xóa được: phiếu phạt ID {penalty_id} không tồn tại")
+                    return False
+                slip_id = penalty['slip_id']
+                before = None
+                if slip_id is not None:
+                    tx.fetchone("SELECT slip_id FROM borrow_slips WHERE slip_id = %s FOR UPDATE", (slip_id,))
+                    before = rollup.capture(tx, [slip_id])
+                if not tx.execute("DELETE FROM penalties WHERE penalty_id = %s", (penalty_id,)):
+                    return False
+                if slip_id is not None:
+                    rollup.apply_changes(tx, before)
+            logger.info(f"✅ Đã xóa phiếu phạt ID: {penalty_id}")
             return True
         except Exception as e:
-            print(f"Error deleting penalty: {e}")
+            logger.error(f"❌ Lỗi xóa phiếu phạt: {e}")
             return False
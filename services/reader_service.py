@@ -1,13 +1,25 @@
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
 
 from config.database import db
+from config.settings import AppConfig
 from models.reader import Reader
+from services.circulation_lookup_service import CirculationLookupService
+from services.search_index import SearchIndex
+from services.statistics_service import StatisticsService
 from utils.validators import Validator
 
 logger = logging.getLogger(__name__)
 
+# Chỉ mục tìm kiếm dùng chung cho mọi ReaderService (trường: (kiểu, trọng số))
+reader_search_index = SearchIndex({
+    'name': ('prefix', 3.0),
+    'phone': ('substring', 2.0),
+    'email': ('prefix', 1.5),
+    'address': ('prefix', 1.0),
+}, name='readers', max_age=AppConfig.SEARCH_INDEX_MAX_AGE)
+
 
 class ReaderService:
     """Service layer xử lý business logic cho Reader"""
@@ -90,6 +102,9 @@ class ReaderService:
             reader_id = db.execute_query(query, params, commit=True)
 
             if reader_id:
+                self._index_reader(reader_id, reader)
+                CirculationLookupService.invalidate_readers()
+                StatisticsService.invalidate_readers()
                 logger.info(f"✅ Đã thêm bạn đọc: {reader.full_name} (ID: {reader_id})")
                 return True, None, reader_id
             else:
@@ -138,6 +153,9 @@ class ReaderService:
             result = db.execute_query(query, params, commit=True)
 
             if result and result > 0:
+                self._index_reader(reader.reader_id, reader)
+                CirculationLookupService.invalidate_readers()
+                StatisticsService.invalidate_readers()
                 logger.info(f"✅ Đã cập nhật bạn đọc ID: {reader.reader_id}")
                 return True, None
             else:
@@ -167,6 +185,9 @@ class ReaderService:
             result = db.execute_query(query, (reader_id,), commit=True)
 
             if result and result > 0:
+                reader_search_index.remove(reader_id)
+                CirculationLookupService.invalidate_readers()
+                StatisticsService.invalidate_readers()
                 logger.info(f"✅ Đã xóa bạn đọc ID: {reader_id}")
                 return True, None
             else:
@@ -193,6 +214,22 @@ class ReaderService:
             logger.error(f"❌ Lỗi lấy danh sách: {e}")
             return []
 
+    def stream_readers(self, batch_size: int = 1000) -> Iterator[Reader]:
+        """
+        Duyệt toàn bộ bạn đọc theo lô (fetchmany), cùng thứ tự get_all_readers
+
+        Dùng cho xuất dữ liệu: chỉ giữ tối đa batch_size dòng trong bộ nhớ.
+        Phải duyệt hết (hoặc close generator) để trả connection về pool.
+        """
+        query = "SELECT * FROM readers ORDER BY reader_id DESC"
+        for row in db.stream(query, batch_size=batch_size):
+            yield Reader.from_dict(row)
+
+    def count_readers(self) -> int:
+        """Đếm tổng số bạn đọc"""
+        result = db.fetchone("SELECT COUNT(*) as count FROM readers")
+        return result['count'] if result else 0
+
     def get_reader_by_id(self, reader_id: int) -> Optional[Reader]:
         """Lấy thông tin bạn đọc theo ID"""
         try:
@@ -208,7 +245,29 @@ class ReaderService:
             return None
 
     def search_readers(self, keyword: str, search_by: str = "all") -> List[Reader]:
-        """Tìm kiếm bạn đọc"""
+        """
+        Tìm kiếm bạn đọc
+        search_by: 'all', 'name', 'phone', 'email', 'address'
+
+        Dùng chỉ mục trong bộ nhớ; trong lúc chỉ mục đang được xây lần đầu
+        thì tạm dùng truy vấn LIKE.
+        """
+        if not reader_search_index.ready(self._iter_index_documents):
+            return self._search_readers_like(keyword, search_by)
+
+        try:
+            fields = None if search_by == "all" else [search_by]
+            reader_ids = reader_search_index.search(keyword, fields, limit=AppConfig.MAX_SEARCH_RESULTS)
+            readers = self._get_readers_by_ids(reader_ids)
+            logger.info(f"🔍 Tìm thấy {len(readers)} kết quả cho '{keyword}'")
+            return readers
+
+        except Exception as e:
+            logger.error(f"❌ Lỗi tìm kiếm: {e}")
+            return []
+
+    def _search_readers_like(self, keyword: str, search_by: str = "all") -> List[Reader]:
+        """Tìm kiếm bạn đọc bằng LIKE (quét bảng) - dùng khi chưa có chỉ mục"""
         try:
             keyword_pattern = f"%{keyword}%"
 
@@ -249,6 +308,46 @@ class ReaderService:
             logger.error(f"❌ Lỗi tìm kiếm: {e}")
             return []
 
+    # ========== SEARCH INDEX ==========
+
+    def _get_readers_by_ids(self, reader_ids: List[int]) -> List[Reader]:
+        """Lấy bạn đọc theo danh sách ID, giữ nguyên thứ tự xếp hạng"""
+        if not reader_ids:
+            return []
+
+        placeholders = ', '.join(['%s'] * len(reader_ids))
+        query = f"SELECT * FROM readers WHERE reader_id IN ({placeholders})"
+        rows = db.execute_query(query, tuple(reader_ids), fetch=True) or []
+
+        by_id = {row['reader_id']: Reader.from_dict(row) for row in rows}
+        return [by_id[reader_id] for reader_id in reader_ids if reader_id in by_id]
+
+    def _iter_index_documents(self):
+        """Nguồn dữ liệu để xây chỉ mục tìm kiếm (đọc theo lô, không fetchall)"""
+        query = "SELECT reader_id, full_name, phone, email, address FROM readers"
+        for row in db.stream(query, batch_size=5000):
+            yield row['reader_id'], {
+                'name': row['full_name'],
+                'phone': row['phone'],
+                'email': row['email'],
+                'address': row['address'],
+            }
+
+    def _index_reader(self, reader_id: int, reader: Reader):
+        """Cập nhật chỉ mục cho 1 bạn đọc sau khi thêm / sửa (kể cả khi chỉ mục đang xây)"""
+        if not reader_search_index.needs_updates:
+            return
+        reader_search_index.add(reader_id, {
+            'name': reader.full_name,
+            'phone': reader.phone,
+            'email': reader.email,
+            'address': reader.address,
+        })
+
+    def rebuild_search_index(self) -> int:
+        """Xây lại chỉ mục tìm kiếm bạn đọc"""
+        return reader_search_index.build(self._iter_index_documents())
+
     def filter_readers(
             self,
             status: Optional[str] = None,
@@ -297,84 +396,8 @@ class ReaderService:
             return []
 
     def get_statistics(self) -> dict:
-        """Lấy thống kê bạn đọc"""
-        try:
-            stats = {
-                'total': 0,
-                'active': 0,
-                'expired': 0,
-                'locked': 0,
-                'avg_reputation': 0,
-                'expiring_soon': 0,
-                'high_reputation': 0,
-                'low_reputation': 0
-            }
-
-            # Tổng số bạn đọc
-            result = db.execute_query("SELECT COUNT(*) as total FROM readers", fetch=True)
-            if result and len(result) > 0:
-                stats['total'] = result[0]['total']
-
-            # Số bạn đọc theo trạng thái
-            query = "SELECT status, COUNT(*) as count FROM readers GROUP BY status"
-            rows = db.execute_query(query, fetch=True)
-
-            if rows:
-                for row in rows:
-                    status = row['status']
-                    if status == 'ACTIVE':
-                        stats['active'] = row['count']
-                    elif status == 'EXPIRED':
-                        stats['expired'] = row['count']
-                    elif status == 'LOCKED':
-                        stats['locked'] = row['count']
-
-            # Điểm uy tín trung bình
-            result = db.execute_query("SELECT AVG(reputation_score) as avg_rep FROM readers", fetch=True)
-            if result and len(result) > 0 and result[0]['avg_rep']:
-                stats['avg_reputation'] = round(result[0]['avg_rep'], 2)
-
-            # Số thẻ sắp hết hạn (trong 30 ngày)
-            date_30_days = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
-            query = """
-                SELECT COUNT(*) as count
-                FROM readers
-                WHERE card_end <= %s AND card_end >= CURDATE()
-            """
-            result = db.execute_query(query, (date_30_days,), fetch=True)
-            if result and len(result) > 0:
-                stats['expiring_soon'] = result[0]['count']
-
-            # Số bạn đọc có điểm uy tín cao (>= 90)
-            result = db.execute_query(
-                "SELECT COUNT(*) as count FROM readers WHERE reputation_score >= 90",
-                fetch=True
-            )
-            if result and len(result) > 0:
-                stats['high_reputation'] = result[0]['count']
-
-            # Số bạn đọc có điểm uy tín thấp (< 50)
-            result = db.execute_query(
-                "SELECT COUNT(*) as count FROM readers WHERE reputation_score < 50",
-                fetch=True
-            )
-            if result and len(result) > 0:
-                stats['low_reputation'] = result[0]['count']
-
-            return stats
-
-        except Exception as e:
-            logger.error(f"❌ Lỗi thống kê: {e}")
-            return {
-                'total': 0,
-                'active': 0,
-                'expired': 0,
-                'locked': 0,
-                'avg_reputation': 0,
-                'expiring_soon': 0,
-                'high_reputation': 0,
-                'low_reputation': 0
-            }
+        """Lấy thống kê bạn đọc (1 truy vấn gộp, có cache snapshot)"""
+        return StatisticsService().get_reader_statistics()
 
     def update_reader_status(self, reader_id: int, new_status: str) -> Tuple[bool, Optional[str]]:
         """Cập nhật trạng thái bạn đọc"""
@@ -386,6 +409,7 @@ class ReaderService:
             result = db.execute_query(query, (new_status, reader_id), commit=True)
 
             if result and result > 0:
+                StatisticsService.invalidate_readers()
                 logger.info(f"✅ Đã cập nhật trạng thái bạn đọc ID {reader_id} thành {new_status}")
                 return True, None
             else:
@@ -405,6 +429,7 @@ class ReaderService:
             result = db.execute_query(query, (score, reader_id), commit=True)
 
             if result and result > 0:
+                StatisticsService.invalidate_readers()
                 logger.info(f"✅ Đã cập nhật điểm uy tín bạn đọc ID {reader_id} thành {score}")
                 return True, None
             else:
@@ -437,6 +462,7 @@ class ReaderService:
             result = db.execute_query(query, (new_end_str, reader_id), commit=True)
 
             if result and result > 0:
+                StatisticsService.invalidate_readers()
                 logger.info(f"✅ Đã gia hạn thẻ bạn đọc ID {reader_id} đến {new_end_str}")
                 return True, None
             else:
@@ -481,6 +507,7 @@ class ReaderService:
             result = db.execute_query(query, commit=True)
 
             if result:
+                StatisticsService.invalidate_readers()
                 logger.info(f"✅ Đã cập nhật {result} thẻ thành EXPIRED")
                 return result, f"Đã cập nhật {result} thẻ thành trạng thái hết hạn"
             else:
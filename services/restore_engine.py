@@ -0,0 +1,317 @@
+"""
+Restore Engine - Phục hồi dữ liệu hàng loạt (bulk) từ bản sao lưu
+
+- Đọc bản sao lưu theo luồng (stream) từng bảng, không nạp cả file vào bộ nhớ
+- INSERT nhiều dòng mỗi lần gửi (executemany -> 1 câu INSERT ... VALUES (...),(...))
+- Tắt kiểm tra khóa ngoại / unique và DISABLE KEYS trong lúc nạp từng bảng
+- Commit theo lô để giới hạn undo log, báo tiến độ (số dòng, dòng/giây)
+"""
+import json
+import re
+import time
+from itertools import groupby
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+from config.database import db
+from services.backup_chain import SKIP_LOG_VARIABLE, chunked, key_condition
+
+logger = logging.getLogger(__name__)
+
+# Thứ tự bảng khi sao lưu / phục hồi (bảng cha trước bảng con)
+BACKUP_TABLES = ['categories', 'authors', 'publishers', 'books', 'book_inventory',
+                 'readers', 'borrow_slips', 'borrow_details', 'penalties', 'system_settings']
+
+_IDENTIFIER_RE = re.compile(r'^[A-Za-z0-9_]+$')
+
+# (tên bảng, danh sách cột, iterable các dòng theo thứ tự cột)
+TableData = Tuple[str, List[str], Iterable[Sequence]]
+ProgressCallback = Callable[[str, int, float], None]
+
+
+class BulkRestoreEngine:
+    """
+    Nạp dữ liệu hàng loạt vào MySQL, mỗi bảng trên 1 connection của pool
+
+    Args:
+        batch_size: Số dòng mỗi lần executemany
+        commit_every: Commit sau mỗi n lô
+        progress: Callback(tên_bảng, số_dòng_đã_nạp, dòng/giây) gọi sau mỗi lần commit
+    """
+
+    BATCH_SIZE = 1000
+    COMMIT_EVERY = 20
+
+    def __init__(self, batch_size: int = BATCH_SIZE, commit_every: int = COMMIT_EVERY,
+                 progress: Optional[ProgressCallback] = None):
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.progress = progress
+
+    def restore(self, tables: Iterable[TableData], truncate: bool = True) -> Dict[str, dict]:
+        """
+        Phục hồi lần lượt các bảng
+
+        Args:
+            tables: Iterable (bảng, cột, dòng) - có thể là generator đọc từ file
+            truncate: Xóa dữ liệu cũ của bảng trước khi nạp (False = ghi đè theo khóa chính)
+
+        Returns:
+            dict: {bảng: {'rows', 'seconds', 'rows_per_sec'}}
+        """
+        stats = {}
+        for table, columns, rows in tables:
+            stats[table] = self.restore_table(table, columns, rows, truncate=truncate)
+        return stats
+
+    def restore_table(self, table: str, columns: List[str], rows: Iterable[Sequence],
+                      truncate: bool = True) -> dict:
+        """Nạp 1 bảng trên 1 connection riêng (an toàn khi chạy song song nhiều bảng)"""
+        self._check_identifiers(table, columns)
+
+        connection = db.get_connection()
+        if connection is None:
+            raise RuntimeError("Lỗi kết nối CSDL")
+
+        cursor = connection.cursor()
+        started = time.perf_counter()
+        count = 0
+        try:
+            cursor.execute("SET SESSION FOREIGN_KEY_CHECKS = 0, UNIQUE_CHECKS = 0")
+            # Dữ liệu nạp lại không phải thay đổi mới: trigger sao lưu tăng dần bỏ qua
+            cursor.execute(f"SET {SKIP_LOG_VARIABLE} = 1")
+            if truncate:
+                cursor.execute(f"TRUNCATE TABLE `{table}`")
+            cursor.execute(f"ALTER TABLE `{table}` DISABLE KEYS")
+
+            sql = self._insert_sql(table, columns, upsert=not truncate)
+            batch, batches = [], 0
+            # Connection của pool chạy autocommit: gom commit_every lô vào 1 transaction
+            connection.start_transaction()
+            for row in rows:
+                batch.append(tuple(row))
+                if len(batch) >= self.batch_size:
+                    cursor.executemany(sql, batch)
+                    count += len(batch)
+                    batch = []
+                    batches += 1
+                    if batches % self.commit_every == 0:
+                        connection.commit()
+                        connection.start_transaction()
+                        self._report(table, count, started)
+
+            if batch:
+                cursor.executemany(sql, batch)
+                count += len(batch)
+
+            connection.commit()
+            cursor.execute(f"ALTER TABLE `{table}` ENABLE KEYS")
+            self._report(table, count, started)
+
+        except Exception:
+            connection.rollback()
+            raise
+
+        finally:
+            self._release(connection, cursor,
+                          "SET SESSION FOREIGN_KEY_CHECKS = 1, UNIQUE_CHECKS = 1")
+
+        seconds = time.perf_counter() - started
+        rate = count / seconds if seconds > 0 else 0.0
+        logger.info(f"✅ Phục hồi '{table}': {count} dòng trong {seconds:.2f}s ({rate:,.0f} dòng/s)")
+        return {'rows': count, 'seconds': round(seconds, 3), 'rows_per_sec': round(rate, 1)}
+
+    def delete_rows(self, table: str, key_columns: List[str], keys: Iterable[Sequence]) -> int:
+        """
+        Xóa các dòng theo khóa chính (tombstone của bản sao lưu tăng dần)
+
+        Returns:
+            int: Số dòng đã xóa
+        """
+        self._check_identifiers(table, key_columns)
+
+        connection = db.get_connection()
+        if connection is None:
+            raise RuntimeError("Lỗi kết nối CSDL")
+
+        cursor = connection.cursor()
+        deleted = 0
+        try:
+            cursor.execute("SET SESSION FOREIGN_KEY_CHECKS = 0")
+            cursor.execute(f"SET {SKIP_LOG_VARIABLE} = 1")
+            connection.start_transaction()
+            for batch in chunked(keys, self.batch_size):
+                params = [value for key in batch for value in key]
+                cursor.execute(
+                    f"DELETE FROM `{table}` WHERE {key_condition(key_columns, len(batch))}",
+                    params
+                )
+                deleted += cursor.rowcount
+            connection.commit()
+
+        except Exception:
+            connection.rollback()
+            raise
+
+        finally:
+            self._release(connection, cursor, "SET SESSION FOREIGN_KEY_CHECKS = 1")
+
+        logger.info(f"✅ Đã xóa {deleted} dòng '{table}' theo bản sao lưu tăng dần")
+        return deleted
+
+    # ========== INTERNAL ==========
+
+    @staticmethod
+    def _insert_sql(table: str, columns: List[str], upsert: bool = False) -> str:
+        cols = ', '.join(f"`{c}`" for c in columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        sql = f"INSERT INTO `{table}` ({cols}) VALUES ({placeholders})"
+        if upsert:
+            updates = ', '.join(f"`{c}` = VALUES(`{c}`)" for c in columns)
+            sql += f" ON DUPLICATE KEY UPDATE {updates}"
+        return sql
+
+    @staticmethod
+    def _check_identifiers(table: str, columns: List[str]):
+        """Chỉ chấp nhận bảng đã biết và tên cột hợp lệ (file sao lưu có thể bị sửa tay)"""
+        if table not in BACKUP_TABLES:
+            raise ValueError(f"Bảng không hợp lệ trong bản sao lưu: {table}")
+        for column in columns:
+            if not _IDENTIFIER_RE.match(column):
+                raise ValueError(f"Tên cột không hợp lệ: {table}.{column}")
+
+    @staticmethod
+    def _release(connection, cursor, reset_checks: str):
+        """
+        Bật lại kiểm tra khóa ngoại / trigger rồi trả connection về pool
+
+        Pool không reset session: không khôi phục được biến session thì đóng hẳn
+        connection, không để connection tắt FOREIGN_KEY_CHECKS quay lại pool.
+        """
+        discard = False
+        try:
+            cursor.execute(reset_checks)
+            cursor.execute(f"SET {SKIP_LOG_VARIABLE} = NULL")
+            cursor.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Không khôi phục được biến session sau phục hồi: {e}")
+            discard = True
+        db.release_connection(connection, discard=discard)
+
+    def _report(self, table: str, count: int, started: float):
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else 0.0
+        logger.debug(f"... {table}: {count} dòng ({rate:,.0f} dòng/s)")
+        if self.progress:
+            self.progress(table, count, rate)
+
+
+# ========== ĐỌC FILE JSON CŨ THEO LUỒNG ==========
+
+class _JsonStream:
+    """Đọc dần 1 file JSON lớn, giải mã từng giá trị bằng raw_decode"""
+
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, file):
+        self.file = file
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.file.read(self.CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        # Bỏ phần đã đọc để buffer không phình to
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Ký tự kế tiếp (bỏ qua khoảng trắng), '' nếu hết file"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"File sao lưu JSON không hợp lệ: cần '{char}' tại vị trí {self.pos}")
+        self.pos += 1
+
+    def decode(self):
+        """Giải mã 1 giá trị JSON hoàn chỉnh (đọc thêm nếu giá trị bị cắt giữa chunk)"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # Số ở cuối buffer có thể còn chữ số ở chunk sau
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_json_backup_rows(filepath: str) -> Iterator[Tuple[str, dict]]:
+    """
+    Duyệt file sao lưu JSON cũ ({bảng: [dòng, ...]}) theo từng dòng
+
+    Yields:
+        (tên_bảng, dòng_dict) - chỉ giữ 1 dòng trong bộ nhớ tại một thời điểm
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f)
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+
+        while True:
+            table = stream.decode()
+            stream.expect(':')
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.pos += 1
+            else:
+                while True:
+                    yield table, stream.decode()
+                    if stream.peek() == ',':
+                        stream.pos += 1
+                        continue
+                    stream.expect(']')
+                    break
+
+            if stream.peek() == ',':
+                stream.pos += 1
+                continue
+            stream.expect('}')
+            return
+
+
+def iter_json_backup_tables(filepath: str) -> Iterator[TableData]:
+    """
+    Đọc file sao lưu JSON cũ thành (bảng, cột, dòng) cho BulkRestoreEngine
+
+    Bảng rỗng bị bỏ qua (giữ nguyên dữ liệu hiện có, như cách phục hồi cũ).
+    Các dòng phải được tiêu thụ hết trước khi lấy bảng tiếp theo.
+    """
+    for table, group in groupby(iter_json_backup_rows(filepath), key=lambda item: item[0]):
+        first = next(group)[1]
+        columns = list(first.keys())
+
+        def rows(first=first, group=group, columns=columns):
+            yield [first.get(c) for c in columns]
+            for _, row in group:
+                yield [row.get(c) for c in columns]
+
+        yield table, columns, rows()
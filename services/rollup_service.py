@@ -0,0 +1,535 @@
+"""
+Borrow Rollup Service - Bảng tổng hợp lượt mượn theo tháng (materialized rollup)
+
+Thay vì mỗi phân tích AI join lại borrow_slips / borrow_details / books / penalties
+trên toàn bộ lịch sử, dữ liệu được gộp sẵn theo tháng:
+
+- borrow_rollup_monthly: tháng x (thể loại | tác giả | NXB | năm XB)
+- borrow_rollup_months:  tổng theo tháng (lượt mượn, bạn đọc, doanh thu phạt, người mới)
+- borrow_rollup_meta:    số phiên bản dữ liệu, tăng sau mỗi lần làm mới
+                         (tiến trình khác như API dùng để biết khi nào cache hết hiệu lực)
+
+Mỗi lần ghi (mượn / trả / sửa phiếu / phạt) cộng phần chênh lệch của đúng các phiếu bị
+ảnh hưởng vào rollup (INSERT ... ON DUPLICATE KEY UPDATE x = x + delta) NGAY TRONG
+transaction ghi: chi phí tỉ lệ với số phiếu thay đổi, không phụ thuộc số năm lịch sử,
+và rollup không bao giờ lệch với dữ liệu đã commit.
+
+Xây lại toàn bộ (rebuild_all) / 1 tháng (refresh_month) chỉ dùng sau khi phục hồi,
+nhập dữ liệu hàng loạt hoặc để sửa rollup.
+
+Ví dụ (trong transaction ghi):
+    before = rollup.capture(tx, [slip_id])
+    tx.execute("UPDATE borrow_slips ...")
+    rollup.apply_changes(tx, before, [slip_id])
+"""
+import calendar
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+import threading
+
+from config.database import db, Transaction
+
+logger = logging.getLogger(__name__)
+
+
+class RollupContribution:
+    """
+    Phần đóng góp của 1 tập phiếu mượn vào các bảng rollup
+
+    Cùng định nghĩa với các câu INSERT ... SELECT khi xây lại, để chênh lệch
+    sau - trước của 1 lần ghi cộng thẳng được vào rollup.
+    """
+
+    def __init__(self, slip_ids: Iterable[int] = ()):
+        self.slip_ids: Set[int] = set(slip_ids)
+        # (dim_type, dim_id, month) -> [borrows, {slip_id}, loan_days_sum, returned_count]
+        self.dimensions: Dict[Tuple[str, int, str], list] = {}
+        # month -> [borrowing_count, revenue]
+        self.months: Dict[str, list] = {}
+        # (reader_id, month) -> bạn đọc có được tính là người mới trong tháng
+        self.readers: Dict[Tuple[int, str], bool] = {}
+
+
+class BorrowRollupService:
+    """Duy trì và làm mới bảng rollup lượt mượn theo tháng"""
+
+    # Loại chiều -> cột trong bảng books (giá trị cố định, an toàn khi ghép vào SQL)
+    DIMENSIONS = {
+        'category': 'b.category_id',
+        'author': 'b.author_id',
+        'publisher': 'b.publisher_id',
+        'publish_year': 'b.publish_year'
+    }
+
+    # Bạn đọc là "người mới" của tháng nếu bắt đầu thẻ trong vòng n tháng trước ngày mượn
+    NEW_USER_MONTHS = 3
+
+    _schema_ready = False
+    _backfilled = False
+    _lock = threading.Lock()
+
+    # ========== SCHEMA ==========
+
+    def ensure_schema(self):
+        """Tạo bảng rollup nếu chưa có (idempotent)"""
+        if BorrowRollupService._schema_ready:
+            return
+
+        with db.transaction() as tx:
+            tx.execute("""
+                CREATE TABLE IF NOT EXISTS borrow_rollup_monthly (
+                    month CHAR(7) NOT NULL,
+                    dim_type VARCHAR(16) NOT NULL,
+                    dim_id INT NOT NULL,
+                    borrows INT NOT NULL DEFAULT 0,
+                    slips INT NOT NULL DEFAULT 0,
+                    loan_days_sum BIGINT NOT NULL DEFAULT 0,
+                    returned_count INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (dim_type, dim_id, month),
+                    KEY idx_rollup_monthly_month (month)
+                )
+            """)
+            tx.execute("""
+                CREATE TABLE IF NOT EXISTS borrow_rollup_months (
+                    month CHAR(7) NOT NULL PRIMARY KEY,
+                    borrowing_count INT NOT NULL DEFAULT 0,
+                    unique_readers INT NOT NULL DEFAULT 0,
+                    revenue DECIMAL(15, 2) NOT NULL DEFAULT 0,
+                    new_users INT NOT NULL DEFAULT 0,
+                    refreshed_at DATETIME NOT NULL
+                )
+            """)
+            tx.execute("""
+                CREATE TABLE IF NOT EXISTS borrow_rollup_meta (
+                    id TINYINT NOT NULL PRIMARY KEY,
+                    version BIGINT NOT NULL DEFAULT 0,
+                    updated_at DATETIME NOT NULL
+                )
+            """)
+
+        BorrowRollupService._schema_ready = True
+
+    def prepare(self) -> bool:
+        """
+        Tạo bảng rollup trước khi mở transaction ghi
+
+        DDL tự commit nên không được chạy giữa transaction; không tạo được bảng
+        (thiếu quyền...) thì các lần ghi bỏ qua rollup - lần đọc đầu tiên sau khi
+        có bảng sẽ xây toàn bộ.
+        """
+        if BorrowRollupService._schema_ready:
+            return True
+        try:
+            self.ensure_schema()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Không tạo được bảng rollup: {e}")
+            return False
+
+    def ensure_ready(self) -> bool:
+        """
+        Đảm bảo rollup sẵn sàng để đọc
+
+        - Tạo bảng nếu chưa có
+        - Chưa từng xây (chưa có dòng meta): xây toàn bộ 1 lần; sau đó mọi lần ghi
+          tự cộng chênh lệch vào rollup trong transaction của nó
+        """
+        if BorrowRollupService._backfilled:
+            return True
+        try:
+            with BorrowRollupService._lock:
+                self.ensure_schema()
+
+                if not BorrowRollupService._backfilled:
+                    rows = db.fetchall("SELECT version FROM borrow_rollup_meta WHERE id = 1",
+                                       raise_errors=True)
+                    if not rows:
+                        self._rebuild_unlocked()
+                    BorrowRollupService._backfilled = True
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ Lỗi chuẩn bị rollup: {e}")
+            return False
+
+    # ========== LÀM MỚI ==========
+
+    def rebuild_all(self) -> bool:
+        """Tính lại toàn bộ rollup từ dữ liệu gốc (dùng sau khi nhập dữ liệu hàng loạt)"""
+        try:
+            with BorrowRollupService._lock:
+                self.ensure_schema()
+                self._rebuild_unlocked()
+                BorrowRollupService._backfilled = True
+            return True
+        except Exception as e:
+            logger.error(f"❌ Lỗi xây lại rollup: {e}")
+            return False
+
+    def _rebuild_unlocked(self):
+        start = datetime.now()
+        with db.transaction() as tx:
+            tx.execute("DELETE FROM borrow_rollup_monthly")
+            tx.execute("DELETE FROM borrow_rollup_months")
+            for dim_type in self.DIMENSIONS:
+                self._insert_dimension(tx, dim_type)
+            self._insert_totals(tx)
+            self._bump_version(tx)
+
+        elapsed = (datetime.now() - start).total_seconds()
+        logger.info(f"✅ Đã xây lại rollup lượt mượn ({elapsed:.2f}s)")
+
+    def refresh_month(self, month: str) -> bool:
+        """
+        Tính lại rollup của 1 tháng ('YYYY-MM') từ dữ liệu gốc - dùng để sửa rollup
+
+        Chỉ quét phiếu mượn trong tháng đó nên chi phí không phụ thuộc
+        tổng số năm lịch sử.
+        """
+        try:
+            self.ensure_schema()
+            start, end = self._month_bounds(month)
+
+            with db.transaction() as tx:
+                tx.execute("DELETE FROM borrow_rollup_monthly WHERE month = %s", (month,))
+                tx.execute("DELETE FROM borrow_rollup_months WHERE month = %s", (month,))
+                for dim_type in self.DIMENSIONS:
+                    self._insert_dimension(tx, dim_type, start, end)
+                self._insert_totals(tx, start, end)
+                self._bump_version(tx)
+            return True
+
+        except Exception as e:
+            logger.warning(f"⚠️ Không làm mới được rollup tháng {month}: {e}")
+            return False
+
+    # ========== CẬP NHẬT THEO CHÊNH LỆCH (trong transaction ghi) ==========
+
+    def capture(self, tx: Transaction, slip_ids: Iterable[int]) -> Optional[RollupContribution]:
+        """
+        Đọc phần đóng góp hiện tại của các phiếu (gọi trước khi ghi)
+
+        Đọc có khóa (FOR SHARE): thấy dữ liệu mới nhất đã commit và giữ nguyên
+        tới cuối transaction, nên trước / sau luôn so trên cùng 1 trạng thái.
+
+        Returns:
+            RollupContribution, hoặc None nếu chưa có bảng rollup
+        """
+        if not BorrowRollupService._schema_ready:
+            return None
+
+        contribution = RollupContribution(slip_ids)
+        if not contribution.slip_ids:
+            return contribution
+
+        ids = tuple(sorted(contribution.slip_ids))
+        placeholders = ', '.join(['%s'] * len(ids))
+        columns = ', '.join(f"{column} AS {dim_type}" for dim_type, column in self.DIMENSIONS.items())
+        rows = tx.fetchall(f"""
+            SELECT bs.slip_id, bs.reader_id, bs.borrow_date, bs.return_date, r.card_start,
+                   bd.detail_id, bd.book_id, {columns}
+            FROM borrow_slips bs
+            LEFT JOIN readers r ON bs.reader_id = r.reader_id
+            LEFT JOIN borrow_details bd ON bs.slip_id = bd.slip_id
+            LEFT JOIN books b ON bd.book_id = b.book_id
+            WHERE bs.slip_id IN ({placeholders})
+            FOR SHARE
+        """, ids)
+        penalties = defaultdict(list)
+        for row in tx.fetchall(f"""
+            SELECT slip_id, book_id, amount FROM penalties
+            WHERE slip_id IN ({placeholders})
+            FOR SHARE
+        """, ids):
+            penalties[(row['slip_id'], row['book_id'])].append(Decimal(row['amount'] or 0))
+
+        for row in rows:
+            borrow_date = self._as_date(row['borrow_date'])
+            if borrow_date is None:
+                continue
+            month = self.month_of(borrow_date)
+
+            if row['reader_id'] is not None:
+                key = (row['reader_id'], month)
+                contribution.readers[key] = (contribution.readers.get(key, False)
+                                             or self._is_new_user(row['card_start'], borrow_date))
+
+            # Tổng theo tháng: mỗi dòng JOIN phiếu x chi tiết x phạt
+            amounts = penalties.get((row['slip_id'], row['book_id'])) if row['detail_id'] else None
+            totals = contribution.months.setdefault(month, [0, Decimal(0)])
+            totals[0] += len(amounts) if amounts else 1
+            totals[1] += sum(amounts) if amounts else 0
+
+            if row['detail_id'] is None:
+                continue
+            return_date = self._as_date(row['return_date'])
+            for dim_type in self.DIMENSIONS:
+                if row[dim_type] is None:
+                    continue
+                entry = contribution.dimensions.setdefault((dim_type, row[dim_type], month),
+                                                           [0, set(), 0, 0])
+                entry[0] += 1
+                entry[1].add(row['slip_id'])
+                if return_date is not None:
+                    entry[2] += (return_date - borrow_date).days
+                    entry[3] += 1
+
+        return contribution
+
+    def apply_changes(self, tx: Transaction, before: Optional[RollupContribution],
+                      slip_ids: Iterable[int] = ()):
+        """
+        Cộng chênh lệch (sau - trước) của các phiếu vào rollup (gọi sau khi ghi)
+
+        Args:
+            before: Kết quả capture() trước khi ghi (None = phiếu mới tạo)
+            slip_ids: Phiếu cần đọc lại sau khi ghi (gộp với các phiếu của before)
+        """
+        if not BorrowRollupService._schema_ready:
+            return
+        before = before or RollupContribution()
+        after = self.capture(tx, before.slip_ids | set(slip_ids))
+
+        # ---------- Theo chiều (thể loại / tác giả / NXB / năm XB) ----------
+        dim_rows, emptied = [], []
+        for key in sorted(before.dimensions.keys() | after.dimensions.keys()):
+            old = before.dimensions.get(key, (0, (), 0, 0))
+            new = after.dimensions.get(key, (0, (), 0, 0))
+            delta = (new[0] - old[0], len(new[1]) - len(old[1]), new[2] - old[2], new[3] - old[3])
+            if any(delta):
+                dim_type, dim_id, month = key
+                dim_rows.append((month, dim_type, dim_id) + delta)
+                if delta[0] < 0:
+                    emptied.append(key)
+
+        # ---------- Tổng theo tháng ----------
+        month_deltas = defaultdict(lambda: [0, Decimal(0), 0, 0])
+        for month in before.months.keys() | after.months.keys():
+            old = before.months.get(month, (0, 0))
+            new = after.months.get(month, (0, 0))
+            month_deltas[month][0] += new[0] - old[0]
+            month_deltas[month][1] += new[1] - old[1]
+        for (reader_id, month), (readers, new_users) in self._reader_deltas(tx, before, after).items():
+            month_deltas[month][2] += readers
+            month_deltas[month][3] += new_users
+        month_rows = [(month,) + tuple(delta) for month, delta in sorted(month_deltas.items())
+                      if any(delta)]
+
+        if not dim_rows and not month_rows:
+            return
+
+        # Ghi theo thứ tự khóa chính: các transaction cùng cập nhật rollup khóa dòng cùng thứ tự
+        if dim_rows:
+            tx.execute(f"""
+                INSERT INTO borrow_rollup_monthly
+                    (month, dim_type, dim_id, borrows, slips, loan_days_sum, returned_count)
+                VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(dim_rows))}
+                ON DUPLICATE KEY UPDATE
+                    borrows = borrows + VALUES(borrows),
+                    slips = slips + VALUES(slips),
+                    loan_days_sum = loan_days_sum + VALUES(loan_days_sum),
+                    returned_count = returned_count + VALUES(returned_count)
+            """, tuple(value for row in dim_rows for value in row))
+        if emptied:
+            tx.execute(f"""
+                DELETE FROM borrow_rollup_monthly
+                WHERE borrows <= 0 AND (dim_type, dim_id, month) IN
+                    ({', '.join(['(%s, %s, %s)'] * len(emptied))})
+            """, tuple(value for key in emptied for value in key))
+
+        if month_rows:
+            tx.execute(f"""
+                INSERT INTO borrow_rollup_months
+                    (month, borrowing_count, revenue, unique_readers, new_users, refreshed_at)
+                VALUES {', '.join(['(%s, %s, %s, %s, %s, NOW())'] * len(month_rows))}
+                ON DUPLICATE KEY UPDATE
+                    borrowing_count = borrowing_count + VALUES(borrowing_count),
+                    revenue = revenue + VALUES(revenue),
+                    unique_readers = unique_readers + VALUES(unique_readers),
+                    new_users = new_users + VALUES(new_users),
+                    refreshed_at = NOW()
+            """, tuple(value for row in month_rows for value in row))
+            emptied_months = [row[0] for row in month_rows if row[1] < 0]
+            if emptied_months:
+                tx.execute(f"""
+                    DELETE FROM borrow_rollup_months
+                    WHERE borrowing_count <= 0 AND month IN ({', '.join(['%s'] * len(emptied_months))})
+                """, tuple(emptied_months))
+
+        # Chưa có dòng meta = rollup chưa từng được xây: lần đọc đầu sẽ xây toàn bộ
+        tx.execute("""
+            UPDATE borrow_rollup_meta SET version = version + 1, updated_at = NOW()
+            WHERE id = 1
+        """)
+
+    def _reader_deltas(self, tx: Transaction, before: RollupContribution,
+                       after: RollupContribution) -> Dict[Tuple[int, str], Tuple[int, int]]:
+        """
+        Chênh lệch (unique_readers, new_users) theo (bạn đọc, tháng)
+
+        COUNT(DISTINCT) không cộng dồn theo phiếu được: cần biết bạn đọc còn phiếu
+        nào khác trong tháng. Chỉ tra khi phần của các phiếu đang ghi thực sự đổi
+        (tạo phiếu, đổi ngày mượn); trả sách / phạt không tốn truy vấn này.
+        """
+        changed = sorted(key for key in before.readers.keys() | after.readers.keys()
+                         if before.readers.get(key) != after.readers.get(key))
+        if not changed:
+            return {}
+
+        # Phiếu khác của cùng bạn đọc trong tháng; FOR SHARE giữ khoảng (reader_id, borrow_date)
+        # để transaction khác không chèn phiếu cùng bạn đọc / tháng cho tới khi commit
+        conditions, params = [], []
+        for reader_id, month in changed:
+            start, end = self._month_bounds(month)
+            conditions.append("(bs.reader_id = %s AND bs.borrow_date >= %s AND bs.borrow_date < %s)")
+            params += [reader_id, start, end]
+        exclude = tuple(sorted(before.slip_ids | after.slip_ids))
+        rows = tx.fetchall(f"""
+            SELECT bs.reader_id, bs.borrow_date, r.card_start
+            FROM borrow_slips bs
+            LEFT JOIN readers r ON bs.reader_id = r.reader_id
+            WHERE ({' OR '.join(conditions)})
+              AND bs.slip_id NOT IN ({', '.join(['%s'] * len(exclude))})
+            FOR SHARE
+        """, tuple(params) + exclude)
+        others: Dict[Tuple[int, str], bool] = {}
+        for row in rows:
+            borrow_date = self._as_date(row['borrow_date'])
+            key = (row['reader_id'], self.month_of(borrow_date))
+            others[key] = others.get(key, False) or self._is_new_user(row['card_start'], borrow_date)
+
+        deltas = {}
+        for key in changed:
+            other, old, new = others.get(key), before.readers.get(key), after.readers.get(key)
+            present = int(other is not None or new is not None) - int(other is not None or old is not None)
+            is_new = int(bool(other) or bool(new)) - int(bool(other) or bool(old))
+            if present or is_new:
+                deltas[key] = (present, is_new)
+        return deltas
+
+    def data_version(self) -> Optional[int]:
+        """
+        Phiên bản dữ liệu rollup hiện tại (tăng sau mỗi lần mượn / trả / phạt)
+
+        Returns:
+            int, hoặc None nếu không đọc được
+        """
+        try:
+            self.ensure_schema()
+        except Exception as e:
+            logger.warning(f"⚠️ Không đọc được phiên bản rollup: {e}")
+            return None
+
+        row = db.fetchone("SELECT version FROM borrow_rollup_meta WHERE id = 1")
+        if row is None:
+            return 0
+        return int(row['version'])
+
+    # ========== SQL ==========
+
+    @staticmethod
+    def _bump_version(tx: Transaction):
+        tx.execute("""
+            INSERT INTO borrow_rollup_meta (id, version, updated_at)
+            VALUES (1, 1, NOW())
+            ON DUPLICATE KEY UPDATE version = version + 1, updated_at = NOW()
+        """)
+
+    def _insert_dimension(self, tx: Transaction, dim_type: str,
+                          start: Optional[date] = None, end: Optional[date] = None):
+        """Gộp lượt mượn theo tháng x 1 chiều; không có start/end = toàn bộ lịch sử"""
+        column = self.DIMENSIONS[dim_type]
+        where, params = self._date_filter(start, end)
+        tx.execute(f"""
+            INSERT INTO borrow_rollup_monthly
+                (month, dim_type, dim_id, borrows, slips, loan_days_sum, returned_count)
+            SELECT
+                DATE_FORMAT(bs.borrow_date, '%Y-%m') AS month,
+                '{dim_type}',
+                {column},
+                COUNT(bd.detail_id),
+                COUNT(DISTINCT bd.slip_id),
+                COALESCE(SUM(DATEDIFF(bs.return_date, bs.borrow_date)), 0),
+                COUNT(bs.return_date)
+            FROM borrow_slips bs
+            JOIN borrow_details bd ON bs.slip_id = bd.slip_id
+            JOIN books b ON bd.book_id = b.book_id
+            WHERE {column} IS NOT NULL {where}
+            GROUP BY month, {column}
+        """, params)
+
+    def _insert_totals(self, tx: Transaction,
+                       start: Optional[date] = None, end: Optional[date] = None):
+        """Tổng theo tháng (cùng định nghĩa với dữ liệu lịch sử của AI forecast)"""
+        where, params = self._date_filter(start, end)
+        tx.execute(f"""
+            INSERT INTO borrow_rollup_months
+                (month, borrowing_count, unique_readers, revenue, new_users, refreshed_at)
+            SELECT
+                DATE_FORMAT(bs.borrow_date, '%Y-%m') AS month,
+                COUNT(bs.slip_id),
+                COUNT(DISTINCT bs.reader_id),
+                SUM(COALESCE(p.amount, 0)),
+                COUNT(DISTINCT CASE WHEN r.card_start >= DATE_SUB(bs.borrow_date, INTERVAL {self.NEW_USER_MONTHS} MONTH)
+                      THEN bs.reader_id END),
+                NOW()
+            FROM borrow_slips bs
+            LEFT JOIN readers r ON bs.reader_id = r.reader_id
+            LEFT JOIN borrow_details bd ON bs.slip_id = bd.slip_id
+            LEFT JOIN penalties p ON bd.slip_id = p.slip_id AND bd.book_id = p.book_id
+            WHERE bs.borrow_date IS NOT NULL {where}
+            GROUP BY month
+        """, params)
+
+    @staticmethod
+    def _date_filter(start: Optional[date], end: Optional[date]):
+        if start is None:
+            return '', None
+        return 'AND bs.borrow_date >= %s AND bs.borrow_date < %s', (start, end)
+
+    # ========== TIỆN ÍCH ==========
+
+    @staticmethod
+    def month_of(value) -> str:
+        """date / datetime / 'YYYY-MM-DD' -> 'YYYY-MM'"""
+        if isinstance(value, (date, datetime)):
+            return value.strftime('%Y-%m')
+        return str(value)[:7]
+
+    @staticmethod
+    def _as_date(value) -> Optional[date]:
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, str):
+            return date.fromisoformat(value[:10])
+        return value
+
+    @classmethod
+    def _is_new_user(cls, card_start, borrow_date: date) -> bool:
+        """card_start >= DATE_SUB(borrow_date, INTERVAL 3 MONTH) (cùng cách MySQL lùi tháng)"""
+        card_start = cls._as_date(card_start)
+        if card_start is None:
+            return False
+        index = borrow_date.year * 12 + borrow_date.month - 1 - cls.NEW_USER_MONTHS
+        year, month = divmod(index, 12)
+        month += 1
+        day = min(borrow_date.day, calendar.monthrange(year, month)[1])
+        return card_start >= date(year, month, day)
+
+    @staticmethod
+    def _month_bounds(month: str):
+        """'YYYY-MM' -> (ngày đầu tháng, ngày đầu tháng sau)"""
+        year, mon = (int(part) for part in month.split('-'))
+        start = date(year, mon, 1)
+        end = date(year + 1, 1, 1) if mon == 12 else date(year, mon + 1, 1)
+        return start, end
+
+    @staticmethod
+    def months_ago(months: int) -> str:
+        """Tháng ('YYYY-MM') cách hiện tại n tháng"""
+        today = date.today()
+        index = today.year * 12 + (today.month - 1) - months
+        return f"{index // 12:04d}-{index % 12 + 1:02d}"
@@ -0,0 +1,94 @@
+"""
+Schema Indexes - Kiểm tra / tạo các index mà services cần
+
+Định nghĩa index nằm cạnh service dùng nó ({tên index: (bảng, "cột 1, cột 2")}, vd.
+BorrowService.BORROW_INDEXES). Lúc chạy, services chỉ tra xem index có chưa và cảnh báo
+nếu thiếu: CREATE INDEX trên bảng lớn khóa bảng rất lâu và cần quyền ALTER, nên chỉ chạy
+bằng script migration:
+
+    python scripts/create_indexes.py
+"""
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import logging
+
+from config.database import db
+
+logger = logging.getLogger(__name__)
+
+# {tên index: (bảng, danh sách cột cách nhau bởi dấu phẩy)}
+IndexDefinitions = Dict[str, Tuple[str, str]]
+
+
+def _columns(columns: str) -> Tuple[str, ...]:
+    return tuple(c.strip().lower() for c in columns.split(','))
+
+
+def missing_indexes(indexes: IndexDefinitions) -> List[str]:
+    """
+    Tên các index chưa có: không index nào (kể cả khác tên) bắt đầu bằng đúng các cột đó
+
+    Raises:
+        Exception: Lỗi đọc information_schema
+    """
+    tables = sorted({table for table, _ in indexes.values()})
+    if not tables:
+        return []
+
+    placeholders = ', '.join(['%s'] * len(tables))
+    # MySQL 8 trả nhãn cột information_schema viết hoa: đặt alias
+    rows = db.fetchall(f"""
+        SELECT table_name AS table_name, index_name AS index_name, column_name AS column_name
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name IN ({placeholders})
+        ORDER BY table_name, index_name, seq_in_index
+    """, tuple(tables), raise_errors=True)
+
+    existing = defaultdict(lambda: defaultdict(list))   # bảng -> index -> [cột]
+    for row in rows:
+        existing[row['table_name'].lower()][row['index_name']].append(row['column_name'].lower())
+
+    missing = []
+    for name, (table, columns) in indexes.items():
+        wanted = _columns(columns)
+        if not any(tuple(cols[:len(wanted)]) == wanted for cols in existing[table.lower()].values()):
+            missing.append(name)
+    return missing
+
+
+def create_indexes(indexes: IndexDefinitions) -> List[str]:
+    """
+    Tạo các index còn thiếu (chỉ dùng trong script migration, không gọi lúc chạy ứng dụng)
+
+    Returns:
+        List[str]: Tên các index vừa tạo
+
+    Raises:
+        Exception: Lỗi đọc information_schema / CREATE INDEX (vd. thiếu quyền ALTER)
+    """
+    created = []
+    for name in missing_indexes(indexes):
+        table, columns = indexes[name]
+        with db.transaction() as tx:
+            tx.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+        logger.info(f"✅ Đã tạo index {name} trên {table}({columns})")
+        created.append(name)
+    return created
+
+
+def warn_missing_indexes(indexes: IndexDefinitions, purpose: str) -> bool:
+    """
+    Tra index lúc chạy, thiếu thì chỉ ghi cảnh báo (truy vấn vẫn đúng, chỉ chậm hơn)
+
+    Returns:
+        bool: True nếu đã tra được (có thiếu hay không), False nếu lỗi - gọi lại sau
+    """
+    try:
+        missing = missing_indexes(indexes)
+    except Exception as e:
+        logger.warning(f"⚠️ Không kiểm tra được index cho {purpose}: {e}")
+        return False
+    if missing:
+        logger.warning(f"⚠️ Thiếu index cho {purpose}: {', '.join(missing)} - "
+                       f"chạy python scripts/create_indexes.py")
+    return True
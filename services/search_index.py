@@ -0,0 +1,348 @@
+"""
+Search Index - Chỉ mục đảo ngược (inverted index) trong bộ nhớ
+Dùng cho tìm kiếm sách / bạn đọc thay cho LIKE '%kw%' quét toàn bảng
+
+- Chuẩn hóa tiếng Việt: bỏ dấu, đ -> d, chữ thường
+- Trường 'prefix': tách từ, index các tiền tố của từng từ (gõ "ngu" ra "Nguyễn")
+- Trường 'substring': index trigram, dùng cho SĐT / ISBN / mã vạch (gõ đuôi số vẫn ra)
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def _build_fold_table() -> dict:
+    """Bảng translate: ký tự Latin có dấu -> ký tự gốc, xóa dấu rời (combining)"""
+    table = {ord('đ'): 'd', ord('Đ'): 'd'}
+    ranges = [(0x00C0, 0x0250), (0x1E00, 0x1F00)]
+    for start, end in ranges:
+        for code in range(start, end):
+            base = ''.join(
+                ch for ch in unicodedata.normalize('NFD', chr(code))
+                if unicodedata.category(ch) != 'Mn'
+            )
+            if base and base != chr(code):
+                table[code] = base
+    for code in range(0x0300, 0x0370):
+        table[code] = None
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+
+
+def fold_text(text) -> str:
+    """Chuẩn hóa chuỗi: chữ thường, bỏ dấu tiếng Việt (đ -> d)"""
+    if text is None:
+        return ''
+    return str(text).lower().translate(_FOLD_TABLE)
+
+
+def tokenize(text) -> List[str]:
+    """Tách chuỗi đã chuẩn hóa thành các từ (chỉ chữ và số)"""
+    return _TOKEN_RE.findall(fold_text(text))
+
+
+class SearchIndex:
+    """
+    Chỉ mục đảo ngược nhiều trường, an toàn khi dùng từ nhiều thread
+
+    Xây chỉ mục không khóa việc tìm kiếm: bản mới được dựng riêng rồi thay vào.
+    Cập nhật (add / remove) đến trong lúc đang xây được ghi lại và áp vào bản mới
+    khi xây xong, nên không bị mất.
+
+    Args:
+        fields: {tên_trường: (kiểu, trọng_số)} với kiểu là 'prefix' hoặc 'substring'
+        name: Tên chỉ mục (dùng cho log)
+        max_age: Số giây tối đa giữa 2 lần xây (None = không giới hạn); quá hạn thì
+                 xây lại nền để thấy thay đổi do process khác ghi vào CSDL
+    """
+
+    MAX_PREFIX_LENGTH = 20
+    NGRAM = 3
+
+    def __init__(self, fields: Dict[str, Tuple[str, float]], name: str = 'index',
+                 max_age: Optional[float] = None):
+        self.fields = fields
+        self.name = name
+        self.max_age = max_age
+        self._postings: Dict[str, Dict[str, Set[int]]] = {f: defaultdict(set) for f in fields}
+        self._docs: Dict[int, Dict[str, str]] = {}
+        # _lock bảo vệ bản đang dùng (ngắn); _build_lock chỉ cho 1 lần xây tại 1 thời điểm
+        self._lock = threading.RLock()
+        self._build_lock = threading.RLock()
+        self._built = False
+        self._built_at = 0.0
+        self._building = False
+        # Cập nhật đến trong lúc xây: doc_id -> values (None = xóa)
+        self._pending: Dict[int, Optional[dict]] = {}
+        # Tăng mỗi lần invalidate: bản đang xây dở từ dữ liệu cũ bị bỏ
+        self._generation = 0
+        self._build_thread: Optional[threading.Thread] = None
+
+    # ========== BUILD ==========
+
+    @property
+    def is_built(self) -> bool:
+        return self._built
+
+    @property
+    def is_stale(self) -> bool:
+        """Đã quá max_age kể từ lần xây cuối"""
+        return (self._built and self.max_age is not None
+                and time.monotonic() - self._built_at > self.max_age)
+
+    @property
+    def needs_updates(self) -> bool:
+        """Có bản đang dùng hoặc đang xây: caller nên gọi add / remove sau khi ghi CSDL"""
+        return self._built or self._building
+
+    def build(self, documents: Iterable[Tuple[int, dict]]) -> int:
+        """
+        Xây lại toàn bộ chỉ mục
+
+        Dựng bản mới ngoài _lock (tìm kiếm vẫn dùng bản cũ), áp các cập nhật đến
+        trong lúc xây rồi thay bản cũ.
+
+        Args:
+            documents: Iterable các cặp (doc_id, {tên_trường: giá_trị})
+
+        Returns:
+            int: Số tài liệu đã index
+        """
+        with self._build_lock:
+            with self._lock:
+                self._building = True
+                self._pending = {}
+                generation = self._generation
+
+            postings = {f: defaultdict(set) for f in self.fields}
+            docs = {}
+            count = 0
+            try:
+                for doc_id, values in documents:
+                    self._add_to(postings, docs, doc_id, values)
+                    count += 1
+            finally:
+                with self._lock:
+                    self._building = False
+                    pending, self._pending = self._pending, {}
+
+            with self._lock:
+                if generation != self._generation:
+                    logger.info(f"⚠️ Bỏ chỉ mục '{self.name}' vừa xây: dữ liệu đã thay đổi toàn bộ")
+                    return count
+                for doc_id, values in pending.items():
+                    self._remove_from(postings, docs, doc_id)
+                    if values is not None:
+                        self._add_to(postings, docs, doc_id, values)
+                self._postings, self._docs = postings, docs
+                self._built = True
+                self._built_at = time.monotonic()
+
+        logger.info(f"✅ Đã xây chỉ mục '{self.name}': {count} tài liệu"
+                    f" (+{len(pending)} cập nhật trong lúc xây)")
+        return count
+
+    def ensure_built(self, loader: Callable[[], Iterable[Tuple[int, dict]]]) -> bool:
+        """Xây chỉ mục lần đầu (lazy) nếu chưa có, hoặc xây lại nếu quá max_age"""
+        if self._built and not self.is_stale:
+            return True
+        with self._build_lock:
+            if not self._built or self.is_stale:
+                try:
+                    self.build(loader())
+                except Exception as e:
+                    logger.error(f"❌ Lỗi xây chỉ mục '{self.name}': {e}")
+                    return self._built
+        return True
+
+    def ready(self, loader: Callable[[], Iterable[Tuple[int, dict]]]) -> bool:
+        """
+        Chỉ mục dùng được chưa
+
+        Chưa có: xây nền và trả False (caller tạm dùng truy vấn LIKE).
+        Quá max_age: vẫn tìm trên bản hiện có, đồng thời xây lại nền rồi thay vào.
+        """
+        if not self._built or self.is_stale:
+            self.build_async(loader)
+        return self._built
+
+    def build_async(self, loader: Callable[[], Iterable[Tuple[int, dict]]]):
+        """Xây chỉ mục ở thread nền (không chặn giao diện); bỏ qua nếu đang xây"""
+        if (self._built and not self.is_stale) or (self._build_thread and self._build_thread.is_alive()):
+            return
+        self._build_thread = threading.Thread(
+            target=self.ensure_built,
+            args=(loader,),
+            name=f"search-index-{self.name}",
+            daemon=True
+        )
+        self._build_thread.start()
+
+    def invalidate(self):
+        """Đánh dấu chỉ mục cần xây lại ở lần tìm kiếm sau (bỏ cả bản đang xây dở)"""
+        with self._lock:
+            self._built = False
+            self._generation += 1
+
+    # ========== UPDATE ==========
+
+    def add(self, doc_id: int, values: dict):
+        """Thêm hoặc cập nhật 1 tài liệu"""
+        with self._lock:
+            if self._building:
+                self._pending[doc_id] = values
+            self._remove_from(self._postings, self._docs, doc_id)
+            self._add_to(self._postings, self._docs, doc_id, values)
+
+    def remove(self, doc_id: int):
+        """Xóa 1 tài liệu khỏi chỉ mục"""
+        with self._lock:
+            if self._building:
+                self._pending[doc_id] = None
+            self._remove_from(self._postings, self._docs, doc_id)
+
+    def _add_to(self, postings_by_field: Dict[str, Dict[str, Set[int]]],
+                docs: Dict[int, Dict[str, str]], doc_id: int, values: dict):
+        folded = {}
+        for field, (mode, _) in self.fields.items():
+            text = fold_text(values.get(field))
+            if mode == 'substring':
+                text = ''.join(_TOKEN_RE.findall(text))
+            if not text:
+                continue
+            folded[field] = text
+            postings = postings_by_field[field]
+            for gram in self._grams(text, mode):
+                postings[gram].add(doc_id)
+        docs[doc_id] = folded
+
+    def _remove_from(self, postings_by_field: Dict[str, Dict[str, Set[int]]],
+                     docs: Dict[int, Dict[str, str]], doc_id: int):
+        folded = docs.pop(doc_id, None)
+        if not folded:
+            return
+        for field, text in folded.items():
+            postings = postings_by_field[field]
+            for gram in self._grams(text, self.fields[field][0]):
+                ids = postings.get(gram)
+                if ids is not None:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del postings[gram]
+
+    def _grams(self, text: str, mode: str) -> Set[str]:
+        """Sinh các khóa index cho 1 giá trị đã chuẩn hóa"""
+        grams = set()
+        if mode == 'substring':
+            compact = ''.join(_TOKEN_RE.findall(text))
+            # Tiền tố ngắn để tra được từ khóa dưới NGRAM ký tự
+            for i in range(1, min(self.NGRAM, len(compact) + 1)):
+                grams.add(compact[:i])
+            for i in range(len(compact) - self.NGRAM + 1):
+                grams.add(compact[i:i + self.NGRAM])
+        else:
+            for token in _TOKEN_RE.findall(text):
+                # Khóa '=' + từ đánh dấu khớp trọn từ (dùng để cộng điểm)
+                grams.add('=' + token)
+                for i in range(1, min(len(token), self.MAX_PREFIX_LENGTH) + 1):
+                    grams.add(token[:i])
+        return grams
+
+    # ========== SEARCH ==========
+
+    def search(self, query: str, fields: Optional[List[str]] = None, limit: Optional[int] = None) -> List[int]:
+        """
+        Tìm kiếm và trả về danh sách ID đã xếp hạng
+
+        Mọi từ khóa phải khớp (AND); mỗi từ khóa khớp ở bất kỳ trường nào (OR).
+        Điểm = tổng trọng số trường khớp + thưởng khi khớp trọn từ;
+        bằng điểm thì ID lớn hơn (mới hơn) đứng trước.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        fields = [f for f in (fields or self.fields) if f in self.fields]
+
+        with self._lock:
+            # Tập khớp theo từng trường cho mỗi từ khóa
+            matches = []
+            for term in terms:
+                per_field = []
+                for field in fields:
+                    mode, weight = self.fields[field]
+                    ids = self._lookup(field, term)
+                    if ids:
+                        exact = self._postings[field].get('=' + term, ()) if mode == 'prefix' else ()
+                        per_field.append((ids, exact, weight))
+                if not per_field:
+                    return []
+                matches.append(per_field)
+
+            # Từ khóa hiếm nhất trước: các từ sau chỉ cần kiểm tra ứng viên còn lại
+            matches.sort(key=lambda per_field: sum(len(ids) for ids, _, _ in per_field))
+
+            scores: Dict[int, float] = {}
+            for ids, exact, weight in matches[0]:
+                for doc_id in ids:
+                    score = weight * 1.5 if doc_id in exact else weight
+                    if score > scores.get(doc_id, 0):
+                        scores[doc_id] = score
+
+            for per_field in matches[1:]:
+                next_scores = {}
+                for doc_id, total in scores.items():
+                    best = 0
+                    for ids, exact, weight in per_field:
+                        if doc_id in ids:
+                            score = weight * 1.5 if doc_id in exact else weight
+                            if score > best:
+                                best = score
+                    if best:
+                        next_scores[doc_id] = total + best
+                scores = next_scores
+                if not scores:
+                    return []
+
+        rank_key = lambda item: (-item[1], -item[0])
+        if limit is not None and limit < len(scores):
+            ranked = heapq.nsmallest(limit, scores.items(), key=rank_key)
+        else:
+            ranked = sorted(scores.items(), key=rank_key)
+        return [doc_id for doc_id, _ in ranked]
+
+    def _lookup(self, field: str, term: str) -> Set[int]:
+        """Tra postings của 1 từ khóa trong 1 trường"""
+        mode = self.fields[field][0]
+        postings = self._postings[field]
+
+        if mode != 'substring' or len(term) < self.NGRAM:
+            if mode == 'prefix':
+                term = term[:self.MAX_PREFIX_LENGTH]
+            return postings.get(term, set())
+
+        # Giao các trigram rồi kiểm tra lại chuỗi con thực sự
+        candidates = None
+        for i in range(len(term) - self.NGRAM + 1):
+            ids = postings.get(term[i:i + self.NGRAM])
+            if not ids:
+                return set()
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return set()
+
+        return {doc_id for doc_id in candidates if term in self._docs[doc_id].get(field, '')}
+
+    def __len__(self) -> int:
+        return len(self._docs)
@@ -0,0 +1,147 @@
+"""
+Statistics Service - Thống kê tổng hợp cho Dashboard / màn hình Sách / Bạn đọc
+
+Mỗi bộ thống kê được tính bằng 1 câu truy vấn gộp (conditional aggregation)
+thay cho hàng loạt COUNT/SUM riêng lẻ, và được giữ trong cache (snapshot)
+trong STATS_CACHE_TTL giây. Các thao tác ghi gọi invalidate_*() để làm mới.
+"""
+from datetime import datetime, timedelta
+import logging
+
+from config.database import db
+from config.settings import AppConfig
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Snapshot dùng chung cho toàn ứng dụng
+_stats_cache = TTLCache(ttl=AppConfig.STATS_CACHE_TTL)
+
+BOOK_STATS_KEY = 'books'
+READER_STATS_KEY = 'readers'
+
+
+class StatisticsService:
+    """Tính thống kê sách / bạn đọc bằng 1 truy vấn mỗi bộ, có cache TTL"""
+
+    EMPTY_BOOK_STATS = {
+        'total_books': 0,
+        'total_quantity': 0,
+        'available_quantity': 0,
+        'borrowed_quantity': 0,
+        'out_of_stock': 0,
+        'low_stock': 0,
+        'total_authors': 0,
+        'total_categories': 0,
+        'total_publishers': 0
+    }
+
+    EMPTY_READER_STATS = {
+        'total': 0,
+        'active': 0,
+        'expired': 0,
+        'locked': 0,
+        'avg_reputation': 0,
+        'expiring_soon': 0,
+        'high_reputation': 0,
+        'low_reputation': 0
+    }
+
+    # ========== SNAPSHOT (CACHE) ==========
+
+    def get_book_statistics(self) -> dict:
+        """Thống kê sách từ snapshot (tính lại khi hết TTL hoặc sau invalidate_books)"""
+        return self._cached(BOOK_STATS_KEY, self.compute_book_statistics)
+
+    def get_reader_statistics(self) -> dict:
+        """Thống kê bạn đọc từ snapshot (xem get_book_statistics)"""
+        stats = self._cached(READER_STATS_KEY, self.compute_reader_statistics)
+        return stats or dict(self.EMPTY_READER_STATS)
+
+    @staticmethod
+    def invalidate_books():
+        """Gọi sau khi thêm/sửa/xóa sách hoặc thay đổi tồn kho"""
+        _stats_cache.invalidate(BOOK_STATS_KEY)
+
+    @staticmethod
+    def invalidate_readers():
+        """Gọi sau khi thêm/sửa/xóa bạn đọc hoặc đổi trạng thái"""
+        _stats_cache.invalidate(READER_STATS_KEY)
+
+    @staticmethod
+    def cache_stats() -> dict:
+        """Hit/miss của snapshot thống kê"""
+        return _stats_cache.stats()
+
+    def _cached(self, key: str, compute) -> dict:
+        stats = _stats_cache.get(key)
+        if stats is None:
+            stats = compute()
+            # Không cache kết quả lỗi (dict rỗng) để lần sau thử lại
+            if stats:
+                _stats_cache.set(key, stats)
+        return dict(stats)
+
+    # ========== TÍNH TOÁN (1 TRUY VẤN / BỘ) ==========
+
+    def compute_book_statistics(self) -> dict:
+        """Thống kê sách bằng 1 truy vấn"""
+        query = """
+            SELECT
+                (SELECT COUNT(*) FROM books) AS total_books,
+                inv.total_quantity,
+                inv.available_quantity,
+                inv.out_of_stock,
+                inv.low_stock,
+                (SELECT COUNT(*) FROM authors) AS total_authors,
+                (SELECT COUNT(*) FROM categories) AS total_categories,
+                (SELECT COUNT(*) FROM publishers) AS total_publishers
+            FROM (
+                SELECT
+                    COALESCE(SUM(total_quantity), 0) AS total_quantity,
+                    COALESCE(SUM(available_quantity), 0) AS available_quantity,
+                    COALESCE(SUM(available_quantity = 0), 0) AS out_of_stock,
+                    COALESCE(SUM(available_quantity > 0 AND available_quantity < 5), 0) AS low_stock
+                FROM book_inventory
+            ) inv
+        """
+        try:
+            row = db.fetchone(query)
+            if not row:
+                return {}
+
+            stats = {key: int(row[key] or 0) for key in self.EMPTY_BOOK_STATS if key in row}
+            stats['borrowed_quantity'] = stats['total_quantity'] - stats['available_quantity']
+            return stats
+
+        except Exception as e:
+            logger.error(f"❌ Lỗi thống kê sách: {e}")
+            return {}
+
+    def compute_reader_statistics(self) -> dict:
+        """Thống kê bạn đọc bằng 1 truy vấn"""
+        date_30_days = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
+        query = """
+            SELECT
+                COUNT(*) AS total,
+                COALESCE(SUM(status = 'ACTIVE'), 0) AS active,
+                COALESCE(SUM(status = 'EXPIRED'), 0) AS expired,
+                COALESCE(SUM(status = 'LOCKED'), 0) AS locked,
+                AVG(reputation_score) AS avg_reputation,
+                COALESCE(SUM(card_end <= %s AND card_end >= CURDATE()), 0) AS expiring_soon,
+                COALESCE(SUM(reputation_score >= 90), 0) AS high_reputation,
+                COALESCE(SUM(reputation_score < 50), 0) AS low_reputation
+            FROM readers
+        """
+        try:
+            row = db.fetchone(query, (date_30_days,))
+            if not row:
+                return {}
+
+            stats = {key: int(row[key] or 0) for key in self.EMPTY_READER_STATS if key != 'avg_reputation'}
+            stats['avg_reputation'] = round(float(row['avg_reputation']), 2) if row['avg_reputation'] else 0
+            return stats
+
+        except Exception as e:
+            logger.error(f"❌ Lỗi thống kê bạn đọc: {e}")
+            return {}
@@ -1,7 +1,20 @@
 from config.database import db
-import json
+from services.backup_format import (
+    DATA_SUFFIX, BackupWriter, consistent_snapshots, is_streaming_backup, iter_cursor,
+    table_cursor, write_member
+)
+from services.backup_chain import BackupCatalog, ChangeTracker, chunked, key_condition
+from services.book_service import book_search_index
+from services.circulation_lookup_service import CirculationLookupService
+from services.reader_service import reader_search_index
+from services.restore_engine import BACKUP_TABLES, BulkRestoreEngine, iter_json_backup_tables
+from services.rollup_service import BorrowRollupService
+from services.statistics_service import StatisticsService
+from services.table_scheduler import MAX_WORKERS, TableScheduler, load_dependencies
 import os
-from datetime import datetime, date
+import queue
+import time
+from datetime import datetime
 
 
 class SystemService:
@@ -34,6 +47,7 @@ class SystemService:
             if conn is None: return False
 
             cursor = conn.cursor()
+            conn.start_transaction()
             for key, value in settings_dict.items():
                 cursor.execute(
                     "UPDATE system_settings SET setting_value = %s WHERE setting_key = %s",
@@ -49,71 +63,275 @@ class SystemService:
             return False
 
     # --- Phần Backup ---
-    def backup_data(self):
-        tables = ['categories', 'authors', 'publishers', 'books', 'book_inventory',
-                  'readers', 'borrow_slips', 'borrow_details', 'penalties', 'system_settings']
-        data = {}
+    def backup_data(self, incremental=False, workers=1, progress=None):
+        """
+        Sao lưu CSDL ra backup_<ts>[_delta].jsonl.gz + .manifest.json
 
-        try:
-            conn = db.get_connection()
-            if conn is None: return False, "No database connection"
+        Từng bảng được đọc bằng fetchmany và ghi nén ngay, bộ nhớ không phụ thuộc
+        kích thước CSDL (xem services/backup_format.py). Mọi bảng và mốc change_id
+        được đọc trong cùng 1 consistent snapshot.
 
-            cursor = conn.cursor(dictionary=True)
+        Args:
+            incremental: True = chỉ sao lưu các dòng thay đổi kể từ bản sao lưu gần nhất
+                         (tự chuyển sang toàn bộ nếu chưa có bản gốc phù hợp)
+            workers: Số bảng sao lưu đồng thời (bản full)
+            progress: Callback(tên_bảng, số_dòng, dòng/giây)
+        """
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        tracker = ChangeTracker(BACKUP_TABLES)
 
-            for table in tables:
-                cursor.execute(f"SELECT * FROM {table}")
-                rows = cursor.fetchall()
-                for row in rows:
-                    for k, v in row.items():
-                        if isinstance(v, (datetime, date)):
-                            row[k] = str(v)
-                data[table] = rows
+        try:
+            tracking = tracker.ensure_tracking()
+            candidate = self._delta_parent() if incremental and tracking else None
 
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"backup_{timestamp}.json"
-            filepath = os.path.join(self.backup_dir, filename)
+            started = time.perf_counter()
+            # Delta đọc tuần tự trên 1 snapshot; full mở 1 snapshot cho mỗi luồng
+            count = 1 if candidate else max(1, min(int(workers), MAX_WORKERS))
+            with consistent_snapshots(count) as snapshots:
+                epoch, hwm, floor = tracker.state(snapshots[0]) if tracking else (None, None, None)
+                parent = candidate if candidate and candidate.get('epoch') == epoch else None
+                if parent is not None:
+                    backup_id = f"backup_{timestamp}_delta"
+                    stats = self._write_delta(backup_id, tracker, parent, snapshots[0],
+                                              epoch, hwm, floor)
+                else:
+                    backup_id = f"backup_{timestamp}"
+                    stats = self._write_full(backup_id, snapshots, epoch, hwm, floor, progress)
 
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+            if parent is None and tracking:
+                # Delta sau này chỉ dựa trên bản full mới nhất
+                tracker.prune(hwm, floor)
 
-            cursor.close()
-            conn.close()
-            return True, filepath
+            message = os.path.join(self.backup_dir, backup_id + DATA_SUFFIX)
+            if incremental and parent is None:
+                message += "\n(Chưa có bản gốc phù hợp nên đã sao lưu toàn bộ)"
+            message += "\n" + self._format_stats(stats, time.perf_counter() - started)
+            return True, message
         except Exception as e:
             return False, str(e)
 
+    def _delta_parent(self):
+        """
+        Bản sao lưu mới nhất có thể làm gốc cho delta (còn phải cùng epoch theo dõi
+        thay đổi - kiểm tra sau khi đọc epoch trong snapshot)
+        """
+        latest = BackupCatalog(self.backup_dir).latest()
+        if latest is None or 'change_id_to' not in latest:
+            return None
+        return latest
+
+    def _write_full(self, backup_id, snapshots, epoch, hwm, floor=None, progress=None):
+        """
+        Sao lưu toàn bộ các bảng
+
+        Nhiều snapshot (cùng 1 thời điểm, xem consistent_snapshots): mỗi bảng được ghi ra
+        1 file tạm (1 gzip member) trên 1 snapshot rảnh, sau đó nối lần lượt vào file
+        dữ liệu theo thứ tự BACKUP_TABLES.
+        """
+        filepath = os.path.join(self.backup_dir, backup_id + DATA_SUFFIX)
+        parts = {}
+        idle = queue.Queue()
+        for snapshot in snapshots:
+            idle.put(snapshot)
+
+        def dump(table, write):
+            started = time.perf_counter()
+            report = None
+            if progress:
+                def report(name, rows):
+                    elapsed = time.perf_counter() - started
+                    progress(name, rows, rows / elapsed if elapsed > 0 else 0.0)
+
+            snapshot = idle.get()
+            try:
+                with table_cursor(f"SELECT * FROM `{table}`", snapshot=snapshot) as cursor:
+                    entry = write(table, cursor.column_names, iter_cursor(cursor), progress=report)
+            finally:
+                idle.put(snapshot)
+            return entry, self._table_stats(entry['rows'], time.perf_counter() - started)
+
+        def dump_part(table):
+            parts[table] = f"{filepath}.{table}.part"
+            with open(parts[table], 'wb') as part:
+                return dump(table, lambda *args, **kwargs: write_member(part, *args, **kwargs))
+
+        try:
+            with BackupWriter(filepath, kind='full', backup_id=backup_id,
+                              epoch=epoch, change_id_to=hwm, change_floor=floor) as writer:
+                if len(snapshots) > 1:
+                    results = TableScheduler(len(snapshots)).run(BACKUP_TABLES, dump_part)
+                    for table, (entry, _) in results.items():
+                        writer.append_part(parts[table], entry)
+                else:
+                    results = {}
+                    for table in BACKUP_TABLES:
+                        results[table] = dump(table, writer.write_table)
+        finally:
+            for part in parts.values():
+                if os.path.exists(part):
+                    os.remove(part)
+
+        return {table: stats for table, (_, stats) in results.items()}
+
+    def _write_delta(self, backup_id, tracker, parent, snapshot, epoch, hwm, floor=None):
+        """
+        Ghi các dòng thay đổi trong (parent.change_id_to, hwm], cộng các dòng commit muộn
+        sau bản trước (changed_at >= parent.change_floor); đọc tất cả trong snapshot
+
+        Mỗi bảng có thay đổi: 1 member 'upsert' (dòng hiện tại) và
+        1 member 'delete' (khóa chính của dòng không còn tồn tại).
+        """
+        after = parent['change_id_to']
+        filepath = os.path.join(self.backup_dir, backup_id + DATA_SUFFIX)
+        stats = {}
+
+        with BackupWriter(filepath, kind='delta', backup_id=backup_id,
+                          base=parent.get('base') or parent['backup_id'],
+                          parent=parent['backup_id'], epoch=epoch,
+                          change_id_from=after, change_id_to=hwm, change_floor=floor) as writer:
+            for table in BACKUP_TABLES:
+                keys = tracker.changed_keys(snapshot, table, after, hwm, parent.get('change_floor'))
+                if not keys:
+                    continue
+
+                started = time.perf_counter()
+                pk = tracker.primary_key(table)
+                with table_cursor(f"SELECT * FROM `{table}` LIMIT 0", snapshot=snapshot) as cursor:
+                    columns = cursor.column_names
+                    cursor.fetchall()
+
+                found = set()
+                entry = writer.write_table(
+                    table, columns,
+                    self._iter_changed_rows(snapshot, table, columns, pk, keys, found),
+                    op='upsert'
+                )
+                writer.write_table(table, pk, sorted(keys - found, key=str), op='delete')
+                stats[table] = self._table_stats(entry['rows'], time.perf_counter() - started)
+
+        return stats
+
+    @staticmethod
+    def _iter_changed_rows(snapshot, table, columns, pk, keys, found):
+        """Dòng của các khóa đã thay đổi trong snapshot (theo lô); ghi lại khóa tìm thấy vào found"""
+        positions = [columns.index(c) for c in pk]
+        for batch in chunked(keys, 1000):
+            params = tuple(value for key in batch for value in key)
+            with table_cursor(f"SELECT * FROM `{table}` WHERE {key_condition(pk, len(batch))}",
+                              params, snapshot=snapshot) as cursor:
+                for row in iter_cursor(cursor):
+                    found.add(tuple(row[i] for i in positions))
+                    yield row
+
     # --- Phần Restore ---
-    def restore_data(self, filepath):
+    def restore_data(self, filepath, progress=None, workers=1):
+        """
+        Phục hồi dữ liệu từ file sao lưu
+
+        File được đọc theo luồng từng bảng và nạp hàng loạt (xem BulkRestoreEngine),
+        nên bộ nhớ không phụ thuộc kích thước file.
+
+        Chọn 1 bản delta sẽ phục hồi cả chuỗi: bản full gốc rồi lần lượt các delta
+        đến bản đã chọn. Mọi bản trong chuỗi được kiểm tra checksum trước khi
+        xóa dữ liệu hiện tại.
+
+        Args:
+            filepath: Đường dẫn file sao lưu (.jsonl.gz / .manifest.json, hoặc .json cũ)
+            progress: Callback(tên_bảng, số_dòng, dòng/giây) để hiển thị tiến độ
+                      (có thể được gọi đồng thời từ nhiều thread)
+            workers: Số bảng nạp đồng thời (bảng con chờ bảng cha theo khóa ngoại);
+                     file .json cũ luôn đọc tuần tự
+        """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            started = time.perf_counter()
+            engine = BulkRestoreEngine(progress=progress)
 
-            conn = db.get_connection()
-            if conn is None: return False, "Lỗi kết nối CSDL"
+            if is_streaming_backup(filepath):
+                chain = BackupCatalog(os.path.dirname(os.path.abspath(filepath))).chain(filepath)
+                for reader in chain:
+                    reader.verify()
 
-            cursor = conn.cursor()
-            cursor.execute("SET FOREIGN_KEY_CHECKS = 0;")
-
-            tables = ['categories', 'authors', 'publishers', 'books', 'book_inventory',
-                      'readers', 'borrow_slips', 'borrow_details', 'penalties', 'system_settings']
-
-            for table in tables:
-                if table in data:
-                    rows = data[table]
-                    if not rows: continue
-                    cursor.execute(f"TRUNCATE TABLE {table}")
-                    for row in rows:
-                        cols = ', '.join(f"`{k}`" for k in row.keys())
-                        placeholders = ', '.join(['%s'] * len(row))
-                        sql = f"INSERT INTO `{table}` ({cols}) VALUES ({placeholders})"
-                        cursor.execute(sql, list(row.values()))
-
-            cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True, "Phục hồi dữ liệu thành công!"
+                stats = self._restore_base(engine, chain[0], workers)
+                for reader in chain[1:]:
+                    self._apply_delta(engine, reader, stats)
+            else:
+                chain = []
+                stats = engine.restore(iter_json_backup_tables(filepath))
+
+            self._after_restore()
+
+            deltas = f" (kèm {len(chain) - 1} bản tăng dần)" if len(chain) > 1 else ""
+            return True, (f"Phục hồi dữ liệu thành công{deltas}!\n" +
+                          self._format_stats(stats, time.perf_counter() - started))
 
         except Exception as e:
             print(f"Restore Error: {e}")
-            return False, str(e)
\ No newline at end of file
+            return False, str(e)
+
+    def restore_until(self, until, progress=None, workers=1):
+        """Phục hồi về trạng thái của bản sao lưu mới nhất tạo trước thời điểm until"""
+        manifest = BackupCatalog(self.backup_dir).point_in_time(until)
+        if manifest is None:
+            return False, f"Không có bản sao lưu nào trước {until:%d/%m/%Y %H:%M}"
+        return self.restore_data(manifest['path'], progress=progress, workers=workers)
+
+    @staticmethod
+    def _restore_base(engine, reader, workers):
+        """Nạp bản full; nhiều luồng thì mỗi bảng đọc member của nó theo offset trong manifest"""
+        if workers <= 1:
+            return engine.restore(reader.iter_tables())
+
+        entries = {entry['name']: entry for entry in reader.tables}
+        scheduler = TableScheduler(workers, load_dependencies(entries))
+        return scheduler.run(
+            list(entries),
+            lambda name: engine.restore_table(name, entries[name]['columns'],
+                                              reader.iter_rows(entries[name]))
+        )
+
+    @staticmethod
+    def _apply_delta(engine, reader, stats):
+        """Ghi đè dòng thay đổi và xóa dòng đã xóa theo 1 bản delta"""
+        for entry in reader.tables:
+            name = entry['name']
+            rows = reader.iter_rows(entry)
+            if entry.get('op') == 'delete':
+                engine.delete_rows(name, entry['columns'], rows)
+                continue
+
+            result = engine.restore_table(name, entry['columns'], rows, truncate=False)
+            total = stats.setdefault(name, {'rows': 0, 'seconds': 0.0})
+            total['rows'] += result['rows']
+            total['seconds'] += result['seconds']
+
+    @staticmethod
+    def _table_stats(rows, seconds):
+        return {'rows': rows, 'seconds': round(seconds, 3),
+                'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else 0.0}
+
+    @staticmethod
+    def _format_stats(stats, elapsed):
+        """Tổng kết: tổng số dòng theo thời gian thực + tốc độ từng bảng"""
+        rows = sum(s['rows'] for s in stats.values())
+        rate = rows / elapsed if elapsed > 0 else 0
+        lines = [f"{rows:,} dòng / {len(stats)} bảng trong {elapsed:.1f}s ({rate:,.0f} dòng/s)"]
+        for table, s in stats.items():
+            table_rate = s['rows'] / s['seconds'] if s['seconds'] > 0 else 0
+            lines.append(f"  • {table}: {s['rows']:,} dòng, {s['seconds']:.1f}s ({table_rate:,.0f} dòng/s)")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _after_restore():
+        """Dữ liệu đã bị thay toàn bộ: bỏ snapshot thống kê, chỉ mục tìm kiếm và rollup cũ"""
+        StatisticsService.invalidate_books()
+        StatisticsService.invalidate_readers()
+        book_search_index.invalidate()
+        reader_search_index.invalidate()
+        CirculationLookupService.invalidate_books()
+        CirculationLookupService.invalidate_readers()
+        BorrowRollupService().rebuild_all()
+        try:
+            # Log thay đổi cũ không còn khớp: bản sao lưu kế tiếp phải là full
+            ChangeTracker(BACKUP_TABLES).reset()
+        except Exception as e:
+            print(f"Reset change log error: {e}")
@@ -0,0 +1,114 @@
+"""
+Table Scheduler - Chạy sao lưu / phục hồi nhiều bảng song song
+
+Mỗi bảng là 1 tác vụ chạy trên 1 thread (và 1 connection riêng của pool).
+Bảng chỉ được bắt đầu khi mọi bảng cha (khóa ngoại) trong cùng đợt đã xong,
+nên các bảng lớn độc lập (borrow_slips, borrow_details, penalties ...) chạy
+đồng thời còn thứ tự cha -> con vẫn được giữ khi phục hồi.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Set
+import logging
+
+from config.database import db
+from config.settings import DatabaseConfig
+
+logger = logging.getLogger(__name__)
+
+# Pool của mysql-connector không chờ connection rảnh mà báo "pool exhausted" ngay, nên
+# sao lưu / phục hồi chỉ được dùng 1/3 pool: sao lưu full giữ thêm 1 connection điều phối
+# lúc mở snapshot, phần còn lại cho giao diện, BackgroundLoader, xuất file, AI insights
+MAX_WORKERS = max(1, DatabaseConfig.POOL_SIZE // 3)
+
+
+def load_dependencies(tables: Iterable[str]) -> Dict[str, Set[str]]:
+    """
+    Bảng cha (được tham chiếu bởi khóa ngoại) của từng bảng, chỉ trong danh sách đã cho
+
+    Không đọc được information_schema thì mỗi bảng phụ thuộc bảng đứng trước nó
+    (chạy tuần tự theo thứ tự danh sách).
+    """
+    tables = list(tables)
+    try:
+        with db.transaction() as tx:
+            rows = tx.fetchall("""
+                SELECT DISTINCT TABLE_NAME, REFERENCED_TABLE_NAME
+                FROM information_schema.KEY_COLUMN_USAGE
+                WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL
+            """)
+    except Exception as e:
+        logger.warning(f"⚠️ Không đọc được khóa ngoại, chạy tuần tự: {e}")
+        return {t: set(tables[:i]) for i, t in enumerate(tables)}
+
+    dependencies = {t: set() for t in tables}
+    for row in rows:
+        child, parent = row['TABLE_NAME'], row['REFERENCED_TABLE_NAME']
+        if child in dependencies and parent in dependencies and child != parent:
+            dependencies[child].add(parent)
+    return dependencies
+
+
+class TableScheduler:
+    """
+    Chạy task(tên_bảng) cho nhiều bảng với tối đa workers thread
+
+    Args:
+        workers: Số bảng chạy đồng thời (giới hạn bởi MAX_WORKERS)
+        dependencies: {bảng: {bảng cha}}; None = các bảng độc lập
+    """
+
+    def __init__(self, workers: int = 4, dependencies: Optional[Dict[str, Set[str]]] = None):
+        self.workers = max(1, min(int(workers), MAX_WORKERS))
+        self.dependencies = dependencies or {}
+
+    def run(self, tables: List[str], task: Callable[[str], dict]) -> Dict[str, dict]:
+        """
+        Chạy task cho mọi bảng, giữ thứ tự phụ thuộc
+
+        Returns:
+            dict: {bảng: kết quả task} theo thứ tự danh sách tables
+
+        Raises:
+            Exception: Lỗi của bảng đầu tiên thất bại (các bảng chưa bắt đầu bị bỏ)
+        """
+        pending = list(tables)
+        waiting_on = {t: set(self.dependencies.get(t, ())) & set(tables) for t in tables}
+        results: Dict[str, dict] = {}
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='table-worker') as executor:
+            while pending or running:
+                if error is None:
+                    for table in [t for t in pending if not waiting_on[t]]:
+                        if len(running) >= self.workers:
+                            break
+                        pending.remove(table)
+                        running[executor.submit(task, table)] = table
+
+                if not running:
+                    if pending and error is None:
+                        raise ValueError(f"Phụ thuộc vòng giữa các bảng: {', '.join(pending)}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    table = running.pop(future)
+                    try:
+                        results[table] = future.result()
+                    except Exception as e:
+                        logger.error(f"❌ Lỗi xử lý bảng '{table}': {e}")
+                        if error is None:
+                            error = e
+                        continue
+                    for waiting in waiting_on.values():
+                        waiting.discard(table)
+
+        if error is not None:
+            raise error
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"✅ Xong {len(results)} bảng với {self.workers} luồng trong {elapsed:.2f}s")
+        return {t: results[t] for t in tables}
@@ -0,0 +1,211 @@
+"""
+Cấu hình pytest
+
+Các test có CSDL chạy trên 1 schema riêng, mọi bảng bị xóa và tạo lại (tests/schema.sql)
+mỗi lần chạy:
+
+    TEST_DB_NAME=library_test python -m pytest -q
+
+DB_HOST / DB_PORT / DB_USER / DB_PASSWORD dùng chung với ứng dụng (.env). Thiếu
+TEST_DB_NAME thì chỉ chạy các test không cần CSDL (import services là kết nối CSDL).
+"""
+import os
+import sys
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEST_DATABASE = os.getenv('TEST_DB_NAME')
+if TEST_DATABASE:
+    # Đặt trước khi import config: connection pool kết nối tới DB_NAME ngay khi import
+    os.environ['DB_NAME'] = TEST_DATABASE
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
+# Module test cần CSDL (bỏ qua khi chưa đặt TEST_DB_NAME); api.response_cache dùng
+# utils.TTLCache, mà import utils cũng kết nối CSDL
+DB_TEST_MODULES = ['test_database.py', 'test_paging.py', 'test_search_index.py',
+                   'test_inventory.py', 'test_bulk_return.py', 'test_penalty_service.py',
+                   'test_backup_chain.py', 'test_response_cache.py']
+collect_ignore = [] if TEST_DATABASE else DB_TEST_MODULES
+
+
+def pytest_report_header(config):
+    if TEST_DATABASE:
+        return f"CSDL test: {TEST_DATABASE}"
+    return "Chưa đặt TEST_DB_NAME: bỏ qua các test cần CSDL"
+
+
+def pytest_configure(config):
+    """Tạo database test trước khi thu thập test (import services sẽ kết nối tới nó)"""
+    if not TEST_DATABASE:
+        return
+    if 'test' not in TEST_DATABASE.lower():
+        pytest.exit(f"TEST_DB_NAME='{TEST_DATABASE}' phải là schema dành cho test "
+                    f"(tên chứa 'test'): mọi bảng của nó sẽ bị xóa", returncode=4)
+
+    import mysql.connector
+    from config.settings import DatabaseConfig
+
+    settings = DatabaseConfig.get_config()
+    settings.pop('database')
+    connection = mysql.connector.connect(**settings)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{TEST_DATABASE}` "
+                       f"CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        cursor.close()
+    finally:
+        connection.close()
+
+
+# ========== SCHEMA ==========
+
+def _run_on_connection(statements):
+    from config.database import db
+
+    connection = db.get_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for statement in statements(cursor):
+            cursor.execute(statement)
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        connection.commit()
+    finally:
+        cursor.close()
+        db.release_connection(connection)
+
+
+def _base_tables(cursor):
+    cursor.execute("""
+        SELECT table_name AS name FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_type = 'BASE TABLE'
+    """)
+    return [name for (name,) in cursor.fetchall()]
+
+
+def _reset_memory_state():
+    """Cache / chỉ mục / cờ trong bộ nhớ của services (dữ liệu vừa bị thay)"""
+    from services.book_service import book_search_index
+    from services.borrow_service import BorrowService
+    from services.circulation_lookup_service import CirculationLookupService
+    from services.reader_service import reader_search_index
+    from services.statistics_service import StatisticsService
+
+    book_search_index.invalidate()
+    reader_search_index.invalidate()
+    CirculationLookupService.invalidate_books()
+    CirculationLookupService.invalidate_readers()
+    StatisticsService.invalidate_books()
+    StatisticsService.invalidate_readers()
+    BorrowService._indexes_checked = False
+    CirculationLookupService._indexes_checked = False
+
+
+@pytest.fixture(scope='session')
+def schema():
+    """Xóa mọi bảng của schema test rồi tạo lại theo tests/schema.sql"""
+    from services.rollup_service import BorrowRollupService
+
+    with open(SCHEMA_FILE, encoding='utf-8') as f:
+        create = [s for s in f.read().split(';') if s.strip()]
+
+    def statements(cursor):
+        drops = [f"DROP TABLE `{name}`" for name in _base_tables(cursor)]
+        return drops + create
+
+    _run_on_connection(statements)
+    # Bảng rollup vừa bị xóa: tạo lại ở lần ghi đầu tiên
+    BorrowRollupService._schema_ready = False
+    BorrowRollupService._backfilled = False
+
+
+@pytest.fixture
+def clean_db(schema):
+    """Mọi bảng rỗng và trạng thái trong bộ nhớ đã xóa trước mỗi test"""
+    from config.database import db
+
+    _run_on_connection(lambda cursor: [f"TRUNCATE TABLE `{name}`" for name in _base_tables(cursor)])
+    _reset_memory_state()
+    return db
+
+
+# ========== DỮ LIỆU MẪU ==========
+
+class Library:
+    """Tạo dữ liệu mẫu tối thiểu bằng SQL trực tiếp (không qua services đang được test)"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def category(self, name: str = 'Văn học') -> int:
+        return self.db.execute_insert("INSERT INTO categories (category_name) VALUES (%s)", (name,))
+
+    def author(self, name: str = 'Tô Hoài') -> int:
+        return self.db.execute_insert("INSERT INTO authors (author_name) VALUES (%s)", (name,))
+
+    def book(self, title: str, barcode: Optional[str] = None, isbn: Optional[str] = None,
+             stock: int = 5, author_id: Optional[int] = None, category_id: Optional[int] = None) -> int:
+        with self.db.transaction() as tx:
+            book_id = tx.execute_insert("""
+                INSERT INTO books (title, barcode, isbn, author_id, category_id, price)
+                VALUES (%s, %s, %s, %s, %s, 50000)
+            """, (title, barcode, isbn, author_id, category_id))
+            tx.execute("""
+                INSERT INTO book_inventory (book_id, total_quantity, available_quantity)
+                VALUES (%s, %s, %s)
+            """, (book_id, stock, stock))
+        return book_id
+
+    def reader(self, name: str, phone: Optional[str] = None) -> int:
+        today = date.today()
+        return self.db.execute_insert("""
+            INSERT INTO readers (full_name, phone, card_start, card_end, status, reputation_score)
+            VALUES (%s, %s, %s, %s, 'ACTIVE', 100)
+        """, (name, phone, today - timedelta(days=365), today + timedelta(days=365)))
+
+    def slip(self, reader_id: int, books: Dict[int, int], borrow_date: date,
+             return_due: Optional[date] = None, status: str = 'BORROWING') -> int:
+        """Phiếu mượn {book_id: số lượng}; tồn kho được trừ như khi cho mượn"""
+        return_due = return_due or borrow_date + timedelta(days=14)
+        with self.db.transaction() as tx:
+            slip_id = tx.execute_insert("""
+                INSERT INTO borrow_slips (reader_id, staff_id, borrow_date, return_due, status)
+                VALUES (%s, 1, %s, %s, %s)
+            """, (reader_id, borrow_date, return_due, status))
+            for book_id, quantity in books.items():
+                tx.execute("""
+                    INSERT INTO borrow_details (slip_id, book_id, quantity, fine_amount)
+                    VALUES (%s, %s, %s, 0)
+                """, (slip_id, book_id, quantity))
+                if status != 'RETURNED':
+                    tx.execute("""
+                        UPDATE book_inventory SET available_quantity = available_quantity - %s
+                        WHERE book_id = %s
+                    """, (quantity, book_id))
+        return slip_id
+
+    def setting(self, key: str, value):
+        self.db.execute("""
+            INSERT INTO system_settings (setting_key, setting_value) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE setting_value = VALUES(setting_value)
+        """, (key, str(value)))
+
+    def available(self, book_id: int) -> int:
+        row = self.db.fetchone("SELECT available_quantity FROM book_inventory WHERE book_id = %s",
+                               (book_id,))
+        return row['available_quantity']
+
+    def count(self, table: str, where: str = '1 = 1', params: tuple = ()) -> int:
+        row = self.db.fetchone(f"SELECT COUNT(*) AS count FROM `{table}` WHERE {where}", params)
+        return row['count']
+
+
+@pytest.fixture
+def library(clean_db):
+    return Library(clean_db)
@@ -0,0 +1,95 @@
+-- Schema tối thiểu cho test (các bảng sao lưu + cột mà services dùng)
+-- Bảng rollup, log thay đổi và trigger do services tự tạo khi chạy
+
+CREATE TABLE categories (
+    category_id INT AUTO_INCREMENT PRIMARY KEY,
+    category_name VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE authors (
+    author_id INT AUTO_INCREMENT PRIMARY KEY,
+    author_name VARCHAR(150) NOT NULL
+);
+
+CREATE TABLE publishers (
+    publisher_id INT AUTO_INCREMENT PRIMARY KEY,
+    publisher_name VARCHAR(150) NOT NULL,
+    address VARCHAR(255),
+    phone VARCHAR(20)
+);
+
+CREATE TABLE books (
+    book_id INT AUTO_INCREMENT PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    author_id INT,
+    category_id INT,
+    publisher_id INT,
+    publish_year INT,
+    isbn VARCHAR(20),
+    barcode VARCHAR(50),
+    price DECIMAL(12, 2),
+    description TEXT,
+    FOREIGN KEY (author_id) REFERENCES authors (author_id),
+    FOREIGN KEY (category_id) REFERENCES categories (category_id),
+    FOREIGN KEY (publisher_id) REFERENCES publishers (publisher_id)
+);
+
+CREATE TABLE book_inventory (
+    book_id INT PRIMARY KEY,
+    total_quantity INT NOT NULL DEFAULT 0,
+    available_quantity INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (book_id) REFERENCES books (book_id)
+);
+
+CREATE TABLE readers (
+    reader_id INT AUTO_INCREMENT PRIMARY KEY,
+    full_name VARCHAR(150) NOT NULL,
+    address VARCHAR(255),
+    phone VARCHAR(20),
+    email VARCHAR(100),
+    card_start DATE,
+    card_end DATE,
+    status ENUM('ACTIVE', 'EXPIRED', 'LOCKED') DEFAULT 'ACTIVE',
+    reputation_score INT DEFAULT 100,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE TABLE borrow_slips (
+    slip_id INT AUTO_INCREMENT PRIMARY KEY,
+    reader_id INT NOT NULL,
+    staff_id INT,
+    borrow_date DATE NOT NULL,
+    return_due DATE,
+    return_date DATE,
+    status ENUM('BORROWING', 'RETURNED', 'LATE', 'LOST') DEFAULT 'BORROWING',
+    FOREIGN KEY (reader_id) REFERENCES readers (reader_id)
+);
+
+CREATE TABLE borrow_details (
+    detail_id INT AUTO_INCREMENT PRIMARY KEY,
+    slip_id INT NOT NULL,
+    book_id INT NOT NULL,
+    quantity INT NOT NULL DEFAULT 1,
+    fine_amount DECIMAL(12, 2) DEFAULT 0,
+    FOREIGN KEY (slip_id) REFERENCES borrow_slips (slip_id),
+    FOREIGN KEY (book_id) REFERENCES books (book_id)
+);
+
+CREATE TABLE penalties (
+    penalty_id INT AUTO_INCREMENT PRIMARY KEY,
+    reader_id INT NOT NULL,
+    slip_id INT,
+    book_id INT,
+    penalty_type ENUM('LATE', 'LOST', 'DAMAGED') NOT NULL,
+    amount DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    created_at DATETIME,
+    FOREIGN KEY (reader_id) REFERENCES readers (reader_id),
+    FOREIGN KEY (slip_id) REFERENCES borrow_slips (slip_id),
+    FOREIGN KEY (book_id) REFERENCES books (book_id)
+);
+
+CREATE TABLE system_settings (
+    setting_key VARCHAR(50) PRIMARY KEY,
+    setting_value VARCHAR(255)
+);
@@ -0,0 +1,211 @@
+"""Sao lưu full -> delta -> phục hồi theo chuỗi (user-012, user-013, user-014)"""
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from services import backup_chain
+from services.backup_chain import BackupCatalog, ChangeTracker
+from services.backup_format import BackupReader
+from services.restore_engine import BACKUP_TABLES
+from services.system_service import SystemService
+from services.table_scheduler import MAX_WORKERS
+
+
+@pytest.fixture
+def system(library, tmp_path, monkeypatch):
+    """SystemService ghi bản sao lưu vào thư mục tạm; cần quyền tạo trigger"""
+    monkeypatch.chdir(tmp_path)
+    if not ChangeTracker(BACKUP_TABLES).ensure_tracking():
+        pytest.skip("Tài khoản MySQL test không tạo được trigger theo dõi thay đổi")
+    return SystemService()
+
+
+@pytest.fixture
+def seeded(library):
+    category = library.category('Văn học')
+    author = library.author('Tô Hoài')
+    reader = library.reader('Nguyễn Văn An', phone='0912345678')
+    book = library.book('Dế Mèn', barcode='BC-1', stock=3, author_id=author, category_id=category)
+    library.setting('LATE_FEE_PER_DAY', 2000)
+    library.slip(reader, {book: 1}, date.today() - timedelta(days=3))
+    return {'category': category, 'author': author, 'reader': reader, 'book': book}
+
+
+def backup(system, **kwargs) -> str:
+    """Chạy sao lưu, trả về đường dẫn file dữ liệu (mã bản sao lưu theo giây: chờ sang giây mới)"""
+    time.sleep(1.1)
+    success, message = system.backup_data(**kwargs)
+    assert success, message
+    return message.splitlines()[0]
+
+
+def dump(db) -> dict:
+    return {table: db.fetchall(f"SELECT * FROM `{table}` ORDER BY 1") for table in BACKUP_TABLES}
+
+
+# ========== CHUỖI FULL -> DELTA ==========
+
+def test_restore_delta_replays_whole_chain(library, system, seeded):
+    db = library.db
+    full = backup(system)
+
+    # Delta 1: sửa, thêm, xóa
+    spare = library.category('Thiếu nhi')
+    db.execute("UPDATE books SET title = %s WHERE book_id = %s", ('Dế Mèn Phiêu Lưu Ký', seeded['book']))
+    second_book = library.book('Tắt Đèn', barcode='BC-2', stock=2, category_id=spare)
+    db.execute("UPDATE readers SET phone = %s WHERE reader_id = %s", ('0987654321', seeded['reader']))
+    first = backup(system, incremental=True)
+
+    # Delta 2: xóa dòng đã có trong bản full và dòng mới thêm ở delta 1
+    db.execute("DELETE FROM system_settings WHERE setting_key = 'LATE_FEE_PER_DAY'")
+    db.execute("DELETE FROM book_inventory WHERE book_id = %s", (second_book,))
+    db.execute("DELETE FROM books WHERE book_id = %s", (second_book,))
+    db.execute("DELETE FROM categories WHERE category_id = %s", (spare,))
+    library.slip(seeded['reader'], {seeded['book']: 2}, date.today() - timedelta(days=1))
+    second = backup(system, incremental=True)
+
+    assert first.endswith('_delta.jsonl.gz') and second.endswith('_delta.jsonl.gz')
+    chain = BackupCatalog(system.backup_dir).chain(second)
+    assert [reader.path for reader in chain] == [full, first, second]
+    assert [r.manifest.get('parent') for r in chain[1:]] == [chain[0].manifest['backup_id'],
+                                                           chain[1].manifest['backup_id']]
+
+    expected = dump(db)
+
+    # Dữ liệu bị sửa / xóa lung tung sau lần sao lưu cuối
+    library.book('Sau sao lưu', stock=1)
+    db.execute("UPDATE book_inventory SET available_quantity = 0")
+    db.execute("DELETE FROM borrow_details")
+
+    success, message = system.restore_data(second)
+
+    assert success, message
+    assert '2 bản tăng dần' in message
+    assert dump(db) == expected
+
+
+def test_delta_only_contains_changed_rows(library, system, seeded, monkeypatch):
+    # Không trừ hao: dòng log của dữ liệu mẫu (trước bản full >= 1 giây) không bị quét lại
+    monkeypatch.setattr(backup_chain, 'LATE_COMMIT_SLACK', 0)
+    backup(system)
+    library.db.execute("UPDATE readers SET address = %s WHERE reader_id = %s",
+                       ('Hà Nội', seeded['reader']))
+
+    delta = BackupReader(backup(system, incremental=True))
+
+    assert delta.manifest['kind'] == 'delta'
+    upserts = {t['name']: t['rows'] for t in delta.tables if t.get('op') == 'upsert'}
+    assert upserts == {'readers': 1}
+
+
+def test_backup_after_restore_is_full(library, system, seeded):
+    full = backup(system)
+    assert system.restore_data(full)[0]
+
+    path = backup(system, incremental=True)
+
+    assert not path.endswith('_delta.jsonl.gz')
+    assert BackupReader(path).manifest['kind'] == 'full'
+
+
+# ========== KIỂM TRA CHUỖI TRƯỚC KHI XÓA DỮ LIỆU ==========
+
+def test_corrupt_delta_fails_before_wiping(library, system, seeded):
+    backup(system)
+    library.db.execute("UPDATE books SET title = 'Đã sửa' WHERE book_id = %s", (seeded['book'],))
+    delta = backup(system, incremental=True)
+
+    entry = BackupReader(delta).tables[0]
+    with open(delta, 'r+b') as f:
+        f.seek(entry['offset'] + entry['length'] // 2)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    library.book('Sau sao lưu', stock=1)
+    before = dump(library.db)
+
+    success, message = system.restore_data(delta)
+
+    assert not success
+    assert 'hỏng' in message or 'không khớp' in message
+    assert dump(library.db) == before
+
+
+def test_missing_parent_fails_before_wiping(library, system, seeded):
+    full = backup(system)
+    library.db.execute("UPDATE books SET title = 'Đã sửa' WHERE book_id = %s", (seeded['book'],))
+    delta = backup(system, incremental=True)
+    os.remove(BackupReader(full).manifest_path)
+    before = dump(library.db)
+
+    success, message = system.restore_data(delta)
+
+    assert not success
+    assert 'Thiếu bản sao lưu' in message
+    assert dump(library.db) == before
+
+
+# ========== GIAO DỊCH COMMIT MUỘN / SAO LƯU NHIỀU LUỒNG ==========
+
+def test_row_committed_after_full_snapshot_lands_in_next_delta(library, system, seeded):
+    db = library.db
+    held = db.get_connection()
+    cursor = held.cursor()
+    held.start_transaction()
+    try:
+        # Giữ change_id nhỏ hơn mốc của bản full nhưng chưa commit khi chụp snapshot
+        cursor.execute("INSERT INTO categories (category_name) VALUES ('Commit muộn')")
+        late_id = cursor.lastrowid
+        library.category('Commit sớm')
+
+        full = backup(system)
+        held.commit()
+    finally:
+        cursor.close()
+        db.release_connection(held)
+
+    reader = BackupReader(full)
+    assert late_id not in {row[0] for row in reader.iter_rows(reader.table('categories'))}
+
+    delta = backup(system, incremental=True)
+    expected = dump(db)
+    db.execute("DELETE FROM categories WHERE category_id = %s", (late_id,))
+
+    success, message = system.restore_data(delta)
+
+    assert success, message
+    assert dump(db) == expected
+    assert library.count('categories', 'category_id = %s', (late_id,)) == 1
+
+
+def test_parallel_full_backup_is_one_consistent_state(library, system, seeded):
+    stop = threading.Event()
+
+    def writer():
+        # Mỗi sách và dòng tồn kho của nó commit cùng nhau
+        i = 0
+        while not stop.is_set():
+            library.book(f"Đồng thời {i}", stock=1)
+            i += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        time.sleep(0.3)
+        path = backup(system, workers=MAX_WORKERS)
+    finally:
+        stop.set()
+        thread.join(30)
+
+    reader = BackupReader(path)
+    books = {row[0] for row in reader.iter_rows(reader.table('books'))}
+    inventory = {row[0] for row in reader.iter_rows(reader.table('book_inventory'))}
+    assert books == inventory
+
+    success, message = system.restore_data(path, workers=MAX_WORKERS)
+    assert success, message
+    assert library.count('books') == library.count('book_inventory') == len(books)
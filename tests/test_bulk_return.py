@@ -0,0 +1,151 @@
+"""Trả sách hàng loạt / từng phiếu: hoàn kho, phạt trễ hạn chung 1 cách tính, bỏ qua phiếu đã trả (user-023)"""
+from datetime import date, timedelta
+
+import pytest
+
+from services.borrow_service import BorrowService
+
+FEE = 2000
+
+
+@pytest.fixture
+def desk(library):
+    """2 bạn đọc, 3 đầu sách; 1 phiếu trễ 5 ngày (2 đầu sách), 1 phiếu đúng hạn, 1 phiếu đã trả"""
+    today = date.today()
+    library.setting('LATE_FEE_PER_DAY', FEE)
+    first, second = library.reader('Nguyễn Văn An'), library.reader('Trần Thị Bình')
+    books = {
+        'de_men': library.book('Dế Mèn', barcode='BC-1', stock=5),
+        'tat_den': library.book('Tắt Đèn', barcode='BC-2', stock=5),
+        'so_do': library.book('Số Đỏ', barcode='BC-3', stock=5),
+    }
+    slips = {
+        'late': library.slip(first, {books['de_men']: 2, books['tat_den']: 1},
+                             today - timedelta(days=19), return_due=today - timedelta(days=5)),
+        'on_time': library.slip(second, {books['so_do']: 1},
+                                today - timedelta(days=3), return_due=today + timedelta(days=11)),
+        'returned': library.slip(second, {books['de_men']: 1},
+                                 today - timedelta(days=30), return_due=today - timedelta(days=16),
+                                 status='RETURNED'),
+    }
+    return {'readers': (first, second), 'books': books, 'slips': slips}
+
+
+def _penalties(library):
+    return library.db.fetchall(
+        "SELECT reader_id, slip_id, book_id, penalty_type, amount FROM penalties ORDER BY book_id"
+    )
+
+
+def test_return_by_slip_ids(library, desk):
+    books, slips = desk['books'], desk['slips']
+
+    success, message, summary = BorrowService().return_books_bulk(
+        slip_ids=[slips['late'], slips['on_time'], slips['returned'], 99999, 'PM-7', ' ']
+    )
+
+    assert success, message
+    assert summary['returned'] == 2
+    assert summary['late'] == 1
+    assert summary['skipped'] == 1
+    assert summary['not_found'] == ['PM-7', 99999]
+    assert summary['late_fee_per_day'] == FEE
+
+    # Tồn kho về đủ (phiếu đã trả trước đó không được cộng lại)
+    assert [library.available(book) for book in books.values()] == [5, 5, 5]
+    assert library.count('borrow_slips', "status <> 'RETURNED'") == 0
+    assert library.count('borrow_slips', "return_date IS NOT NULL") == 2
+
+    # Phạt = số ngày trễ x số bản x phí/ngày, mỗi sách của phiếu trễ 1 dòng
+    penalties = _penalties(library)
+    first_reader = desk['readers'][0]
+    assert [(p['reader_id'], p['slip_id'], p['book_id'], p['penalty_type'], float(p['amount']))
+            for p in penalties] == [
+        (first_reader, slips['late'], books['de_men'], 'LATE', 5 * 2 * FEE),
+        (first_reader, slips['late'], books['tat_den'], 'LATE', 5 * 1 * FEE),
+    ]
+
+
+def test_return_by_barcode_returns_whole_oldest_slip(library, desk):
+    books, slips = desk['books'], desk['slips']
+    # Phiếu thứ 2 cũng đang mượn Dế Mèn, mới hơn phiếu trễ hạn
+    newer = library.slip(desk['readers'][1], {books['de_men']: 1}, date.today())
+
+    success, message, summary = BorrowService().return_books_bulk(barcodes=['BC-1', 'BC-9'])
+
+    assert success, message
+    assert summary['returned'] == 1
+    assert summary['not_found'] == ['BC-9']
+    # Cả phiếu trễ hạn được trả (cả Tắt Đèn), phiếu mới hơn vẫn đang mượn
+    assert library.count('borrow_slips', "slip_id = %s AND status = 'RETURNED'", (slips['late'],)) == 1
+    assert library.count('borrow_slips', "slip_id = %s AND status = 'BORROWING'", (newer,)) == 1
+    assert library.available(books['de_men']) == 4
+    assert library.available(books['tat_den']) == 5
+    assert len(_penalties(library)) == 2
+
+
+def test_scanning_every_copy_moves_to_next_slip(library, desk):
+    books = desk['books']
+    newer = library.slip(desk['readers'][1], {books['de_men']: 1}, date.today())
+
+    # Phiếu trễ hạn có 2 bản Dế Mèn: lần quét thứ 3 mới sang phiếu mới hơn
+    success, _, summary = BorrowService().return_books_bulk(barcodes=['BC-1', 'BC-1', 'BC-1'])
+
+    assert success
+    assert summary['returned'] == 2
+    assert library.count('borrow_slips', "slip_id = %s AND status = 'RETURNED'", (newer,)) == 1
+    assert library.available(books['de_men']) == 5
+
+
+def test_no_fee_setting_means_no_penalties(library, desk):
+    library.db.execute("DELETE FROM system_settings")
+
+    success, _, summary = BorrowService().return_books_bulk(slip_ids=[desk['slips']['late']])
+
+    assert success
+    assert summary['late'] == 1
+    assert summary['late_fee_per_day'] == 0
+    assert _penalties(library) == []
+
+
+def test_returning_again_changes_nothing(library, desk):
+    service = BorrowService()
+    late = desk['slips']['late']
+    service.return_books_bulk(slip_ids=[late])
+
+    success, message, summary = service.return_books_bulk(slip_ids=[late])
+
+    assert not success
+    assert summary['skipped'] == 1
+    assert 'Bỏ qua' in message
+    assert library.available(desk['books']['de_men']) == 5
+    assert len(_penalties(library)) == 2
+
+
+def test_only_invalid_slip_ids_are_reported(library, desk):
+    success, message, summary = BorrowService().return_books_bulk(slip_ids=['abc', '-1'])
+
+    assert not success
+    assert summary['returned'] == 0
+    assert summary['not_found'] == ['abc', '-1']
+    assert 'Không tìm thấy (2)' in message
+
+
+def test_single_return_charges_same_penalties_as_bulk(library, desk):
+    books, slips = desk['books'], desk['slips']
+    service = BorrowService()
+
+    success, message = service.return_books(slips['late'])
+
+    assert success, message
+    assert 'phạt' in message
+    first_reader = desk['readers'][0]
+    assert [(p['reader_id'], p['slip_id'], p['book_id'], p['penalty_type'], float(p['amount']))
+            for p in _penalties(library)] == [
+        (first_reader, slips['late'], books['de_men'], 'LATE', 5 * 2 * FEE),
+        (first_reader, slips['late'], books['tat_den'], 'LATE', 5 * 1 * FEE),
+    ]
+
+    # Phiếu đúng hạn: không phạt
+    assert service.return_books(slips['on_time']) == (True, "Trả sách thành công")
+    assert len(_penalties(library)) == 2
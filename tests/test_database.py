@@ -0,0 +1,48 @@
+"""Connection pool: autocommit, transaction tường minh (user-004)"""
+import pytest
+
+from config.database import db
+
+
+def _categories(library):
+    return library.count('categories')
+
+
+def test_single_statements_commit_without_transaction(library):
+    library.db.execute("INSERT INTO categories (category_name) VALUES ('Văn học')")
+
+    connection = db.get_connection()
+    try:
+        assert connection.autocommit
+        assert not connection.in_transaction
+    finally:
+        db.release_connection(connection)
+    assert _categories(library) == 1
+
+
+def test_reads_leave_no_open_transaction(library):
+    library.category('Văn học')
+    for _ in range(3):
+        assert db.fetchone("SELECT COUNT(*) AS count FROM categories")['count'] == 1
+
+    # Mọi connection trong pool trả về ở trạng thái autocommit, không giữ snapshot cũ
+    connections = [db.get_connection() for _ in range(3)]
+    try:
+        assert not any(c.in_transaction for c in connections)
+    finally:
+        for connection in connections:
+            db.release_connection(connection)
+
+
+def test_transaction_commits_once_or_rolls_back(library):
+    with db.transaction() as tx:
+        tx.execute("INSERT INTO categories (category_name) VALUES ('A')")
+        tx.execute("INSERT INTO categories (category_name) VALUES ('B')")
+    assert _categories(library) == 2
+
+    with pytest.raises(RuntimeError):
+        with db.transaction() as tx:
+            tx.execute("INSERT INTO categories (category_name) VALUES ('C')")
+            raise RuntimeError("lỗi giữa chừng")
+    assert _categories(library) == 2
+
@@ -0,0 +1,172 @@
+"""Giữ chỗ tồn kho có điều kiện và chạy lại khi deadlock (user-021, user-022)"""
+import threading
+from collections import Counter
+
+import pytest
+from mysql.connector import Error, errorcode
+
+from config.database import db
+from services.borrow_service import BorrowService
+from services.inventory_service import InsufficientStockError, InventoryService
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(InventoryService, 'BACKOFF', 0.001)
+
+
+# ========== TRỪ KHO CÓ ĐIỀU KIỆN ==========
+
+def test_reserve_never_goes_below_zero(library):
+    book = library.book('Dế Mèn', stock=2)
+    inventory = InventoryService()
+
+    with db.transaction() as tx:
+        assert inventory.reserve(tx, book, 1)
+        assert not inventory.reserve(tx, book, 2)
+        assert inventory.reserve(tx, book, 1)
+        assert not inventory.reserve(tx, book, 1)
+
+    assert library.available(book) == 0
+
+
+def test_reserve_many_is_all_or_nothing(library):
+    plenty, scarce = library.book('Nhiều', stock=3), library.book('Ít', stock=1)
+    inventory = InventoryService()
+
+    with pytest.raises(InsufficientStockError):
+        with db.transaction() as tx:
+            inventory.reserve_many(tx, {plenty: 2, scarce: 2})
+
+    assert library.available(plenty) == 3
+    assert library.available(scarce) == 1
+
+    with db.transaction() as tx:
+        inventory.reserve_many(tx, {plenty: 2, scarce: 1})
+    assert library.available(plenty) == 1
+    assert library.available(scarce) == 0
+
+
+def test_concurrent_reservations_do_not_oversell(library):
+    book = library.book('Bản cuối', stock=5)
+    inventory = InventoryService()
+    results = []
+    lock = threading.Lock()
+
+    def counter():
+        for _ in range(4):
+            ok = inventory.run_transaction(lambda tx: inventory.reserve(tx, book, 1))
+            with lock:
+                results.append(ok)
+
+    threads = [threading.Thread(target=counter) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+
+    assert len(results) == 24
+    assert results.count(True) == 5
+    assert library.available(book) == 0
+
+
+def test_last_copy_is_lent_once(library):
+    reader = library.reader('Nguyễn Văn An')
+    book = library.book('Bản cuối', barcode='BC-LAST', stock=1)
+    service = BorrowService()
+
+    first = service.create_borrow(reader, 'BC-LAST')
+    second = service.create_borrow(reader, 'BC-LAST')
+
+    assert first[0] and not second[0]
+    assert library.available(book) == 0
+    assert library.count('borrow_slips') == 1
+
+
+def test_batch_borrow_short_on_one_title_changes_nothing(library):
+    reader = library.reader('Nguyễn Văn An')
+    plenty = library.book('Nhiều', barcode='BC-A', stock=3)
+    scarce = library.book('Ít', barcode='BC-B', stock=1)
+
+    success, message, slip_id = BorrowService().create_borrow_batch(reader, ['BC-A', 'BC-B', 'BC-B'])
+
+    assert not success and slip_id is None
+    assert 'Ít' in message
+    assert library.available(plenty) == 3
+    assert library.available(scarce) == 1
+    assert library.count('borrow_slips') == 0
+
+
+# ========== CHẠY LẠI KHI DEADLOCK ==========
+
+def test_retryable_error_reruns_whole_transaction(library):
+    book = library.book('Dế Mèn', stock=5)
+    inventory = InventoryService()
+    attempts = []
+
+    def work(tx):
+        attempts.append(1)
+        assert inventory.reserve(tx, book, 1)
+        if len(attempts) == 1:
+            raise Error(msg="Deadlock found", errno=errorcode.ER_LOCK_DEADLOCK)
+        return 'ok'
+
+    assert inventory.run_transaction(work) == 'ok'
+    assert len(attempts) == 2
+    # Lần đầu đã rollback: chỉ trừ 1 bản
+    assert library.available(book) == 4
+
+
+def test_other_errors_and_exhausted_retries_are_raised(library):
+    inventory = InventoryService()
+    attempts = Counter()
+
+    def syntax_error(tx):
+        attempts['syntax'] += 1
+        raise Error(msg="Syntax", errno=errorcode.ER_PARSE_ERROR)
+
+    def always_deadlocks(tx):
+        attempts['deadlock'] += 1
+        raise Error(msg="Lock wait timeout", errno=errorcode.ER_LOCK_WAIT_TIMEOUT)
+
+    with pytest.raises(Error):
+        inventory.run_transaction(syntax_error)
+    with pytest.raises(Error):
+        inventory.run_transaction(always_deadlocks)
+
+    assert attempts == {'syntax': 1, 'deadlock': InventoryService.MAX_ATTEMPTS}
+
+
+def test_real_deadlock_victim_is_retried(library):
+    first, second = library.book('A', stock=5), library.book('B', stock=5)
+    inventory = InventoryService()
+    barrier = threading.Barrier(2, timeout=10)
+    attempts = Counter()
+    results = {}
+
+    def work(tx, name, a, b):
+        attempts[name] += 1
+        assert inventory.reserve(tx, a, 1)
+        if attempts[name] == 1:
+            # Cả 2 giao dịch đều giữ khóa dòng đầu tiên rồi mới xin dòng còn lại
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError:
+                pass
+        assert inventory.reserve(tx, b, 1)
+        return True
+
+    def run(name, a, b):
+        results[name] = inventory.run_transaction(work, name, a, b)
+
+    threads = [threading.Thread(target=run, args=('ab', first, second)),
+               threading.Thread(target=run, args=('ba', second, first))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(120)
+
+    assert results == {'ab': True, 'ba': True}
+    assert sum(attempts.values()) >= 3
+    assert library.available(first) == 3
+    assert library.available(second) == 3
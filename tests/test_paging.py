@@ -0,0 +1,153 @@
+"""Phân trang keyset: sách (user-001) và phiếu mượn (user-025)"""
+from datetime import date, timedelta
+
+import pytest
+from mysql.connector import Error
+
+from services.book_service import BookService
+from services.borrow_service import BorrowService
+
+
+# ========== SÁCH ==========
+
+@pytest.fixture
+def books(library):
+    return [library.book(f"Sách {i}") for i in range(1, 8)]
+
+
+def test_book_pages_follow_book_id_descending(books):
+    service = BookService()
+
+    first = service.get_books_page(limit=3)
+    second = service.get_books_page(after_id=first[-1].book_id, limit=3)
+    last = service.get_books_page(after_id=second[-1].book_id, limit=3)
+
+    assert [b.book_id for b in first] == books[6:3:-1]
+    assert [b.book_id for b in second] == books[3:0:-1]
+    assert [b.book_id for b in last] == books[:1]
+    assert service.get_books_page(after_id=books[0], limit=3) == []
+
+
+@pytest.mark.parametrize('batch_size', [1, 3, 7, 10])
+def test_iter_books_visits_every_book_once(books, batch_size):
+    # 7 sách: trang cuối thiếu (3), vừa đủ 1 trang (7) và nhiều hơn số sách (10)
+    ids = [b.book_id for b in BookService().iter_books(batch_size=batch_size)]
+    assert ids == sorted(books, reverse=True)
+
+
+def test_iter_books_exact_multiple_of_page_size(library):
+    created = [library.book(f"Sách {i}") for i in range(6)]
+    ids = [b.book_id for b in BookService().iter_books(batch_size=3)]
+    assert ids == sorted(created, reverse=True)
+
+
+def test_get_all_books_reads_one_streamed_query(books, monkeypatch):
+    service = BookService()
+    monkeypatch.setattr(service, 'get_books_page', None)   # không được phân trang
+
+    books_loaded = service.get_all_books()
+
+    assert [b.book_id for b in books_loaded] == sorted(books, reverse=True)
+    assert [b.book_id for b in service.stream_books(batch_size=2)] == sorted(books, reverse=True)
+
+
+def test_page_errors_are_raised_not_treated_as_last_page(books, monkeypatch):
+    service = BookService()
+    monkeypatch.setattr(service, 'BOOK_SELECT', "SELECT b.* FROM missing_books_table b")
+
+    with pytest.raises(Error):
+        service.get_books_page(limit=3)
+    with pytest.raises(Error):
+        list(service.iter_books(batch_size=3))
+
+
+# ========== PHIẾU MƯỢN ==========
+
+@pytest.fixture
+def slips(library):
+    """11 phiếu, nhiều phiếu trùng ngày mượn / hạn trả (kiểm tra tie-break theo slip_id)"""
+    first, second = library.reader('Nguyễn Văn An'), library.reader('Trần Thị Bình')
+    book = library.book('Dế Mèn', stock=100)
+    start = date(2026, 1, 1)
+    layout = [
+        (first, 0, 'BORROWING'), (first, 0, 'RETURNED'), (second, 0, 'BORROWING'),
+        (second, 3, 'BORROWING'), (first, 3, 'LATE'), (first, 7, 'BORROWING'),
+        (second, 7, 'RETURNED'), (first, 7, 'BORROWING'), (second, 9, 'BORROWING'),
+    ]
+    ids = []
+    for reader_id, offset, status in layout:
+        borrow_date = start + timedelta(days=offset)
+        ids.append(library.slip(reader_id, {book: 1}, borrow_date,
+                                return_due=borrow_date + timedelta(days=14), status=status))
+    # Phiếu không có hạn trả (return_due NULL): xen giữa và ở cuối theo slip_id
+    ids += [library.slip(second, {book: 1}, start + timedelta(days=offset)) for offset in (5, 9)]
+    library.db.execute("UPDATE borrow_slips SET return_due = NULL WHERE slip_id IN (%s, %s, %s)",
+                       (ids[1], ids[-2], ids[-1]))
+    return {'readers': (first, second), 'start': start}
+
+
+def _all_pages(service, limit, **kwargs):
+    rows, after = [], None
+    while True:
+        page = service.get_all_borrows(after=after, limit=limit, **kwargs)
+        rows += page
+        if len(page) < limit:
+            return rows
+        after = service.page_cursor(page[-1], kwargs.get('sort_by', 'borrow_date'))
+
+
+def _expected(rows, sort_by, descending):
+    """Thứ tự của MySQL: NULL nhỏ hơn mọi giá trị (đầu khi tăng dần, cuối khi giảm dần)"""
+    def key(row):
+        value = row[sort_by]
+        return (value is not None, value if value is not None else 0, row['slip_id'])
+    return [r['slip_id'] for r in sorted(rows, key=key, reverse=descending)]
+
+
+@pytest.mark.parametrize('sort_by', ['borrow_date', 'return_due', 'slip_id'])
+@pytest.mark.parametrize('descending', [True, False])
+@pytest.mark.parametrize('limit', [1, 2, 4, 11])
+def test_borrow_pages_cover_every_slip_once(slips, sort_by, descending, limit):
+    service = BorrowService()
+    everything = service.get_all_borrows(limit=100)
+    assert len(everything) == 11
+    assert sum(r['return_due'] is None for r in everything) == 3
+
+    rows = _all_pages(service, limit, sort_by=sort_by, descending=descending)
+
+    assert [r['slip_id'] for r in rows] == _expected(everything, sort_by, descending)
+
+
+@pytest.mark.parametrize('filters', [
+    {'status': 'BORROWING'},
+    {'status': ['BORROWING', 'LATE']},
+    {'date_from': date(2026, 1, 4), 'date_to': date(2026, 1, 8)},
+    {'reader': 0, 'status': 'BORROWING'},
+])
+def test_filtered_pages_match_count_and_matches_filters(slips, filters):
+    service = BorrowService()
+    filters = dict(filters)
+    if 'reader' in filters:
+        filters['reader_id'] = slips['readers'][filters.pop('reader')]
+
+    rows = _all_pages(service, 2, **filters)
+    everything = service.get_all_borrows(limit=100)
+
+    assert len(rows) == service.count_borrows(**filters)
+    # matches_filters (dùng khi làm mới 1 dòng trên giao diện) khớp đúng điều kiện SQL
+    assert {r['slip_id'] for r in rows} == {
+        r['slip_id'] for r in everything if service.matches_filters(r, **filters)
+    }
+
+
+def test_listing_never_creates_indexes(slips):
+    """Danh sách chỉ kiểm tra index; CREATE INDEX chỉ chạy trong script migration"""
+    from services.schema_indexes import create_indexes, missing_indexes
+
+    before = missing_indexes(BorrowService.BORROW_INDEXES)
+    BorrowService().get_all_borrows(limit=5)
+    assert missing_indexes(BorrowService.BORROW_INDEXES) == before
+
+    assert create_indexes(BorrowService.BORROW_INDEXES) == before
+    assert missing_indexes(BorrowService.BORROW_INDEXES) == []
+    assert create_indexes(BorrowService.BORROW_INDEXES) == []
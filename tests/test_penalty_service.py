@@ -0,0 +1,39 @@
+"""Tạo / xóa phiếu phạt có và không gắn phiếu mượn (user-006)"""
+import logging
+from datetime import date
+
+from services.penalty_service import PenaltyService
+
+
+def test_penalty_without_slip_is_created_and_deleted(library):
+    reader = library.reader('Nguyễn Văn An')
+    book = library.book('Dế Mèn', stock=1)
+    service = PenaltyService()
+
+    assert service.create_penalty(reader, None, book, 'DAMAGED', 50000)
+    assert service.create_penalty(reader, '  ', book, 'LOST', 80000)
+
+    rows = library.db.fetchall("SELECT penalty_id, slip_id FROM penalties ORDER BY penalty_id")
+    assert [row['slip_id'] for row in rows] == [None, None]
+    assert service.delete_penalty(rows[0]['penalty_id'])
+    assert library.count('penalties') == 1
+
+
+def test_penalty_on_existing_slip(library):
+    reader = library.reader('Nguyễn Văn An')
+    book = library.book('Dế Mèn', stock=1)
+    slip = library.slip(reader, {book: 1}, date.today())
+
+    assert PenaltyService().create_penalty(reader, slip, book, 'LATE', 2000)
+    assert library.count('penalties', 'slip_id = %s', (slip,)) == 1
+
+
+def test_unknown_slip_is_refused_with_reason(library, caplog):
+    reader = library.reader('Nguyễn Văn An')
+    book = library.book('Dế Mèn', stock=1)
+
+    with caplog.at_level(logging.WARNING, logger='services.penalty_service'):
+        assert not PenaltyService().create_penalty(reader, 99999, book, 'LATE', 2000)
+
+    assert 'phiếu mượn #99999 không tồn tại' in caplog.text
+    assert library.count('penalties') == 0
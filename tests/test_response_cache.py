@@ -0,0 +1,131 @@
+"""Cache phản hồi API: HIT/MISS, ETag / 304, chuẩn hóa tham số, xóa cache (user-007)"""
+import pytest
+
+flask = pytest.importorskip('flask')
+
+from api.response_cache import ResponseCache  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    return flask.Flask(__name__)
+
+
+def make_client(app, cache, **cached):
+    calls = []
+
+    @app.route('/top')
+    @cache.cached(ttl=60, **cached)
+    def top_books():
+        calls.append(flask.request.args.get('limit'))
+        return flask.jsonify(call=len(calls))
+
+    @app.route('/broken')
+    @cache.cached(ttl=60)
+    def broken():
+        calls.append('broken')
+        return flask.jsonify(error='lỗi'), 500
+
+    return app.test_client(), calls
+
+
+def test_second_request_is_served_from_cache(app):
+    cache = ResponseCache()
+    client, calls = make_client(app, cache)
+
+    first = client.get('/top')
+    second = client.get('/top')
+
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert first.get_json() == second.get_json() == {'call': 1}
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert len(calls) == 1
+    assert cache.stats()['endpoints']['top_books'] == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+
+def test_matching_etag_gets_304_without_body(app):
+    cache = ResponseCache()
+    client, calls = make_client(app, cache)
+
+    etag = client.get('/top').headers['ETag']
+    revalidated = client.get('/top', headers={'If-None-Match': etag})
+    changed = client.get('/top', headers={'If-None-Match': '"khac"'})
+
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] == etag
+    assert len(calls) == 1
+
+
+def test_vary_on_params_are_normalised(app):
+    cache = ResponseCache()
+    client, calls = make_client(app, cache, vary_on={'limit': 10})
+
+    assert client.get('/top').headers['X-Cache'] == 'MISS'
+    assert client.get('/top?limit=10').headers['X-Cache'] == 'HIT'
+    assert client.get('/top?limit=010').headers['X-Cache'] == 'HIT'
+    assert client.get('/top?limit= ').headers['X-Cache'] == 'HIT'
+    assert client.get('/top?limit=5').headers['X-Cache'] == 'MISS'
+    assert client.get('/top?other=1').headers['X-Cache'] == 'HIT'
+    assert calls == [None, '5']
+
+
+def test_error_responses_are_not_cached(app):
+    cache = ResponseCache()
+    client, calls = make_client(app, cache)
+
+    first = client.get('/broken')
+    second = client.get('/broken')
+
+    assert first.status_code == second.status_code == 500
+    assert first.headers['X-Cache'] == second.headers['X-Cache'] == 'BYPASS'
+    assert calls == ['broken', 'broken']
+    assert cache._inflight == {}
+
+
+def test_invalidate_drops_every_entry(app):
+    cache = ResponseCache()
+    client, calls = make_client(app, cache)
+    etag = client.get('/top').headers['ETag']
+
+    cache.invalidate()
+    response = client.get('/top', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json() == {'call': 2}
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_data_version_change_invalidates(app):
+    version = {'value': 1}
+    cache = ResponseCache(version_source=lambda: version['value'], check_interval=0)
+    client, calls = make_client(app, cache)
+
+    client.get('/top')
+    assert client.get('/top').headers['X-Cache'] == 'HIT'
+
+    version['value'] = 2
+    assert client.get('/top').headers['X-Cache'] == 'MISS'
+    assert cache.stats()['data_version'] == 2
+    assert len(calls) == 2
+
+
+def test_unknown_or_failing_version_keeps_cache(app):
+    versions = iter([1, None, RuntimeError("mất kết nối"), 1])
+
+    def source():
+        value = next(versions)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    cache = ResponseCache(version_source=source, check_interval=0)
+    client, calls = make_client(app, cache)
+
+    headers = [client.get('/top').headers['X-Cache'] for _ in range(4)]
+
+    assert headers == ['MISS', 'HIT', 'HIT', 'HIT']
+    assert cache.invalidations == 0
@@ -0,0 +1,171 @@
+"""Chỉ mục tìm kiếm: chuẩn hóa tiếng Việt, xếp hạng, cập nhật trong lúc xây (user-002)"""
+import threading
+
+from services.book_service import BookService, book_search_index
+from services.search_index import SearchIndex, fold_text, tokenize
+
+
+def make_index(**kwargs):
+    return SearchIndex({
+        'name': ('prefix', 3.0),
+        'phone': ('substring', 2.0),
+        'address': ('prefix', 1.0),
+    }, name='test', **kwargs)
+
+
+# ========== CHUẨN HÓA ==========
+
+def test_fold_text_strips_vietnamese_marks():
+    assert fold_text('Nguyễn Đức Thắng') == 'nguyen duc thang'
+    assert fold_text('ĐẶNG THỊ HỒNG') == 'dang thi hong'
+    assert fold_text(None) == ''
+
+
+def test_tokenize_keeps_letters_and_digits_only():
+    assert tokenize('Dế Mèn - phiêu lưu ký (2023)') == ['de', 'men', 'phieu', 'luu', 'ky', '2023']
+
+
+def test_search_matches_with_or_without_marks():
+    index = make_index()
+    index.build([(1, {'name': 'Nguyễn Văn An'}), (2, {'name': 'Trần Thị Bình'})])
+
+    assert index.search('nguyen') == [1]
+    assert index.search('Nguyễn') == [1]
+    assert index.search('NGUY') == [1]
+    assert index.search('binh tran') == [2]
+
+
+# ========== XẾP HẠNG ==========
+
+def test_every_term_must_match():
+    index = make_index()
+    index.build([(1, {'name': 'Nguyễn Văn An'}), (2, {'name': 'Nguyễn Thị Bình'})])
+
+    assert index.search('nguyen binh') == [2]
+    assert index.search('nguyen cuong') == []
+
+
+def test_whole_word_ranks_above_prefix():
+    index = make_index()
+    index.build([(1, {'name': 'Anh Tuấn'}), (2, {'name': 'An Khang'})])
+
+    # "an" khớp trọn từ ở 2, chỉ là tiền tố của "anh" ở 1
+    assert index.search('an') == [2, 1]
+
+
+def test_field_weight_and_newest_first_on_ties():
+    index = make_index()
+    index.build([
+        (1, {'name': 'Lê Hoa', 'address': 'Hà Nội'}),
+        (2, {'name': 'Hà Lan', 'address': 'Huế'}),
+        (3, {'name': 'Hà My', 'address': 'Huế'}),
+    ])
+
+    # Tên (trọng số 3) trước địa chỉ (1); cùng điểm thì ID lớn hơn trước
+    assert index.search('ha') == [3, 2, 1]
+    assert index.search('ha', limit=2) == [3, 2]
+    assert index.search('ha', fields=['address']) == [1]
+
+
+def test_substring_field_matches_digits_anywhere():
+    index = make_index()
+    index.build([(1, {'phone': '0912 345 678'}), (2, {'phone': '0987654321'})])
+
+    assert index.search('5678') == [1]
+    assert index.search('09') == [2, 1]
+
+
+# ========== CẬP NHẬT ==========
+
+def test_add_and_remove_after_build():
+    index = make_index()
+    index.build([(1, {'name': 'Nguyễn Văn An'})])
+
+    index.add(1, {'name': 'Phạm Văn An'})
+    index.add(2, {'name': 'Nguyễn Thị Hoa'})
+    index.remove(3)
+
+    assert index.search('pham') == [1]
+    assert index.search('nguyen') == [2]
+    index.remove(2)
+    assert index.search('nguyen') == []
+
+
+def test_updates_during_build_are_kept():
+    index = make_index()
+
+    def documents():
+        yield 1, {'name': 'Tên Cũ'}
+        # Ghi vào CSDL trong lúc đang đọc để xây chỉ mục
+        index.add(1, {'name': 'Tên Mới'})
+        index.add(3, {'name': 'Thêm Giữa Chừng'})
+        index.remove(2)
+        yield 2, {'name': 'Đã Xóa'}
+
+    index.build(documents())
+
+    assert index.search('moi') == [1]
+    assert index.search('cu') == []
+    assert index.search('giua') == [3]
+    assert index.search('xoa') == []
+
+
+def test_invalidate_during_build_discards_result():
+    index = make_index()
+
+    def documents():
+        yield 1, {'name': 'Dữ Liệu Cũ'}
+        index.invalidate()
+
+    index.build(documents())
+    assert not index.is_built
+
+
+def test_search_while_building_uses_previous_version():
+    index = make_index()
+    index.build([(1, {'name': 'Bản Cũ'})])
+    reading = threading.Event()
+    release = threading.Event()
+
+    def documents():
+        reading.set()
+        release.wait(5)
+        yield 2, {'name': 'Bản Mới'}
+
+    builder = threading.Thread(target=index.build, args=(documents(),))
+    builder.start()
+    reading.wait(5)
+    try:
+        assert index.search('cu') == [1]
+    finally:
+        release.set()
+        builder.join(5)
+    assert index.search('moi') == [2]
+    assert index.search('cu') == []
+
+
+def test_max_age_marks_index_stale():
+    index = make_index(max_age=0)
+    index.build([(1, {'name': 'An'})])
+    assert index.is_stale
+    assert not make_index(max_age=None).is_stale
+
+
+# ========== QUA CSDL ==========
+
+def test_book_search_ranks_title_matches(library):
+    author = library.author('Tô Hoài')
+    library.book('Dế Mèn Phiêu Lưu Ký', author_id=author, isbn='9786042088')
+    library.book('Vợ Chồng A Phủ', author_id=author)
+    third = library.book('Tuyển Tập Tô Hoài')
+
+    service = BookService()
+    service.rebuild_search_index()
+
+    assert [b.title for b in service.search_books('de men')] == ['Dế Mèn Phiêu Lưu Ký']
+    # Khớp tên sách (trọng số 3) trước khớp tác giả (2)
+    ranked = service.search_books('to hoai')
+    assert ranked[0].book_id == third
+    assert len(ranked) == 3
+    assert [b.title for b in service.search_books('2088', 'isbn')] == ['Dế Mèn Phiêu Lưu Ký']
+    assert book_search_index.is_built
@@ -3,5 +3,7 @@ from .validators import Validator
 from .messagebox_helper import MessageBoxHelper
 from .export_helper import ExportHelper
 from .html_report_helper import HTMLReportHelper
+from .cache import TTLCache
+from .background_loader import BackgroundLoader
 
-__all__ = ['Validator', 'MessageBoxHelper', 'ExportHelper', HTMLReportHelper]
\ No newline at end of file
+__all__ = ['Validator', 'MessageBoxHelper', 'ExportHelper', HTMLReportHelper, 'TTLCache', 'BackgroundLoader']
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+Background Loader - Chạy truy vấn database ở thread nền cho giao diện Tkinter
+
+Tkinter không an toàn với đa luồng: mọi thao tác widget phải chạy trên main thread.
+Loader đẩy hàm nặng (gọi controller) sang thread pool, kết quả được đưa về qua
+hàng đợi và main thread lấy ra bằng after(), nên cửa sổ không bị "đơ" khi MySQL chậm.
+
+Mỗi yêu cầu gắn với 1 key (vd: 'readers'). Gửi yêu cầu mới cùng key sẽ hủy yêu cầu cũ:
+kết quả cũ (vd: từ khóa tìm kiếm đã gõ tiếp) bị bỏ qua, không ghi đè kết quả mới.
+
+Ví dụ:
+    self.loader = BackgroundLoader(self)
+    self.loader.submit(
+        'readers', self.controller.get_all_readers,
+        on_success=self._populate_tree,
+        on_error=lambda e: self.status_label.config(text=f"❌ {e}")
+    )
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoader:
+    """
+    Chạy hàm ở thread nền, gọi callback trên Tk main thread
+
+    Args:
+        widget: Widget Tk dùng để lập lịch after() (thường là chính view)
+        on_busy: Callback(bool) khi bắt đầu / kết thúc có yêu cầu đang chạy
+                 (dùng để hiện / ẩn thanh tiến trình)
+    """
+
+    # Thread pool dùng chung cho mọi view (mỗi thread giữ tối đa 1 connection)
+    MAX_WORKERS = 4
+    # Chu kỳ kiểm tra kết quả (ms) - ~60 lần/giây, chỉ chạy khi có yêu cầu đang chờ
+    POLL_INTERVAL_MS = 16
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, widget, on_busy: Optional[Callable[[bool], None]] = None):
+        self.widget = widget
+        self.on_busy = on_busy
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        self._generations: Dict[str, int] = {}
+        self._pending: Dict[str, tuple] = {}
+        self._poll_id = None
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=cls.MAX_WORKERS,
+                    thread_name_prefix='ui-loader'
+                )
+            return cls._executor
+
+    # ========== PUBLIC API ==========
+
+    def submit(self, key: str, func: Callable[..., Any], *args,
+               on_success: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None,
+               **kwargs) -> int:
+        """
+        Chạy func(*args, **kwargs) ở thread nền (gọi từ main thread)
+
+        Yêu cầu cũ cùng key bị hủy (nếu chưa chạy) hoặc bị bỏ qua kết quả.
+
+        Returns:
+            int: Số thứ tự (generation) của yêu cầu
+        """
+        was_busy = bool(self._pending)
+        self._discard(key)
+        generation = self._generations.get(key, 0) + 1
+        self._generations[key] = generation
+
+        future = self._get_executor().submit(func, *args, **kwargs)
+        self._pending[key] = (generation, future, on_success, on_error, time.perf_counter())
+        future.add_done_callback(
+            lambda f, k=key, g=generation: self._results.put((k, g, f))
+        )
+
+        if not was_busy:
+            self._notify_busy(True)
+        self._schedule_poll()
+        return generation
+
+    def cancel(self, key: str):
+        """Hủy yêu cầu đang chờ của key (kết quả nếu có sẽ bị bỏ qua)"""
+        if self._discard(key) and not self._pending:
+            self._notify_busy(False)
+
+    def _discard(self, key: str) -> bool:
+        entry = self._pending.pop(key, None)
+        if entry is None:
+            return False
+        entry[1].cancel()
+        self._generations[key] = self._generations.get(key, 0) + 1
+        return True
+
+    def cancel_all(self):
+        """Hủy mọi yêu cầu (gọi khi view bị hủy)"""
+        for key in list(self._pending):
+            self.cancel(key)
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+
+    def is_busy(self, key: Optional[str] = None) -> bool:
+        """Có yêu cầu (của key, hoặc bất kỳ) đang chạy không"""
+        return key in self._pending if key else bool(self._pending)
+
+    # ========== MAIN THREAD ==========
+
+    def _schedule_poll(self):
+        if self._poll_id is None:
+            self._poll_id = self.widget.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        """Lấy kết quả từ hàng đợi và gọi callback (chạy trên main thread)"""
+        self._poll_id = None
+        try:
+            if not self.widget.winfo_exists():
+                return
+        except Exception:
+            return
+
+        while True:
+            try:
+                key, generation, future = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver(key, generation, future)
+
+        if self._pending:
+            self._schedule_poll()
+
+    def _deliver(self, key: str, generation: int, future: Future):
+        entry = self._pending.get(key)
+        if entry is None or entry[0] != generation or future.cancelled():
+            # Kết quả của yêu cầu đã bị thay thế / hủy
+            return
+
+        del self._pending[key]
+        _, _, on_success, on_error, started = entry
+        elapsed = (time.perf_counter() - started) * 1000
+
+        error = future.exception()
+        try:
+            if error is None:
+                logger.debug(f"Loaded '{key}' in {elapsed:.0f} ms")
+                if on_success:
+                    on_success(future.result())
+            else:
+                logger.error(f"❌ Lỗi tải '{key}': {error}")
+                if on_error:
+                    on_error(error)
+        except Exception as e:
+            logger.error(f"❌ Lỗi xử lý kết quả '{key}': {e}")
+        finally:
+            if not self._pending:
+                self._notify_busy(False)
+
+    def _notify_busy(self, busy: bool):
+        if self.on_busy:
+            try:
+                self.on_busy(busy)
+            except Exception as e:
+                logger.debug(f"on_busy callback error: {e}")
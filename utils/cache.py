@@ -0,0 +1,87 @@
+"""
+Cache Helper - Bộ nhớ đệm trong tiến trình
+Hỗ trợ: TTL (hết hạn theo thời gian), LRU (giới hạn số phần tử), bộ đếm hit/miss
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Cache key -> value có thời gian sống (TTL) và giới hạn số phần tử (LRU)
+
+    Args:
+        ttl: Số giây một giá trị còn hợp lệ (None = không hết hạn)
+        max_size: Số phần tử tối đa, phần tử ít dùng nhất bị loại trước (None = không giới hạn)
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_size: Optional[int] = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Lấy giá trị còn hạn, hoặc default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Lưu giá trị (ttl riêng cho phần tử này nếu truyền vào)"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            if self.max_size is not None:
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Lấy từ cache, nếu không có thì gọi compute() và lưu lại"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key: Hashable = None):
+        """Xóa 1 key, hoặc toàn bộ cache nếu không truyền key"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self) -> dict:
+        """Thống kê hit/miss"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,169 @@
+"""
+Excel Export Engine - Xuất Excel theo luồng bằng chế độ write-only của openpyxl
+
+- Không giữ ô nào trong bộ nhớ: mỗi dòng được ghi thẳng ra file tạm của sheet
+- Độ rộng cột được ước lượng từ các dòng đầu, không quét lại toàn bộ sheet
+
+Ở chế độ write-only, độ rộng cột phải được đặt trước dòng đầu tiên, nên engine
+giữ lại SAMPLE_ROWS dòng đầu để tính độ rộng rồi mới ghi; các dòng sau được ghi
+thẳng, không đo lại (không thể đổi độ rộng đã ghi).
+
+Ví dụ:
+    engine = ExcelExportEngine()
+    engine.add_sheet("Bạn đọc", headers, (row_of(r) for r in readers))
+    engine.save(filename)
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ExcelExportEngine:
+    """
+    Ghi 1 workbook nhiều sheet theo luồng
+
+    Raises:
+        ImportError: Chưa cài openpyxl (gọi hàm xử lý như các export khác)
+    """
+
+    # Số dòng đầu dùng để tính độ rộng cột
+    SAMPLE_ROWS = 1000
+    MIN_WIDTH = 6
+    MAX_WIDTH = 50
+    HEADER_COLOR = "4472C4"
+    # Gọi progress sau mỗi n dòng
+    PROGRESS_EVERY = 5000
+
+    def __init__(self):
+        from openpyxl import Workbook
+
+        self.workbook = Workbook(write_only=True)
+
+    def add_sheet(self, title: str, headers: Sequence[str], rows: Iterable[Sequence],
+                  number_formats: Optional[Dict[int, str]] = None,
+                  progress: Optional[Callable[[str, int], None]] = None) -> int:
+        """
+        Thêm 1 sheet và ghi toàn bộ dòng
+
+        Args:
+            title: Tên sheet (tối đa 31 ký tự theo giới hạn của Excel)
+            headers: Tiêu đề cột
+            rows: Iterable các dòng (list/tuple giá trị) - có thể là generator
+            number_formats: {chỉ số cột (0-based): định dạng số}, vd {8: '#,##0'}
+            progress: Callback(tên_sheet, số_dòng_đã_ghi)
+
+        Returns:
+            int: Số dòng dữ liệu đã ghi
+        """
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment, Font, PatternFill
+        from openpyxl.utils import get_column_letter
+
+        title = title[:31]
+        sheet = self.workbook.create_sheet(title=title)
+        rows = iter(rows)
+
+        widths = [self._text_width(h) for h in headers]
+        sample = list(islice(rows, self.SAMPLE_ROWS))
+        for row in sample:
+            self._track(widths, row)
+
+        for index, width in enumerate(widths, start=1):
+            sheet.column_dimensions[get_column_letter(index)].width = self._clamp(width)
+        sheet.freeze_panes = 'A2'
+
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color=self.HEADER_COLOR, end_color=self.HEADER_COLOR,
+                                  fill_type="solid")
+        header_alignment = Alignment(horizontal="center", vertical="center")
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(sheet, value=header)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_alignment
+            header_cells.append(cell)
+        sheet.append(header_cells)
+
+        formats = number_formats or {}
+        count = 0
+        for row in sample:
+            sheet.append(self._prepare(sheet, row, formats))
+            count += 1
+
+        for row in rows:
+            sheet.append(self._prepare(sheet, row, formats))
+            count += 1
+            if progress and count % self.PROGRESS_EVERY == 0:
+                progress(title, count)
+
+        if progress:
+            progress(title, count)
+
+        return count
+
+    def save(self, filename) -> str:
+        """Ghi workbook ra file (sau khi đã thêm đủ sheet)"""
+        if not self.workbook.worksheets:
+            # Workbook write-only không có sheet mặc định, Excel không mở được file rỗng
+            self.workbook.create_sheet(title="Sheet1")
+        self.workbook.save(str(filename))
+        return str(filename)
+
+    # ========== INTERNAL ==========
+
+    @classmethod
+    def _prepare(cls, sheet, row: Sequence, formats: Dict[int, str]) -> list:
+        values = [cls._cell_value(v) for v in row]
+        if not formats:
+            return values
+
+        from openpyxl.cell import WriteOnlyCell
+        for index, number_format in formats.items():
+            if index < len(values) and isinstance(values[index], (int, float)):
+                cell = WriteOnlyCell(sheet, value=values[index])
+                cell.number_format = number_format
+                values[index] = cell
+        return values
+
+    @staticmethod
+    def _cell_value(value):
+        # Decimal (giá tiền từ MySQL) -> float để Excel coi là số
+        if isinstance(value, Decimal):
+            return float(value)
+        return value
+
+    @classmethod
+    def _track(cls, widths: List[float], row: Sequence):
+        for index, value in enumerate(row):
+            if index >= len(widths):
+                widths.append(cls.MIN_WIDTH)
+            width = cls._text_width(value)
+            if width > widths[index]:
+                widths[index] = width
+
+    @staticmethod
+    def _text_width(value) -> float:
+        """Độ rộng hiển thị ước lượng (ký tự) của 1 giá trị"""
+        if value is None:
+            return 0
+        if isinstance(value, datetime):
+            return 19
+        if isinstance(value, date):
+            return 10
+        if isinstance(value, float):
+            return len(f"{value:,.2f}")
+        if isinstance(value, (int, Decimal)):
+            return len(f"{value:,}")
+        text = str(value)
+        if '\n' in text:
+            text = max(text.split('\n'), key=len)
+        return len(text)
+
+    @classmethod
+    def _clamp(cls, width: float) -> float:
+        return min(max(width + 2, cls.MIN_WIDTH), cls.MAX_WIDTH)
@@ -0,0 +1,340 @@
+"""
+Export Jobs - Hàng đợi xuất dữ liệu chạy nền, có tiến độ và hủy được
+
+Mỗi lần xuất (JSON / CSV / Excel / PDF / báo cáo) là 1 ExportJob chạy trên thread
+pool riêng (không dùng chung với BackgroundLoader), nên xuất file lớn không chiếm
+luồng tải dữ liệu của các màn hình mượn / trả đang dùng.
+
+Hàm của job nhận job làm tham số đầu tiên để báo tiến độ:
+    job.set_total(n)    # tổng số dòng (nếu biết) -> có phần trăm
+    job.advance(count)  # số dòng đã ghi; raise ExportCancelled nếu người dùng đã hủy
+
+Giao diện (ExportJobPanel) đọc trạng thái bằng export_jobs.jobs() theo chu kỳ after(),
+manager không gọi vào Tkinter nên an toàn đa luồng.
+
+Ví dụ:
+    job = export_jobs.submit("Xuất bạn đọc ra PDF", controller.run_job, 'PDF', None)
+    ...
+    job.cancel()
+
+RecordExport gom phần xuất dùng chung của các controller (sách, bạn đọc): xuất đồng bộ,
+đưa vào hàng đợi, ghi file và thông báo kết quả.
+"""
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+from config.settings import AppConfig
+from utils.export_helper import EXPORT_EXTENSIONS, CountingIterator, ExportHelper
+
+logger = logging.getLogger(__name__)
+
+
+class ExportCancelled(BaseException):
+    """
+    Người dùng đã hủy job xuất dữ liệu
+
+    Kế thừa BaseException (như asyncio.CancelledError) để đi xuyên qua các
+    `except Exception` của exporter: file vẫn được đóng bởi with, không bị ghi log lỗi.
+    """
+
+
+class ExportJob:
+    """Trạng thái 1 lần xuất dữ liệu (đọc từ main thread, ghi từ thread nền)"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    STATUS_TEXT = {
+        QUEUED: 'Đang chờ',
+        RUNNING: 'Đang xuất',
+        DONE: 'Hoàn tất',
+        FAILED: 'Lỗi',
+        CANCELLED: 'Đã hủy',
+    }
+
+    def __init__(self, job_id: int, title: str):
+        self.job_id = job_id
+        self.title = title
+        self.status = self.QUEUED
+        self.done = 0
+        self.total: Optional[int] = None
+        self.message = ''
+        # File đang ghi: bị xóa nếu job lỗi / bị hủy
+        self.output_path: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel_event = threading.Event()
+
+    # ========== GỌI TỪ THREAD NỀN ==========
+
+    def set_total(self, total: Optional[int]):
+        self.total = total
+
+    def advance(self, done: int):
+        """Cập nhật số dòng đã xuất, dừng job (raise) nếu đã bị hủy"""
+        self.done = done
+        if self._cancel_event.is_set():
+            raise ExportCancelled()
+
+    # ========== GỌI TỪ GIAO DIỆN ==========
+
+    def cancel(self):
+        """Yêu cầu hủy (job dừng ở dòng kế tiếp; job đang chờ thì không chạy nữa)"""
+        if not self.is_finished:
+            self._cancel_event.set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
+
+    @property
+    def percent(self) -> Optional[float]:
+        """Phần trăm hoàn thành, None nếu chưa biết tổng số dòng"""
+        if self.status == self.DONE:
+            return 100.0
+        if not self.total:
+            return None
+        return min(100.0, self.done * 100.0 / self.total)
+
+    @property
+    def status_text(self) -> str:
+        return self.STATUS_TEXT[self.status]
+
+
+class ExportJobManager:
+    """
+    Sổ đăng ký + thread pool cho các job xuất dữ liệu
+
+    Args:
+        workers: Số job chạy đồng thời (mỗi job giữ 1 connection khi đọc DB theo lô)
+    """
+
+    # Số job đã xong được giữ lại để hiển thị
+    KEEP_FINISHED = 20
+
+    def __init__(self, workers: int = 2):
+        self.workers = max(1, workers)
+        self._jobs: Dict[int, ExportJob] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='export-job'
+                )
+            return self._executor
+
+    # ========== PUBLIC API ==========
+
+    def submit(self, title: str, func: Callable[..., Tuple[bool, str]], *args, **kwargs) -> ExportJob:
+        """
+        Đưa job vào hàng đợi
+
+        Args:
+            func: Hàm func(job, *args, **kwargs) -> (success, message)
+
+        Returns:
+            ExportJob: Dùng để theo dõi tiến độ / hủy
+        """
+        job = ExportJob(next(self._ids), title)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._trim_finished()
+        self._get_executor().submit(self._run, job, func, args, kwargs)
+        logger.info(f"📤 Job xuất #{job.job_id}: {title}")
+        return job
+
+    def jobs(self) -> List[ExportJob]:
+        """Các job theo thứ tự gửi"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get(self, job_id: int) -> Optional[ExportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def remove(self, job_id: int):
+        """Bỏ job đã xong khỏi danh sách"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.is_finished:
+                del self._jobs[job_id]
+
+    def active_count(self) -> int:
+        return sum(1 for job in self.jobs() if not job.is_finished)
+
+    def cancel_all(self):
+        for job in self.jobs():
+            job.cancel()
+
+    def shutdown(self, timeout: float = 5.0):
+        """Hủy mọi job và chờ thread dừng (gọi khi đóng ứng dụng)"""
+        self.cancel_all()
+        executor = self._executor
+        if executor is None:
+            return
+        deadline = time.time() + timeout
+        while self.active_count() and time.time() < deadline:
+            time.sleep(0.05)
+        executor.shutdown(wait=False)
+
+    # ========== INTERNAL ==========
+
+    def _trim_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(finished) - self.KEEP_FINISHED)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: ExportJob, func, args, kwargs):
+        if job.cancel_requested:
+            self._finish(job, ExportJob.CANCELLED, "Đã hủy trước khi chạy")
+            return
+
+        job.status = ExportJob.RUNNING
+        job.started_at = time.time()
+        try:
+            success, message = func(job, *args, **kwargs)
+        except ExportCancelled:
+            success, message = False, ''
+        except Exception as e:
+            logger.error(f"❌ Job xuất #{job.job_id} lỗi: {e}")
+            success, message = False, f"Lỗi: {str(e)}"
+
+        if success:
+            self._finish(job, ExportJob.DONE, message)
+        elif job.cancel_requested:
+            self._remove_partial(job)
+            self._finish(job, ExportJob.CANCELLED, "Đã hủy")
+        else:
+            self._remove_partial(job)
+            self._finish(job, ExportJob.FAILED, message)
+
+    def _finish(self, job: ExportJob, status: str, message: str):
+        job.message = message
+        job.finished_at = time.time()
+        job.status = status
+        elapsed = job.finished_at - (job.started_at or job.created_at)
+        logger.info(f"📤 Job xuất #{job.job_id} {job.status_text.lower()} sau {elapsed:.1f}s")
+
+    @staticmethod
+    def _remove_partial(job: ExportJob):
+        if job.output_path and os.path.exists(job.output_path):
+            try:
+                os.remove(job.output_path)
+            except OSError as e:
+                logger.warning(f"⚠️ Không xóa được file dở dang {job.output_path}: {e}")
+
+
+# Dùng chung cho toàn ứng dụng
+export_jobs = ExportJobManager(AppConfig.EXPORT_WORKERS)
+
+
+class RecordExport:
+    """
+    Xuất 1 loại bản ghi ra JSON / CSV / Excel / PDF (đồng bộ hoặc bằng job chạy nền)
+
+    records = None: xuất toàn bộ, đọc thẳng từ DB theo lô qua `stream` (không nạp hết
+    vào bộ nhớ); list rỗng: báo không có dữ liệu.
+
+    Args:
+        noun: Tên loại bản ghi trong thông báo, vd 'sách', 'bạn đọc'
+        prefix: Tiền tố tên file mặc định, vd 'books'
+        exporters: {label: hàm(rows, filename) -> (success, message)}
+        stream: Hàm trả về generator toàn bộ bản ghi
+        count: Hàm đếm toàn bộ bản ghi (tổng cho thanh tiến độ)
+        msg_helper: MessageBoxHelper của controller
+    """
+
+    def __init__(self, noun: str, prefix: str,
+                 exporters: Dict[str, Callable[[Iterable, Optional[str]], Tuple[bool, str]]],
+                 stream: Callable[[], Iterable], count: Callable[[], int], msg_helper):
+        self.noun = noun
+        self.prefix = prefix
+        self.exporters = exporters
+        self.stream = stream
+        self.count = count
+        self.msg_helper = msg_helper
+
+    def export(self, label: str, records: Optional[Sequence] = None, parent=None) -> bool:
+        """Xuất đồng bộ (chặn giao diện tới khi ghi xong)"""
+        if not self._has_data(records, parent):
+            return False
+        return self.show_result(label, self.run(label, records), parent)
+
+    def submit(self, label: str, records: Optional[Sequence] = None,
+               parent=None) -> Optional[ExportJob]:
+        """
+        Đưa vào hàng đợi xuất chạy nền (tiến độ / hủy / thông báo ở bảng job của cửa sổ chính)
+
+        Returns:
+            ExportJob hoặc None nếu không có dữ liệu
+        """
+        if not self._has_data(records, parent):
+            return None
+        return export_jobs.submit(f"Xuất {self.noun} ra {label}", self._run_job, label, records)
+
+    def run(self, label: str, records: Optional[Sequence] = None, filename: str = None,
+            on_count: Optional[Callable[[int], None]] = None) -> Tuple[bool, str, int]:
+        """
+        Ghi file xuất, không đụng tới giao diện (gọi được từ thread nền)
+
+        Args:
+            label: 'JSON' | 'CSV' | 'Excel' | 'PDF'
+            filename: None = tên mặc định trong data/export
+            on_count: Callback(số_dòng_đã_đọc), xem CountingIterator
+
+        Returns:
+            tuple: (success, đường dẫn file hoặc thông báo lỗi, số bản ghi đã xuất)
+        """
+        # Số dòng chỉ biết sau khi ghi xong
+        rows = CountingIterator(records if records is not None else self.stream(),
+                                on_count=on_count)
+        success, message = self.exporters[label](rows, filename)
+        return success, message, rows.count
+
+    def show_result(self, label: str, result: Tuple[bool, str, int], parent=None) -> bool:
+        """Thông báo kết quả run (gọi trên main thread)"""
+        success, message, count = result
+        if success:
+            self.msg_helper.show_success(
+                f"Đã xuất {count} {self.noun} ra {label}\n{message}",
+                parent=parent
+            )
+            return True
+        else:
+            self.msg_helper.show_error(f"Lỗi xuất {label}", message, parent=parent)
+            return False
+
+    def _has_data(self, records: Optional[Sequence], parent) -> bool:
+        if records is not None and not records:
+            self.msg_helper.show_warning("Không có dữ liệu", f"Không có {self.noun} để xuất",
+                                         parent=parent)
+            return False
+        return True
+
+    def _run_job(self, job: ExportJob, label: str, records) -> Tuple[bool, str]:
+        """Chạy trong thread của ExportJobManager"""
+        job.set_total(len(records) if records is not None else self.count())
+        job.output_path = str(ExportHelper.default_filename(self.prefix, EXPORT_EXTENSIONS[label]))
+        success, message, count = self.run(label, records, filename=job.output_path,
+                                           on_count=job.advance)
+        if success:
+            return True, f"Đã xuất {count} {self.noun} ra {label}\n{message}"
+        return False, message
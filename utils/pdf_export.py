@@ -0,0 +1,348 @@
+"""
+PDF Export Engine - Xuất PDF dạng bảng theo luồng bằng reportlab (platypus)
+
+- Mỗi trang là 1 bảng riêng có dòng tiêu đề (repeatRows), chỉ chứa số dòng vừa
+  phần trống của trang. Thời gian dàn trang tăng tuyến tính thay vì 1 Table
+  khổng lồ phải đo lại toàn bộ dòng còn lại mỗi lần tách trang.
+- Dòng được lấy dần từ rows trong lúc reportlab dàn trang (không dựng sẵn cả bảng),
+  nên rows có thể là generator đọc DB theo lô.
+- Độ rộng cột cố định (theo tỉ lệ) để các trang thẳng cột; chữ dài bị cắt theo
+  độ rộng thực đo bằng font, không theo số ký tự.
+- Dùng font TTF Unicode (Arial / DejaVu Sans ...) để hiển thị đúng tiếng Việt.
+
+Ví dụ:
+    engine = PdfExportEngine("DANH SÁCH BẠN ĐỌC")
+    count = engine.build(filename, headers, (row_of(r) for r in readers),
+                         col_weights=[1, 3, 2], summary=lambda n: f"Tổng số: {n} bạn đọc")
+"""
+import os
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+from config.settings import AppConfig
+
+logger = logging.getLogger(__name__)
+
+# (font thường, font đậm) - tìm theo thứ tự, dùng cặp đầu tiên có file
+FONT_CANDIDATES = [
+    ('C:/Windows/Fonts/arial.ttf', 'C:/Windows/Fonts/arialbd.ttf'),
+    ('C:/Windows/Fonts/tahoma.ttf', 'C:/Windows/Fonts/tahomabd.ttf'),
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+     '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+    ('/usr/share/fonts/TTF/DejaVuSans.ttf', '/usr/share/fonts/TTF/DejaVuSans-Bold.ttf'),
+    ('/System/Library/Fonts/Supplemental/Arial.ttf',
+     '/System/Library/Fonts/Supplemental/Arial Bold.ttf'),
+    ('/Library/Fonts/Arial Unicode.ttf', None),
+]
+
+FALLBACK_FONTS = ('Helvetica', 'Helvetica-Bold')
+
+# Kèm theo kết quả xuất khi phải dùng FALLBACK_FONTS
+FALLBACK_FONT_WARNING = ("Không tìm thấy font Unicode: PDF không hiển thị đúng tiếng Việt. "
+                         "Đặt PDF_FONT_PATH trong .env tới 1 file .ttf (vd. DejaVuSans.ttf)")
+
+_registered_fonts: Optional[Tuple[str, str]] = None
+
+
+def register_unicode_font() -> Tuple[str, str]:
+    """
+    Đăng ký font TTF Unicode với reportlab (chỉ làm 1 lần)
+
+    Đặt PDF_FONT_PATH trong .env để chỉ định font khác.
+
+    Returns:
+        tuple: (tên font thường, tên font đậm); không tìm thấy font thì trả
+               Helvetica (không hiển thị được dấu tiếng Việt)
+    """
+    global _registered_fonts
+    if _registered_fonts is not None:
+        return _registered_fonts
+
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    candidates = list(FONT_CANDIDATES)
+    if AppConfig.PDF_FONT_PATH:
+        if not os.path.isfile(AppConfig.PDF_FONT_PATH):
+            logger.warning(f"⚠️ PDF_FONT_PATH không tồn tại: {AppConfig.PDF_FONT_PATH}")
+        candidates.insert(0, (AppConfig.PDF_FONT_PATH, None))
+
+    for regular, bold in candidates:
+        if not os.path.isfile(regular):
+            continue
+        try:
+            pdfmetrics.registerFont(TTFont('ExportUnicode', str(regular)))
+            bold_name = 'ExportUnicode'
+            if bold and os.path.isfile(bold):
+                pdfmetrics.registerFont(TTFont('ExportUnicode-Bold', str(bold)))
+                bold_name = 'ExportUnicode-Bold'
+            _registered_fonts = ('ExportUnicode', bold_name)
+            logger.info(f"✅ Font PDF: {regular}")
+            return _registered_fonts
+        except Exception as e:
+            logger.warning(f"⚠️ Không nạp được font {regular}: {e}")
+
+    tried = ', '.join(str(regular) for regular, _ in candidates)
+    logger.error(f"❌ {FALLBACK_FONT_WARNING}. Đã tìm: {tried}")
+    _registered_fonts = FALLBACK_FONTS
+    return _registered_fonts
+
+
+def _streaming_table_class():
+    from reportlab.platypus import Flowable
+
+    class StreamingTable(Flowable):
+        """
+        Bảng "vô hạn" luôn báo cao hơn phần trống của trang nên reportlab gọi split():
+        lấy đúng số dòng vừa phần trống thành 1 Table, phần còn lại sang trang sau
+        """
+
+        def __init__(self, engine, rows: Iterator, make_table, header_height: float,
+                     row_height: float):
+            super().__init__()
+            self.engine = engine
+            self.rows = rows
+            self.make_table = make_table
+            self.header_height = header_height
+            self.row_height = row_height
+            self._pushed_back: List[list] = []
+
+        def wrap(self, availWidth, availHeight):
+            return availWidth, availHeight + 1
+
+        def split(self, availWidth, availHeight):
+            count = int((availHeight - self.header_height) // self.row_height)
+            if count <= 0:
+                return []
+
+            chunk = self._take(count)
+            table = self.make_table(chunk)
+            # Ước lượng sai (vd. dòng cao hơn dự kiến): trả bớt dòng cho trang sau
+            while len(chunk) > 1 and table.wrap(availWidth, availHeight)[1] > availHeight:
+                self._pushed_back.insert(0, chunk.pop())
+                table = self.make_table(chunk)
+
+            # reportlab đánh dấu _postponed khi trang trước hết chỗ; đã tách được thì bỏ
+            # dấu, nếu không lần hết chỗ kế tiếp sẽ bị coi là "quá lớn cho 1 trang"
+            self.__dict__.pop('_postponed', None)
+            if self._has_more():
+                return [table, self]
+            return [table]
+
+        def draw(self):
+            pass
+
+        def _take(self, count: int) -> List[list]:
+            chunk = self._pushed_back[:count]
+            del self._pushed_back[:count]
+            while len(chunk) < count:
+                row = next(self.rows, None)
+                if row is None:
+                    break
+                chunk.append(self.engine._next_row(row))
+            return chunk
+
+        def _has_more(self) -> bool:
+            if self._pushed_back:
+                return True
+            row = next(self.rows, None)
+            if row is None:
+                return False
+            self._pushed_back.append(self.engine._next_row(row))
+            return True
+
+    return StreamingTable
+
+
+def _deferred_paragraph_class():
+    from reportlab.platypus import Flowable, Paragraph
+
+    class DeferredParagraph(Flowable):
+        """Paragraph chỉ tạo nội dung khi được dàn trang (vd. tổng số dòng sau bảng)"""
+
+        def __init__(self, text_func: Callable[[], str], style):
+            super().__init__()
+            self.text_func = text_func
+            self.style = style
+            self._paragraph = None
+
+        def wrap(self, availWidth, availHeight):
+            if self._paragraph is None:
+                self._paragraph = Paragraph(self.text_func(), self.style)
+            return self._paragraph.wrap(availWidth, availHeight)
+
+        def draw(self):
+            self._paragraph.drawOn(self.canv, 0, 0)
+
+    return DeferredParagraph
+
+
+class PdfExportEngine:
+    """
+    Ghi 1 bảng dữ liệu (có thể rất dài) ra file PDF khổ A4 ngang
+
+    Raises:
+        ImportError: Chưa cài reportlab (gọi hàm xử lý như các export khác)
+    """
+
+    FONT_SIZE = 8
+    HEADER_FONT_SIZE = 9
+    CELL_PADDING = 3
+    PRIMARY_COLOR = '#1976D2'
+    # Gọi progress sau mỗi n dòng
+    PROGRESS_EVERY = 1000
+
+    def __init__(self, title: str):
+        from reportlab.lib.pagesizes import A4, landscape
+
+        self.title = title
+        self.pagesize = landscape(A4)
+        self.font, self.bold_font = register_unicode_font()
+        self.rows = 0
+
+    @property
+    def uses_fallback_font(self) -> bool:
+        """True nếu đang dùng Helvetica (mất dấu tiếng Việt)"""
+        return (self.font, self.bold_font) == FALLBACK_FONTS
+
+    def build(self, filename, headers: Sequence[str], rows: Iterable[Sequence],
+              col_weights: Optional[Sequence[float]] = None,
+              summary: Optional[Callable[[int], str]] = None,
+              progress: Optional[Callable[[str, int], None]] = None) -> int:
+        """
+        Dàn trang và ghi file PDF
+
+        Args:
+            headers: Tiêu đề cột
+            rows: Iterable các dòng (list giá trị) - có thể là generator
+            col_weights: Tỉ lệ độ rộng các cột (mặc định chia đều)
+            summary: Hàm(số_dòng) -> dòng tổng kết in cuối file
+            progress: Callback(tiêu_đề, số_dòng_đã_dàn_trang)
+
+        Returns:
+            int: Số dòng dữ liệu đã ghi
+        """
+        from reportlab.platypus import SimpleDocTemplate
+
+        doc = SimpleDocTemplate(
+            str(filename),
+            pagesize=self.pagesize,
+            rightMargin=30,
+            leftMargin=30,
+            topMargin=30,
+            bottomMargin=30,
+            title=self.title
+        )
+
+        weights = list(col_weights or [1] * len(headers))
+        total = sum(weights)
+        col_widths = [doc.width * w / total for w in weights]
+
+        self.rows = 0
+        self._progress = progress
+        flowables = self._flowables(headers, rows, col_widths, summary)
+        doc.build(flowables, onFirstPage=self._draw_page_number,
+                  onLaterPages=self._draw_page_number)
+
+        if progress:
+            progress(self.title, self.rows)
+        return self.rows
+
+    # ========== INTERNAL ==========
+
+    def _flowables(self, headers, rows, col_widths, summary) -> list:
+        from reportlab.lib import colors
+        from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+
+        styles = getSampleStyleSheet()
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontName=self.bold_font,
+            fontSize=16,
+            textColor=colors.HexColor(self.PRIMARY_COLOR),
+            spaceAfter=30,
+            alignment=1
+        )
+        normal_style = ParagraphStyle('ExportNormal', parent=styles['Normal'], fontName=self.font)
+
+        table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(self.PRIMARY_COLOR)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), self.bold_font),
+            ('FONTSIZE', (0, 0), (-1, 0), self.HEADER_FONT_SIZE),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), self.font),
+            ('FONTSIZE', (0, 1), (-1, -1), self.FONT_SIZE),
+            ('LEFTPADDING', (0, 0), (-1, -1), self.CELL_PADDING),
+            ('RIGHTPADDING', (0, 0), (-1, -1), self.CELL_PADDING),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ])
+
+        self._col_widths = col_widths
+        header_row = [self._fit(h, w, self.bold_font, self.HEADER_FONT_SIZE)
+                      for h, w in zip(headers, col_widths)]
+
+        def make_table(chunk: List[list]):
+            return Table([header_row] + chunk, colWidths=col_widths,
+                         repeatRows=1, style=table_style)
+
+        # Đo chiều cao dòng tiêu đề / dòng dữ liệu (ô 1 dòng chữ nên mọi dòng cao bằng nhau)
+        sample = make_table([['Ág'] * len(headers)])
+        sample.wrap(sum(col_widths), 1 << 20)
+        header_height, row_height = sample._rowHeights[0], sample._rowHeights[1]
+
+        StreamingTable = _streaming_table_class()
+        DeferredParagraph = _deferred_paragraph_class()
+
+        flowables = [
+            Paragraph(self.title, title_style),
+            Spacer(1, 0.2 * inch),
+            Paragraph(f"Ngày xuất: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", normal_style),
+            Spacer(1, 0.3 * inch),
+            StreamingTable(self, iter(rows), make_table, header_height, row_height),
+        ]
+        if summary:
+            flowables.append(Spacer(1, 0.2 * inch))
+            flowables.append(DeferredParagraph(lambda: summary(self.rows), normal_style))
+        return flowables
+
+    def _next_row(self, row: Sequence) -> list:
+        """Chuẩn hóa 1 dòng (cắt chữ vừa ô) và đếm tiến độ"""
+        self.rows += 1
+        if self._progress and self.rows % self.PROGRESS_EVERY == 0:
+            self._progress(self.title, self.rows)
+        return [self._fit(value, width, self.font, self.FONT_SIZE)
+                for value, width in zip(row, self._col_widths)]
+
+    def _fit(self, value, width: float, font: str, size: float) -> str:
+        """Cắt chữ vừa ô (đo bằng font thật), thêm '…' nếu bị cắt"""
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        text = '' if value is None else str(value).replace('\n', ' ')
+        available = width - 2 * self.CELL_PADDING
+        if stringWidth(text, font, size) <= available:
+            return text
+
+        ellipsis_width = stringWidth('…', font, size)
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if stringWidth(text[:middle], font, size) + ellipsis_width <= available:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low].rstrip() + '…'
+
+    def _draw_page_number(self, canvas, doc):
+        canvas.saveState()
+        canvas.setFont(self.font, 8)
+        canvas.drawRightString(self.pagesize[0] - 30, 15, f"Trang {doc.page}")
+        canvas.restoreState()
@@ -0,0 +1,279 @@
+"""
+Report Engine - Dựng báo cáo HTML từ template biên dịch sẵn
+
+- Template nằm trong assets/reports/, cú pháp {{ ten_bien }} (tự escape HTML) và
+  {{ ten_bien|raw }} (chèn nguyên văn; nếu giá trị là iterable thì ghi từng đoạn).
+  CSS / JS trong template viết bình thường, không phải nhân đôi ngoặc như f-string.
+- Template được đọc và tách thành các đoạn đúng 1 lần mỗi process (load_template có cache).
+- CSS dùng chung (report.css) được ghi 1 lần vào reports/assets/, chỉ ghi lại khi
+  nội dung đổi; các báo cáo chỉ tham chiếu tới.
+- Biểu đồ được vẽ sẵn thành SVG (utils/svg_charts.py) và nhúng vào trang: báo cáo
+  không tải gì qua mạng, mở được trên mạng nội bộ không ra Internet.
+- Bảng dữ liệu (stream_table) được ghi thẳng ra file theo lô dòng, không dựng 1 chuỗi lớn.
+- Mỗi loại báo cáo ghi vào 1 file cố định (reports/<tên>.html). Khóa cache (hash của
+  dữ liệu đầu vào + phiên bản template / asset) được ghi ở dòng đầu file; nếu dữ liệu
+  không đổi thì dùng lại file cũ, không dựng lại.
+
+Ví dụ:
+    engine = ReportEngine()
+    path, reused = engine.render('book_statistics', page, context, cache_data=stats)
+"""
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+from config.settings import AppConfig
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = AppConfig.BASE_DIR / 'assets' / 'reports'
+
+# File tĩnh dùng chung, chép sang reports/assets/
+SHARED_ASSETS = ('report.css',)
+
+_PLACEHOLDER = re.compile(r'\{\{\s*(\w+)(\|raw)?\s*\}\}')
+_CACHE_MARK = '<!-- report-key: {} -->\n'
+
+
+# ========== TEMPLATE ==========
+
+class ReportTemplate:
+    """
+    Template đã biên dịch: danh sách đoạn chữ cố định xen kẽ (tên biến, raw)
+
+    Args:
+        name: Tên template (để báo lỗi)
+        source: Nội dung template
+    """
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.version = hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+        self._parts: List = []
+
+        position = 0
+        for match in _PLACEHOLDER.finditer(source):
+            if match.start() > position:
+                self._parts.append(source[position:match.start()])
+            self._parts.append((match.group(1), bool(match.group(2))))
+            position = match.end()
+        if position < len(source):
+            self._parts.append(source[position:])
+
+    def stream(self, context: Dict) -> Iterator[str]:
+        """Sinh từng đoạn HTML (giá trị raw là iterable thì được ghi theo luồng)"""
+        for part in self._parts:
+            if isinstance(part, str):
+                yield part
+                continue
+
+            name, raw = part
+            try:
+                value = context[name]
+            except KeyError:
+                raise KeyError(f"Template '{self.name}' thiếu biến '{name}'") from None
+
+            if value is None:
+                continue
+            if raw and not isinstance(value, str):
+                yield from value
+            elif raw:
+                yield value
+            else:
+                yield html.escape(str(value))
+
+    def render(self, context: Dict) -> str:
+        return ''.join(self.stream(context))
+
+
+@lru_cache(maxsize=None)
+def load_template(name: str) -> ReportTemplate:
+    """Đọc + biên dịch template (1 lần mỗi process)"""
+    path = TEMPLATE_DIR / f"{name}.html"
+    return ReportTemplate(name, path.read_text(encoding='utf-8'))
+
+
+@lru_cache(maxsize=None)
+def _asset_source(name: str) -> str:
+    return (TEMPLATE_DIR / name).read_text(encoding='utf-8')
+
+
+def asset_version() -> str:
+    """Hash nội dung CSS dùng chung (gắn vào URL để trình duyệt không dùng bản cũ)"""
+    digest = hashlib.sha1()
+    for name in SHARED_ASSETS:
+        digest.update(_asset_source(name).encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+# ========== BẢNG DỮ LIỆU ==========
+
+def stream_table(title: str, headers: Sequence[str], rows: Iterable[Sequence],
+                 numeric_columns: Sequence[int] = (), batch_size: int = 500) -> Iterator[str]:
+    """
+    Sinh HTML cho 1 bảng dữ liệu theo từng lô dòng
+
+    Args:
+        title: Tiêu đề mục (đã gồm icon)
+        headers: Tiêu đề cột
+        rows: Iterable các dòng - có thể là generator
+        numeric_columns: Chỉ số cột căn phải
+        batch_size: Số dòng mỗi đoạn ghi ra
+    """
+    escape = html.escape
+    numeric = set(numeric_columns)
+
+    yield f'            <h2 class="section-title">{escape(title)}</h2>\n'
+    yield '            <div class="table-wrapper">\n'
+    yield '                <table class="data-table">\n'
+    yield '                    <thead><tr>'
+    yield ''.join(f'<th>{escape(str(h))}</th>' for h in headers)
+    yield '</tr></thead>\n                    <tbody>\n'
+
+    rows = iter(rows)
+    count = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        count += len(batch)
+        yield ''.join(
+            '<tr>' + ''.join(
+                f'<td class="num">{escape(_cell_text(v))}</td>' if i in numeric
+                else f'<td>{escape(_cell_text(v))}</td>'
+                for i, v in enumerate(row)
+            ) + '</tr>\n'
+            for row in batch
+        )
+
+    if count == 0:
+        yield f'<tr><td class="table-empty" colspan="{len(headers)}">Không có dữ liệu</td></tr>\n'
+    yield '                    </tbody>\n                </table>\n            </div>\n'
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%d/%m/%Y %H:%M')
+    if hasattr(value, 'strftime'):
+        return value.strftime('%d/%m/%Y')
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:,}"
+    return str(value)
+
+
+# ========== ENGINE ==========
+
+class ReportEngine:
+    """
+    Ghi báo cáo HTML vào thư mục reports
+
+    Args:
+        reports_dir: Thư mục đích (mặc định ./reports như trước)
+    """
+
+    # Thư mục reports/assets đã được đồng bộ trong process này
+    _assets_synced = set()
+    _lock = threading.Lock()
+
+    def __init__(self, reports_dir: Optional[Path] = None):
+        self.reports_dir = Path(reports_dir) if reports_dir else Path.cwd() / "reports"
+
+    # ========== PUBLIC API ==========
+
+    def render(self, name: str, page: Dict, context: Dict,
+               cache_data=None) -> Tuple[str, bool]:
+        """
+        Dựng template trang `name` trong layout chung và ghi ra reports/<name>.html
+
+        Args:
+            name: Tên template trang (assets/reports/<name>.html)
+            page: Biến của layout: title, heading, theme
+            context: Biến của template trang
+            cache_data: Dữ liệu đầu vào để tính khóa cache (đủ JSON hóa, dùng default=str);
+                None = luôn dựng lại (vd. context có generator không hash trước được)
+
+        Returns:
+            (đường dẫn file, True nếu dùng lại file cũ)
+        """
+        self.ensure_assets()
+        filename = self.reports_dir / f"{name}.html"
+
+        key = None
+        if cache_data is not None:
+            key = self.cache_key(name, page, cache_data)
+            if self._read_key(filename) == key:
+                logger.info(f"✅ Dữ liệu không đổi, dùng lại báo cáo: {filename}")
+                return str(filename), True
+
+        layout_context = {
+            'title': page['title'],
+            'heading': page['heading'],
+            'theme': page.get('theme', 'default'),
+            'asset_version': asset_version(),
+            'generated_at': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+            'content': load_template(name).stream(context),
+        }
+
+        # Ghi ra file tạm rồi đổi tên: trình duyệt đang mở file cũ không thấy file dở dang
+        tmp_path = filename.with_name(f".{filename.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                if key:
+                    f.write(_CACHE_MARK.format(key))
+                for chunk in load_template('base').stream(layout_context):
+                    f.write(chunk)
+            os.replace(tmp_path, filename)
+        except BaseException:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+
+        return str(filename), False
+
+    def ensure_assets(self):
+        """Ghi CSS dùng chung vào reports/assets/ nếu chưa có hoặc đã đổi"""
+        assets_dir = self.reports_dir / 'assets'
+        with self._lock:
+            if assets_dir in self._assets_synced:
+                return
+            assets_dir.mkdir(parents=True, exist_ok=True)
+            for name in SHARED_ASSETS:
+                source = _asset_source(name)
+                target = assets_dir / name
+                if not target.exists() or target.read_text(encoding='utf-8') != source:
+                    target.write_text(source, encoding='utf-8')
+                    logger.info(f"✅ Đã ghi asset báo cáo: {target}")
+            self._assets_synced.add(assets_dir)
+
+    @staticmethod
+    def cache_key(name: str, page: Dict, cache_data) -> str:
+        """Hash dữ liệu đầu vào + phiên bản template / asset"""
+        payload = json.dumps(
+            [name, load_template('base').version, load_template(name).version,
+             asset_version(), page, cache_data],
+            sort_keys=True, default=str, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    # ========== INTERNAL ==========
+
+    @staticmethod
+    def _read_key(filename: Path) -> Optional[str]:
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                first_line = f.readline()
+        except OSError:
+            return None
+        match = re.match(r'<!-- report-key: (\w+) -->', first_line)
+        return match.group(1) if match else None
@@ -0,0 +1,184 @@
+"""
+SVG Charts - Vẽ biểu đồ cột / tròn thành SVG ngay khi dựng báo cáo
+
+Báo cáo HTML nhúng thẳng SVG nên mở được ngay, không cần tải thư viện vẽ biểu đồ
+qua mạng (mạng nội bộ không ra Internet). Chỉ dùng thư viện chuẩn.
+
+Ví dụ:
+    svg = bar_chart(['Hoạt động', 'Hết hạn'], [120, 8], [GREEN, RED])
+    svg = pie_chart(['Trong kho', 'Đang mượn'], [900, 100], [BLUE, ORANGE], cutout=0.6)
+"""
+import math
+from html import escape
+from typing import List, Sequence, Tuple
+
+Color = Tuple[int, int, int]
+
+GREEN = (76, 175, 80)
+RED = (244, 67, 54)
+ORANGE = (255, 152, 0)
+AMBER = (255, 193, 7)
+BLUE = (33, 150, 243)
+INDIGO = (102, 126, 234)
+LIME = (139, 195, 74)
+
+EMPTY_COLOR = '#e0e0e0'
+AXIS_COLOR = '#ccc'
+TEXT_COLOR = '#555'
+LEGEND_ROW = 24
+
+
+def _rgb(color: Color) -> str:
+    return 'rgb({}, {}, {})'.format(*color)
+
+
+def _fmt(value) -> str:
+    return f"{value:,}" if isinstance(value, int) else f"{value:,.1f}"
+
+
+def _nice_ticks(maximum: float, count: int = 5) -> List[float]:
+    """Các mốc trục 0..top với bước tròn (1, 2, 5 x 10^k)"""
+    if maximum <= 0:
+        return [0, 1]
+    raw_step = maximum / count
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw_step)
+    step = max(step, 1)
+    top = math.ceil(maximum / step) * step
+    return [i * step for i in range(int(round(top / step)) + 1)]
+
+
+def _svg(width: int, height: int, body: List[str], label: str) -> str:
+    return (
+        f'<svg class="chart-svg" viewBox="0 0 {width} {height}" role="img" '
+        f'aria-label="{escape(label)}" xmlns="http://www.w3.org/2000/svg">'
+        + ''.join(body) + '</svg>'
+    )
+
+
+# ========== BIỂU ĐỒ CỘT ==========
+
+def bar_chart(labels: Sequence[str], values: Sequence[float], colors: Sequence[Color],
+              horizontal: bool = False, width: int = 520, height: int = 320) -> str:
+    """
+    Biểu đồ cột (1 dãy số liệu)
+
+    Args:
+        labels: Nhãn từng cột
+        values: Giá trị (số âm được vẽ như 0)
+        colors: Màu từng cột (r, g, b)
+        horizontal: True = cột nằm ngang
+    """
+    values = [max(v or 0, 0) for v in values]
+    ticks = _nice_ticks(max(values, default=0))
+    top = ticks[-1]
+    body = []
+
+    if horizontal:
+        left, right, top_pad, bottom = 140, 30, 10, 30
+        plot_w = width - left - right
+        plot_h = height - top_pad - bottom
+        band = plot_h / max(len(values), 1)
+
+        for tick in ticks:
+            x = left + tick / top * plot_w
+            body.append(f'<line x1="{x:.1f}" y1="{top_pad}" x2="{x:.1f}" y2="{top_pad + plot_h}" '
+                        f'stroke="{AXIS_COLOR}" stroke-width="1"/>')
+            body.append(f'<text x="{x:.1f}" y="{height - 10}" font-size="12" fill="{TEXT_COLOR}" '
+                        f'text-anchor="middle">{_fmt(tick)}</text>')
+
+        for i, (label, value, color) in enumerate(zip(labels, values, colors)):
+            y = top_pad + i * band + band * 0.15
+            bar_h = band * 0.7
+            bar_w = value / top * plot_w
+            body.append(f'<rect x="{left}" y="{y:.1f}" width="{bar_w:.1f}" height="{bar_h:.1f}" '
+                        f'fill="{_rgb(color)}" fill-opacity="0.8" stroke="{_rgb(color)}" stroke-width="2">'
+                        f'<title>{escape(label)}: {_fmt(value)}</title></rect>')
+            body.append(f'<text x="{left - 8}" y="{y + bar_h / 2 + 4:.1f}" font-size="12" fill="{TEXT_COLOR}" '
+                        f'text-anchor="end">{escape(label)}</text>')
+            body.append(f'<text x="{left + bar_w + 6:.1f}" y="{y + bar_h / 2 + 4:.1f}" font-size="12" '
+                        f'font-weight="bold" fill="#333">{_fmt(value)}</text>')
+    else:
+        left, right, top_pad, bottom = 55, 10, 25, 40
+        plot_w = width - left - right
+        plot_h = height - top_pad - bottom
+        band = plot_w / max(len(values), 1)
+
+        for tick in ticks:
+            y = top_pad + plot_h - tick / top * plot_h
+            body.append(f'<line x1="{left}" y1="{y:.1f}" x2="{left + plot_w}" y2="{y:.1f}" '
+                        f'stroke="{AXIS_COLOR}" stroke-width="1"/>')
+            body.append(f'<text x="{left - 8}" y="{y + 4:.1f}" font-size="12" fill="{TEXT_COLOR}" '
+                        f'text-anchor="end">{_fmt(tick)}</text>')
+
+        for i, (label, value, color) in enumerate(zip(labels, values, colors)):
+            x = left + i * band + band * 0.2
+            bar_w = band * 0.6
+            bar_h = value / top * plot_h
+            y = top_pad + plot_h - bar_h
+            center = x + bar_w / 2
+            body.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{bar_w:.1f}" height="{bar_h:.1f}" '
+                        f'fill="{_rgb(color)}" fill-opacity="0.8" stroke="{_rgb(color)}" stroke-width="2">'
+                        f'<title>{escape(label)}: {_fmt(value)}</title></rect>')
+            body.append(f'<text x="{center:.1f}" y="{y - 6:.1f}" font-size="12" font-weight="bold" '
+                        f'fill="#333" text-anchor="middle">{_fmt(value)}</text>')
+            body.append(f'<text x="{center:.1f}" y="{height - 15}" font-size="12" fill="{TEXT_COLOR}" '
+                        f'text-anchor="middle">{escape(label)}</text>')
+
+    return _svg(width, height, body, ', '.join(f"{l}: {_fmt(v)}" for l, v in zip(labels, values)))
+
+
+# ========== BIỂU ĐỒ TRÒN ==========
+
+def pie_chart(labels: Sequence[str], values: Sequence[float], colors: Sequence[Color],
+              cutout: float = 0.0, size: int = 300) -> str:
+    """
+    Biểu đồ tròn / vành khuyên kèm chú thích (nhãn: giá trị (phần trăm))
+
+    Args:
+        cutout: Tỉ lệ lỗ giữa (0 = hình tròn, 0.6 = vành khuyên như Chart.js doughnut)
+        size: Đường kính vùng vẽ (px, trước khi co giãn)
+    """
+    values = [max(v or 0, 0) for v in values]
+    total = sum(values)
+    width = max(size, 360)
+    height = size + 10 + LEGEND_ROW * len(values)
+    cx, cy = width / 2, size / 2
+    radius = size / 2 - 10
+    body = []
+
+    if total == 0:
+        body.append(f'<circle cx="{cx}" cy="{cy}" r="{radius}" fill="{EMPTY_COLOR}"/>')
+    else:
+        angle = -math.pi / 2
+        for label, value, color in zip(labels, values, colors):
+            if value == 0:
+                continue
+            tooltip = f'<title>{escape(label)}: {_fmt(value)} ({value / total * 100:.1f}%)</title>'
+            if value == total:
+                body.append(f'<circle cx="{cx}" cy="{cy}" r="{radius}" fill="{_rgb(color)}" '
+                            f'fill-opacity="0.8">{tooltip}</circle>')
+                break
+            sweep = value / total * 2 * math.pi
+            x1, y1 = cx + radius * math.cos(angle), cy + radius * math.sin(angle)
+            angle += sweep
+            x2, y2 = cx + radius * math.cos(angle), cy + radius * math.sin(angle)
+            large = 1 if sweep > math.pi else 0
+            body.append(f'<path d="M{cx},{cy} L{x1:.2f},{y1:.2f} A{radius},{radius} 0 {large} 1 '
+                        f'{x2:.2f},{y2:.2f} Z" fill="{_rgb(color)}" fill-opacity="0.8" '
+                        f'stroke="white" stroke-width="2">{tooltip}</path>')
+
+    if cutout > 0:
+        body.append(f'<circle cx="{cx}" cy="{cy}" r="{radius * cutout:.1f}" fill="white"/>')
+        body.append(f'<text x="{cx}" y="{cy + 8}" font-size="22" font-weight="bold" fill="#333" '
+                    f'text-anchor="middle">{_fmt(total)}</text>')
+
+    legend_x = width / 2 - 120
+    for i, (label, value, color) in enumerate(zip(labels, values, colors)):
+        y = size + 10 + i * LEGEND_ROW
+        percent = value / total * 100 if total else 0
+        body.append(f'<rect x="{legend_x:.1f}" y="{y}" width="14" height="14" rx="3" fill="{_rgb(color)}"/>')
+        body.append(f'<text x="{legend_x + 22:.1f}" y="{y + 12}" font-size="13" fill="{TEXT_COLOR}">'
+                    f'{escape(label)}: {_fmt(value)} ({percent:.1f}%)</text>')
+
+    return _svg(width, height, body, ', '.join(f"{l}: {_fmt(v)}" for l, v in zip(labels, values)))
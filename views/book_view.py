@@ -3,10 +3,12 @@ from tkinter import ttk
 from typing import Optional, List
 import logging
 from utils.html_report_helper import HTMLReportHelper
+from config.settings import AppConfig
 from models.book import Book
 from controllers.book_controller import BookController
 from views.book_dialog import BookDialog
 from utils.messagebox_helper import MessageBoxHelper
+from utils.background_loader import BackgroundLoader
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +23,18 @@ class BookView(ttk.Frame):
         self.current_books: List[Book] = []
         self.selected_book: Optional[Book] = None
 
+        # Trạng thái phân trang (keyset) cho Treeview ảo hóa
+        self._last_book_id: Optional[int] = None
+        self._has_more = False
+        # Từ khóa đang tìm: trong lúc tìm kiếm không tải thêm trang (trang là danh sách chưa lọc)
+        self._search_keyword = None
+        self._loading_page = False
+        self._total_books = 0
+
         self._create_widgets()
+        # Truy vấn chạy nền; mọi yêu cầu dùng chung key 'books' nên yêu cầu mới
+        # (tìm kiếm, tải lại) thay thế yêu cầu cũ chưa xong
+        self.loader = BackgroundLoader(self, on_busy=self._set_busy)
         self._load_data()
 
     def _create_widgets(self):
@@ -189,7 +202,9 @@ class BookView(ttk.Frame):
         # Scrollbars
         vsb = ttk.Scrollbar(table_frame, orient='vertical', command=self.tree.yview)
         hsb = ttk.Scrollbar(table_frame, orient='horizontal', command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.vsb = vsb
+        # Cuộn gần cuối danh sách sẽ tự tải thêm trang kế tiếp
+        self.tree.configure(yscrollcommand=self._on_tree_scroll, xscrollcommand=hsb.set)
 
         # Grid layout
         self.tree.grid(row=0, column=0, sticky='nsew')
@@ -208,6 +223,11 @@ class BookView(ttk.Frame):
         self.context_menu.add_separator()
         self.context_menu.add_command(label="ℹ️ Chi tiết", command=self._show_detail)
 
+        # Cấu hình màu tag
+        self.tree.tag_configure('out_of_stock', foreground='#F44336')
+        self.tree.tag_configure('low_stock', foreground='#FF9800')
+        self.tree.tag_configure('in_stock', foreground='#4CAF50')
+
         # Bind events
         self.tree.bind('<<TreeviewSelect>>', self._on_select)
         self.tree.bind('<Double-1>', lambda e: self._show_edit_dialog())
@@ -239,6 +259,9 @@ class BookView(ttk.Frame):
         )
         self.status_label.pack(side='left', padx=5)
 
+        # Thanh tiến trình, chỉ hiện khi đang tải
+        self.progress = ttk.Progressbar(status_bar, mode='indeterminate', length=120)
+
         self.count_label = ttk.Label(
             status_bar,
             text="Tổng: 0 sách",
@@ -247,23 +270,101 @@ class BookView(ttk.Frame):
         self.count_label.pack(side='right', padx=5)
 
     def _load_data(self):
-        """Load dữ liệu từ database"""
-        try:
-            self.current_books = self.controller.get_all_books()
-            self._populate_tree(self.current_books)
-            self.status_label.config(text="✅ Đã tải dữ liệu thành công")
-            logger.info(f"Loaded {len(self.current_books)} books")
-        except Exception as e:
-            self.msg_helper.show_error("Lỗi", f"Không thể tải dữ liệu: {str(e)}")
-            logger.error(f"Error loading data: {e}")
+        """Load trang đầu tiên từ database (chạy nền), các trang sau tải khi cuộn"""
+        self._search_keyword = None
+        self.status_label.config(text="⏳ Đang tải dữ liệu...")
+        self._loading_page = True
+        self.loader.submit(
+            'books',
+            self._fetch_first_page,
+            on_success=self._on_first_page_loaded,
+            on_error=self._on_load_error
+        )
+
+    def _fetch_first_page(self):
+        """(Thread nền) Đếm tổng số sách và lấy trang đầu"""
+        total = self.controller.count_books()
+        books = self.controller.get_books_page(None, AppConfig.ITEMS_PER_PAGE)
+        return total, books
+
+    def _on_first_page_loaded(self, result):
+        total, books = result
+        self._clear_tree()
+        self.current_books = []
+        self._last_book_id = None
+        self._total_books = total
+        self._loading_page = False
+        self._on_page_loaded(books)
+
+        self.status_label.config(text="✅ Đã tải dữ liệu thành công")
+        logger.info(f"Loaded first page: {len(self.current_books)}/{self._total_books} books")
+
+    def _on_load_error(self, error: Exception):
+        self._loading_page = False
+        self.status_label.config(text="❌ Lỗi tải dữ liệu")
+        self.msg_helper.show_error("Lỗi", f"Không thể tải dữ liệu: {str(error)}")
+        logger.error(f"Error loading data: {error}")
+
+    def _load_next_page(self):
+        """Tải thêm 1 trang sách (keyset theo book_id, chạy nền) và nối vào cuối Treeview"""
+        if self._search_keyword or not self._has_more or self._loading_page:
+            return
+
+        self._loading_page = True
+        self.loader.submit(
+            'books',
+            self.controller.get_books_page, self._last_book_id, AppConfig.ITEMS_PER_PAGE,
+            on_success=self._on_next_page_loaded,
+            on_error=self._on_load_error
+        )
+
+    def _on_next_page_loaded(self, books: List[Book]):
+        self._loading_page = False
+        if self._search_keyword:
+            # Trang chưa lọc về sau khi đã bắt đầu tìm kiếm: bỏ qua
+            return
+        self._on_page_loaded(books)
+
+    def _on_page_loaded(self, books: List[Book]):
+        """Nối 1 trang vào Treeview và cập nhật con trỏ keyset"""
+        if books:
+            self._last_book_id = books[-1].book_id
+            self.current_books.extend(books)
+            self._append_rows(books)
+        self._has_more = len(books) == AppConfig.ITEMS_PER_PAGE
+        self._update_count_label()
+
+    def _set_busy(self, busy: bool):
+        """Hiện / ẩn thanh tiến trình khi đang tải"""
+        if busy:
+            self.progress.pack(side='left', padx=5)
+            self.progress.start(15)
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
+
+    def _on_tree_scroll(self, first, last):
+        """Đồng bộ scrollbar và tải trang kế tiếp khi cuộn gần cuối"""
+        self.vsb.set(first, last)
+        if (self._has_more and not self._loading_page and not self._search_keyword
+                and float(last) >= 0.9):
+            self.after_idle(self._load_next_page)
+
+    def _clear_tree(self):
+        """Xóa toàn bộ dòng trên Treeview trong 1 lệnh"""
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
 
     def _populate_tree(self, books: List[Book]):
-        """Hiển thị dữ liệu lên Treeview"""
-        # Xóa dữ liệu cũ
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        """Hiển thị danh sách (kết quả tìm kiếm) lên Treeview"""
+        self._clear_tree()
+        self._has_more = False
+        self._append_rows(books)
+        self.count_label.config(text=f"Tổng: {len(books)} sách")
 
-        # Thêm dữ liệu mới
+    def _append_rows(self, books: List[Book]):
+        """Thêm các dòng sách vào cuối Treeview"""
         for book in books:
             # Format giá
             price_str = f"{book.price:,.0f}" if book.price else "0"
@@ -284,23 +385,22 @@ class BookView(ttk.Frame):
             )
 
             # Thêm tag màu theo trạng thái tồn kho
-            tags = []
             if book.available_quantity == 0:
-                tags.append('out_of_stock')
+                tag = 'out_of_stock'
             elif book.available_quantity < 5:
-                tags.append('low_stock')
+                tag = 'low_stock'
             else:
-                tags.append('in_stock')
-
-            self.tree.insert('', 'end', values=values, tags=tuple(tags))
+                tag = 'in_stock'
 
-        # Cấu hình màu tag
-        self.tree.tag_configure('out_of_stock', foreground='#F44336')
-        self.tree.tag_configure('low_stock', foreground='#FF9800')
-        self.tree.tag_configure('in_stock', foreground='#4CAF50')
+            self.tree.insert('', 'end', values=values, tags=(tag,))
 
-        # Cập nhật count
-        self.count_label.config(text=f"Tổng: {len(books)} sách")
+    def _update_count_label(self):
+        """Cập nhật số sách đã hiển thị / tổng số"""
+        shown = len(self.current_books)
+        if shown < self._total_books:
+            self.count_label.config(text=f"Hiển thị: {shown}/{self._total_books} sách")
+        else:
+            self.count_label.config(text=f"Tổng: {self._total_books} sách")
 
     def _on_select(self, event):
         """Xử lý khi chọn 1 dòng"""
@@ -347,12 +447,22 @@ class BookView(ttk.Frame):
             self._load_data()
             return
 
-        try:
-            books = self.controller.search_books(keyword, search_by)
-            self._populate_tree(books)
-            self.status_label.config(text=f"🔍 Tìm thấy {len(books)} kết quả")
-        except Exception as e:
-            self.msg_helper.show_error("Lỗi tìm kiếm", str(e))
+        # Thay thế yêu cầu đang chạy (tải trang / từ khóa cũ); tắt cuộn tải thêm khi tìm kiếm
+        self._search_keyword = keyword
+        self._loading_page = False
+        self._has_more = False
+        self.status_label.config(text=f"🔍 Đang tìm kiếm '{keyword}'...")
+        self.loader.submit(
+            'books',
+            self.controller.search_books, keyword, search_by,
+            on_success=self._on_search_done,
+            on_error=lambda e: self.msg_helper.show_error("Lỗi tìm kiếm", str(e))
+        )
+
+    def _on_search_done(self, books: List[Book]):
+        self.current_books = books
+        self._populate_tree(books)
+        self.status_label.config(text=f"🔍 Tìm thấy {len(books)} kết quả")
 
     def _reset_search(self):
         """Reset tìm kiếm"""
@@ -625,18 +735,36 @@ class BookView(ttk.Frame):
                 parent=self
             )
 
+    def _get_export_books(self) -> Optional[List[Book]]:
+        """
+        Danh sách sách cần xuất: kết quả tìm kiếm đang hiển thị,
+        hoặc None (= toàn bộ catalogue, controller đọc từ DB theo lô)
+        nếu Treeview mới tải một phần
+        """
+        if self._has_more:
+            return None
+        return self.current_books
+
     def _export_json(self):
         """Xuất dữ liệu ra JSON"""
-        self.controller.export_json(self.current_books, parent=self)
+        self._export_async('JSON')
 
     def _export_csv(self):
         """Xuất dữ liệu ra CSV"""
-        self.controller.export_csv(self.current_books, parent=self)
+        self._export_async('CSV')
 
     def _export_excel(self):
         """Xuất dữ liệu ra Excel"""
-        self.controller.export_excel(self.current_books, parent=self)
+        self._export_async('Excel')
 
     def _export_pdf(self):
         """Xuất dữ liệu ra PDF"""
-        self.controller.export_pdf(self.current_books, parent=self)
+        self._export_async('PDF')
+
+    def _export_async(self, label: str):
+        """
+        Xuất bằng job chạy nền: tiến độ, hủy và thông báo hoàn tất
+        ở bảng "Xuất dữ liệu" cuối cửa sổ
+        """
+        if self.controller.export_async(label, self._get_export_books(), parent=self):
+            self.status_label.config(text=f"⏳ Đang xuất {label} (xem tiến độ ở cuối cửa sổ)")
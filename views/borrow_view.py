@@ -2,7 +2,13 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 from controllers.borrow_controller import BorrowController
+from config.settings import AppConfig
+from collections import Counter
 from datetime import datetime
+import re
+
+# Gợi ý có dạng "Tên (#id)": chọn gợi ý = tra theo khóa chính, không tra lại theo tên
+_SUGGESTION_ID = re.compile(r'\(#(\d+)\)$')
 
 
 class BorrowView(ttk.Frame):
@@ -10,6 +16,16 @@ class BorrowView(ttk.Frame):
         super().__init__(parent)
         self.controller = BorrowController()
         self.selected_slip_id = None  # Lưu slip đang chọn
+        self.scanned_codes = []  # Mã sách đã quét, chờ xác nhận mượn
+        self._suggest_jobs = {}  # Ô nhập -> lịch gợi ý đang chờ (after id)
+        # Danh sách phiếu: bộ lọc + sắp xếp chạy trong SQL, tải từng trang (keyset)
+        self.filters = {}
+        self.sort_by = "borrow_date"
+        self.descending = True
+        self._cursor = None
+        self._has_more = False
+        self._page_pending = False
+        self._total = 0
         self._create_ui()
         self._load_borrows()  # Load dữ liệu ngay khi tạo view
 
@@ -22,13 +38,17 @@ class BorrowView(ttk.Frame):
         # -----------------------
         # Form thông tin phiếu
         # -----------------------
-        ttk.Label(form, text="Tên Bạn đọc:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
-        self.reader_entry = ttk.Entry(form, width=30)
+        ttk.Label(form, text="Bạn đọc (mã thẻ / tên):").grid(row=0, column=0, sticky="w", padx=5, pady=5)
+        self.reader_entry = ttk.Combobox(form, width=28)
         self.reader_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.reader_entry.bind("<KeyRelease>", lambda e: self._schedule_suggest(
+            e, self.reader_entry, self.controller.suggest_readers, "reader_id", "full_name"))
 
-        ttk.Label(form, text="Tên Sách:").grid(row=1, column=0, sticky="w", padx=5, pady=5)
-        self.book_entry = ttk.Entry(form, width=30)
+        ttk.Label(form, text="Sách (barcode / ISBN / tên):").grid(row=1, column=0, sticky="w", padx=5, pady=5)
+        self.book_entry = ttk.Combobox(form, width=28)
         self.book_entry.grid(row=1, column=1, padx=5, pady=5)
+        self.book_entry.bind("<KeyRelease>", lambda e: self._schedule_suggest(
+            e, self.book_entry, self.controller.suggest_books, "book_id", "title"))
 
         ttk.Label(form, text="Ngày mượn:").grid(row=0, column=2, sticky="w", padx=5, pady=5)
         self.borrow_date_entry = DateEntry(form, width=15, date_pattern="yyyy-mm-dd")
@@ -47,37 +67,216 @@ class BorrowView(ttk.Frame):
         ttk.Button(form, text="💾 Cập nhật", command=self._update_borrow).grid(row=2, column=1, pady=10)
         ttk.Button(form, text="📤 Trả sách", command=self._return_borrow).grid(row=2, column=2, pady=10)
         ttk.Button(form, text="🔄 Reset", command=self._reset_form).grid(row=2, column=3, pady=10)
+        ttk.Button(form, text="📦 Trả hàng loạt", command=self._open_bulk_return).grid(row=2, column=4, pady=10)
+
+        # -----------------------
+        # Mượn nhiều sách: quét lần lượt rồi xác nhận 1 lần
+        # -----------------------
+        scan = ttk.LabelFrame(self, text="🛒 Mượn nhiều sách (bạn đọc: tên hoặc mã ở ô trên)", padding=5)
+        scan.pack(padx=10, fill="x")
+
+        ttk.Label(scan, text="Barcode / Mã sách:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
+        self.scan_entry = ttk.Entry(scan, width=30)
+        self.scan_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.scan_entry.bind("<Return>", self._add_scanned_code)
+        ttk.Button(scan, text="➕ Thêm", command=self._add_scanned_code).grid(row=0, column=2, padx=5)
+
+        self.scan_list = tk.Listbox(scan, height=5, width=40)
+        self.scan_list.grid(row=1, column=0, columnspan=2, sticky="we", padx=5, pady=5)
+
+        scan_buttons = ttk.Frame(scan)
+        scan_buttons.grid(row=1, column=2, sticky="n", padx=5, pady=5)
+        ttk.Button(scan_buttons, text="🗑️ Bỏ mã đã chọn", command=self._remove_scanned_code).pack(fill="x", pady=2)
+        ttk.Button(scan_buttons, text="🧹 Xóa hết", command=self._clear_scanned_codes).pack(fill="x", pady=2)
+        self.confirm_batch_button = ttk.Button(
+            scan_buttons, text="✅ Xác nhận mượn (0)", command=self._confirm_batch_borrow
+        )
+        self.confirm_batch_button.pack(fill="x", pady=2)
 
         # -----------------------
         # Treeview hiển thị phiếu mượn/trả
         # -----------------------
+        # -----------------------
+        # Bộ lọc danh sách
+        # -----------------------
+        filters = ttk.LabelFrame(self, text="🔍 Lọc phiếu", padding=5)
+        filters.pack(padx=10, pady=(10, 0), fill="x")
+
+        ttk.Label(filters, text="Trạng thái:").pack(side="left", padx=(5, 2))
+        self.status_filter = ttk.Combobox(
+            filters, width=12, state="readonly",
+            values=("Tất cả", "BORROWING", "LATE", "RETURNED", "LOST")
+        )
+        self.status_filter.set("Tất cả")
+        self.status_filter.pack(side="left", padx=2)
+
+        ttk.Label(filters, text="Mượn từ:").pack(side="left", padx=(10, 2))
+        self.date_from_filter = ttk.Entry(filters, width=11)
+        self.date_from_filter.pack(side="left", padx=2)
+        ttk.Label(filters, text="đến:").pack(side="left", padx=2)
+        self.date_to_filter = ttk.Entry(filters, width=11)
+        self.date_to_filter.pack(side="left", padx=2)
+
+        ttk.Label(filters, text="Bạn đọc:").pack(side="left", padx=(10, 2))
+        self.reader_filter = ttk.Entry(filters, width=18)
+        self.reader_filter.pack(side="left", padx=2)
+        self.reader_filter.bind("<Return>", lambda e: self._apply_filters())
+
+        ttk.Button(filters, text="🔍 Lọc", command=self._apply_filters).pack(side="left", padx=5)
+        ttk.Button(filters, text="✖ Bỏ lọc", command=self._clear_filters).pack(side="left")
+
+        # -----------------------
+        # Treeview hiển thị phiếu mượn/trả (1 dòng / phiếu, iid = slip_id)
+        # -----------------------
+        table = ttk.Frame(self)
+        table.pack(padx=10, pady=(10, 0), fill="both", expand=True)
+
         columns = ("slip_id", "reader_name", "book_name", "borrow_date", "return_due", "return_date", "status")
-        self.tree = ttk.Treeview(self, columns=columns, show="headings")
+        self.tree = ttk.Treeview(table, columns=columns, show="headings")
         for col in columns:
             self.tree.heading(col, text=col.replace("_", " ").title())
             self.tree.column(col, width=100)
-        self.tree.pack(pady=20, fill="x")
+        # Bấm tiêu đề cột để sắp xếp (trong SQL, tải lại từ trang đầu)
+        for col in ("slip_id", "borrow_date", "return_due"):
+            self.tree.heading(col, command=lambda c=col: self._sort_by_column(c))
+
+        self.vsb = ttk.Scrollbar(table, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.vsb.pack(side="right", fill="y")
 
         self.tree.bind("<Double-1>", self._on_row_click)
 
+        footer = ttk.Frame(self)
+        footer.pack(padx=10, pady=5, fill="x")
+        self.count_label = ttk.Label(footer, text="")
+        self.count_label.pack(side="left")
+        self.more_button = ttk.Button(footer, text="⬇️ Tải thêm", command=self._load_next_page)
+        self.more_button.pack(side="right")
+
     # -----------------------
     # Load dữ liệu phiếu mượn/trả
     # -----------------------
     def _load_borrows(self):
+        """Tải lại từ trang đầu theo bộ lọc + sắp xếp hiện tại"""
         for row in self.tree.get_children():
             self.tree.delete(row)
 
-        borrows = self.controller.get_all_borrows()
+        self._cursor = None
+        self._total = self.controller.count_borrows(**self.filters)
+        self._has_more = True
+        self._load_next_page()
+
+    def _load_next_page(self):
+        """Nối 1 trang phiếu vào cuối Treeview"""
+        self._page_pending = False
+        if not self._has_more:
+            return
+
+        try:
+            borrows = self.controller.get_all_borrows(
+                **self.filters, sort_by=self.sort_by, descending=self.descending,
+                after=self._cursor, limit=AppConfig.ITEMS_PER_PAGE
+            )
+        except Exception as e:
+            # Giữ _has_more: bấm "Tải thêm" / cuộn để thử lại
+            messagebox.showerror("Lỗi", f"Không tải được danh sách phiếu mượn: {e}")
+            self._update_count_label()
+            return
         for b in borrows:
-            self.tree.insert("", "end", values=(
-                b["slip_id"],
-                b["full_name"],
-                b["book_name"],
-                b["borrow_date"],
-                b["return_due"],
-                b["return_date"] if b["return_date"] else "",
-                b["status"]
-            ))
+            if not self.tree.exists(b["slip_id"]):
+                self.tree.insert("", "end", iid=b["slip_id"], values=self._row_values(b))
+        if borrows:
+            self._cursor = self.controller.page_cursor(borrows[-1], self.sort_by)
+        self._has_more = len(borrows) == AppConfig.ITEMS_PER_PAGE
+        self._update_count_label()
+
+    def _refresh_slip(self, slip_id):
+        """Sau khi tạo / sửa / trả: chỉ tải lại đúng 1 phiếu thay vì cả danh sách"""
+        b = self.controller.get_borrow(slip_id)
+        if b and not self.controller.matches_filters(b, **self.filters):
+            # Phiếu không còn khớp bộ lọc (vd. vừa trả khi đang lọc "Đang mượn"): bỏ khỏi danh sách
+            b = None
+        if self.tree.exists(slip_id):
+            if b:
+                self.tree.item(slip_id, values=self._row_values(b))
+            else:
+                self.tree.delete(slip_id)
+                self._total -= 1
+        elif b:
+            # Phiếu mới: đưa lên đầu danh sách
+            self.tree.insert("", 0, iid=slip_id, values=self._row_values(b))
+            self._total += 1
+        self._update_count_label()
+
+    @staticmethod
+    def _row_values(b):
+        return (
+            b["slip_id"],
+            b["full_name"],
+            b["book_name"] or "",
+            b["borrow_date"],
+            b["return_due"],
+            b["return_date"] if b["return_date"] else "",
+            b["status"]
+        )
+
+    def _update_count_label(self):
+        shown = len(self.tree.get_children())
+        self.count_label.config(text=f"Hiển thị {shown:,} / {max(self._total, shown):,} phiếu")
+        self.more_button.config(state="normal" if self._has_more else "disabled")
+
+    def _on_tree_scroll(self, first, last):
+        """Đồng bộ scrollbar và tải trang kế tiếp khi cuộn gần cuối"""
+        self.vsb.set(first, last)
+        if self._has_more and not self._page_pending and float(last) >= 0.9:
+            self._page_pending = True
+            self.after_idle(self._load_next_page)
+
+    # -----------------------
+    # Lọc / sắp xếp
+    # -----------------------
+    def _apply_filters(self):
+        filters = {}
+        status = self.status_filter.get()
+        if status != "Tất cả":
+            filters["status"] = status
+
+        for key, entry in (("date_from", self.date_from_filter), ("date_to", self.date_to_filter)):
+            text = entry.get().strip()
+            if not text:
+                continue
+            try:
+                filters[key] = datetime.strptime(text, "%Y-%m-%d").date()
+            except ValueError:
+                messagebox.showwarning("Sai định dạng", f"Ngày '{text}' phải có dạng yyyy-mm-dd")
+                return
+
+        reader_ref = self.reader_filter.get().strip()
+        if reader_ref:
+            reader_id, error = self.controller.resolve_reader(reader_ref)
+            if error:
+                messagebox.showwarning("Bạn đọc", error)
+                return
+            filters["reader_id"] = reader_id
+
+        self.filters = filters
+        self._load_borrows()
+
+    def _clear_filters(self):
+        self.status_filter.set("Tất cả")
+        self.date_from_filter.delete(0, tk.END)
+        self.date_to_filter.delete(0, tk.END)
+        self.reader_filter.delete(0, tk.END)
+        self.filters = {}
+        self._load_borrows()
+
+    def _sort_by_column(self, column):
+        if self.sort_by == column:
+            self.descending = not self.descending
+        else:
+            self.sort_by, self.descending = column, True
+        self._load_borrows()
 
     # -----------------------
     # Reset form
@@ -89,25 +288,105 @@ class BorrowView(ttk.Frame):
         self.borrow_date_entry.set_date("")
         self.return_date_entry.set_date("")
 
+    # -----------------------
+    # Gợi ý khi gõ tên (chờ ngừng gõ 200ms mới tra)
+    # -----------------------
+    def _schedule_suggest(self, event, entry, source, id_key, name_key):
+        if event.keysym in ("Return", "Escape", "Tab", "Up", "Down"):
+            return
+        job = self._suggest_jobs.pop(entry, None)
+        if job:
+            self.after_cancel(job)
+        self._suggest_jobs[entry] = self.after(200, self._show_suggestions, entry, source, id_key, name_key)
+
+    def _show_suggestions(self, entry, source, id_key, name_key):
+        self._suggest_jobs.pop(entry, None)
+        text = entry.get().strip()
+        # Mã thẻ / barcode quét vào hoặc gợi ý vừa chọn: không cần gợi ý
+        if not text or text.isdigit() or _SUGGESTION_ID.search(text):
+            entry["values"] = []
+            return
+        entry["values"] = [f"{row[name_key]} (#{row[id_key]})" for row in source(text)]
+
+    @staticmethod
+    def _entry_ref(entry):
+        """id (int) nếu đã chọn gợi ý, ngược lại chuỗi đã nhập (mã / tên)"""
+        text = entry.get().strip()
+        match = _SUGGESTION_ID.search(text)
+        return int(match.group(1)) if match else text
+
     # -----------------------
     # Tạo phiếu mượn
     # -----------------------
     def _create_borrow(self):
-        reader_name = self.reader_entry.get().strip()
-        book_name = self.book_entry.get().strip()
+        reader_ref = self._entry_ref(self.reader_entry)
+        book_ref = self._entry_ref(self.book_entry)
 
-        if not reader_name or not book_name:
-            messagebox.showwarning("Thiếu dữ liệu", "Vui lòng nhập đầy đủ tên bạn đọc và sách")
+        if not reader_ref or not book_ref:
+            messagebox.showwarning("Thiếu dữ liệu", "Vui lòng nhập đầy đủ bạn đọc và sách")
             return
 
-        success, msg = self.controller.create_borrow_by_name(
-            reader_name=reader_name,
-            book_name=book_name,
+        success, msg, slip_id = self.controller.create_borrow_by_name(
+            reader_name=reader_ref,
+            book_name=book_ref,
         )
         messagebox.showinfo("Kết quả", msg)
         if success:
             self._reset_form()
-            self._load_borrows()
+            self._refresh_slip(slip_id)
+
+    # -----------------------
+    # Mượn nhiều sách (quét mã)
+    # -----------------------
+    def _add_scanned_code(self, event=None):
+        code = self.scan_entry.get().strip()
+        if not code:
+            return
+        self.scanned_codes.append(code)
+        self.scan_entry.delete(0, tk.END)
+        self._refresh_scanned_codes()
+
+    def _remove_scanned_code(self):
+        selected = self.scan_list.curselection()
+        if not selected:
+            return
+        code = list(Counter(self.scanned_codes))[selected[0]]
+        self.scanned_codes = [c for c in self.scanned_codes if c != code]
+        self._refresh_scanned_codes()
+
+    def _clear_scanned_codes(self):
+        self.scanned_codes = []
+        self._refresh_scanned_codes()
+
+    def _refresh_scanned_codes(self):
+        self.scan_list.delete(0, tk.END)
+        for code, count in Counter(self.scanned_codes).items():
+            self.scan_list.insert(tk.END, f"{code}  x{count}" if count > 1 else code)
+        self.confirm_batch_button.config(text=f"✅ Xác nhận mượn ({len(self.scanned_codes)})")
+
+    def _confirm_batch_borrow(self):
+        reader_ref = self._entry_ref(self.reader_entry)
+        if not reader_ref:
+            messagebox.showwarning("Thiếu dữ liệu", "Vui lòng nhập tên hoặc mã bạn đọc")
+            return
+        if not self.scanned_codes:
+            messagebox.showwarning("Thiếu dữ liệu", "Vui lòng quét ít nhất 1 sách")
+            return
+
+        if not messagebox.askyesno(
+                "Xác nhận",
+                f"Tạo 1 phiếu mượn {len(self.scanned_codes)} cuốn cho bạn đọc '{reader_ref}'?"
+        ):
+            return
+
+        success, msg, slip_id = self.controller.create_borrow_batch(reader_ref, self.scanned_codes)
+        messagebox.showinfo("Kết quả", msg)
+        if success:
+            self._clear_scanned_codes()
+            self._reset_form()
+            self._refresh_slip(slip_id)
+        else:
+            self.scan_entry.focus_set()
 
     # -----------------------
     # Cập nhật phiếu mượn
@@ -123,8 +402,9 @@ class BorrowView(ttk.Frame):
         if return_date:
             status = "RETURNED"
 
+        slip_id = self.selected_slip_id
         success, msg = self.controller.update_borrow(
-            slip_id=self.selected_slip_id,
+            slip_id=slip_id,
             borrow_date=borrow_date,
             return_date=return_date,
             status=status
@@ -132,7 +412,7 @@ class BorrowView(ttk.Frame):
         messagebox.showinfo("Kết quả", msg)
         if success:
             self._reset_form()
-            self._load_borrows()
+            self._refresh_slip(slip_id)
 
     # -----------------------
     # Trả sách
@@ -142,11 +422,51 @@ class BorrowView(ttk.Frame):
             messagebox.showwarning("Chưa chọn", "Vui lòng chọn phiếu để trả sách")
             return
 
-        success, msg = self.controller.return_books(self.selected_slip_id)
+        slip_id = self.selected_slip_id
+        success, msg = self.controller.return_books(slip_id)
         messagebox.showinfo("Kết quả", msg)
         if success:
             self._reset_form()
-            self._load_borrows()
+            self._refresh_slip(slip_id)
+
+    # -----------------------
+    # Trả hàng loạt (thùng trả sách)
+    # -----------------------
+    def _open_bulk_return(self):
+        dialog = tk.Toplevel(self)
+        dialog.title("📦 Trả sách hàng loạt")
+        dialog.transient(self.winfo_toplevel())
+
+        ttk.Label(dialog, text="Mỗi dòng 1 mã (quét hoặc dán danh sách):").pack(anchor="w", padx=10, pady=(10, 5))
+        codes_text = tk.Text(dialog, width=40, height=15)
+        codes_text.pack(padx=10, fill="both", expand=True)
+        codes_text.focus_set()
+
+        kind = tk.StringVar(value="barcode")
+        kinds = ttk.Frame(dialog)
+        kinds.pack(padx=10, pady=5, anchor="w")
+        ttk.Radiobutton(kinds, text="Barcode sách", variable=kind, value="barcode").pack(side="left")
+        ttk.Radiobutton(kinds, text="Mã phiếu mượn", variable=kind, value="slip").pack(side="left", padx=10)
+
+        def submit():
+            codes = [line.strip() for line in codes_text.get("1.0", tk.END).splitlines() if line.strip()]
+            if not codes:
+                messagebox.showwarning("Thiếu dữ liệu", "Vui lòng nhập ít nhất 1 mã", parent=dialog)
+                return
+            if kind.get() == "slip":
+                success, msg, _ = self.controller.return_books_bulk(slip_ids=codes)
+            else:
+                success, msg, _ = self.controller.return_books_bulk(barcodes=codes)
+            messagebox.showinfo("Kết quả", msg, parent=dialog)
+            if success:
+                dialog.destroy()
+                self._reset_form()
+                self._load_borrows()
+
+        buttons = ttk.Frame(dialog)
+        buttons.pack(pady=10)
+        ttk.Button(buttons, text="📤 Trả tất cả", command=submit).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Đóng", command=dialog.destroy).pack(side="left", padx=5)
 
     # -----------------------
     # Khi click vào row
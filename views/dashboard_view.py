@@ -8,6 +8,7 @@ import logging
 
 from controllers.reader_controller import ReaderController
 from controllers.book_controller import BookController
+from utils.background_loader import BackgroundLoader
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,7 @@ class DashboardView(ttk.Frame):
         self.stats_labels = {}
 
         self._create_widgets()
+        self.loader = BackgroundLoader(self)
         self._load_statistics()
 
         # Auto refresh mỗi 30 giây
@@ -317,11 +319,23 @@ class DashboardView(ttk.Frame):
         refresh_btn.pack(pady=(15, 0))
 
     def _load_statistics(self):
-        """Load dữ liệu thống kê từ database"""
-        try:
-            # ✅ Lấy thống kê bạn đọc
-            reader_stats = self.reader_controller.get_statistics()
+        """Load dữ liệu thống kê từ database (chạy nền, không chặn giao diện)"""
+        self.loader.submit(
+            'statistics',
+            self._fetch_statistics,
+            on_success=self._show_statistics,
+            on_error=lambda e: logger.error(f"❌ Lỗi load thống kê Dashboard: {e}")
+        )
+
+    def _fetch_statistics(self):
+        """(Thread nền) Lấy thống kê bạn đọc và sách"""
+        return self.reader_controller.get_statistics(), self.book_controller.get_statistics()
 
+    def _show_statistics(self, result):
+        """Cập nhật các thẻ thống kê (main thread)"""
+        reader_stats, book_stats = result
+        try:
+            # ✅ Thống kê bạn đọc
             total_readers = reader_stats.get('total', 0)
             active_readers = reader_stats.get('active', 0)
             expiring_soon = reader_stats.get('expiring_soon', 0)
@@ -338,9 +352,7 @@ class DashboardView(ttk.Frame):
             if 'expired_value' in self.stats_labels:
                 self.stats_labels['expired_value'].config(text=str(expiring_soon))
 
-            # ✅ Lấy thống kê sách
-            book_stats = self.book_controller.get_statistics()
-
+            # ✅ Thống kê sách
             total_books = book_stats.get('total_books', 0)
             borrowed_qty = book_stats.get('borrowed_quantity', 0)
 
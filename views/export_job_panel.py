@@ -0,0 +1,209 @@
+"""
+Export Job Panel - Bảng theo dõi các job xuất dữ liệu chạy nền (đặt ở cuối cửa sổ chính)
+
+Đọc trạng thái từ export_jobs theo chu kỳ after() (job chạy ở thread khác, không
+được chạm vào widget), hiện tiến độ, nút hủy và thông báo khi job xong.
+"""
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Dict, Optional
+import logging
+
+from utils.export_jobs import ExportJob, export_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class ExportJobPanel(ttk.Frame):
+    """
+    Danh sách job xuất: tiêu đề, thanh tiến độ, trạng thái, nút Hủy / Đóng
+
+    Args:
+        parent: Widget cha (cửa sổ chính)
+        on_notify: Callback(text) khi job xong (vd. ghi lên thanh trạng thái)
+    """
+
+    POLL_INTERVAL_MS = 300
+    TOAST_MS = 6000
+
+    def __init__(self, parent, on_notify: Optional[Callable[[str], None]] = None):
+        super().__init__(parent)
+        self.on_notify = on_notify
+        self._rows: Dict[int, dict] = {}
+        self._toast = None
+
+        # Chỉ hiện khi có job
+        self.body = ttk.LabelFrame(self, text="📤 Xuất dữ liệu", padding=(5, 2))
+        self._visible = False
+
+        toolbar = ttk.Frame(self.body)
+        toolbar.pack(fill='x')
+        ttk.Button(
+            toolbar,
+            text="Xóa job đã xong",
+            command=self._clear_finished
+        ).pack(side='right')
+
+        self.list_frame = ttk.Frame(self.body)
+        self.list_frame.pack(fill='x')
+
+        self._poll()
+
+    # ========== CẬP NHẬT ==========
+
+    def _poll(self):
+        try:
+            jobs = export_jobs.jobs()
+            current = {job.job_id for job in jobs}
+
+            for job_id in [j for j in self._rows if j not in current]:
+                self._rows.pop(job_id)['frame'].destroy()
+
+            for job in jobs:
+                row = self._rows.get(job.job_id) or self._create_row(job)
+                self._update_row(row, job)
+
+            self._set_visible(bool(jobs))
+        except Exception as e:
+            logger.error(f"Error updating export jobs: {e}")
+        finally:
+            self.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _create_row(self, job: ExportJob) -> dict:
+        frame = ttk.Frame(self.list_frame)
+        frame.pack(fill='x', pady=1)
+
+        ttk.Label(frame, text=job.title, width=32).pack(side='left')
+        progress = ttk.Progressbar(frame, length=220, maximum=100)
+        progress.pack(side='left', padx=5)
+        status = ttk.Label(frame, width=40)
+        status.pack(side='left', padx=5)
+        button = ttk.Button(frame, width=8, command=lambda: self._on_button(job.job_id))
+        button.pack(side='right')
+
+        row = {
+            'frame': frame,
+            'progress': progress,
+            'status': status,
+            'button': button,
+            'notified': False,
+            'indeterminate': False,
+        }
+        self._rows[job.job_id] = row
+        return row
+
+    def _update_row(self, row: dict, job: ExportJob):
+        percent = job.percent
+        progress = row['progress']
+
+        if job.status == ExportJob.RUNNING and percent is None:
+            if not row['indeterminate']:
+                progress.config(mode='indeterminate')
+                progress.start(15)
+                row['indeterminate'] = True
+        else:
+            if row['indeterminate']:
+                progress.stop()
+                progress.config(mode='determinate')
+                row['indeterminate'] = False
+            progress['value'] = percent or 0
+
+        row['status'].config(text=self._status_text(job, percent))
+        row['button'].config(text="✖ Đóng" if job.is_finished else "Hủy",
+                             state='disabled' if job.cancel_requested and not job.is_finished else 'normal')
+
+        if job.is_finished and not row['notified']:
+            row['notified'] = True
+            self._notify(job)
+
+    @staticmethod
+    def _status_text(job: ExportJob, percent: Optional[float]) -> str:
+        if job.status == ExportJob.RUNNING:
+            if percent is not None:
+                return f"{job.status_text} {percent:.0f}% ({job.done:,}/{job.total:,})"
+            return f"{job.status_text}... {job.done:,} dòng"
+        if job.status == ExportJob.DONE:
+            return f"✅ {job.status_text}"
+        if job.status == ExportJob.FAILED:
+            return f"❌ {job.message.splitlines()[0] if job.message else job.status_text}"
+        if job.status == ExportJob.CANCELLED:
+            return f"⚠️ {job.status_text}"
+        return job.status_text
+
+    def _set_visible(self, visible: bool):
+        if visible and not self._visible:
+            self.body.pack(fill='x', padx=5, pady=(0, 3))
+        elif not visible and self._visible:
+            self.body.pack_forget()
+        self._visible = visible
+
+    # ========== THAO TÁC ==========
+
+    def _on_button(self, job_id: int):
+        job = export_jobs.get(job_id)
+        if job is None:
+            return
+        if job.is_finished:
+            export_jobs.remove(job_id)
+        else:
+            job.cancel()
+
+    def _clear_finished(self):
+        for job in export_jobs.jobs():
+            if job.is_finished:
+                export_jobs.remove(job.job_id)
+
+    # ========== THÔNG BÁO ==========
+
+    def _notify(self, job: ExportJob):
+        """Thông báo không chặn (không dùng messagebox để không cắt ngang việc đang làm)"""
+        if job.status == ExportJob.DONE:
+            text = f"✅ {job.title}: {job.message}"
+        elif job.status == ExportJob.FAILED:
+            text = f"❌ {job.title}: {job.message}"
+        else:
+            text = f"⚠️ {job.title}: đã hủy"
+
+        if self.on_notify:
+            self.on_notify(text.splitlines()[0])
+        self._show_toast(text, error=job.status == ExportJob.FAILED)
+        self.bell()
+
+    def _show_toast(self, text: str, error: bool = False):
+        if self._toast is not None:
+            self._toast.destroy()
+
+        toplevel = self.winfo_toplevel()
+        toast = tk.Toplevel(toplevel)
+        toast.overrideredirect(True)
+        toast.attributes('-topmost', True)
+
+        label = tk.Label(
+            toast,
+            text=text,
+            justify='left',
+            bg='#F44336' if error else '#323232',
+            fg='white',
+            font=('Arial', 10),
+            padx=15,
+            pady=10,
+            wraplength=420
+        )
+        label.pack()
+        label.bind('<Button-1>', lambda e: self._close_toast(toast))
+
+        toast.update_idletasks()
+        x = toplevel.winfo_rootx() + toplevel.winfo_width() - toast.winfo_width() - 20
+        y = toplevel.winfo_rooty() + toplevel.winfo_height() - toast.winfo_height() - 60
+        toast.geometry(f"+{max(x, 0)}+{max(y, 0)}")
+
+        self._toast = toast
+        self.after(self.TOAST_MS, lambda: self._close_toast(toast))
+
+    def _close_toast(self, toast):
+        if self._toast is toast:
+            self._toast = None
+        try:
+            toast.destroy()
+        except tk.TclError:
+            pass
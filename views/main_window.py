@@ -14,6 +14,8 @@ from views.report_view import ReportView
 from views.staff_view import StaffView
 from views.system_view import SystemView
 from views.penalty_view import PenaltyView
+from views.export_job_panel import ExportJobPanel
+from utils.export_jobs import export_jobs
 from config.session import Session
 
 logger = logging.getLogger(__name__)
@@ -331,6 +333,13 @@ class MainWindow(tk.Tk):
         self.clock_label.pack(side='right', padx=10)
         self._update_clock()
 
+        # Job xuất dữ liệu chạy nền (chỉ hiện khi có job), nằm trên thanh trạng thái
+        self.export_panel = ExportJobPanel(
+            self,
+            on_notify=lambda text: self.status_label.config(text=f"  {text}")
+        )
+        self.export_panel.pack(side='bottom', fill='x')
+
     def _add_placeholder_tab(self, title):
         """Thêm tab placeholder"""
         frame = ttk.Frame(self.notebook)
@@ -486,12 +495,16 @@ All rights reserved.
 
     def _on_closing(self):
         """Xử lý khi đóng ứng dụng"""
-        if messagebox.askokcancel(
-                "Xác nhận thoát",
-                "Bạn có chắc chắn muốn thoát khỏi ứng dụng?"
-        ):
+        message = "Bạn có chắc chắn muốn thoát khỏi ứng dụng?"
+        active_exports = export_jobs.active_count()
+        if active_exports:
+            message = (f"Đang có {active_exports} job xuất dữ liệu chưa xong, "
+                       f"thoát sẽ hủy và xóa file dở dang.\n\n" + message)
+
+        if messagebox.askokcancel("Xác nhận thoát", message):
             try:
                 # Cleanup
+                export_jobs.shutdown()
                 db.close_pool()
                 logger.info("Application closed successfully")
             except Exception as e:
@@ -8,6 +8,7 @@ from models.reader import Reader, get_all_statuses, get_status_display_map
 from controllers.reader_controller import ReaderController
 from views.reader_dialog import ReaderDialog
 from utils.messagebox_helper import MessageBoxHelper
+from utils.background_loader import BackgroundLoader
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,8 @@ class ReaderView(ttk.Frame):
         self.search_after_id = None  # For debouncing
 
         self._create_widgets()
+        # Truy vấn chạy nền, kết quả cập nhật lên Treeview qua after()
+        self.loader = BackgroundLoader(self, on_busy=self._set_busy)
         self._load_data()
 
         # Auto-refresh every 5 minutes
@@ -374,6 +377,9 @@ class ReaderView(ttk.Frame):
         )
         self.status_label.pack(side='left', padx=5)
 
+        # Thanh tiến trình, chỉ hiện khi đang tải
+        self.progress = ttk.Progressbar(status_bar, mode='indeterminate', length=120)
+
         self.count_label = ttk.Label(
             status_bar,
             text="Tổng: 0 bạn đọc",
@@ -397,22 +403,38 @@ class ReaderView(ttk.Frame):
         self.bind_all('<Control-f>', lambda e: self.search_entry.focus())
 
     def _load_data(self):
-        """Load dữ liệu từ database"""
-        try:
-            self.status_label.config(text="⏳ Đang tải dữ liệu...")
-            self.update_idletasks()
+        """Load dữ liệu từ database (chạy nền, không chặn giao diện)"""
+        self.status_label.config(text="⏳ Đang tải dữ liệu...")
+        self.loader.submit(
+            'readers',
+            self.controller.get_all_readers,
+            on_success=self._on_data_loaded,
+            on_error=self._on_load_error
+        )
 
-            self.current_readers = self.controller.get_all_readers()
-            self._populate_tree(self.current_readers)
+    def _on_data_loaded(self, readers: List[Reader]):
+        """Hiển thị dữ liệu sau khi tải xong"""
+        self.current_readers = readers
+        self._populate_tree(self.current_readers)
 
-            self.status_label.config(text=f"✅ Đã tải {len(self.current_readers)} bạn đọc")
-            self.search_result_label.config(text="")
+        self.status_label.config(text=f"✅ Đã tải {len(self.current_readers)} bạn đọc")
+        self.search_result_label.config(text="")
 
-            logger.info(f"Loaded {len(self.current_readers)} readers")
-        except Exception as e:
-            self.status_label.config(text="❌ Lỗi tải dữ liệu")
-            self.msg_helper.show_error("Lỗi", f"Không thể tải dữ liệu: {str(e)}", parent=self)
-            logger.error(f"Error loading data: {e}")
+        logger.info(f"Loaded {len(self.current_readers)} readers")
+
+    def _on_load_error(self, error: Exception):
+        self.status_label.config(text="❌ Lỗi tải dữ liệu")
+        self.msg_helper.show_error("Lỗi", f"Không thể tải dữ liệu: {str(error)}", parent=self)
+        logger.error(f"Error loading data: {error}")
+
+    def _set_busy(self, busy: bool):
+        """Hiện / ẩn thanh tiến trình khi đang tải"""
+        if busy:
+            self.progress.pack(side='left', padx=5)
+            self.progress.start(15)
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
 
     def _populate_tree(self, readers: List[Reader]):
         """Hiển thị dữ liệu lên Treeview"""
@@ -545,28 +567,35 @@ class ReaderView(ttk.Frame):
             self._load_data()
             return
 
-        try:
-            self.status_label.config(text=f"🔍 Đang tìm kiếm '{keyword}'...")
-            self.update_idletasks()
+        # Cùng key 'readers': kết quả của từ khóa cũ (đang gõ dở) bị bỏ qua
+        self.status_label.config(text=f"🔍 Đang tìm kiếm '{keyword}'...")
+        self.loader.submit(
+            'readers',
+            self.controller.search_readers, keyword, search_by,
+            on_success=self._on_search_done,
+            on_error=self._on_search_error
+        )
 
-            readers = self.controller.search_readers(keyword, search_by)
-            self._populate_tree(readers)
+    def _on_search_done(self, readers: List[Reader]):
+        """Hiển thị kết quả tìm kiếm"""
+        self._populate_tree(readers)
 
-            if readers:
-                self.status_label.config(text=f"✅ Hoàn tất tìm kiếm")
-                self.search_result_label.config(
-                    text=f"🎯 Tìm thấy {len(readers)} kết quả",
-                    foreground='#4CAF50'
-                )
-            else:
-                self.status_label.config(text="⚠️ Không tìm thấy")
-                self.search_result_label.config(
-                    text="❌ Không có kết quả",
-                    foreground='#F44336'
-                )
-        except Exception as e:
-            self.status_label.config(text="❌ Lỗi tìm kiếm")
-            self.msg_helper.show_error("Lỗi tìm kiếm", str(e), parent=self)
+        if readers:
+            self.status_label.config(text=f"✅ Hoàn tất tìm kiếm")
+            self.search_result_label.config(
+                text=f"🎯 Tìm thấy {len(readers)} kết quả",
+                foreground='#4CAF50'
+            )
+        else:
+            self.status_label.config(text="⚠️ Không tìm thấy")
+            self.search_result_label.config(
+                text="❌ Không có kết quả",
+                foreground='#F44336'
+            )
+
+    def _on_search_error(self, error: Exception):
+        self.status_label.config(text="❌ Lỗi tìm kiếm")
+        self.msg_helper.show_error("Lỗi tìm kiếm", str(error), parent=self)
 
     def _reset_search(self):
         """Reset tìm kiếm"""
@@ -576,34 +605,41 @@ class ReaderView(ttk.Frame):
         self._load_data()
 
     def _filter(self):
-        """Lọc dữ liệu"""
+        """Lọc dữ liệu (chạy nền)"""
         try:
-            self.status_label.config(text="🔎 Đang lọc dữ liệu...")
-            self.update_idletasks()
-
             status = self.filter_status_var.get()
             status = None if status == "Tất cả" else status
 
             min_rep = self.filter_min_rep_var.get()
             max_rep = self.filter_max_rep_var.get()
             expiring = self.filter_expiring_var.get()
+        except tk.TclError as e:
+            self.msg_helper.show_error("Lỗi lọc", str(e), parent=self)
+            return
 
-            readers = self.controller.filter_readers(
-                status=status,
-                min_reputation=min_rep,
-                max_reputation=max_rep,
-                expiring_soon=expiring
-            )
+        self.status_label.config(text="🔎 Đang lọc dữ liệu...")
+        self.loader.submit(
+            'readers',
+            self.controller.filter_readers,
+            status=status,
+            min_reputation=min_rep,
+            max_reputation=max_rep,
+            expiring_soon=expiring,
+            on_success=self._on_filter_done,
+            on_error=self._on_filter_error
+        )
 
-            self._populate_tree(readers)
-            self.status_label.config(text=f"✅ Đã lọc: {len(readers)} kết quả")
-            self.search_result_label.config(
-                text=f"📊 {len(readers)} bạn đọc phù hợp",
-                foreground='#1976D2'
-            )
-        except Exception as e:
-            self.status_label.config(text="❌ Lỗi lọc")
-            self.msg_helper.show_error("Lỗi lọc", str(e), parent=self)
+    def _on_filter_done(self, readers: List[Reader]):
+        self._populate_tree(readers)
+        self.status_label.config(text=f"✅ Đã lọc: {len(readers)} kết quả")
+        self.search_result_label.config(
+            text=f"📊 {len(readers)} bạn đọc phù hợp",
+            foreground='#1976D2'
+        )
+
+    def _on_filter_error(self, error: Exception):
+        self.status_label.config(text="❌ Lỗi lọc")
+        self.msg_helper.show_error("Lỗi lọc", str(error), parent=self)
 
     def _reset_filter(self):
         """Reset bộ lọc"""
@@ -932,23 +968,27 @@ class ReaderView(ttk.Frame):
 
     def _export_json(self):
         """Xuất dữ liệu ra JSON"""
-        if self.controller.export_json(self.current_readers, parent=self):
-            self.status_label.config(text="✅ Đã xuất JSON thành công")
+        self._export_async('JSON')
 
     def _export_csv(self):
         """Xuất dữ liệu ra CSV"""
-        if self.controller.export_csv(self.current_readers, parent=self):
-            self.status_label.config(text="✅ Đã xuất CSV thành công")
+        self._export_async('CSV')
 
     def _export_excel(self):
         """Xuất dữ liệu ra Excel"""
-        if self.controller.export_excel(self.current_readers, parent=self):
-            self.status_label.config(text="✅ Đã xuất Excel thành công")
+        self._export_async('Excel')
 
     def _export_pdf(self):
         """Xuất dữ liệu ra PDF"""
-        if self.controller.export_pdf(self.current_readers, parent=self):
-            self.status_label.config(text="✅ Đã xuất PDF thành công")
+        self._export_async('PDF')
+
+    def _export_async(self, label: str):
+        """
+        Xuất toàn bộ bạn đọc (đọc thẳng từ DB theo lô) bằng job chạy nền:
+        tiến độ, hủy và thông báo hoàn tất ở bảng "Xuất dữ liệu" cuối cửa sổ
+        """
+        if self.controller.export_async(label, None, parent=self):
+            self.status_label.config(text=f"⏳ Đang xuất {label} (xem tiến độ ở cuối cửa sổ)")
 
     def _schedule_auto_refresh(self):
         """Lên lịch auto-refresh mỗi 5 phút"""
@@ -1,12 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from controllers.report_controller import ReportController
+from utils.background_loader import BackgroundLoader
 
 
 class ReportView(tk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
         self.controller = ReportController()
+        self.loader = BackgroundLoader(self, on_busy=self._set_busy)
         self.pack(fill="both", expand=True, padx=10, pady=10)
 
         # --- Header & Filter ---
@@ -96,6 +98,10 @@ class ReportView(tk.Frame):
         tk.Button(btn_frame, text="📤 Xuất Excel", command=self.export_excel,
                   bg="#2196F3", fg="white", font=("Arial", 10)).pack(side="left", padx=10)
 
+        # Trạng thái tải (chạy nền)
+        self.lbl_status = tk.Label(btn_frame, text="", font=("Arial", 9), fg="#666")
+        self.lbl_status.pack(side="left", padx=10)
+
         # Load dữ liệu lần đầu
         self.load_data()
 
@@ -116,11 +122,20 @@ class ReportView(tk.Frame):
         # nhưng nếu controller chưa hỗ trợ truyền mode, bạn cần sửa controller một chút.
         # Ở đây mình giả định bạn sửa controller như bên dưới hướng dẫn.
 
-        try:
-            # Cách gọi cũ: data = self.controller.get_dashboard_data()
-            # Cách gọi mới (cần sửa controller):
-            data = self.controller.get_dashboard_data(mode=selected_mode)
+        # Truy vấn chạy nền; đổi bộ lọc liên tục thì chỉ kết quả cuối được hiển thị
+        self.loader.submit(
+            'report',
+            self.controller.get_dashboard_data, mode=selected_mode,
+            on_success=self.show_data,
+            on_error=lambda e: print(f"Lỗi load data: {e}")
+        )
+
+    def _set_busy(self, busy):
+        self.lbl_status.config(text="⏳ Đang tải dữ liệu..." if busy else "")
 
+    def show_data(self, data):
+        """Hiển thị dữ liệu báo cáo (main thread)"""
+        try:
             # 1. Fill Inventory
             inv = data['inventory']
             self.lbl_total.config(text=f"Tổng: {inv['total']}")
@@ -156,16 +171,11 @@ class ReportView(tk.Frame):
             tree.delete(item)
 
     def export_excel(self):
-        # Gọi hàm xuất excel từ controller (nếu bạn đã thêm ở bước trước)
-        if hasattr(self.controller, 'export_to_excel'):
-            success, msg = self.controller.export_to_excel()
-            if success:
-                messagebox.showinfo("Thành công", msg)
-            elif "hủy" not in msg:
-                messagebox.showerror("Lỗi", msg)
-        else:
-            messagebox.showinfo("Thông báo", "Chức năng đang phát triển")
-
+        # Chọn nơi lưu trên main thread, phần ghi file chạy nền trong hàng đợi xuất
+        # (tiến độ / hủy / thông báo ở bảng "Xuất dữ liệu" cuối cửa sổ chính)
+        save_path = self.controller.ask_excel_path()
+        if save_path:
+            self.controller.export_excel_async(save_path)
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -1,12 +1,18 @@
 import tkinter as tk
 from tkinter import messagebox
+from config.settings import AppConfig
 from controllers.system_controller import SystemController
+from utils.background_loader import BackgroundLoader
 
 
 class SystemView(tk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
         self.controller = SystemController()
+        self.loader = BackgroundLoader(self)
+        # Tiến độ mới nhất của từng bảng (ghi từ thread nền, đọc bằng after())
+        self._progress = {}
+        self._job_title = ""
         self.pack(fill="both", expand=True, padx=20, pady=20)
 
         # Tiêu đề
@@ -45,18 +51,35 @@ class SystemView(tk.Frame):
         frame_backup = tk.LabelFrame(self, text="An Toàn Dữ Liệu", font=("Arial", 11, "bold"), padx=10, pady=10)
         frame_backup.pack(fill="x", pady=20)
 
-        lbl_backup = tk.Label(frame_backup, text="Sao lưu và Phục hồi cơ sở dữ liệu (JSON).")
+        lbl_backup = tk.Label(frame_backup, text="Sao lưu và Phục hồi cơ sở dữ liệu (JSON nén gzip).")
         lbl_backup.pack(side="left", padx=10)
 
         # Nút Phục hồi (Màu đỏ)
-        btn_restore = tk.Button(frame_backup, text="♻️ PHỤC HỒI", command=self.perform_restore,
-                                bg="#F44336", fg="white", font=("Arial", 10, "bold"))
-        btn_restore.pack(side="right", padx=5)
+        self.btn_restore = tk.Button(frame_backup, text="♻️ PHỤC HỒI", command=self.perform_restore,
+                                     bg="#F44336", fg="white", font=("Arial", 10, "bold"))
+        self.btn_restore.pack(side="right", padx=5)
 
         # Nút Sao lưu (Màu cam)
-        btn_backup = tk.Button(frame_backup, text="📦 SAO LƯU NGAY", command=self.perform_backup,
-                               bg="#FF9800", fg="white", font=("Arial", 10, "bold"))
-        btn_backup.pack(side="right", padx=5)
+        self.btn_backup = tk.Button(frame_backup, text="📦 SAO LƯU NGAY", command=self.perform_backup,
+                                    bg="#FF9800", fg="white", font=("Arial", 10, "bold"))
+        self.btn_backup.pack(side="right", padx=5)
+
+        # Nút Sao lưu tăng dần (chỉ các dòng thay đổi từ lần sao lưu trước)
+        self.btn_backup_delta = tk.Button(frame_backup, text="➕ SAO LƯU TĂNG DẦN",
+                                          command=lambda: self.perform_backup(incremental=True),
+                                          bg="#FFB74D", fg="white", font=("Arial", 10, "bold"))
+        self.btn_backup_delta.pack(side="right", padx=5)
+
+        # Số luồng: số bảng được sao lưu / phục hồi đồng thời
+        self.var_workers = tk.IntVar(value=min(AppConfig.BACKUP_WORKERS, self.controller.max_workers))
+        spn_workers = tk.Spinbox(frame_backup, from_=1, to=self.controller.max_workers, width=3,
+                                 textvariable=self.var_workers, state="readonly")
+        spn_workers.pack(side="right", padx=(0, 10))
+        tk.Label(frame_backup, text="Số luồng:").pack(side="right")
+
+        # Trạng thái sao lưu / phục hồi (các bảng đang xử lý, số dòng, tốc độ)
+        self.lbl_restore_status = tk.Label(self, text="", font=("Arial", 9), fg="#555", justify="left")
+        self.lbl_restore_status.pack(anchor="w")
 
         # Load dữ liệu ban đầu
         self.load_current_settings()
@@ -79,23 +102,70 @@ class SystemView(tk.Frame):
         else:
             messagebox.showerror("Lỗi", msg)
 
-    def perform_backup(self):
-        if messagebox.askyesno("Xác nhận", "Bạn có muốn sao lưu dữ liệu ngay bây giờ?"):
-            success, msg = self.controller.perform_backup()
-            if success:
-                messagebox.showinfo("Thành công", msg)
-            else:
-                messagebox.showerror("Lỗi", msg)
+    def perform_backup(self, incremental=False):
+        question = ("Sao lưu các thay đổi kể từ lần sao lưu trước?" if incremental
+                    else "Bạn có muốn sao lưu dữ liệu ngay bây giờ?")
+        if messagebox.askyesno("Xác nhận", question):
+            self._start_job("Đang sao lưu", self.controller.perform_backup,
+                            incremental=incremental)
 
     def perform_restore(self):
-        if messagebox.askyesno("Cảnh báo nguy hiểm",
-                               "Phục hồi sẽ XÓA TOÀN BỘ dữ liệu hiện tại và thay thế bằng bản sao lưu.\n\nBạn có chắc chắn muốn tiếp tục không?"):
-            success, msg = self.controller.perform_restore()
-            if success:
-                messagebox.showinfo("Thành công", msg)
-                self.load_current_settings()
-            elif "hủy" not in msg:
-                messagebox.showerror("Lỗi", msg)
+        if not messagebox.askyesno("Cảnh báo nguy hiểm",
+                                   "Phục hồi sẽ XÓA TOÀN BỘ dữ liệu hiện tại và thay thế bằng bản sao lưu.\n"
+                                   "Chọn 1 bản tăng dần để phục hồi đến thời điểm của bản đó.\n\nBạn có chắc chắn muốn tiếp tục không?"):
+            return
+
+        filepath = self.controller.choose_restore_file()
+        if not filepath:
+            return
+
+        self._start_job("Đang phục hồi", self.controller.restore_from, filepath,
+                        on_success=self.load_current_settings)
+
+    # ========== CHẠY NỀN + TIẾN ĐỘ ==========
+
+    def _start_job(self, title, func, *args, on_success=None, **kwargs):
+        """Chạy sao lưu / phục hồi ở thread nền để cửa sổ không bị treo với dữ liệu lớn"""
+        self._job_title = title
+        self._progress = {}
+        self._set_buttons_state("disabled")
+        self.lbl_restore_status.config(text=f"⏳ {title}...")
+        self.loader.submit(
+            'system_job', func, *args,
+            workers=self.var_workers.get(), progress=self._on_progress,
+            on_success=lambda result: self._on_job_done(result, on_success),
+            on_error=lambda e: self._on_job_done((False, str(e)))
+        )
+        self.after(200, self._show_progress)
+
+    def _on_progress(self, table, rows, rate):
+        """Gọi từ các thread nền (có thể đồng thời): chỉ lưu lại, không chạm vào widget"""
+        self._progress[table] = (rows, rate)
+
+    def _show_progress(self):
+        if not self.loader.is_busy('system_job'):
+            return
+        if self._progress:
+            lines = [f"⏳ {self._job_title}:"]
+            for table, (rows, rate) in list(self._progress.items()):
+                lines.append(f"   {table}: {rows:,} dòng ({rate:,.0f} dòng/s)")
+            self.lbl_restore_status.config(text="\n".join(lines))
+        self.after(200, self._show_progress)
+
+    def _on_job_done(self, result, on_success=None):
+        success, msg = result
+        self._set_buttons_state("normal")
+        self.lbl_restore_status.config(text="✅ Hoàn tất" if success else "❌ Thất bại")
+        if success:
+            messagebox.showinfo("Thành công", msg)
+            if on_success:
+                on_success()
+        else:
+            messagebox.showerror("Lỗi", msg)
+
+    def _set_buttons_state(self, state):
+        for button in (self.btn_backup, self.btn_backup_delta, self.btn_restore):
+            button.config(state=state)
 
 
 # --- QUAN TRỌNG: Dòng này phải nằm SÁT LỀ TRÁI (Không thụt vào) ---